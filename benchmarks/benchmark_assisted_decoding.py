@@ -0,0 +1,102 @@
+"""Compare greedy generation with and without a draft model (assisted decoding).
+
+A TextGeneration is bootstrapped from --model_name with --draft_model_name as its
+draft model. Each of --num_prompts prompts generates exactly --max_new_tokens
+tokens greedily, once without and once with the draft model, and the throughput
+(generated tokens per second) and the draft token acceptance rate are reported.
+
+Example:
+    python benchmarks/benchmark_assisted_decoding.py --model_name <HF model name or path> \
+        --draft_model_name <smaller HF model with the same vocabulary>
+"""
+# Standard
+import argparse
+import os
+import random
+import sys
+import time
+
+# Hack for relative imports outside of containerized environments
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+# Local
+from caikit_nlp.modules.text_generation import TextGeneration
+
+WORDS = "the quick brown fox jumps over a lazy dog while foo and bar".split()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark assisted decoding with a draft model.",
+    )
+    parser.add_argument(
+        "--model_name",
+        help="Target model name or path to bootstrap a TextGeneration from.",
+        required=True,
+    )
+    parser.add_argument(
+        "--draft_model_name",
+        help="Draft model name or path, sharing the target model vocabulary.",
+        required=True,
+    )
+    parser.add_argument("--num_prompts", help="Number of prompts", type=int, default=16)
+    parser.add_argument(
+        "--max_prompt_words", help="Max words per prompt", type=int, default=32
+    )
+    parser.add_argument(
+        "--max_new_tokens", help="Tokens generated per prompt", type=int, default=64
+    )
+    parser.add_argument(
+        "--confidence_threshold",
+        help="Draft token probability below which the draft model stops proposing "
+        "(assistant_confidence_threshold). Default: the draft model's "
+        "generation config",
+        type=float,
+        default=None,
+    )
+    return parser.parse_args()
+
+
+def tokens_per_second(model, prompts, new_tokens):
+    start = time.perf_counter()
+    for prompt in prompts:
+        model.run(prompt, max_new_tokens=new_tokens, min_new_tokens=new_tokens)
+    return len(prompts) * new_tokens / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    random.seed(42)
+    model = TextGeneration.bootstrap(
+        args.model_name, draft_model_path=args.draft_model_name
+    )
+    draft_model = model.draft_model
+    if args.confidence_threshold is not None:
+        draft_model.model.generation_config.assistant_confidence_threshold = (
+            args.confidence_threshold
+        )
+    prompts = [
+        " ".join(random.choices(WORDS, k=random.randint(4, args.max_prompt_words)))
+        for _ in range(args.num_prompts)
+    ]
+    model.run(prompts[0], max_new_tokens=4)  # warm up
+    print(
+        f"{args.num_prompts} prompts, {args.max_new_tokens} new tokens each "
+        f"({args.model_name}, draft {args.draft_model_name}, confidence threshold "
+        f"{draft_model.model.generation_config.assistant_confidence_threshold})"
+    )
+
+    model.draft_model = None
+    baseline_tps = tokens_per_second(model, prompts, args.max_new_tokens)
+    print(f"{'target only':<12} {baseline_tps:10.1f} tokens/s")
+
+    model.draft_model = draft_model
+    draft_model.proposed_tokens = draft_model.accepted_tokens = 0
+    assisted_tps = tokens_per_second(model, prompts, args.max_new_tokens)
+    print(f"{'assisted':<12} {assisted_tps:10.1f} tokens/s")
+
+    print(
+        f"speedup: {assisted_tps / baseline_tps:.2f}x, acceptance rate "
+        f"{draft_model.acceptance_rate:.2f} ({draft_model.accepted_tokens} of "
+        f"{draft_model.proposed_tokens} draft tokens)"
+    )
@@ -0,0 +1,89 @@
+"""Compare batched generation (run_batch) with running one prompt at a time.
+
+Both modes generate exactly --max_new_tokens tokens per prompt with greedy
+decoding, so the throughput (generated tokens per second) is comparable.
+
+Example:
+    python benchmarks/benchmark_batched_generation.py --model_name <HF model name or path>
+"""
+# Standard
+import argparse
+import os
+import random
+import sys
+import time
+
+# Hack for relative imports outside of containerized environments
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+# Local
+from caikit_nlp.modules.text_generation import TextGeneration
+
+WORDS = "the quick brown fox jumps over a lazy dog while foo and bar".split()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark batched generation against a sequential loop.",
+    )
+    parser.add_argument(
+        "--model_name",
+        help="Model name or path to bootstrap a TextGeneration module from.",
+        required=True,
+    )
+    parser.add_argument("--num_prompts", help="Number of prompts", type=int, default=64)
+    parser.add_argument(
+        "--max_prompt_words", help="Max words per prompt", type=int, default=32
+    )
+    parser.add_argument(
+        "--max_new_tokens", help="Tokens generated per prompt", type=int, default=32
+    )
+    parser.add_argument(
+        "--batch_sizes",
+        help="Batch sizes to measure",
+        type=int,
+        nargs="+",
+        default=[8, 32],
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    random.seed(42)
+    model = TextGeneration.bootstrap(args.model_name)
+    # Decoder-only models need left padding to generate in a batch
+    model.model.tokenizer.padding_side = "left"
+    gen_kwargs = {
+        "max_new_tokens": args.max_new_tokens,
+        "min_new_tokens": args.max_new_tokens,
+    }
+    prompts = [
+        " ".join(random.choices(WORDS, k=random.randint(4, args.max_prompt_words)))
+        for _ in range(args.num_prompts)
+    ]
+    model.run(prompts[0], **gen_kwargs)  # warm up
+
+    print(
+        f"{args.num_prompts} prompts, {args.max_new_tokens} new tokens each "
+        f"({args.model_name})"
+    )
+    # min_new_tokens == max_new_tokens, so every prompt generates the same count
+    generated_tokens = args.num_prompts * args.max_new_tokens
+
+    start = time.perf_counter()
+    for prompt in prompts:
+        model.run(prompt, **gen_kwargs)
+    elapsed = time.perf_counter() - start
+    sequential_tps = generated_tokens / elapsed
+    print(f"sequential:       {elapsed:8.2f} s {sequential_tps:10.1f} tokens/s")
+
+    for batch_size in args.batch_sizes:
+        start = time.perf_counter()
+        model.run_batch(prompts, batch_size=batch_size, **gen_kwargs)
+        elapsed = time.perf_counter() - start
+        tps = generated_tokens / elapsed
+        print(
+            f"batch_size={batch_size:<4}  {elapsed:8.2f} s {tps:10.1f} tokens/s "
+            f"({tps / sequential_tps:.1f}x)"
+        )
@@ -0,0 +1,132 @@
+"""Compare continuous batching with one generate() call per concurrent request.
+
+--concurrency client threads each send --requests_per_client TextGeneration.run
+calls back to back. Every request generates exactly its own number of new tokens
+(drawn between --min_new_tokens and --max_new_tokens), so the throughput
+(generated tokens per second) is comparable. The load runs once with independent
+generate() calls and once through a ContinuousBatchingEngine.
+
+Example:
+    python benchmarks/benchmark_continuous_batching.py --model_name <HF model name or path>
+"""
+# Standard
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+# Hack for relative imports outside of containerized environments
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+# Local
+from caikit_nlp.modules.text_generation import TextGeneration
+from caikit_nlp.toolkit.text_generation.continuous_batching import (
+    ContinuousBatchingEngine,
+)
+
+WORDS = "the quick brown fox jumps over a lazy dog while foo and bar".split()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark continuous batching under concurrent load.",
+    )
+    parser.add_argument(
+        "--model_name",
+        help="Model name or path to bootstrap a (decoder-only) TextGeneration from.",
+        required=True,
+    )
+    parser.add_argument(
+        "--concurrency", help="Number of client threads", type=int, default=8
+    )
+    parser.add_argument(
+        "--requests_per_client", help="Requests per client", type=int, default=8
+    )
+    parser.add_argument(
+        "--max_prompt_words", help="Max words per prompt", type=int, default=32
+    )
+    parser.add_argument(
+        "--min_new_tokens", help="Min tokens generated per request", type=int, default=8
+    )
+    parser.add_argument(
+        "--max_new_tokens",
+        help="Max tokens generated per request",
+        type=int,
+        default=64,
+    )
+    parser.add_argument(
+        "--max_batch_size", help="Engine max batch size", type=int, default=8
+    )
+    return parser.parse_args()
+
+
+def run_load(model, clients):
+    """Returns the elapsed seconds and the request latencies of the load"""
+    latencies = []
+
+    def client(requests):
+        for prompt, new_tokens in requests:
+            start = time.perf_counter()
+            model.run(prompt, max_new_tokens=new_tokens, min_new_tokens=new_tokens)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(len(clients)) as executor:
+        list(executor.map(client, clients))
+    return time.perf_counter() - start, latencies
+
+
+def report(name, elapsed, latencies, generated_tokens):
+    print(
+        f"{name:<12} {elapsed:8.2f} s {generated_tokens / elapsed:10.1f} tokens/s  "
+        f"latency mean {statistics.mean(latencies):6.2f} s "
+        f"max {max(latencies):6.2f} s"
+    )
+    return generated_tokens / elapsed
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    random.seed(42)
+    model = TextGeneration.bootstrap(args.model_name)
+    clients = [
+        [
+            (
+                " ".join(
+                    random.choices(WORDS, k=random.randint(4, args.max_prompt_words))
+                ),
+                random.randint(args.min_new_tokens, args.max_new_tokens),
+            )
+            for _ in range(args.requests_per_client)
+        ]
+        for _ in range(args.concurrency)
+    ]
+    generated_tokens = sum(tokens for requests in clients for _, tokens in requests)
+    model.run(clients[0][0][0], max_new_tokens=4)  # warm up
+
+    print(
+        f"{args.concurrency} clients x {args.requests_per_client} requests, "
+        f"{args.min_new_tokens}-{args.max_new_tokens} new tokens each "
+        f"({args.model_name})"
+    )
+
+    model._continuous_batching_engine = None
+    elapsed, latencies = run_load(model, clients)
+    independent_tps = report("independent", elapsed, latencies, generated_tokens)
+
+    engine = ContinuousBatchingEngine(
+        model.model.model, model.model.tokenizer, max_batch_size=args.max_batch_size
+    )
+    model._continuous_batching_engine = engine
+    elapsed, latencies = run_load(model, clients)
+    continuous_tps = report("continuous", elapsed, latencies, generated_tokens)
+    engine.shutdown()
+
+    print(
+        f"speedup: {continuous_tps / independent_tps:.1f}x, mean decode batch "
+        f"{engine.step_sequences / engine.steps:.1f} (max_batch_size="
+        f"{args.max_batch_size})"
+    )
@@ -0,0 +1,94 @@
+"""Compare cross-encoder predict() latency with and without pipelined tokenization.
+
+Pipelined tokenization encodes batch k+1 on a helper thread while batch k runs
+through the model. This script reports the wall time of both modes along with the
+time spent tokenizing alone, i.e. the upper bound of the overlap that can be gained.
+
+Example:
+    python benchmarks/benchmark_crossencoder_pipelining.py --model_path <saved CrossEncoderModule>
+"""
+# Standard
+import argparse
+import os
+import random
+import sys
+import time
+
+# Hack for relative imports outside of containerized environments
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+# Local
+from caikit_nlp.modules.text_embedding import CrossEncoderModule
+
+WORDS = "the quick brown fox jumps over a lazy dog while foo and bar".split()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark pipelined tokenization for cross-encoder predict.",
+    )
+    parser.add_argument(
+        "--model_path",
+        help="Saved CrossEncoderModule to be loaded from disk.",
+        required=True,
+    )
+    parser.add_argument(
+        "--num_docs", help="Number of documents to rerank", type=int, default=512
+    )
+    parser.add_argument(
+        "--doc_words", help="Number of words per document", type=int, default=200
+    )
+    parser.add_argument("--batch_size", help="Batch size", type=int, default=32)
+    parser.add_argument(
+        "--iterations", help="Timed iterations per mode", type=int, default=5
+    )
+    return parser.parse_args()
+
+
+def time_it(fn, iterations):
+    fn()  # warm up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    random.seed(42)
+    model = CrossEncoderModule.load(args.model_path).model
+
+    query = "where is the lazy dog?"
+    pairs = [
+        [query, " ".join(random.choices(WORDS, k=args.doc_words))]
+        for _ in range(args.num_docs)
+    ]
+
+    def tokenize_only():
+        for start in range(0, len(pairs), args.batch_size):
+            model.smart_batching_collate_text_only(
+                pairs[start : start + args.batch_size], truncate_input_tokens=-1
+            )
+
+    def predict(pipelined):
+        return lambda: model.predict(
+            pairs,
+            batch_size=args.batch_size,
+            truncate_input_tokens=-1,
+            pipelined_tokenization=pipelined,
+        )
+
+    tokenize_s = time_it(tokenize_only, args.iterations)
+    serial_s = time_it(predict(False), args.iterations)
+    pipelined_s = time_it(predict(True), args.iterations)
+
+    print("----- Cross-encoder predict -----")
+    print(f"Documents: {args.num_docs} x {args.doc_words} words")
+    print(f"Tokenization only:      {tokenize_s * 1000:.1f} ms")
+    print(f"Serial predict:         {serial_s * 1000:.1f} ms")
+    print(f"Pipelined predict:      {pipelined_s * 1000:.1f} ms")
+    saved = serial_s - pipelined_s
+    print(
+        f"Overlap gained:         {saved * 1000:.1f} ms "
+        f"({100 * saved / tokenize_s if tokenize_s else 0:.0f}% of tokenization time)"
+    )
@@ -0,0 +1,130 @@
+"""Measure the bootstrap time and memory of local text generation models.
+
+A TextGeneration is bootstrapped from --model_name eagerly and with lazy weight
+loading, reporting the time until bootstrap returns, the time of the first run
+and the load time breakdown of the model. Then --num_workers processes each
+bootstrap and run the model at once, in the data type of the checkpoint and in
+--convert_dtype, reporting the mean resident and proportional set size of a
+worker. Weights memory mapped from the checkpoint are shared by the workers, so
+they only count once in the proportional set sizes.
+
+Example:
+    python benchmarks/benchmark_model_loading.py --model_name <HF model name or path>
+"""
+# Standard
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+# Hack for relative imports outside of containerized environments
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+# Third Party
+from transformers import AutoConfig
+
+# Local
+from caikit_nlp.modules.text_generation import TextGeneration
+from tests.fixtures import temp_config
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark lazy and memory mapped model loading.",
+    )
+    parser.add_argument(
+        "--model_name",
+        help="Model name or path to bootstrap a TextGeneration from.",
+        required=True,
+    )
+    parser.add_argument(
+        "--num_workers", help="Number of worker processes", type=int, default=4
+    )
+    parser.add_argument(
+        "--convert_dtype",
+        help="Data type differing from the checkpoint one to load the model with",
+        default="float16",
+    )
+    return parser.parse_args()
+
+
+def memory_mb():
+    """Resident and proportional set size of this process (Linux only)"""
+    sizes = {}
+    with open("/proc/self/smaps_rollup", encoding="utf-8") as smaps:
+        for line in smaps:
+            name, value = line.split()[:2]
+            if name in ("Rss:", "Pss:"):
+                sizes[name[:-1]] = int(value) / 1024
+    return sizes["Rss"], sizes["Pss"]
+
+
+def bootstrap_and_run(model_name, torch_dtype, lazy):
+    """Bootstrap a model, returning it with the bootstrap and first run times"""
+    with temp_config(model_loading={"lazy": lazy}):
+        start = time.perf_counter()
+        model = TextGeneration.bootstrap(model_name, torch_dtype=torch_dtype)
+        bootstrap_time = time.perf_counter() - start
+    start = time.perf_counter()
+    model.run("foo", max_new_tokens=1)
+    return model, bootstrap_time, time.perf_counter() - start
+
+
+def worker(model_name, torch_dtype, barrier, results):
+    """Load and run the model, then report the memory once every worker did"""
+    model = bootstrap_and_run(model_name, torch_dtype, lazy=False)[0]
+    barrier.wait()
+    results.put(memory_mb())
+    barrier.wait()
+    del model
+
+
+def workers_memory(model_name, torch_dtype, num_workers):
+    """Mean resident and proportional set size of num_workers workers"""
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(num_workers)
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(model_name, torch_dtype, barrier, results))
+        for _ in range(num_workers)
+    ]
+    for process in processes:
+        process.start()
+    sizes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return (
+        statistics.mean(rss for rss, _ in sizes),
+        statistics.mean(pss for _, pss in sizes),
+    )
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    checkpoint_dtype = str(AutoConfig.from_pretrained(args.model_name).torch_dtype)
+    checkpoint_dtype = checkpoint_dtype.rsplit(".", maxsplit=1)[-1]
+    print(f"{args.model_name} (checkpoint data type {checkpoint_dtype})")
+
+    bootstrap_and_run(args.model_name, checkpoint_dtype, lazy=False)  # warm up
+    for lazy in (False, True):
+        model, bootstrap_time, run_time = bootstrap_and_run(
+            args.model_name, checkpoint_dtype, lazy
+        )
+        load_times = ", ".join(
+            f"{step} {seconds * 1000:.1f} ms"
+            for step, seconds in model.model.load_times.items()
+        )
+        print(
+            f"{'lazy' if lazy else 'eager':<6} bootstrap {bootstrap_time * 1000:8.1f} ms, "
+            f"first run {run_time * 1000:8.1f} ms ({load_times})"
+        )
+        del model
+
+    for torch_dtype in (checkpoint_dtype, args.convert_dtype):
+        rss, pss = workers_memory(args.model_name, torch_dtype, args.num_workers)
+        print(
+            f"{args.num_workers} workers loading {torch_dtype:<8}: memory per worker "
+            f"RSS {rss:8.1f} MB, PSS {pss:8.1f} MB"
+        )
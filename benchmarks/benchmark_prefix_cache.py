@@ -0,0 +1,107 @@
+"""Measure the prefill saved by the PeftPromptTuning prompt prefix KV cache.
+
+A prompt tuned model (untrained, --num_virtual_tokens virtual tokens) is created
+from the base model with a verbalizer of --instruction_words fixed words before
+the {{input}} placeholder. Each of --num_prompts short inputs is generated with
+and without the prefix cache. The mean latency is reported for 1 new token
+(almost only the prefill) and for --max_new_tokens new tokens.
+
+Example:
+    python benchmarks/benchmark_prefix_cache.py --model_name <HF causal model name or path>
+"""
+# Standard
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+# Hack for relative imports outside of containerized environments
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+# First Party
+from caikit.core.data_model import DataStream
+
+# Local
+from caikit_nlp.data_model import GenerationTrainRecord, TuningConfig
+from caikit_nlp.modules.text_generation import PeftPromptTuning
+from caikit_nlp.resources.pretrained_model import HFAutoCausalLM
+
+WORDS = "the quick brown fox jumps over a lazy dog while foo and bar".split()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the PeftPromptTuning prefix KV cache.",
+    )
+    parser.add_argument(
+        "--model_name",
+        help="Causal model name or path to prompt tune.",
+        required=True,
+    )
+    parser.add_argument(
+        "--instruction_words",
+        help="Number of fixed words in the verbalizer before the input",
+        type=int,
+        default=200,
+    )
+    parser.add_argument(
+        "--num_virtual_tokens", help="Number of virtual tokens", type=int, default=20
+    )
+    parser.add_argument("--num_prompts", help="Number of prompts", type=int, default=32)
+    parser.add_argument(
+        "--max_new_tokens", help="Tokens generated per prompt", type=int, default=16
+    )
+    return parser.parse_args()
+
+
+def mean_latency(model, prompts, new_tokens):
+    latencies = []
+    for prompt in prompts:
+        start = time.perf_counter()
+        model.run(prompt, max_new_tokens=new_tokens, min_new_tokens=new_tokens)
+        latencies.append(time.perf_counter() - start)
+    return statistics.mean(latencies)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    random.seed(42)
+    instruction = " ".join(random.choices(WORDS, k=args.instruction_words))
+    model = PeftPromptTuning.train(
+        base_model=HFAutoCausalLM.bootstrap(
+            model_name=args.model_name, tokenizer_name=args.model_name
+        ),
+        train_stream=DataStream.from_iterable(
+            [GenerationTrainRecord(input="foo", output="bar")]
+        ),
+        num_epochs=0,
+        tuning_config=TuningConfig(
+            num_virtual_tokens=args.num_virtual_tokens,
+            prompt_tuning_init_text="hello world",
+        ),
+        verbalizer=f"Instruction: {instruction}\nInput: {{{{input}}}}\nOutput:",
+    )
+    prompts = [
+        " ".join(random.choices(WORDS, k=random.randint(4, 16)))
+        for _ in range(args.num_prompts)
+    ]
+    model._use_prefix_cache = True
+    model.run(prompts[0], max_new_tokens=1)  # build the cache and warm up
+    prefix_cache = model._get_prefix_cache()
+    print(
+        f"{args.num_prompts} prompts, cached prefix of "
+        f"{prefix_cache.num_virtual_tokens} virtual + "
+        f"{len(prefix_cache.token_ids)} verbalizer tokens ({args.model_name})"
+    )
+
+    for new_tokens in (1, args.max_new_tokens):
+        model._use_prefix_cache = False
+        uncached = mean_latency(model, prompts, new_tokens)
+        model._use_prefix_cache = True
+        cached = mean_latency(model, prompts, new_tokens)
+        print(
+            f"{new_tokens:3d} new tokens: uncached {uncached * 1000:8.1f} ms  "
+            f"cached {cached * 1000:8.1f} ms  ({uncached / cached:.1f}x)"
+        )
@@ -0,0 +1,155 @@
+"""Measure the cost of each additional prompt tuned model over a shared base model.
+
+An untrained PeftPromptTuning model of --model_name is saved --num_adapters times,
+each with its own prompt initialization text. All copies are loaded with and
+without text_generation.shared_base_models, reporting the mean load time and
+memory growth of each model after the first one. The memory is the proportional
+set size after a one token run, so the base model weights are paged in and
+weights memory mapped from the same file are only counted once. Then --num_prompts
+prompts, spread over the shared models, are generated one run() at a time and
+with PeftPromptTuning.run_mixed_batch.
+
+Example:
+    python benchmarks/benchmark_shared_base_models.py --model_name <HF causal model name or path>
+"""
+# Standard
+import argparse
+import gc
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+# Hack for relative imports outside of containerized environments
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+# First Party
+from caikit.core.data_model import DataStream
+
+# Local
+from caikit_nlp.data_model import GenerationTrainRecord, TuningConfig
+from caikit_nlp.modules.text_generation import PeftPromptTuning
+from caikit_nlp.resources.pretrained_model import HFAutoCausalLM
+from tests.fixtures import temp_config
+
+WORDS = "the quick brown fox jumps over a lazy dog while foo and bar".split()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark prompt tuned models sharing their base model.",
+    )
+    parser.add_argument(
+        "--model_name",
+        help="Causal model name or path to prompt tune.",
+        required=True,
+    )
+    parser.add_argument(
+        "--num_adapters", help="Number of prompt tuned models", type=int, default=8
+    )
+    parser.add_argument(
+        "--num_virtual_tokens", help="Number of virtual tokens", type=int, default=20
+    )
+    parser.add_argument(
+        "--torch_dtype",
+        help="Data type to load the models with. Default: the trained data type",
+        default=None,
+    )
+    parser.add_argument("--num_prompts", help="Number of prompts", type=int, default=32)
+    parser.add_argument(
+        "--max_new_tokens", help="Tokens generated per prompt", type=int, default=16
+    )
+    return parser.parse_args()
+
+
+def pss_mb():
+    """Proportional set size of this process (Linux only)"""
+    with open("/proc/self/smaps_rollup", encoding="utf-8") as smaps:
+        for line in smaps:
+            if line.startswith("Pss:"):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError("No Pss in /proc/self/smaps_rollup")
+
+
+def load_all(model_dirs, shared, torch_dtype):
+    """Load every model, returning them with the load times and memory growths
+    of the models after the first one
+    """
+    models, load_times, memory_growths = [], [], []
+    with temp_config(text_generation={"shared_base_models": shared}):
+        for model_dir in model_dirs:
+            pss = pss_mb()
+            start = time.perf_counter()
+            models.append(PeftPromptTuning.load(model_dir, torch_dtype=torch_dtype))
+            load_times.append(time.perf_counter() - start)
+            models[-1].run("foo", max_new_tokens=1)
+            memory_growths.append(pss_mb() - pss)
+    return models, load_times[1:], memory_growths[1:]
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    random.seed(42)
+    model_dirs = []
+    for index in range(args.num_adapters):
+        model = PeftPromptTuning.train(
+            base_model=HFAutoCausalLM.bootstrap(
+                model_name=args.model_name, tokenizer_name=args.model_name
+            ),
+            train_stream=DataStream.from_iterable(
+                [GenerationTrainRecord(input="foo", output="bar")]
+            ),
+            num_epochs=0,
+            tuning_config=TuningConfig(
+                num_virtual_tokens=args.num_virtual_tokens,
+                prompt_tuning_init_text=" ".join(random.choices(WORDS, k=4)),
+            ),
+            verbalizer=f"Task {index}: {{{{input}}}}",
+        )
+        model_dirs.append(tempfile.mkdtemp())
+        model.save(model_dirs[-1], save_base_model=True)
+        del model
+    gc.collect()
+    print(
+        f"{args.num_adapters} prompt tuned models of {args.model_name} "
+        f"(torch_dtype {args.torch_dtype})"
+    )
+
+    for shared in (False, True):
+        models = None
+        gc.collect()
+        models, load_times, memory_growths = load_all(
+            model_dirs, shared, args.torch_dtype
+        )
+        print(
+            f"{'shared' if shared else 'separate':<9} base model: additional model "
+            f"load {statistics.mean(load_times) * 1000:8.1f} ms, "
+            f"memory (PSS) +{statistics.mean(memory_growths):7.1f} MB"
+        )
+
+    prompts = [
+        " ".join(random.choices(WORDS, k=random.randint(4, 16)))
+        for _ in range(args.num_prompts)
+    ]
+    prompt_models = [models[i % len(models)] for i in range(len(prompts))]
+    kwargs = {
+        "max_new_tokens": args.max_new_tokens,
+        "min_new_tokens": args.max_new_tokens,
+    }
+    generated_tokens = len(prompts) * args.max_new_tokens
+    PeftPromptTuning.run_mixed_batch(prompt_models[:2], prompts[:2], max_new_tokens=2)
+
+    start = time.perf_counter()
+    for model, prompt in zip(prompt_models, prompts):
+        model.run(prompt, **kwargs)
+    sequential_tps = generated_tokens / (time.perf_counter() - start)
+    start = time.perf_counter()
+    PeftPromptTuning.run_mixed_batch(prompt_models, prompts, **kwargs)
+    mixed_tps = generated_tokens / (time.perf_counter() - start)
+    print(
+        f"{args.num_prompts} prompts over {len(models)} models: sequential run "
+        f"{sequential_tps:8.1f} tokens/s, run_mixed_batch {mixed_tps:8.1f} tokens/s "
+        f"({mixed_tps / sequential_tps:.1f}x)"
+    )
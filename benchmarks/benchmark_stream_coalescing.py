@@ -0,0 +1,151 @@
+"""Measure the client CPU per generated token of TGIS streams with and without
+stream coalescing.
+
+A fake TGIS server (see fake_tgis_server.py) is started in a subprocess, so that
+only the client's CPU is measured, streaming each word of the prompt as a token
+with no delay, like a fast model. --streams TGISGenerationClient.stream_generate
+calls of --tokens tokens each are consumed, with the generated token details, and
+each result is converted to its protobuf message and serialized like the runtime
+sends it. The streams run without coalescing, and then for each
+stream_coalesce_tokens of --coalesce_tokens. For each run, the script reports the
+process CPU time per generated token, the results per stream and the streamed
+tokens per second.
+
+Example:
+    python benchmarks/benchmark_stream_coalescing.py --tokens 512
+"""
+# Standard
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+
+# Hack for relative imports outside of containerized environments
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+# Third Party
+import grpc
+
+# First Party
+from caikit.core.data_model import ProducerId
+from caikit_tgis_backend.protobufs import generation_pb2_grpc
+import caikit
+
+# Local
+from caikit_nlp.toolkit.text_generation.tgis_utils import TGISGenerationClient
+
+GENERATE_KWARGS = dict(
+    preserve_input_text=False,
+    input_tokens=False,
+    generated_tokens=True,
+    token_logprobs=True,
+    token_ranks=False,
+    include_stop_sequence=False,
+    max_new_tokens=1024,
+    min_new_tokens=0,
+    truncate_input_tokens=0,
+    decoding_method="GREEDY",
+    top_k=0,
+    top_p=1.0,
+    typical_p=1.0,
+    temperature=1.0,
+    seed=None,
+    repetition_penalty=1.0,
+    max_time=None,
+    exponential_decay_length_penalty=None,
+    stop_sequences=None,
+)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the client CPU of TGIS streams with coalescing.",
+    )
+    parser.add_argument("--streams", help="Number of streams", type=int, default=50)
+    parser.add_argument("--tokens", help="Tokens per stream", type=int, default=256)
+    parser.add_argument(
+        "--coalesce_tokens",
+        help="stream_coalesce_tokens values to compare with no coalescing",
+        type=int,
+        nargs="+",
+        default=[4, 16],
+    )
+    return parser.parse_args()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_server(address: str):
+    channel = grpc.insecure_channel(address)
+    grpc.channel_ready_future(channel).result(timeout=30)
+    channel.close()
+
+
+def run_streams(client, text, streams):
+    """Consume the streams, returning the CPU and wall times and results sent"""
+    results = 0
+    cpu_start, start = time.process_time(), time.perf_counter()
+    for _ in range(streams):
+        for result in client.stream_generate(text=text, **GENERATE_KWARGS):
+            result.to_proto().SerializeToString()
+            results += 1
+    return time.process_time() - cpu_start, time.perf_counter() - start, results
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    port = free_port()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            os.path.join(os.path.dirname(__file__), "fake_tgis_server.py"),
+            "--port",
+            str(port),
+            "--rpc_ms",
+            "0",
+            "--request_ms",
+            "0",
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        address = f"localhost:{port}"
+        wait_for_server(address)
+        channel = grpc.insecure_channel(address)
+        stub = generation_pb2_grpc.GenerationServiceStub(channel)
+        client = TGISGenerationClient("fake", "</s>", stub, ProducerId("Bench", "0"))
+        text = " ".join(f"w{i}" for i in range(args.tokens))
+        total_tokens = args.streams * args.tokens
+        print(
+            f"{args.streams} streams x {args.tokens} tokens, fake server in a "
+            "subprocess with no delay per token"
+        )
+
+        # Warm up the channel and the conversions
+        run_streams(client, text, 2)
+        baseline = None
+        for coalesce_tokens in [0] + args.coalesce_tokens:
+            caikit.configure(
+                config_dict={"tgis_client": {"stream_coalesce_tokens": coalesce_tokens}}
+            )
+            cpu, elapsed, results = run_streams(client, text, args.streams)
+            cpu_per_token = cpu / total_tokens * 1e6
+            baseline = baseline or cpu_per_token
+            name = f"{coalesce_tokens} tokens" if coalesce_tokens else "no coalescing"
+            print(
+                f"{name:<14}: {cpu_per_token:6.2f} us CPU/token "
+                f"({baseline / cpu_per_token:4.1f}x), "
+                f"{results / args.streams:6.1f} results/stream, "
+                f"{total_tokens / elapsed:9.1f} tokens/s"
+            )
+        channel.close()
+    finally:
+        server.terminate()
+        server.wait()
@@ -0,0 +1,192 @@
+"""Compare the concurrent stream capacity of the sync and async TGIS clients.
+
+A fake TGIS server (see fake_tgis_server.py) is started locally with enough
+threads to never be the bottleneck. Each of --concurrencies long streams
+(--stream_tokens tokens, --token_ms apart) is consumed either by the sync
+TGISGenerationClient on a pool of --worker_threads threads, like the runtime
+serving run_stream_out, or by the AsyncTGISGenerationClient on a single event
+loop thread. For each run, the script reports the stream throughput, the peak
+number of streams in flight and the median stream duration.
+
+Example:
+    python benchmarks/benchmark_tgis_async_streams.py --worker_threads 16
+"""
+# Standard
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+
+# Hack for relative imports outside of containerized environments
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+# Third Party
+from fake_tgis_server import FakeTGISServicer, start_server
+import grpc
+
+# First Party
+from caikit.core.data_model import ProducerId
+from caikit_tgis_backend.protobufs import generation_pb2_grpc
+from caikit_tgis_backend.tgis_connection import TGISConnection
+
+# Local
+from caikit_nlp.toolkit.text_generation.tgis_utils import (
+    AsyncTGISGenerationClient,
+    TGISGenerationClient,
+    close_async_tgis_clients,
+    get_async_tgis_client,
+)
+
+GENERATE_KWARGS = dict(
+    preserve_input_text=False,
+    input_tokens=False,
+    generated_tokens=False,
+    token_logprobs=False,
+    token_ranks=False,
+    include_stop_sequence=False,
+    max_new_tokens=1024,
+    min_new_tokens=0,
+    truncate_input_tokens=0,
+    decoding_method="GREEDY",
+    top_k=0,
+    top_p=1.0,
+    typical_p=1.0,
+    temperature=1.0,
+    seed=None,
+    repetition_penalty=1.0,
+    max_time=None,
+    exponential_decay_length_penalty=None,
+    stop_sequences=None,
+)
+PRODUCER_ID = ProducerId("Bench", "0")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark concurrent TGIS streams on sync and async clients.",
+    )
+    parser.add_argument(
+        "--concurrencies",
+        help="Numbers of concurrent streams to run",
+        type=int,
+        nargs="+",
+        default=[16, 128, 512],
+    )
+    parser.add_argument(
+        "--worker_threads",
+        help="Threads serving the sync client streams",
+        type=int,
+        default=16,
+    )
+    parser.add_argument(
+        "--stream_tokens", help="Tokens per stream", type=int, default=50
+    )
+    parser.add_argument(
+        "--token_ms", help="Fake server time per token", type=float, default=20.0
+    )
+    return parser.parse_args()
+
+
+class InFlight:
+    """Counts the streams in flight and their peak"""
+
+    def __init__(self):
+        self.count = self.peak = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        with self._lock:
+            self.count += 1
+            self.peak = max(self.peak, self.count)
+
+    def __exit__(self, *_):
+        with self._lock:
+            self.count -= 1
+
+
+def run_sync(address, text, concurrency, worker_threads):
+    """Consume the streams with the sync client, returning the stream durations
+    and the peak streams in flight
+    """
+    in_flight = InFlight()
+    with grpc.insecure_channel(address) as channel:
+        client = TGISGenerationClient(
+            "fake",
+            "</s>",
+            generation_pb2_grpc.GenerationServiceStub(channel),
+            PRODUCER_ID,
+        )
+
+        def stream(_):
+            start = time.perf_counter()
+            with in_flight:
+                for _ in client.stream_generate(text=text, **GENERATE_KWARGS):
+                    pass
+            return time.perf_counter() - start
+
+        with ThreadPoolExecutor(worker_threads) as pool:
+            durations = list(pool.map(stream, range(concurrency)))
+    return durations, in_flight.peak
+
+
+def run_async(address, text, concurrency):
+    """Consume the streams with the async client, returning the stream durations
+    and the peak streams in flight
+    """
+    in_flight = InFlight()
+
+    async def consume():
+        client = AsyncTGISGenerationClient(
+            "fake",
+            "</s>",
+            get_async_tgis_client(TGISConnection(hostname=address, model_id="fake")),
+            PRODUCER_ID,
+        )
+
+        async def stream():
+            start = time.perf_counter()
+            with in_flight:
+                async for _ in client.stream_generate(text=text, **GENERATE_KWARGS):
+                    pass
+            return time.perf_counter() - start
+
+        durations = await asyncio.gather(*(stream() for _ in range(concurrency)))
+        await close_async_tgis_clients()
+        return durations
+
+    return asyncio.run(consume()), in_flight.peak
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    servicer = FakeTGISServicer(rpc_ms=0, request_ms=args.token_ms)
+    server, port = start_server(servicer, workers=max(args.concurrencies) + 8)
+    address = f"localhost:{port}"
+    text = " ".join(["token"] * args.stream_tokens)
+    print(
+        f"streams of {args.stream_tokens} tokens, {args.token_ms} ms/token "
+        f"(ideal stream duration {args.stream_tokens * args.token_ms / 1000:.2f} s), "
+        f"sync client on {args.worker_threads} threads, async client on 1 thread"
+    )
+
+    for concurrency in args.concurrencies:
+        for name in ("sync", "async"):
+            start = time.perf_counter()
+            if name == "sync":
+                durations, peak = run_sync(
+                    address, text, concurrency, args.worker_threads
+                )
+            else:
+                durations, peak = run_async(address, text, concurrency)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{concurrency:4d} streams, {name:<5}: {concurrency / elapsed:7.1f} "
+                f"streams/s, peak in flight {peak:4d}, "
+                f"median stream {statistics.median(durations):6.2f} s, "
+                f"total {elapsed:6.2f} s"
+            )
+    server.stop(None)
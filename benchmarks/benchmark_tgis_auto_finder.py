@@ -0,0 +1,165 @@
+"""Compare TGISAutoFinder lookups with and without the probe cache.
+
+A fake TGIS server (see fake_tgis_server.py) is started locally, whose ModelInfo
+calls take --probe_ms and only find the model "found". The finder's TGIS backend
+tests its connections. --threads threads each look up a missing model and the
+found model, --lookups times, like a burst of requests for a missing model id
+next to a model in use. The lookups first probe TGIS each, like the finder did
+before probes were shared, then use the finder without the probe cache, which
+shares the concurrent probes of a model, and then with negative_ttl_seconds and
+positive_ttl_seconds set. For each run, the script reports the lookups per
+second, the ModelInfo probes TGIS got and the p50 and p99 latencies of the
+missing model lookups.
+
+Example:
+    python benchmarks/benchmark_tgis_auto_finder.py --threads 16
+"""
+# Standard
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import os
+import sys
+import threading
+import time
+
+# Hack for relative imports outside of containerized environments
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+# Third Party
+from fake_tgis_server import FakeTGISServicer, start_server
+import grpc
+
+# First Party
+from caikit_tgis_backend import TGISBackend
+from caikit_tgis_backend.protobufs import generation_pb2
+import aconfig
+import caikit
+
+# Local
+from caikit_nlp.model_management import TGISAutoFinder
+
+FOUND_MODEL = "found"
+
+
+class ProbedTGISServicer(FakeTGISServicer):
+    """Fake TGIS server whose ModelInfo calls take probe_ms"""
+
+    def __init__(self, probe_ms: float):
+        super().__init__()
+        self.probe_s = probe_ms / 1000
+        self.probes = 0
+        self._probe_lock = threading.Lock()
+
+    def ModelInfo(self, request, context):
+        with self._probe_lock:
+            self.probes += 1
+        time.sleep(self.probe_s)
+        if request.model_id != FOUND_MODEL:
+            context.abort(grpc.StatusCode.NOT_FOUND, "Model not found")
+        return generation_pb2.ModelInfoResponse(max_sequence_length=2048)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the TGISAutoFinder probe cache.",
+    )
+    parser.add_argument("--threads", help="Threads looking up", type=int, default=16)
+    parser.add_argument(
+        "--lookups", help="Lookups of each model per thread", type=int, default=20
+    )
+    parser.add_argument(
+        "--probe_ms",
+        help="Fake server cost of a ModelInfo call",
+        type=float,
+        default=50,
+    )
+    parser.add_argument(
+        "--negative_ttl", help="negative_ttl_seconds", type=float, default=5
+    )
+    parser.add_argument(
+        "--positive_ttl", help="positive_ttl_seconds", type=float, default=60
+    )
+    return parser.parse_args()
+
+
+def make_finder(port: int, finder_config: dict) -> TGISAutoFinder:
+    """Finder with a TGIS backend testing its connections to the fake server"""
+    caikit.configure(
+        config_dict={
+            "model_management": {
+                "initializers": {
+                    "default": {
+                        "type": "LOCAL",
+                        "config": {
+                            "backend_priority": [
+                                {
+                                    "type": TGISBackend.backend_type,
+                                    "config": {
+                                        "test_connections": True,
+                                        "connect_timeout": 5,
+                                        "connection": {"hostname": f"localhost:{port}"},
+                                    },
+                                }
+                            ]
+                        },
+                    }
+                }
+            }
+        }
+    )
+    return TGISAutoFinder(aconfig.Config(finder_config, override_env_vars=False))
+
+
+def run(find_model, threads, lookups):
+    """Look up the models from the threads, returning the elapsed time and the
+    sorted latencies of the missing model lookups
+    """
+    missing_latencies = []
+    lock = threading.Lock()
+
+    def look_up():
+        for _ in range(lookups):
+            start = time.perf_counter()
+            assert not find_model("missing")
+            with lock:
+                missing_latencies.append(time.perf_counter() - start)
+            assert find_model(FOUND_MODEL)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        for future in [pool.submit(look_up) for _ in range(threads)]:
+            future.result()
+    return time.perf_counter() - start, sorted(missing_latencies)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    servicer = ProbedTGISServicer(args.probe_ms)
+    server, port = start_server(servicer, workers=args.threads)
+    total = args.threads * args.lookups * 2
+    print(
+        f"{args.threads} threads x {args.lookups} lookups of a missing and a found "
+        f"model, fake server: {args.probe_ms} ms/ModelInfo"
+    )
+    cache_config = {
+        TGISAutoFinder._NEGATIVE_TTL_KEY: args.negative_ttl,
+        TGISAutoFinder._POSITIVE_TTL_KEY: args.positive_ttl,
+    }
+    for name, finder_config, shared in [
+        ("probe each", {}, False),
+        ("shared", {}, True),
+        ("probe cache", cache_config, True),
+    ]:
+        finder = make_finder(port, finder_config)
+        # The unshared probe of a lookup, as find_model did before
+        find_model = finder.find_model if shared else finder._probe
+        probes_before = servicer.probes
+        elapsed, latencies = run(find_model, args.threads, args.lookups)
+        p50 = latencies[len(latencies) // 2] * 1000
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000
+        print(
+            f"{name:<12}: {total / elapsed:9.1f} lookups/s, "
+            f"{servicer.probes - probes_before:5d} probes, "
+            f"missing p50 {p50:6.2f} ms, p99 {p99:6.2f} ms"
+        )
+    server.stop(None)
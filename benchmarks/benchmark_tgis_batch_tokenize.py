@@ -0,0 +1,126 @@
+"""Compare tokenizing a list of passages with unary and batched TGIS tokenize calls.
+
+A fake TGIS server (see fake_tgis_server.py) is started locally. A document
+chunking job of --passages passages of --words words is tokenized with one
+TGISGenerationClient.unary_tokenize call per passage, and then with
+TGISGenerationClient.batch_tokenize, for each tokenize_max_batch_size of
+--max_batch_sizes. The unary calls are sent by --concurrency threads, like a job
+parallelizing its calls. For each run, the script reports the passages tokenized
+per second, the RPCs sent to TGIS and the job time.
+
+Example:
+    python benchmarks/benchmark_tgis_batch_tokenize.py --passages 5000
+"""
+# Standard
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import os
+import random
+import sys
+import time
+
+# Hack for relative imports outside of containerized environments
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+# Third Party
+from fake_tgis_server import FakeTGISServicer, start_server
+import grpc
+
+# First Party
+from caikit.core.data_model import ProducerId
+from caikit_tgis_backend.protobufs import generation_pb2_grpc
+import caikit
+
+# Local
+from caikit_nlp.toolkit.text_generation.tgis_utils import TGISGenerationClient
+
+WORDS = "the quick brown fox jumps over a lazy dog while tokenizers count words".split()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark batched TGIS tokenize calls for many texts.",
+    )
+    parser.add_argument(
+        "--passages", help="Number of passages to tokenize", type=int, default=2000
+    )
+    parser.add_argument("--words", help="Words per passage", type=int, default=100)
+    parser.add_argument(
+        "--concurrency", help="Threads sending the unary calls", type=int, default=8
+    )
+    parser.add_argument(
+        "--max_batch_sizes",
+        help="tokenize_max_batch_size values of the batched runs",
+        type=int,
+        nargs="+",
+        default=[64, 256],
+    )
+    parser.add_argument(
+        "--server_workers", help="Fake server threads", type=int, default=4
+    )
+    parser.add_argument(
+        "--rpc_ms", help="Fake server cost of each call", type=float, default=2.0
+    )
+    parser.add_argument(
+        "--request_ms",
+        help="Fake server cost of each passage in a call",
+        type=float,
+        default=0.05,
+    )
+    return parser.parse_args()
+
+
+def report(name, passages, rpcs, elapsed):
+    print(
+        f"{name:<16}: {passages / elapsed:9.1f} passages/s, {rpcs:5d} RPCs, "
+        f"job {elapsed * 1000:8.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    servicer = FakeTGISServicer(args.rpc_ms, args.request_ms)
+    server, port = start_server(servicer, workers=args.server_workers)
+    channel = grpc.insecure_channel(f"localhost:{port}")
+    stub = generation_pb2_grpc.GenerationServiceStub(channel)
+    client = TGISGenerationClient("fake", "</s>", stub, ProducerId("Bench", "0"))
+    rng = random.Random(0)
+    passages = [
+        " ".join(rng.choices(WORDS, k=args.words)) for _ in range(args.passages)
+    ]
+    print(
+        f"{args.passages} passages of {args.words} words, fake server: "
+        f"{args.server_workers} workers, {args.rpc_ms} ms/call + "
+        f"{args.request_ms} ms/passage"
+    )
+
+    rpcs_before = servicer.rpc_count
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        unary_results = list(pool.map(client.unary_tokenize, passages))
+    report(
+        f"unary x{args.concurrency}",
+        len(passages),
+        servicer.rpc_count - rpcs_before,
+        time.perf_counter() - start,
+    )
+
+    for max_batch_size in args.max_batch_sizes:
+        caikit.configure(
+            config_dict={"tgis_client": {"tokenize_max_batch_size": max_batch_size}}
+        )
+        rpcs_before = servicer.rpc_count
+        start = time.perf_counter()
+        results = client.batch_tokenize(passages)
+        elapsed = time.perf_counter() - start
+        assert [result.token_count for result in results] == [
+            result.token_count for result in unary_results
+        ]
+        report(
+            f"batch of {max_batch_size}",
+            len(passages),
+            servicer.rpc_count - rpcs_before,
+            elapsed,
+        )
+    channel.close()
+    server.stop(None)
@@ -0,0 +1,145 @@
+"""Compare coalesced unary TGIS generate calls with one RPC per call.
+
+A fake TGIS server (see fake_tgis_server.py) is started locally. --concurrency
+client threads each send --requests_per_client TGISGenerationClient.unary_generate
+calls back to back with the same parameters. The load runs without coalescing and
+then with each --windows_ms coalescing window. For each run, the script reports
+the call throughput, the number of RPCs sent and the median and p99 call latency.
+
+Example:
+    python benchmarks/benchmark_tgis_coalescing.py --concurrency 32
+"""
+# Standard
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# Hack for relative imports outside of containerized environments
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+# Third Party
+from fake_tgis_server import FakeTGISServicer, start_server
+import grpc
+
+# First Party
+from caikit.core.data_model import ProducerId
+from caikit_tgis_backend.protobufs import generation_pb2_grpc
+
+# Local
+from caikit_nlp.toolkit.text_generation.tgis_request_coalescer import (
+    TGISRequestCoalescer,
+)
+from caikit_nlp.toolkit.text_generation.tgis_utils import TGISGenerationClient
+
+GENERATE_KWARGS = dict(
+    preserve_input_text=False,
+    input_tokens=False,
+    generated_tokens=False,
+    token_logprobs=False,
+    token_ranks=False,
+    include_stop_sequence=False,
+    max_new_tokens=20,
+    min_new_tokens=0,
+    truncate_input_tokens=0,
+    decoding_method="GREEDY",
+    top_k=0,
+    top_p=1.0,
+    typical_p=1.0,
+    temperature=1.0,
+    seed=None,
+    repetition_penalty=1.0,
+    max_time=None,
+    exponential_decay_length_penalty=None,
+    stop_sequences=None,
+)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the coalescing of unary TGIS generate calls.",
+    )
+    parser.add_argument(
+        "--concurrency", help="Number of client threads", type=int, default=32
+    )
+    parser.add_argument(
+        "--requests_per_client", help="Calls per client", type=int, default=50
+    )
+    parser.add_argument(
+        "--windows_ms",
+        help="Coalescing windows to compare with no coalescing",
+        type=float,
+        nargs="+",
+        default=[1.0, 5.0],
+    )
+    parser.add_argument(
+        "--max_batch_size", help="Max calls per coalesced RPC", type=int, default=16
+    )
+    parser.add_argument(
+        "--server_workers", help="Fake server threads", type=int, default=4
+    )
+    parser.add_argument(
+        "--rpc_ms", help="Fake server cost of each RPC", type=float, default=2.0
+    )
+    parser.add_argument(
+        "--request_ms",
+        help="Fake server cost of each generation request",
+        type=float,
+        default=0.5,
+    )
+    return parser.parse_args()
+
+
+def run_load(client, concurrency, requests_per_client):
+    """Send the calls, returning the elapsed time and the call latencies"""
+
+    def send(client_index):
+        latencies = []
+        for i in range(requests_per_client):
+            start = time.perf_counter()
+            client.unary_generate(
+                text=f"client {client_index} call {i}", **GENERATE_KWARGS
+            )
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = [lat for lats in pool.map(send, range(concurrency)) for lat in lats]
+    return time.perf_counter() - start, sorted(latencies)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    servicer = FakeTGISServicer(args.rpc_ms, args.request_ms)
+    server, port = start_server(servicer, workers=args.server_workers)
+    channel = grpc.insecure_channel(f"localhost:{port}")
+    stub = generation_pb2_grpc.GenerationServiceStub(channel)
+    client = TGISGenerationClient("fake", "</s>", stub, ProducerId("Bench", "0"))
+    total = args.concurrency * args.requests_per_client
+    print(
+        f"{args.concurrency} clients x {args.requests_per_client} calls, fake server: "
+        f"{args.server_workers} workers, {args.rpc_ms} ms/RPC + "
+        f"{args.request_ms} ms/request"
+    )
+
+    run_load(client, args.concurrency, 2)  # warm up
+    for window_ms in [0.0] + args.windows_ms:
+        client.request_coalescer = (
+            TGISRequestCoalescer(window_ms, args.max_batch_size) if window_ms else None
+        )
+        rpcs_before = servicer.rpc_count
+        elapsed, latencies = run_load(
+            client, args.concurrency, args.requests_per_client
+        )
+        rpcs = servicer.rpc_count - rpcs_before
+        print(
+            f"window {window_ms:4.1f} ms: {total / elapsed:8.1f} calls/s, "
+            f"{rpcs:5d} RPCs ({total / rpcs:5.1f} calls/RPC), "
+            f"p50 {statistics.median(latencies) * 1000:6.1f} ms, "
+            f"p99 {latencies[int(0.99 * (len(latencies) - 1))] * 1000:6.1f} ms"
+        )
+    channel.close()
+    server.stop(None)
@@ -0,0 +1,180 @@
+"""Compare overloading a TGIS server with and without adaptive concurrency limits.
+
+A fake TGIS server (see fake_tgis_server.py) is started locally with
+--server_workers threads and a queue of --server_max_rpcs calls in flight, over
+which it fails calls as RESOURCE_EXHAUSTED like a full TGIS queue. --clients
+threads send TGISGenerationClient.unary_generate calls back to back for
+--seconds, more than the server can serve, waiting --retry_ms after a failed call. The run is done without a limit, and
+then with tgis_client.concurrency_limit on for each of --queue_timeouts_ms. For
+each run, the script reports the successful calls per second, their p50 and p99
+latencies, the calls failed by the server and rejected by the client, and the
+final concurrency limit.
+
+Example:
+    python benchmarks/benchmark_tgis_concurrency_limiter.py --clients 64
+"""
+# Standard
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import os
+import sys
+import threading
+import time
+
+# Hack for relative imports outside of containerized environments
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+# Third Party
+from fake_tgis_server import FakeTGISServicer, start_server
+import grpc
+
+# First Party
+from caikit.core.data_model import ProducerId
+from caikit.core.exceptions.caikit_core_exception import CaikitCoreException
+from caikit.runtime.types.caikit_runtime_exception import CaikitRuntimeException
+from caikit_tgis_backend.protobufs import generation_pb2_grpc
+import caikit
+
+# Local
+from caikit_nlp.toolkit.text_generation.tgis_utils import TGISGenerationClient
+
+GENERATE_KWARGS = dict(
+    preserve_input_text=False,
+    input_tokens=False,
+    generated_tokens=False,
+    token_logprobs=False,
+    token_ranks=False,
+    include_stop_sequence=False,
+    max_new_tokens=20,
+    min_new_tokens=0,
+    truncate_input_tokens=0,
+    decoding_method="SAMPLING",
+    top_k=0,
+    top_p=1.0,
+    typical_p=1.0,
+    temperature=1.0,
+    seed=None,
+    repetition_penalty=1.0,
+    max_time=None,
+    exponential_decay_length_penalty=None,
+    stop_sequences=None,
+)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark adaptive concurrency limits against an overloaded TGIS.",
+    )
+    parser.add_argument("--clients", help="Threads sending calls", type=int, default=64)
+    parser.add_argument(
+        "--seconds", help="Duration of each run", type=float, default=10
+    )
+    parser.add_argument(
+        "--retry_ms",
+        help="Wait of a client after a failed call",
+        type=float,
+        default=10,
+    )
+    parser.add_argument(
+        "--queue_timeouts_ms",
+        help="concurrency_queue_timeout_ms values of the limited runs",
+        type=float,
+        nargs="+",
+        default=[0, 100],
+    )
+    parser.add_argument(
+        "--server_workers", help="Fake server threads", type=int, default=4
+    )
+    parser.add_argument(
+        "--server_max_rpcs",
+        help="Fake server calls in flight before failing new ones",
+        type=int,
+        default=48,
+    )
+    parser.add_argument(
+        "--rpc_ms", help="Fake server cost of each call", type=float, default=10.0
+    )
+    return parser.parse_args()
+
+
+def run(client, clients, seconds, retry_s):
+    """Send calls from the client threads for seconds, returning the latencies of
+    the successful calls and the counts of server errors and client rejections
+    """
+    latencies, errors, rejections = [], [0], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def send():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                client.unary_generate(text="a b c d e f g h", **GENERATE_KWARGS)
+            except CaikitRuntimeException:
+                with lock:
+                    rejections[0] += 1
+                time.sleep(retry_s)
+                continue
+            except CaikitCoreException:
+                with lock:
+                    errors[0] += 1
+                time.sleep(retry_s)
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    with ThreadPoolExecutor(clients) as pool:
+        for _ in range(clients):
+            pool.submit(send)
+    return sorted(latencies), errors[0], rejections[0]
+
+
+def report(name, latencies, errors, rejections, seconds, limit):
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(
+        f"{name:<22}: {len(latencies) / seconds:7.1f} calls/s, p50 {p50:7.1f} ms, "
+        f"p99 {p99:7.1f} ms, {errors:6d} TGIS errors, {rejections:6d} rejected, "
+        f"limit {limit}"
+    )
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    retry_s = args.retry_ms / 1000
+    servicer = FakeTGISServicer(args.rpc_ms, 0)
+    server, port = start_server(
+        servicer, workers=args.server_workers, max_concurrent_rpcs=args.server_max_rpcs
+    )
+    channel = grpc.insecure_channel(f"localhost:{port}")
+    stub = generation_pb2_grpc.GenerationServiceStub(channel)
+    print(
+        f"{args.clients} client threads for {args.seconds} s, fake server: "
+        f"{args.server_workers} workers, {args.rpc_ms} ms/call, "
+        f"{args.server_max_rpcs} calls in flight at most"
+    )
+
+    client = TGISGenerationClient("fake", "</s>", stub, ProducerId("Bench", "0"))
+    report(
+        "no limit", *run(client, args.clients, args.seconds, retry_s), args.seconds, "-"
+    )
+
+    for queue_timeout_ms in args.queue_timeouts_ms:
+        caikit.configure(
+            config_dict={
+                "tgis_client": {
+                    "concurrency_limit": True,
+                    "concurrency_queue_timeout_ms": queue_timeout_ms,
+                }
+            }
+        )
+        client = TGISGenerationClient("fake", "</s>", stub, ProducerId("Bench", "0"))
+        limiter = client.concurrency_limiter
+        report(
+            f"limit, {queue_timeout_ms:g} ms queue",
+            *run(client, args.clients, args.seconds, retry_s),
+            args.seconds,
+            f"{limiter.limit('fake'):.1f}",
+        )
+    channel.close()
+    server.stop(None)
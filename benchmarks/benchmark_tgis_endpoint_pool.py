@@ -0,0 +1,152 @@
+"""Compare TGIS calls balanced over several endpoints with a single endpoint.
+
+One fake TGIS server (see fake_tgis_server.py) is started locally for each
+--rpc_ms value, each with --server_workers threads and that cost per call, so
+that a slower endpoint can be mixed in. --concurrency client threads each send
+--requests_per_client TGISGenerationClient.unary_generate calls back to back,
+first to the first server only and then through a TGISEndpointPool of all the
+servers for each --balance_by. For each run, the script reports the call
+throughput, the share of the calls each server got and the median and p99 call
+latency.
+
+Example:
+    python benchmarks/benchmark_tgis_endpoint_pool.py --rpc_ms 10 10 30
+"""
+# Standard
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# Hack for relative imports outside of containerized environments
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+# Third Party
+from fake_tgis_server import FakeTGISServicer, start_server
+import grpc
+
+# First Party
+from caikit.core.data_model import ProducerId
+from caikit_tgis_backend.protobufs import generation_pb2_grpc
+
+# Local
+from caikit_nlp.toolkit.text_generation.tgis_endpoint_pool import TGISEndpointPool
+from caikit_nlp.toolkit.text_generation.tgis_utils import TGISGenerationClient
+
+GENERATE_KWARGS = dict(
+    preserve_input_text=False,
+    input_tokens=False,
+    generated_tokens=False,
+    token_logprobs=False,
+    token_ranks=False,
+    include_stop_sequence=False,
+    max_new_tokens=20,
+    min_new_tokens=0,
+    truncate_input_tokens=0,
+    decoding_method="GREEDY",
+    top_k=0,
+    top_p=1.0,
+    typical_p=1.0,
+    temperature=1.0,
+    seed=None,
+    repetition_penalty=1.0,
+    max_time=None,
+    exponential_decay_length_penalty=None,
+    stop_sequences=None,
+)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the balancing of TGIS calls over several endpoints.",
+    )
+    parser.add_argument(
+        "--concurrency", help="Number of client threads", type=int, default=32
+    )
+    parser.add_argument(
+        "--requests_per_client", help="Calls per client", type=int, default=30
+    )
+    parser.add_argument(
+        "--rpc_ms",
+        help="Fake server cost of each call, one server per value",
+        type=float,
+        nargs="+",
+        default=[10.0, 10.0, 30.0],
+    )
+    parser.add_argument(
+        "--server_workers", help="Threads of each fake server", type=int, default=4
+    )
+    parser.add_argument(
+        "--balance_by",
+        help="Pool load measures to compare",
+        nargs="+",
+        default=["requests", "tokens"],
+    )
+    return parser.parse_args()
+
+
+def run_load(client, concurrency, requests_per_client):
+    """Send the calls, returning the elapsed time and the call latencies"""
+
+    def send(client_index):
+        latencies = []
+        for i in range(requests_per_client):
+            start = time.perf_counter()
+            client.unary_generate(
+                text=f"client {client_index} call {i}", **GENERATE_KWARGS
+            )
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = [lat for lats in pool.map(send, range(concurrency)) for lat in lats]
+    return time.perf_counter() - start, sorted(latencies)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    servicers = [FakeTGISServicer(rpc_ms, 0.0) for rpc_ms in args.rpc_ms]
+    servers = [
+        start_server(servicer, workers=args.server_workers) for servicer in servicers
+    ]
+    addresses = [f"localhost:{port}" for _, port in servers]
+    total = args.concurrency * args.requests_per_client
+    print(
+        f"{args.concurrency} clients x {args.requests_per_client} calls, "
+        f"{len(servers)} fake servers of {args.server_workers} workers, "
+        f"ms/call: {' '.join(str(rpc_ms) for rpc_ms in args.rpc_ms)}"
+    )
+
+    single_channel = grpc.insecure_channel(addresses[0])
+    runs = [
+        ("single endpoint", generation_pb2_grpc.GenerationServiceStub(single_channel))
+    ]
+    runs += [
+        (f"pool by {balance_by}", TGISEndpointPool(addresses, balance_by=balance_by))
+        for balance_by in args.balance_by
+    ]
+    for name, stub in runs:
+        client = TGISGenerationClient("fake", "</s>", stub, ProducerId("Bench", "0"))
+        run_load(client, args.concurrency, 2)  # warm up
+        rpcs_before = [servicer.rpc_count for servicer in servicers]
+        elapsed, latencies = run_load(
+            client, args.concurrency, args.requests_per_client
+        )
+        shares = [
+            (servicer.rpc_count - before) / total
+            for servicer, before in zip(servicers, rpcs_before)
+        ]
+        print(
+            f"{name:<18}: {total / elapsed:7.1f} calls/s, "
+            f"shares {' '.join(f'{share:4.0%}' for share in shares)}, "
+            f"p50 {statistics.median(latencies) * 1000:6.1f} ms, "
+            f"p99 {latencies[int(0.99 * (len(latencies) - 1))] * 1000:6.1f} ms"
+        )
+        if isinstance(stub, TGISEndpointPool):
+            stub.close()
+    single_channel.close()
+    for server, _ in servers:
+        server.stop(None)
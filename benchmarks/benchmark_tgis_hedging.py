@@ -0,0 +1,161 @@
+"""Compare the tail latency of unary TGIS generate calls with and without hedging.
+
+Two local fake TGIS servers (see fake_tgis_server.py) take --rpc_ms per call, and
+stall for --stall_ms on a fraction --stall_rate of the calls, like in a GC pause.
+--concurrency client threads each send --requests_per_client greedy
+TGISGenerationClient.unary_generate calls back to back through a
+TGISEndpointPool of both servers, without hedging and then with a hedger at each
+--percentiles. For each run, the script reports the call throughput, the
+latency percentiles and the share of the calls that were hedged and won by the
+hedge.
+
+Example:
+    python benchmarks/benchmark_tgis_hedging.py --stall_rate 0.02 --stall_ms 200
+"""
+# Standard
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import os
+import sys
+import time
+
+# Hack for relative imports outside of containerized environments
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+# Third Party
+from fake_tgis_server import FakeTGISServicer, start_server
+from prometheus_client import REGISTRY
+
+# First Party
+from caikit.core.data_model import ProducerId
+
+# Local
+from caikit_nlp.toolkit.text_generation.tgis_endpoint_pool import TGISEndpointPool
+from caikit_nlp.toolkit.text_generation.tgis_request_hedger import TGISRequestHedger
+from caikit_nlp.toolkit.text_generation.tgis_utils import TGISGenerationClient
+
+GENERATE_KWARGS = dict(
+    preserve_input_text=False,
+    input_tokens=False,
+    generated_tokens=False,
+    token_logprobs=False,
+    token_ranks=False,
+    include_stop_sequence=False,
+    max_new_tokens=20,
+    min_new_tokens=0,
+    truncate_input_tokens=0,
+    decoding_method="GREEDY",
+    top_k=0,
+    top_p=1.0,
+    typical_p=1.0,
+    temperature=1.0,
+    seed=None,
+    repetition_penalty=1.0,
+    max_time=None,
+    exponential_decay_length_penalty=None,
+    stop_sequences=None,
+)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the hedging of unary TGIS generate calls.",
+    )
+    parser.add_argument(
+        "--concurrency", help="Number of client threads", type=int, default=8
+    )
+    parser.add_argument(
+        "--requests_per_client", help="Calls per client", type=int, default=250
+    )
+    parser.add_argument(
+        "--percentiles",
+        help="Hedge delay percentiles to compare with no hedging",
+        type=float,
+        nargs="+",
+        default=[95.0, 99.0],
+    )
+    parser.add_argument(
+        "--server_workers", help="Threads of each fake server", type=int, default=16
+    )
+    parser.add_argument(
+        "--rpc_ms", help="Fake server cost of each call", type=float, default=10.0
+    )
+    parser.add_argument(
+        "--stall_rate",
+        help="Fraction of the calls that stall",
+        type=float,
+        default=0.02,
+    )
+    parser.add_argument(
+        "--stall_ms", help="Duration of the stalls", type=float, default=200.0
+    )
+    return parser.parse_args()
+
+
+def run_load(client, concurrency, requests_per_client):
+    """Send the calls, returning the elapsed time and the call latencies"""
+
+    def send(client_index):
+        latencies = []
+        for i in range(requests_per_client):
+            start = time.perf_counter()
+            client.unary_generate(
+                text=f"client {client_index} call {i}", **GENERATE_KWARGS
+            )
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = [lat for lats in pool.map(send, range(concurrency)) for lat in lats]
+    return time.perf_counter() - start, sorted(latencies)
+
+
+def counter(name, model_id):
+    return REGISTRY.get_sample_value(f"{name}_total", {"model_id": model_id}) or 0
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    servers = [
+        start_server(
+            FakeTGISServicer(args.rpc_ms, 0.0, args.stall_rate, args.stall_ms),
+            workers=args.server_workers,
+        )
+        for _ in range(2)
+    ]
+    pool = TGISEndpointPool([f"localhost:{port}" for _, port in servers])
+    total = args.concurrency * args.requests_per_client
+    print(
+        f"{args.concurrency} clients x {args.requests_per_client} calls, 2 fake "
+        f"servers: {args.rpc_ms} ms/call, {args.stall_rate:.0%} of the calls stall "
+        f"for {args.stall_ms} ms"
+    )
+
+    for percentile in [0.0] + args.percentiles:
+        model_id = f"fake-p{percentile:g}"
+        client = TGISGenerationClient(model_id, "</s>", pool, ProducerId("Bench", "0"))
+        client.request_hedger = (
+            TGISRequestHedger(percentile, min_delay_ms=1) if percentile else None
+        )
+        run_load(client, args.concurrency, 10)  # warm up
+        hedges = counter("tgis_generate_hedges", model_id)
+        wins = counter("tgis_generate_hedge_wins", model_id)
+        elapsed, latencies = run_load(
+            client, args.concurrency, args.requests_per_client
+        )
+        hedges = counter("tgis_generate_hedges", model_id) - hedges
+        wins = counter("tgis_generate_hedge_wins", model_id) - wins
+        p50, p99, p999 = (
+            latencies[int(quantile * (len(latencies) - 1))] * 1000
+            for quantile in (0.5, 0.99, 0.999)
+        )
+        print(
+            f"{'no hedging' if not percentile else f'hedge at p{percentile:g}':<12}: "
+            f"{total / elapsed:6.1f} calls/s, p50 {p50:6.1f} ms, p99 {p99:6.1f} ms, "
+            f"p99.9 {p999:6.1f} ms, hedged {hedges / total:5.1%}, "
+            f"hedges won {wins / total:5.1%}"
+        )
+    pool.close()
+    for server, _ in servers:
+        server.stop(None)
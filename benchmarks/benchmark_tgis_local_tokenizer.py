@@ -0,0 +1,144 @@
+"""Compare TGIS tokenize calls with and without the local tokenizer.
+
+A fake TGIS server (see fake_tgis_server.py) counting tokens with the tokenizer of
+--model (the tiny T5 test model by default) is started locally. --concurrency
+client threads each send --requests_per_client TGISGenerationClient.unary_tokenize
+calls, with texts of --words words. The load runs with the Tokenize RPC to the
+fake server, and then with the local fast tokenizer of the same model and
+--parity_checks calls checked against TGIS. For each run, the script reports the
+call throughput, the RPCs sent to TGIS and the median and p99 call latency.
+
+Example:
+    python benchmarks/benchmark_tgis_local_tokenizer.py --words 200
+"""
+# Standard
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+# Hack for relative imports outside of containerized environments
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+# Third Party
+from fake_tgis_server import FakeTGISServicer, start_server
+from transformers import AutoTokenizer
+import grpc
+
+# First Party
+from caikit.core.data_model import ProducerId
+from caikit_tgis_backend.protobufs import generation_pb2, generation_pb2_grpc
+
+# Local
+from caikit_nlp.toolkit.text_generation.local_tokenizer import LocalTokenCounter
+from caikit_nlp.toolkit.text_generation.tgis_utils import TGISGenerationClient
+
+DEFAULT_MODEL = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "tests",
+    "fixtures",
+    "tiny_models",
+    "T5ForConditionalGeneration",
+)
+WORDS = "the quick brown fox jumps over a lazy dog while tokenizers count words".split()
+
+
+class TokenizingTGISServicer(FakeTGISServicer):
+    """Fake TGIS server counting tokens with the same tokenizer as the client"""
+
+    def __init__(self, tokenizer, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tokenizer = tokenizer
+
+    def Tokenize(self, request, context):
+        self._serve(len(request.requests))
+        return generation_pb2.BatchedTokenizeResponse(
+            responses=[
+                generation_pb2.TokenizeResponse(
+                    token_count=len(self.tokenizer.encode(req.text))
+                )
+                for req in request.requests
+            ]
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark local token counting against the TGIS Tokenize RPC.",
+    )
+    parser.add_argument(
+        "--model", help="Model of the local tokenizer", default=DEFAULT_MODEL
+    )
+    parser.add_argument(
+        "--concurrency", help="Number of client threads", type=int, default=8
+    )
+    parser.add_argument(
+        "--requests_per_client", help="Calls per client", type=int, default=200
+    )
+    parser.add_argument("--words", help="Words per text", type=int, default=100)
+    parser.add_argument(
+        "--parity_checks", help="Calls checked against TGIS", type=int, default=3
+    )
+    parser.add_argument(
+        "--server_workers", help="Fake server threads", type=int, default=4
+    )
+    parser.add_argument(
+        "--rpc_ms", help="Fake server cost of each call", type=float, default=2.0
+    )
+    return parser.parse_args()
+
+
+def run_load(client, concurrency, requests_per_client, words):
+    """Send the calls, returning the elapsed time and the call latencies"""
+
+    def send(client_index):
+        rng = random.Random(client_index)
+        latencies = []
+        for _ in range(requests_per_client):
+            text = " ".join(rng.choices(WORDS, k=words))
+            start = time.perf_counter()
+            client.unary_tokenize(text)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = [lat for lats in pool.map(send, range(concurrency)) for lat in lats]
+    return time.perf_counter() - start, sorted(latencies)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    tokenizer = AutoTokenizer.from_pretrained(args.model, use_fast=True)
+    servicer = TokenizingTGISServicer(tokenizer, args.rpc_ms, 0.0)
+    server, port = start_server(servicer, workers=args.server_workers)
+    channel = grpc.insecure_channel(f"localhost:{port}")
+    stub = generation_pb2_grpc.GenerationServiceStub(channel)
+    total = args.concurrency * args.requests_per_client
+    print(
+        f"{args.concurrency} clients x {args.requests_per_client} calls of "
+        f"{args.words} words, tokenizer: {os.path.basename(args.model)}, fake server: "
+        f"{args.server_workers} workers, {args.rpc_ms} ms/call"
+    )
+
+    for local in [False, True]:
+        client = TGISGenerationClient("fake", "</s>", stub, ProducerId("Bench", "0"))
+        client.local_token_counter = (
+            LocalTokenCounter("fake", tokenizer, args.parity_checks) if local else None
+        )
+        rpcs_before = servicer.rpc_count
+        elapsed, latencies = run_load(
+            client, args.concurrency, args.requests_per_client, args.words
+        )
+        rpcs = servicer.rpc_count - rpcs_before
+        print(
+            f"{'local' if local else 'TGIS':<6}: {total / elapsed:8.1f} calls/s, "
+            f"{rpcs:5d} RPCs, p50 {statistics.median(latencies) * 1000:6.2f} ms, "
+            f"p99 {latencies[int(0.99 * (len(latencies) - 1))] * 1000:6.2f} ms"
+        )
+    channel.close()
+    server.stop(None)
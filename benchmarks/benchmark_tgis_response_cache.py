@@ -0,0 +1,152 @@
+"""Compare unary TGIS generate calls with and without the response cache.
+
+A fake TGIS server (see fake_tgis_server.py) is started locally. --concurrency
+client threads each send --requests_per_client greedy
+TGISGenerationClient.unary_generate calls. Each call sends one of --distinct_prompts
+templated prompts, drawn with Zipf-like popularity (--zipf_exponent), like
+classification prompts of a few popular inputs. The load runs without the cache
+and then with a cache of each --max_entries. For each run, the script reports the
+call throughput, the RPCs sent to TGIS, the cache hit rate and the median and p99
+call latency.
+
+Example:
+    python benchmarks/benchmark_tgis_response_cache.py --distinct_prompts 500
+"""
+# Standard
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+# Hack for relative imports outside of containerized environments
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+# Third Party
+from fake_tgis_server import FakeTGISServicer, start_server
+import grpc
+
+# First Party
+from caikit.core.data_model import ProducerId
+from caikit_tgis_backend.protobufs import generation_pb2_grpc
+
+# Local
+from caikit_nlp.toolkit.text_generation.tgis_response_cache import TGISResponseCache
+from caikit_nlp.toolkit.text_generation.tgis_utils import TGISGenerationClient
+
+GENERATE_KWARGS = dict(
+    preserve_input_text=False,
+    input_tokens=False,
+    generated_tokens=False,
+    token_logprobs=False,
+    token_ranks=False,
+    include_stop_sequence=False,
+    max_new_tokens=20,
+    min_new_tokens=0,
+    truncate_input_tokens=0,
+    decoding_method="GREEDY",
+    top_k=0,
+    top_p=1.0,
+    typical_p=1.0,
+    temperature=1.0,
+    seed=None,
+    repetition_penalty=1.0,
+    max_time=None,
+    exponential_decay_length_penalty=None,
+    stop_sequences=None,
+)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the cache of deterministic TGIS responses.",
+    )
+    parser.add_argument(
+        "--concurrency", help="Number of client threads", type=int, default=16
+    )
+    parser.add_argument(
+        "--requests_per_client", help="Calls per client", type=int, default=200
+    )
+    parser.add_argument(
+        "--distinct_prompts", help="Number of distinct prompts", type=int, default=500
+    )
+    parser.add_argument(
+        "--zipf_exponent",
+        help="Exponent of the prompt popularity",
+        type=float,
+        default=1.0,
+    )
+    parser.add_argument(
+        "--max_entries",
+        help="Cache sizes to compare with no cache",
+        type=int,
+        nargs="+",
+        default=[100, 1000],
+    )
+    parser.add_argument(
+        "--server_workers", help="Fake server threads", type=int, default=4
+    )
+    parser.add_argument(
+        "--rpc_ms", help="Fake server cost of each call", type=float, default=10.0
+    )
+    return parser.parse_args()
+
+
+def run_load(client, prompts, weights, concurrency, requests_per_client):
+    """Send the calls, returning the elapsed time and the call latencies"""
+
+    def send(client_index):
+        rng = random.Random(client_index)
+        latencies = []
+        for text in rng.choices(prompts, weights, k=requests_per_client):
+            start = time.perf_counter()
+            client.unary_generate(text=text, **GENERATE_KWARGS)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = [lat for lats in pool.map(send, range(concurrency)) for lat in lats]
+    return time.perf_counter() - start, sorted(latencies)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    servicer = FakeTGISServicer(args.rpc_ms, 0.0)
+    server, port = start_server(servicer, workers=args.server_workers)
+    channel = grpc.insecure_channel(f"localhost:{port}")
+    stub = generation_pb2_grpc.GenerationServiceStub(channel)
+    prompts = [
+        f"Classify the sentiment of this review: product {i} works"
+        for i in range(args.distinct_prompts)
+    ]
+    weights = [1 / (rank + 1) ** args.zipf_exponent for rank in range(len(prompts))]
+    total = args.concurrency * args.requests_per_client
+    print(
+        f"{args.concurrency} clients x {args.requests_per_client} calls over "
+        f"{args.distinct_prompts} prompts (zipf {args.zipf_exponent}), fake server: "
+        f"{args.server_workers} workers, {args.rpc_ms} ms/call"
+    )
+
+    for max_entries in [0] + args.max_entries:
+        client = TGISGenerationClient("fake", "</s>", stub, ProducerId("Bench", "0"))
+        client.response_cache = (
+            TGISResponseCache(max_entries, ttl_seconds=300) if max_entries else None
+        )
+        rpcs_before = servicer.rpc_count
+        elapsed, latencies = run_load(
+            client, prompts, weights, args.concurrency, args.requests_per_client
+        )
+        rpcs = servicer.rpc_count - rpcs_before
+        cache = client.response_cache
+        hit_rate = cache.hits / (cache.hits + cache.misses) if cache else 0.0
+        print(
+            f"{'no cache' if not max_entries else f'{max_entries} entries':<12}: "
+            f"{total / elapsed:8.1f} calls/s, {rpcs:5d} RPCs, hit rate {hit_rate:5.1%}, "
+            f"p50 {statistics.median(latencies) * 1000:6.2f} ms, "
+            f"p99 {latencies[int(0.99 * (len(latencies) - 1))] * 1000:6.2f} ms"
+        )
+    channel.close()
+    server.stop(None)
@@ -0,0 +1,115 @@
+"""Measure the CPU saved by the embedding tokenization cache on rerank traffic.
+
+The replay sends --num_requests rerank requests, each with a new query and
+--docs_per_request documents drawn from a pool of --doc_pool documents, so the
+same documents are seen again with different queries. The replay runs once with
+the cache disabled and once with it enabled. The process CPU time is reported for
+the whole requests and for tokenization (_tokenize_plus) alone.
+
+Example:
+    python benchmarks/benchmark_tokenization_cache.py --model_path <saved EmbeddingModule>
+"""
+# Standard
+import argparse
+import os
+import random
+import sys
+import time
+
+# Hack for relative imports outside of containerized environments
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+# Local
+from caikit_nlp.modules.text_embedding import EmbeddingModule
+from caikit_nlp.modules.text_embedding.utils import TokenizationCache
+
+WORDS = "the quick brown fox jumps over a lazy dog while foo and bar".split()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the embedding tokenization cache on rerank traffic.",
+    )
+    parser.add_argument(
+        "--model_path",
+        help="Saved EmbeddingModule to be loaded from disk.",
+        required=True,
+    )
+    parser.add_argument(
+        "--doc_pool", help="Number of distinct documents", type=int, default=256
+    )
+    parser.add_argument(
+        "--docs_per_request", help="Documents per rerank", type=int, default=64
+    )
+    parser.add_argument(
+        "--doc_words", help="Number of words per document", type=int, default=100
+    )
+    parser.add_argument(
+        "--num_requests", help="Rerank requests to replay", type=int, default=200
+    )
+    parser.add_argument(
+        "--cache_size", help="Tokenization cache size", type=int, default=1024
+    )
+    return parser.parse_args()
+
+
+def replay(module, requests):
+    """Returns the (total, tokenization) process CPU seconds of the requests"""
+    model = module.model
+    tokenize_plus = model._tokenize_plus
+    tokenize_cpu = 0.0
+
+    def timed_tokenize_plus(*args, **kwargs):
+        nonlocal tokenize_cpu
+        start = time.process_time()
+        try:
+            return tokenize_plus(*args, **kwargs)
+        finally:
+            tokenize_cpu += time.process_time() - start
+
+    model._tokenize_plus = timed_tokenize_plus
+    start = time.process_time()
+    try:
+        for query, documents in requests:
+            module.run_rerank_query(query=query, documents=documents)
+    finally:
+        del model._tokenize_plus
+    return time.process_time() - start, tokenize_cpu
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    random.seed(42)
+    module = EmbeddingModule.load(args.model_path)
+
+    doc_pool = [
+        {"text": " ".join(random.choices(WORDS, k=args.doc_words))}
+        for _ in range(args.doc_pool)
+    ]
+    requests = [
+        (
+            " ".join(random.choices(WORDS, k=8)),
+            random.sample(doc_pool, args.docs_per_request),
+        )
+        for _ in range(args.num_requests)
+    ]
+
+    replay(module, requests[:5])  # warm up
+
+    module.model.tokenization_cache = None
+    uncached_cpu, uncached_tokenize_cpu = replay(module, requests)
+
+    cache = TokenizationCache(args.cache_size)
+    module.model.tokenization_cache = cache
+    cached_cpu, cached_tokenize_cpu = replay(module, requests)
+
+    print(
+        f"{args.num_requests} requests x {args.docs_per_request} docs "
+        f"(pool of {args.doc_pool} docs x {args.doc_words} words)"
+    )
+    print(f"cache hits/misses:          {cache.hits}/{cache.misses}")
+    print(f"uncached total CPU (s):     {uncached_cpu:.2f}")
+    print(f"cached total CPU (s):       {cached_cpu:.2f}")
+    print(f"uncached tokenize CPU (s):  {uncached_tokenize_cpu:.2f}")
+    print(f"cached tokenize CPU (s):    {cached_tokenize_cpu:.2f}")
+    print(f"CPU saved (s):              {uncached_cpu - cached_cpu:.2f}")
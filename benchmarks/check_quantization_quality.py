@@ -0,0 +1,142 @@
+"""Compare the greedy outputs of quantized models with the full precision ones.
+
+A TextGeneration is bootstrapped from --model_name in full precision and with
+each --quantizations value. Every prompt of --prompts_file (one per line, or a
+built-in sample set) generates up to --max_new_tokens tokens greedily. For each
+quantization, the script reports the fraction of outputs identical to the full
+precision ones, the mean fraction of output tokens generated before the first
+difference, the size of the model weights and the generation throughput.
+
+Example:
+    python benchmarks/check_quantization_quality.py --model_name <HF model name or path>
+"""
+# Standard
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# Hack for relative imports outside of containerized environments
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+# Third Party
+from torch.ao.nn.quantized.modules.linear import LinearPackedParams
+
+# Local
+from caikit_nlp.modules.text_generation import TextGeneration
+
+SAMPLE_PROMPTS = [
+    "The capital of France is",
+    "Translate to German: Where is the train station?",
+    "Write a haiku about the sea.",
+    "Q: What is 12 times 12?\nA:",
+    "Summarize: The meeting was moved from Monday to Wednesday because the "
+    "room was booked, and the agenda now includes the budget review.",
+    "def fibonacci(n):",
+    "Once upon a time, in a small village by the mountains,",
+    "List three uses of a paperclip:",
+    "The main difference between a virus and a bacterium is",
+    "Complete the sentence: The best way to learn a language is",
+    "Classify the sentiment of 'I loved this movie, the acting was superb':",
+    "Explain in one sentence why the sky is blue.",
+]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Check the greedy output quality of quantized models.",
+    )
+    parser.add_argument(
+        "--model_name",
+        help="Model name or path to bootstrap a TextGeneration from.",
+        required=True,
+    )
+    parser.add_argument(
+        "--quantizations",
+        help="Quantizations to compare with full precision",
+        nargs="+",
+        default=["int8", "bf16"],
+    )
+    parser.add_argument(
+        "--prompts_file",
+        help="File with one prompt per line. Default: a built-in sample set",
+        default=None,
+    )
+    parser.add_argument(
+        "--max_new_tokens", help="Max tokens generated per prompt", type=int, default=32
+    )
+    return parser.parse_args()
+
+
+def weights_mb(model):
+    """Size of the parameters and buffers of a model, including int8 weights"""
+    size = 0
+    for module in model.modules():
+        tensors = list(module.parameters(recurse=False))
+        tensors += list(module.buffers(recurse=False))
+        if isinstance(module, LinearPackedParams):
+            tensors += [t for t in module._weight_bias() if t is not None]
+        size += sum(t.numel() * t.element_size() for t in tensors)
+    return size / 1024**2
+
+
+def generate(model, prompts, max_new_tokens):
+    """Greedy output token ids of each prompt, with the generation throughput"""
+    tokenizer = model.model.tokenizer
+    outputs, new_tokens = [], 0
+    start = time.perf_counter()
+    for prompt in prompts:
+        result = model.run(
+            prompt, max_new_tokens=max_new_tokens, preserve_input_text=False
+        )
+        outputs.append(
+            tokenizer(result.generated_text, add_special_tokens=False)["input_ids"]
+        )
+        new_tokens += len(outputs[-1])
+    return outputs, new_tokens / (time.perf_counter() - start)
+
+
+def matching_fraction(expected, output):
+    """Fraction of the expected tokens generated before the first difference"""
+    if not expected:
+        return float(not output)
+    matching = 0
+    for expected_id, output_id in zip(expected, output):
+        if expected_id != output_id:
+            break
+        matching += 1
+    return matching / len(expected)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    prompts = SAMPLE_PROMPTS
+    if args.prompts_file:
+        with open(args.prompts_file, encoding="utf-8") as prompts_file:
+            prompts = [line.strip() for line in prompts_file if line.strip()]
+    print(
+        f"{args.model_name}: {len(prompts)} prompts, "
+        f"up to {args.max_new_tokens} greedy tokens each"
+    )
+
+    expected = None
+    for quantization in [""] + args.quantizations:
+        model = TextGeneration.bootstrap(args.model_name, quantization=quantization)
+        model.run(prompts[0], max_new_tokens=2)  # warm up
+        outputs, tps = generate(model, prompts, args.max_new_tokens)
+        if expected is None:
+            expected = outputs
+        exact = statistics.mean(
+            float(output == reference) for output, reference in zip(outputs, expected)
+        )
+        matching = statistics.mean(
+            matching_fraction(reference, output)
+            for output, reference in zip(outputs, expected)
+        )
+        print(
+            f"{quantization or 'full':<5} ({model.model.model.dtype}): exact match "
+            f"{exact:6.1%}, tokens before first difference {matching:6.1%}, "
+            f"weights {weights_mb(model.model.model):8.1f} MB, {tps:7.1f} tokens/s"
+        )
+        del model
@@ -0,0 +1,153 @@
+"""Local fake TGIS server for the benchmarks of the TGIS client.
+
+The server echoes each generation request text, one token per word. Calls are
+served by a fixed number of worker threads, and each one takes --rpc_ms plus
+--request_ms per generation request it carries (or per streamed token), which
+models a server with a fixed cost per RPC and a cost per sequence. A fraction
+--stall_rate of the calls also stall for --stall_ms, like in a GC pause.
+
+Run it standalone to point the TGIS modules at it:
+    python benchmarks/fake_tgis_server.py --port 8033
+"""
+# Standard
+from concurrent import futures
+from typing import Optional
+import argparse
+import random
+import re
+import threading
+import time
+
+# Third Party
+import grpc
+
+# First Party
+from caikit_tgis_backend.protobufs import generation_pb2, generation_pb2_grpc
+
+
+def _tokenize_words(
+    text: str, return_tokens: bool, return_offsets: bool
+) -> generation_pb2.TokenizeResponse:
+    """Tokenize a text into its words, with their offsets"""
+    spans = [match.span() for match in re.finditer(r"\S+", text)]
+    return generation_pb2.TokenizeResponse(
+        token_count=len(spans),
+        tokens=[text[start:end] for start, end in spans] if return_tokens else [],
+        offsets=[
+            generation_pb2.TokenizeResponse.Offset(start=start, end=end)
+            for start, end in spans
+        ]
+        if return_offsets
+        else [],
+    )
+
+
+class FakeTGISServicer(generation_pb2_grpc.GenerationServiceServicer):
+    """Echoing TGIS generation service with a simulated cost per call"""
+
+    def __init__(
+        self,
+        rpc_ms: float = 2.0,
+        request_ms: float = 0.5,
+        stall_rate: float = 0.0,
+        stall_ms: float = 0.0,
+    ):
+        self.rpc_s = rpc_ms / 1000
+        self.request_s = request_ms / 1000
+        self.stall_rate = stall_rate
+        self.stall_s = stall_ms / 1000
+        self.rpc_count = 0
+        self._lock = threading.Lock()
+
+    def _serve(self, request_count: int):
+        with self._lock:
+            self.rpc_count += 1
+        stall = self.stall_s if random.random() < self.stall_rate else 0.0
+        time.sleep(self.rpc_s + self.request_s * request_count + stall)
+
+    def Generate(self, request, context):
+        self._serve(len(request.requests))
+        responses = []
+        for req in request.requests:
+            words = req.text.split()
+            responses.append(
+                generation_pb2.GenerationResponse(
+                    text=req.text,
+                    input_token_count=len(words),
+                    generated_token_count=len(words),
+                    stop_reason=generation_pb2.StopReason.EOS_TOKEN,
+                )
+            )
+        return generation_pb2.BatchedGenerationResponse(responses=responses)
+
+    def GenerateStream(self, request, context):
+        self._serve(0)
+        words = request.request.text.split()
+        token_details = request.params.response.generated_tokens
+        yield generation_pb2.GenerationResponse(input_token_count=len(words))
+        for i, word in enumerate(words):
+            if self.request_s:
+                time.sleep(self.request_s)
+            text = f" {word}" if i else word
+            yield generation_pb2.GenerationResponse(
+                text=text,
+                generated_token_count=i + 1,
+                tokens=[generation_pb2.TokenInfo(text=text, logprob=-0.5)]
+                if token_details
+                else [],
+            )
+
+    def Tokenize(self, request, context):
+        self._serve(len(request.requests))
+        return generation_pb2.BatchedTokenizeResponse(
+            responses=[
+                _tokenize_words(req.text, request.return_tokens, request.return_offsets)
+                for req in request.requests
+            ]
+        )
+
+
+def start_server(
+    servicer: FakeTGISServicer,
+    port: int = 0,
+    workers: int = 4,
+    max_concurrent_rpcs: Optional[int] = None,
+):
+    """Start serving servicer, returning the server and its port. Calls over
+    max_concurrent_rpcs in flight fail as RESOURCE_EXHAUSTED, like a full TGIS queue.
+    """
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=workers),
+        maximum_concurrent_rpcs=max_concurrent_rpcs,
+    )
+    generation_pb2_grpc.add_GenerationServiceServicer_to_server(servicer, server)
+    port = server.add_insecure_port(f"localhost:{port}")
+    server.start()
+    return server, port
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a fake TGIS server.")
+    parser.add_argument("--port", type=int, default=8033)
+    parser.add_argument("--workers", help="Server threads", type=int, default=4)
+    parser.add_argument("--rpc_ms", help="Cost of each call", type=float, default=2.0)
+    parser.add_argument(
+        "--request_ms",
+        help="Cost of each generation request or streamed token",
+        type=float,
+        default=0.5,
+    )
+    parser.add_argument(
+        "--stall_rate", help="Fraction of the calls that stall", type=float, default=0.0
+    )
+    parser.add_argument(
+        "--stall_ms", help="Duration of the stalls", type=float, default=0.0
+    )
+    args = parser.parse_args()
+    fake_server, fake_port = start_server(
+        FakeTGISServicer(args.rpc_ms, args.request_ms, args.stall_rate, args.stall_ms),
+        args.port,
+        args.workers,
+    )
+    print(f"Fake TGIS server listening on localhost:{fake_port}")
+    fake_server.wait_for_termination()
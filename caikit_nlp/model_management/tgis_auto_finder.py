@@ -15,9 +15,20 @@
 The TGISAutoFinder implements the ModelFinder interface to provide automatic
 discovery of text-generation models that can be auto-configured to run against
 a remote TGIS model.
+
+The results of the connection probes can be cached per model, for
+positive_ttl_seconds when the model was found and negative_ttl_seconds when it
+was not, so that a burst of lookups for a missing model doesn't wait on a probe
+each. Concurrent lookups of a model share one probe.
 """
 # Standard
-from typing import Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+import threading
+import time
+
+# Third Party
+import grpc
 
 # First Party
 from caikit.core import MODEL_MANAGER, error_handler
@@ -33,6 +44,9 @@ from ..modules.text_generation import TextGenerationTGIS
 log = alog.use_channel("TGIS_FND")
 error = error_handler.get(log)
 
+# Number of cached probe results over which the expired ones are dropped
+_MAX_PROBE_CACHE_ENTRIES = 10000
+
 
 class TGISAutoFinder(ModelFinderBase):
     __doc__ = __doc__
@@ -42,6 +56,9 @@ class TGISAutoFinder(ModelFinderBase):
     # Constants for the keys of the config blob
     _LOCAL_INITIALIZER_NAME_KEY = "local_initializer_name"
     _TGIS_BACKEND_PRIORITY_KEY = "tgis_backend_priority"
+    _POSITIVE_TTL_KEY = "positive_ttl_seconds"
+    _NEGATIVE_TTL_KEY = "negative_ttl_seconds"
+    _REFRESH_AHEAD_KEY = "refresh_ahead_seconds"
 
     def __init__(self, config: aconfig.Config, instance_name: str = ""):
         """Initialize from the model finder factory config
@@ -60,6 +77,26 @@ class TGISAutoFinder(ModelFinderBase):
                 backend to use. If not set, the first TGIS backend found will be
                 used.
 
+        positive_ttl_seconds:
+            type: number
+            default: 0
+            description: Time the finder reuses a probe that found the model.
+                If the TGIS backend tests connections, the model's connection is
+                tested again once it expires. 0 disables the cache.
+
+        negative_ttl_seconds:
+            type: number
+            default: 0
+            description: Time the finder reuses a probe that didn't find the
+                model. 0 disables the cache.
+
+        refresh_ahead_seconds:
+            type: number
+            default: 0
+            description: A lookup of a found model within this long of the
+                expiry of its probe probes it again in the background, so that
+                models in use never wait on a probe. 0 disables refreshing.
+
         Args:
             config (aconfig.Config): The configuration blob from caikit's
                 model_management factory construction
@@ -67,6 +104,9 @@ class TGISAutoFinder(ModelFinderBase):
         """
         local_initializer_name = config.get(self._LOCAL_INITIALIZER_NAME_KEY, "default")
         tgis_backend_priority = config.get(self._TGIS_BACKEND_PRIORITY_KEY)
+        positive_ttl = config.get(self._POSITIVE_TTL_KEY, 0)
+        negative_ttl = config.get(self._NEGATIVE_TTL_KEY, 0)
+        refresh_ahead = config.get(self._REFRESH_AHEAD_KEY, 0)
         error.type_check(
             "<NLP97312902E>", str, local_initializer_name=local_initializer_name
         )
@@ -76,6 +116,19 @@ class TGISAutoFinder(ModelFinderBase):
             tgis_backend_priority=tgis_backend_priority,
             allow_none=True,
         )
+        error.type_check(
+            "<NLP97312904E>",
+            int,
+            float,
+            positive_ttl=positive_ttl,
+            negative_ttl=negative_ttl,
+            refresh_ahead=refresh_ahead,
+        )
+        error.value_check(
+            "<NLP87928814E>",
+            positive_ttl >= 0 and negative_ttl >= 0 and refresh_ahead >= 0,
+            "The probe cache times must not be negative",
+        )
 
         # Extract the TGIS backend instance
         local_initializer = MODEL_MANAGER.get_initializer(local_initializer_name)
@@ -108,6 +161,23 @@ class TGISAutoFinder(ModelFinderBase):
             )
             self._tgis_backend = tgis_backend
 
+        self._positive_ttl = positive_ttl
+        self._negative_ttl = negative_ttl
+        self._refresh_ahead = refresh_ahead
+        # Expired positive probes test the existing connection again, as the
+        # backend only tests the connections it creates
+        backend_config = self._tgis_backend.config
+        self._revalidate = positive_ttl > 0 and backend_config.get(
+            "test_connections", False
+        )
+        self._connect_timeout = backend_config.get("connect_timeout")
+        # Probe results by model, with their expiry time
+        self._probe_cache: Dict[str, Tuple[bool, float]] = {}
+        # Probes in flight by model, shared by the concurrent lookups
+        self._probes: Dict[str, Future] = {}
+        self._probe_lock = threading.Lock()
+        self._refresh_pool: Optional[ThreadPoolExecutor] = None
+
     def find_model(
         self,
         model_path: str,
@@ -116,8 +186,7 @@ class TGISAutoFinder(ModelFinderBase):
         """Find the model if"""
 
         # Get a connection to this model in tgis
-        log.debug2("Attempting to setup TGIS client for %s", model_path)
-        if self._tgis_backend.get_connection(model_id=model_path) is None:
+        if not self._model_found(model_path):
             log.debug2("TGIS cannot connect to model %s", model_path)
             return None
 
@@ -138,5 +207,92 @@ class TGISAutoFinder(ModelFinderBase):
         cfg.tgis_backend = self._tgis_backend
         return cfg
 
+    def _model_found(self, model_path: str) -> bool:
+        """Whether TGIS serves the model, from a cached or shared probe"""
+        refresh = False
+        with self._probe_lock:
+            cached = self._probe_cache.get(model_path)
+            now = time.monotonic()
+            if cached is not None and cached[1] > now:
+                found, expires = cached
+                refresh = (
+                    found
+                    and expires - now <= self._refresh_ahead
+                    and model_path not in self._probes
+                )
+                if not refresh:
+                    return found
+            probe = self._probes.get(model_path)
+            owner = probe is None
+            if owner:
+                probe = Future()
+                self._probes[model_path] = probe
+
+        if refresh:
+            log.debug2("Refreshing the TGIS probe of model %s", model_path)
+            if self._refresh_pool is None:
+                self._refresh_pool = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="tgis-finder-refresh"
+                )
+            self._refresh_pool.submit(self._run_probe, model_path, probe)
+            return True
+        if owner:
+            self._run_probe(model_path, probe)
+        return probe.result()
+
+    def _run_probe(self, model_path: str, probe: Future):
+        """Probe the model, caching and sharing the result"""
+        try:
+            found = self._probe(model_path)
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            with self._probe_lock:
+                del self._probes[model_path]
+            probe.set_exception(err)
+            return
+        ttl = self._positive_ttl if found else self._negative_ttl
+        with self._probe_lock:
+            del self._probes[model_path]
+            if ttl > 0:
+                if len(self._probe_cache) >= _MAX_PROBE_CACHE_ENTRIES:
+                    self._drop_expired_probes()
+                self._probe_cache[model_path] = (found, time.monotonic() + ttl)
+            else:
+                self._probe_cache.pop(model_path, None)
+        probe.set_result(found)
+
+    def _drop_expired_probes(self):
+        """Drop the expired probe results, or the oldest ones if none expired"""
+        now = time.monotonic()
+        expired = [
+            model_path
+            for model_path, (_, expires) in self._probe_cache.items()
+            if expires <= now
+        ]
+        if not expired:
+            expired = list(self._probe_cache)[: _MAX_PROBE_CACHE_ENTRIES // 10]
+        for model_path in expired:
+            del self._probe_cache[model_path]
+
+    def _probe(self, model_path: str) -> bool:
+        """Probe TGIS for the model"""
+        log.debug2("Attempting to setup TGIS client for %s", model_path)
+        model_conn = self._tgis_backend.get_connection(
+            model_id=model_path, create=False
+        )
+        if model_conn is None:
+            return self._tgis_backend.get_connection(model_id=model_path) is not None
+        if self._revalidate:
+            try:
+                model_conn.test_connection(self._connect_timeout)
+            except grpc.RpcError as err:
+                log.warning(
+                    "<NLP35114626W>",
+                    "Unable to connect to model %s: %s",
+                    model_path,
+                    err,
+                )
+                return False
+        return True
+
 
 model_finder_factory.register(TGISAutoFinder)
@@ -13,9 +13,10 @@
 # limitations under the License.
 
 # Standard
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
 from functools import partial
-from typing import Any, Dict, List, NamedTuple, Optional, Union
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Union
 import os
 import threading
 
@@ -35,14 +36,19 @@ from caikit.interfaces.nlp.data_model import (
     RerankResults,
     RerankScore,
     RerankScores,
-    Token,
     TokenizationResults,
 )
 from caikit.interfaces.nlp.tasks import RerankTask, RerankTasks, TokenizationTask
 import alog
 
 # Local
-from caikit_nlp.modules.text_embedding.utils import env_val_to_bool
+from caikit_nlp.modules.text_embedding.utils import (
+    deadline_passed,
+    env_val_to_bool,
+    get_deadline,
+    get_tokenization_results,
+    get_unscored_score,
+)
 
 logger = alog.use_channel("CROSS_ENCODER")
 error = error_handler.get(logger)
@@ -53,6 +59,7 @@ class RerankResultTuple(NamedTuple):
 
     scores: list
     input_token_count: int
+    scored_count: Optional[int] = None
 
 
 class PredictResultTuple(NamedTuple):
@@ -96,6 +103,10 @@ class CrossEncoderModule(ModuleBase):
         if self.batch_size <= 0:
             self.batch_size = 32  # 0 or negative, use the default.
 
+        self.pipelined_tokenization = env_val_to_bool(
+            embedding_cfg.get("pipelined_tokenization")
+        )
+
     @classmethod
     def load(
         cls, model_path: Union[str, ModuleConfig], *args, **kwargs
@@ -171,13 +182,33 @@ class CrossEncoderModule(ModuleBase):
                 The token count
         """
         result = self.model.get_tokenized([text], return_offsets_mapping=True)
+        return get_tokenization_results([text], result)[0]
 
-        mapping = [
-            interv for interv in result.offset_mapping[0] if (interv[1] - interv[0]) > 0
-        ]
-        tokens = [Token(start=i[0], end=i[1], text=text[i[0] : i[1]]) for i in mapping]
+    def run_tokenizer_batch(
+        self,
+        texts: List[str],
+        return_tokens: bool = True,
+    ) -> List[TokenizationResults]:
+        """Run tokenization against the model for a list of texts
+
+        The texts are tokenized with one batched tokenizer call.
+
+        Args:
+            texts: List[str]
+                Texts to tokenize
+            return_tokens: bool
+                Default True
+                Setting to False returns only the token counts (no Token spans).
+        Returns:
+            List[TokenizationResults]
+                The token count (and tokens) for each text, in the original order
+        """
+        error.type_check_all("<NLP27301954E>", str, texts=texts)
+        if not texts:
+            return []
 
-        return TokenizationResults(token_count=len(result.input_ids[0]), results=tokens)
+        result = self.model.get_tokenized([texts], return_offsets_mapping=True)
+        return get_tokenization_results(texts, result, return_tokens=return_tokens)
 
     @RerankTask.taskmethod()
     def run_rerank_query(
@@ -189,6 +220,7 @@ class CrossEncoderModule(ModuleBase):
         return_documents: bool = True,
         return_query: bool = True,
         return_text: bool = True,
+        time_budget_ms: Optional[int] = None,
     ) -> RerankResult:
         """Rerank the documents returning the most relevant top_n in order for this query.
         Args:
@@ -216,6 +248,12 @@ class CrossEncoderModule(ModuleBase):
             return_text:  bool
                 Default True
                 Setting to False will disable returning of document text string that was used.
+            time_budget_ms:  Optional[int]
+                Latency budget for scoring in milliseconds. Default None (no budget).
+                Documents are scored in the given order until the budget is spent.
+                Documents that were not scored get a NaN score and are ranked last
+                (in the given order), so the number of non-NaN scores is the number
+                of documents that were actually scored.
         Returns:
             RerankResult
                 Returns the (top_n) scores in relevance order (most relevant first).
@@ -247,6 +285,7 @@ class CrossEncoderModule(ModuleBase):
             return_documents=return_documents,
             return_queries=return_query,
             return_text=return_text,
+            time_budget_ms=time_budget_ms,
         )
 
         return RerankResult(
@@ -265,6 +304,7 @@ class CrossEncoderModule(ModuleBase):
         return_documents: bool = True,
         return_queries: bool = True,
         return_text: bool = True,
+        time_budget_ms: Optional[int] = None,
     ) -> RerankResults:
         """Rerank the documents returning the most relevant top_n in order for each of the queries.
         Args:
@@ -292,6 +332,12 @@ class CrossEncoderModule(ModuleBase):
             return_text:  bool
                 Default True
                 Setting to False will disable returning of document text string that was used.
+            time_budget_ms:  Optional[int]
+                Latency budget for scoring in milliseconds. Default None (no budget).
+                Documents are scored in the given order until the budget is spent.
+                Documents that were not scored get a NaN score and are ranked last
+                (in the given order), so the number of non-NaN scores is the number
+                of documents that were actually scored.
         Returns:
             RerankResults
                 For each query in queries (in the original order)...
@@ -315,9 +361,19 @@ class CrossEncoderModule(ModuleBase):
             "Cannot rerank without a query and at least one document",
         )
 
+        error.type_check(
+            "<NLP53124893E>",
+            int,
+            allow_none=True,
+            time_budget_ms=time_budget_ms,
+        )
+
         if top_n is None or top_n < 1:
             top_n = len(documents)
 
+        # The budget is shared by all of the queries
+        deadline = get_deadline(time_budget_ms)
+
         # Using input document dicts so get "text" else "_text" else default to ""
         def get_text(doc):
             return doc.get("text") or doc.get("_text", "")
@@ -325,9 +381,10 @@ class CrossEncoderModule(ModuleBase):
         doc_texts = [get_text(doc) for doc in documents]
 
         input_token_count = 0
+        scored_count = 0
         results = []
-        for query in queries:
-            scores, token_count = self.model.rank(
+        for query_index, query in enumerate(queries):
+            scores, token_count, query_scored_count = self.model.rank(
                 query=query,
                 documents=doc_texts,
                 top_k=top_n,
@@ -335,9 +392,22 @@ class CrossEncoderModule(ModuleBase):
                 batch_size=self.batch_size,
                 convert_to_numpy=True,
                 truncate_input_tokens=truncate_input_tokens,
+                pipelined_tokenization=self.pipelined_tokenization,
+                deadline=deadline,
+                score_first_batch=query_index == 0,
             )
             results.append(scores)
             input_token_count += token_count
+            scored_count += query_scored_count
+
+        pair_count = len(queries) * len(documents)
+        if scored_count < pair_count:
+            logger.info(
+                "<NLP31905246I>",
+                f"Rerank time budget of {time_budget_ms}ms spent. Scored "
+                f"{scored_count} of {pair_count} query/document pairs. The rest "
+                "have a fallback score below the scored ones.",
+            )
 
         # Fixup result dicts
         for r in results:
@@ -471,8 +541,12 @@ class CrossEncoderWithTruncate(CrossEncoder):
 
         return tokenizer
 
-    def get_tokenized(self, texts, **kwargs):
-        """Use a copy of the tokenizer per-model (self) and per-thread (map by thread ID)"""
+    def get_tokenized(self, texts, tokenizer=None, **kwargs):
+        """Use a copy of the tokenizer per-model (self) and per-thread (map by thread ID)
+
+        A tokenizer may be passed in by a caller that owns it for the duration of the
+        call (see _pipelined_batches).
+        """
 
         max_len = kwargs.get("truncate_input_tokens", self.tokenizer.model_max_length)
         max_len = min(max_len, self.tokenizer.model_max_length)
@@ -483,7 +557,8 @@ class CrossEncoderWithTruncate(CrossEncoder):
             # Bare minimum is [CLS] token [SEP] token [SEP]
             max_len = 5
 
-        tokenizer = self._get_tokenizer_per_thread()
+        if tokenizer is None:
+            tokenizer = self._get_tokenizer_per_thread()
         tokenized = tokenizer(
             *texts,
             return_attention_mask=True,  # Used for determining token count
@@ -534,7 +609,7 @@ class CrossEncoderWithTruncate(CrossEncoder):
         return end_index < len(texts[end_typeid].strip())
 
     def smart_batching_collate_text_only(
-        self, batch, truncate_input_tokens: Optional[int] = 0
+        self, batch, truncate_input_tokens: Optional[int] = 0, tokenizer=None
     ):
         texts = [[] for _ in range(len(batch[0]))]
 
@@ -543,11 +618,49 @@ class CrossEncoderWithTruncate(CrossEncoder):
                 texts[idx].append(text.strip())
 
         tokenized = self.get_tokenized(
-            texts, truncate_input_tokens=truncate_input_tokens
+            texts, tokenizer=tokenizer, truncate_input_tokens=truncate_input_tokens
         )
 
         return tokenized
 
+    def _pipelined_batches(self, sentences, batch_size, collate_fn) -> Iterator:
+        """Yield tokenized batches, tokenizing batch k+1 on a helper thread
+        while the caller runs batch k through the model.
+
+        The fast tokenizer releases the GIL while batch encoding, so the
+        tokenization of the next batch overlaps with the forward pass.
+
+        Each call gets its own helper thread (no queueing behind other requests)
+        which is shut down when the batches are done. The helper uses the calling
+        thread's tokenizer copy. That is safe because the caller does not tokenize
+        while it is consuming these batches, and it avoids a tokenizer copy per
+        short-lived helper thread.
+        """
+        batches = [
+            sentences[start : start + batch_size]
+            for start in range(0, len(sentences), batch_size)
+        ]
+        if not batches:
+            return
+
+        collate_fn = partial(collate_fn, tokenizer=self._get_tokenizer_per_thread())
+        with ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="xenc-tokenize"
+        ) as executor:
+            future = executor.submit(collate_fn, batches[0])
+            try:
+                for next_batch in batches[1:]:
+                    features = future.result()
+                    future = executor.submit(collate_fn, next_batch)
+                    yield features
+                features = future.result()
+                future = None
+                yield features
+            finally:
+                # On early exit (e.g. truncation error) do not leave work queued
+                if future is not None:
+                    future.cancel()
+
     @staticmethod
     def raise_truncation_error(max_len, truncation_needed_indexes):
 
@@ -576,6 +689,9 @@ class CrossEncoderWithTruncate(CrossEncoder):
         convert_to_numpy: bool = True,
         convert_to_tensor: bool = False,
         truncate_input_tokens: Optional[int] = 0,
+        pipelined_tokenization: bool = False,
+        deadline: Optional[float] = None,
+        score_first_batch: bool = True,
     ) -> PredictResultTuple:
         """
         Performs predictions with the CrossEncoder on the given sentence pairs.
@@ -583,9 +699,17 @@ class CrossEncoderWithTruncate(CrossEncoder):
         Args:
             See overriden method for details.
             truncate_input_tokens: Optional[int] = 0 added for truncation
+            pipelined_tokenization: bool = False added to tokenize the next batch
+                on a helper thread while the current batch is in the model
+                (num_workers is ignored when enabled)
+            deadline: Optional[float] = None added to stop scoring batches after this
+                time.monotonic() value
+            score_first_batch: bool = True added to always score the first batch,
+                even when the deadline has already passed
 
         Returns:
             Uses PredictResultTuple to add input_token_count
+            With a deadline, scores may be returned for only the leading sentences
         """
         input_was_string = False
         if isinstance(
@@ -598,13 +722,16 @@ class CrossEncoderWithTruncate(CrossEncoder):
             self.smart_batching_collate_text_only,
             truncate_input_tokens=truncate_input_tokens,
         )
-        iterator = DataLoader(
-            sentences,
-            batch_size=batch_size,
-            collate_fn=collate_fn,
-            num_workers=num_workers,
-            shuffle=False,
-        )
+        if pipelined_tokenization:
+            iterator = self._pipelined_batches(sentences, batch_size, collate_fn)
+        else:
+            iterator = DataLoader(
+                sentences,
+                batch_size=batch_size,
+                collate_fn=collate_fn,
+                num_workers=num_workers,
+                shuffle=False,
+            )
 
         if activation_fct is None:
             activation_fct = self.default_activation_function
@@ -616,6 +743,9 @@ class CrossEncoderWithTruncate(CrossEncoder):
         truncation_needed_indexes = []
         with torch.no_grad():
             for features in iterator:
+                if (pred_scores or not score_first_batch) and deadline_passed(deadline):
+                    break
+
                 # Sum the length of all encodings for all samples
                 for encoding in features.encodings:
                     row += 1
@@ -650,7 +780,7 @@ class CrossEncoderWithTruncate(CrossEncoder):
             pred_scores = [score[0] for score in pred_scores]
 
         if convert_to_tensor:
-            pred_scores = torch.stack(pred_scores)
+            pred_scores = torch.stack(pred_scores) if pred_scores else torch.empty(0)
         elif convert_to_numpy:
             pred_scores = np.asarray(
                 [score.cpu().detach().float().item() for score in pred_scores]
@@ -675,6 +805,9 @@ class CrossEncoderWithTruncate(CrossEncoder):
         convert_to_numpy: bool = True,
         convert_to_tensor: bool = False,
         truncate_input_tokens: Optional[int] = 0,
+        pipelined_tokenization: bool = False,
+        deadline: Optional[float] = None,
+        score_first_batch: bool = True,
     ) -> RerankResultTuple:
         """
         Performs ranking with the CrossEncoder on the given query and documents.
@@ -684,21 +817,35 @@ class CrossEncoderWithTruncate(CrossEncoder):
         Args:
             See overridden method for argument description.
             truncate_input_tokens (int, optional): Added to support truncation.
+            pipelined_tokenization (bool, optional): Added to overlap tokenization
+                with model compute.
+            deadline (float, optional): Added to stop scoring after this time.monotonic()
+                value. Documents are scored in the given order and unscored documents
+                get a finite fallback score, ranked after the scored ones in the
+                given order.
+            score_first_batch (bool, optional): Added to always score the first batch,
+                even when the deadline has already passed. With False and a passed
+                deadline, the model is not called at all.
         Returns:
-            RerankResultTuple: Adds input_token_count to result
+            RerankResultTuple: Adds input_token_count and scored_count to result
         """
-        query_doc_pairs = [[query, doc] for doc in documents]
-        scores, input_token_count = self.predict(
-            query_doc_pairs,
-            batch_size=batch_size,
-            show_progress_bar=show_progress_bar,
-            num_workers=num_workers,
-            activation_fct=activation_fct,
-            apply_softmax=apply_softmax,
-            convert_to_numpy=convert_to_numpy,
-            convert_to_tensor=convert_to_tensor,
-            truncate_input_tokens=truncate_input_tokens,
-        )
+        if not score_first_batch and deadline_passed(deadline):
+            scores, input_token_count = [], 0
+        else:
+            scores, input_token_count = self.predict(
+                [[query, doc] for doc in documents],
+                batch_size=batch_size,
+                show_progress_bar=show_progress_bar,
+                num_workers=num_workers,
+                activation_fct=activation_fct,
+                apply_softmax=apply_softmax,
+                convert_to_numpy=convert_to_numpy,
+                convert_to_tensor=convert_to_tensor,
+                truncate_input_tokens=truncate_input_tokens,
+                pipelined_tokenization=pipelined_tokenization,
+                deadline=deadline,
+                score_first_batch=score_first_batch,
+            )
         results = []
         for i, score in enumerate(scores):
             if return_documents:
@@ -707,4 +854,18 @@ class CrossEncoderWithTruncate(CrossEncoder):
                 results.append({"corpus_id": i, "score": score})
 
         results = sorted(results, key=lambda x: x["score"], reverse=True)
-        return RerankResultTuple(results[:top_k], input_token_count)
+
+        # Documents left unscored by the deadline keep their given (prior) order
+        scored_count = len(results)
+        unscored_score = np.float64(get_unscored_score(scores))
+        for i in range(scored_count, len(documents)):
+            if top_k is not None and len(results) >= top_k:
+                break
+            if return_documents:
+                results.append(
+                    {"corpus_id": i, "score": unscored_score, "text": documents[i]}
+                )
+            else:
+                results.append({"corpus_id": i, "score": unscored_score})
+
+        return RerankResultTuple(results[:top_k], input_token_count, scored_count)
@@ -56,7 +56,6 @@ from caikit.interfaces.nlp.data_model import (
     SentenceSimilarityResult,
     SentenceSimilarityResults,
     SentenceSimilarityScores,
-    Token,
     TokenizationResults,
 )
 from caikit.interfaces.nlp.tasks import (
@@ -71,7 +70,15 @@ from caikit.interfaces.nlp.tasks import (
 import alog
 
 # Local
-from caikit_nlp.modules.text_embedding.utils import env_val_to_bool
+from caikit_nlp.modules.text_embedding.utils import (
+    CachedTokens,
+    TokenizationCache,
+    deadline_passed,
+    env_val_to_bool,
+    get_deadline,
+    get_tokenization_results,
+    get_unscored_score,
+)
 
 logger = alog.use_channel("TXT_EMB")
 error = error_handler.get(logger)
@@ -84,6 +91,7 @@ try:
     # Third Party
     from sentence_transformers import SentenceTransformer
     from sentence_transformers.model_card import SentenceTransformerModelCardData
+    from sentence_transformers.models import Normalize
     from sentence_transformers.similarity_functions import SimilarityFunction
     from sentence_transformers.util import batch_to_device, cos_sim, dot_score
     from sentence_transformers.util import (
@@ -117,6 +125,10 @@ class TruncatedTokensTuple(NamedTuple):
     truncation_needed: List[int]
 
 
+# Pooling choices for long-document (sliding-window) embedding
+LONG_DOCUMENT_POOLING = ("mean", "weighted")
+
+
 # pylint: disable=too-many-lines
 @module(
     "eeb12558-b4fa-4f34-a9fd-3f5890e9cd3f",
@@ -155,6 +167,38 @@ class EmbeddingModule(ModuleBase):
         self.batch_size = embedding_cfg.get("batch_size", 0)
         error.type_check("<NLP83816537E>", int, EMBEDDING_BATCH_SIZE=self.batch_size)
 
+        # Sliding-window embedding of long documents ("" to truncate or raise instead)
+        self.long_document_pooling = embedding_cfg.get("long_document_pooling") or None
+        error.value_check(
+            "<NLP44190683E>",
+            self.long_document_pooling in (None, *LONG_DOCUMENT_POOLING),
+            f"EMBEDDING_LONG_DOCUMENT_POOLING must be one of {LONG_DOCUMENT_POOLING}",
+        )
+        self.window_overlap = embedding_cfg.get("window_overlap", 32)
+        error.type_check(
+            "<NLP28764014E>", int, EMBEDDING_WINDOW_OVERLAP=self.window_overlap
+        )
+        window_tokens = (
+            self.model.max_seq_length - self.model.tokenizer.num_special_tokens_to_add()
+        )
+        error.value_check(
+            "<NLP28764015E>",
+            0 <= self.window_overlap < window_tokens,
+            f"EMBEDDING_WINDOW_OVERLAP must be >= 0 and < {window_tokens} for this model",
+        )
+
+        # Bounded cache of tokenizer output per text (0 to disable)
+        tokenization_cache_size = embedding_cfg.get("tokenization_cache_size", 0)
+        error.type_check(
+            "<NLP51370288E>",
+            int,
+            EMBEDDING_TOKENIZATION_CACHE_SIZE=tokenization_cache_size,
+        )
+        if tokenization_cache_size > 0 and isinstance(
+            self.model, SentenceTransformerWithTruncate
+        ):
+            self.model.tokenization_cache = TokenizationCache(tokenization_cache_size)
+
         # Retry count if enabled to try again (was for thread contention errors)
         retries = embedding_cfg.get("retries", 0)
         error.type_check("<NLP41910524E>", int, EMBEDDING_RETRIES=retries)
@@ -241,13 +285,33 @@ class EmbeddingModule(ModuleBase):
                 The token count
         """
         result = self.model._get_tokenized([text])
+        return get_tokenization_results([text], result)[0]
 
-        mapping = [
-            interv for interv in result.offset_mapping[0] if (interv[1] - interv[0]) > 0
-        ]
-        tokens = [Token(start=i[0], end=i[1], text=text[i[0] : i[1]]) for i in mapping]
+    def run_tokenizer_batch(
+        self,
+        texts: List[str],
+        return_tokens: bool = True,
+    ) -> List[TokenizationResults]:
+        """Run tokenization against the model for a list of texts
+
+        The texts are tokenized with one batched tokenizer call.
+
+        Args:
+            texts: List[str]
+                Texts to tokenize
+            return_tokens: bool
+                Default True
+                Setting to False returns only the token counts (no Token spans).
+        Returns:
+            List[TokenizationResults]
+                The token count (and tokens) for each text, in the original order
+        """
+        error.type_check_all("<NLP61739286E>", str, texts=texts)
+        if not texts:
+            return []
 
-        return TokenizationResults(token_count=len(result.input_ids[0]), results=tokens)
+        result = self.model._get_tokenized(texts)
+        return get_tokenization_results(texts, result, return_tokens=return_tokens)
 
     @classmethod
     def _get_ipex(cls, ipex_flag):
@@ -360,6 +424,8 @@ class EmbeddingModule(ModuleBase):
                 "implicit_truncation_errors"
             ] = self.no_implicit_truncation  # config/env overrides default
             kwargs["autocast"] = self.autocast  # config/env overrides default
+            kwargs["long_document_pooling"] = self.long_document_pooling
+            kwargs["window_overlap"] = self.window_overlap
             return self._with_retry(self.model.encode, *args, **kwargs)
 
         # Else...
@@ -375,6 +441,12 @@ class EmbeddingModule(ModuleBase):
             del kwargs["implicit_truncation_errors"]
         if "autocast" in kwargs:
             del kwargs["autocast"]
+        if "long_document_pooling" in kwargs:
+            del kwargs["long_document_pooling"]
+        if "window_overlap" in kwargs:
+            del kwargs["window_overlap"]
+        if "index_offset" in kwargs:
+            del kwargs["index_offset"]
         return self._with_retry(self.model.encode, *args, **kwargs)
 
     @EmbeddingTask.taskmethod()
@@ -549,6 +621,7 @@ class EmbeddingModule(ModuleBase):
         return_documents: bool = True,
         return_query: bool = True,
         return_text: bool = True,
+        time_budget_ms: Optional[int] = None,
         **kwargs,
     ) -> RerankResult:
         """Rerank the documents returning the most relevant top_n in order for this query.
@@ -577,6 +650,12 @@ class EmbeddingModule(ModuleBase):
             return_text:  bool
                 Default True
                 Setting to False will disable returning of document text string that was used.
+            time_budget_ms:  Optional[int]
+                Latency budget for scoring in milliseconds. Default None (no budget).
+                Documents are embedded in the given order until the budget is spent.
+                Documents that were not scored get a NaN score and are ranked last
+                (in the given order), so the number of non-NaN scores is the number
+                of documents that were actually scored.
         Returns:
             RerankResult
                 Returns the (top_n) scores in relevance order (most relevant first).
@@ -601,6 +680,7 @@ class EmbeddingModule(ModuleBase):
             return_documents=return_documents,
             return_queries=return_query,
             return_text=return_text,
+            time_budget_ms=time_budget_ms,
             **kwargs,
         )
 
@@ -630,6 +710,7 @@ class EmbeddingModule(ModuleBase):
         return_documents: bool = True,
         return_queries: bool = True,
         return_text: bool = True,
+        time_budget_ms: Optional[int] = None,
         **kwargs,
     ) -> RerankResults:
         """Rerank the documents returning the most relevant top_n in order for each of the queries.
@@ -658,6 +739,12 @@ class EmbeddingModule(ModuleBase):
             return_text:  bool
                 Default True
                 Setting to False will disable returning of document text string that was used.
+            time_budget_ms:  Optional[int]
+                Latency budget for scoring in milliseconds. Default None (no budget).
+                Documents are embedded in the given order until the budget is spent.
+                Documents that were not scored get a NaN score and are ranked last
+                (in the given order), so the number of non-NaN scores is the number
+                of documents that were actually scored.
         Returns:
             RerankResults
                 For each query in queries (in the original order)...
@@ -681,6 +768,13 @@ class EmbeddingModule(ModuleBase):
             "Cannot rerank without a query and at least one document",
         )
 
+        error.type_check(
+            "<NLP71386250E>",
+            int,
+            allow_none=True,
+            time_budget_ms=time_budget_ms,
+        )
+
         if top_n is None or top_n < 1:
             top_n = len(documents)
 
@@ -690,14 +784,7 @@ class EmbeddingModule(ModuleBase):
 
         doc_texts = [get_text(doc) for doc in documents]
 
-        doc_embeddings, doc_token_count = self._encode_with_retry(
-            doc_texts,
-            truncate_input_tokens=truncate_input_tokens,
-            return_token_count=True,
-            convert_to_tensor=True,
-            **kwargs,
-        )
-        doc_embeddings = normalize(doc_embeddings.to(self.model.device))
+        deadline = get_deadline(time_budget_ms)
 
         query_embeddings, query_token_count = self._encode_with_retry(
             queries,
@@ -708,10 +795,60 @@ class EmbeddingModule(ModuleBase):
         )
         query_embeddings = normalize(query_embeddings.to(self.model.device))
 
+        if deadline is None:
+            doc_embeddings, doc_token_count = self._encode_with_retry(
+                doc_texts,
+                truncate_input_tokens=truncate_input_tokens,
+                return_token_count=True,
+                convert_to_tensor=True,
+                **kwargs,
+            )
+        else:
+            # Embed the documents a batch at a time in the given order until the
+            # budget is spent. The first batch is always scored.
+            chunk_size = self.batch_size if self.batch_size > 0 else 32
+            chunks = []
+            doc_token_count = 0
+            for start in range(0, len(doc_texts), chunk_size):
+                if chunks and deadline_passed(deadline):
+                    break
+                chunk_embeddings, chunk_token_count = self._encode_with_retry(
+                    doc_texts[start : start + chunk_size],
+                    truncate_input_tokens=truncate_input_tokens,
+                    return_token_count=True,
+                    convert_to_tensor=True,
+                    index_offset=start,
+                    **kwargs,
+                )
+                chunks.append(chunk_embeddings)
+                doc_token_count += chunk_token_count
+            doc_embeddings = torch.cat(chunks)
+        doc_embeddings = normalize(doc_embeddings.to(self.model.device))
+
+        scored_count = len(doc_embeddings)
         res = semantic_search(
-            query_embeddings, doc_embeddings, top_k=top_n, score_function=dot_score
+            query_embeddings,
+            doc_embeddings,
+            top_k=min(top_n, scored_count),
+            score_function=dot_score,
         )
 
+        if scored_count < len(documents):
+            logger.info(
+                "<NLP84021765I>",
+                f"Rerank time budget of {time_budget_ms}ms spent. Scored "
+                f"{scored_count} of {len(documents)} documents per query. The rest "
+                "have a fallback score below the scored ones.",
+            )
+            # Documents left unscored keep their given (prior) order
+            for r in res:
+                unscored_score = get_unscored_score(x["score"] for x in r)
+                end = min(len(documents), scored_count + top_n - len(r))
+                r.extend(
+                    {"corpus_id": i, "score": unscored_score}
+                    for i in range(scored_count, end)
+                )
+
         # Fixup result dicts
         for r in res:
             for x in r:
@@ -845,6 +982,11 @@ def sum_token_count(
         BatchEncoding,
         tokenized=tokenized,
     )
+
+    if tokenized.encodings is None and "attention_mask" in tokenized:
+        # Batches assembled from the tokenization cache have no encodings
+        return int(tokenized["attention_mask"].sum())
+
     error.value_check(
         "<NLP82314995E>",
         tokenized.encodings,
@@ -889,8 +1031,8 @@ def _truncate_texts(texts, tokenized, max_length, text_indexes):
 
 
 def _get_end_index(max_length, text_number, tokenized):
-    offsets = tokenized["offset_mapping"][text_number]
-    attn_mask = tokenized.encodings[text_number].attention_mask
+    offsets = tokenized["offset_mapping"][text_number].tolist()
+    attn_mask = tokenized["attention_mask"][text_number].tolist()
 
     # Find the last offset by counting attn masks
     # and keeping the last non-zero offset end.
@@ -907,6 +1049,28 @@ def _get_end_index(max_length, text_number, tokenized):
     return end_index
 
 
+def _pool_windows(
+    window_embeddings: torch.Tensor,
+    text_indexes: torch.Tensor,
+    weights: torch.Tensor,
+    text_count: int,
+) -> torch.Tensor:
+    """Pool window embeddings back to one (weighted) mean embedding per text"""
+    weights = weights.to(device=window_embeddings.device, dtype=window_embeddings.dtype)
+    text_indexes = text_indexes.to(window_embeddings.device)
+
+    sums = torch.zeros(
+        text_count,
+        window_embeddings.shape[1],
+        dtype=window_embeddings.dtype,
+        device=window_embeddings.device,
+    ).index_add_(0, text_indexes, window_embeddings * weights.unsqueeze(1))
+    totals = torch.zeros(
+        text_count, dtype=weights.dtype, device=window_embeddings.device
+    ).index_add_(0, text_indexes, weights)
+    return sums / totals.unsqueeze(1)
+
+
 class SentenceTransformerWithTruncate(SentenceTransformer):
     def __init__(
         self,
@@ -948,6 +1112,8 @@ class SentenceTransformerWithTruncate(SentenceTransformer):
             model_card_data,
         )
         self.tokenizers = {}
+        self.window_tokenizers = {}
+        self.tokenization_cache: Optional[TokenizationCache] = None
 
     def _truncation_needed(self, tokenized, max_length, texts):
         """Check for truncation needed to meet max_length token limit
@@ -961,8 +1127,9 @@ class SentenceTransformerWithTruncate(SentenceTransformer):
             # -1 means to just let the model do its thing
             return ret
 
-        for i, encoding in enumerate(tokenized.encodings):
-            input_tokens = sum(encoding.attention_mask)
+        for i, input_tokens in enumerate(
+            tokenized["attention_mask"].sum(dim=1).tolist()
+        ):
             if input_tokens > max_length or input_tokens > self.max_seq_length:
                 # Greater than truncate_input_tokens plus 2 (start/end) or over model limit
                 ret.append(i)
@@ -1023,7 +1190,7 @@ class SentenceTransformerWithTruncate(SentenceTransformer):
         texts = [str(s).strip() for s in texts]
 
         # Call tokenizer with the same truncation parameters every time
-        tokenized = self._get_tokenized(texts, **kwargs)
+        tokenized = self._get_tokenized_cached(texts, **kwargs)
 
         # Custom truncation and/or error raise if needed
         truncation_needed = self._truncation_needed(tokenized, max_length, texts)
@@ -1031,12 +1198,159 @@ class SentenceTransformerWithTruncate(SentenceTransformer):
             # Truncate texts in place
             _truncate_texts(texts, tokenized, max_length, truncation_needed)
             # Re-tokenize the truncated texts
-            tokenized = self._get_tokenized(texts, **kwargs)
+            tokenized = self._get_tokenized_cached(texts, **kwargs)
             truncation_needed = []  # truncation accomplished
 
         input_token_count = sum_token_count(tokenized)
         return TruncatedTokensTuple(tokenized, input_token_count, truncation_needed)
 
+    def _get_windows(self, texts: List[str], window_overlap: int) -> BatchEncoding:
+        """Tokenize texts once into overlapping windows that each fit the model.
+
+        The tokenizer returns the overflowing tokens of long texts as extra rows, with
+        window_overlap tokens repeated from the end of the previous window. The
+        overflow_to_sample_mapping gives the text index of each window.
+
+        Uses its own copy of the tokenizer per-thread, so the stride (truncation)
+        setting never changes on the tokenizers used by _get_tokenized().
+        """
+        window_tokens = self.max_seq_length - self.tokenizer.num_special_tokens_to_add()
+        error.value_check(
+            "<NLP60125497E>",
+            0 <= window_overlap < window_tokens,
+            f"window_overlap must be >= 0 and < {window_tokens} for this model",
+        )
+
+        thread_id = threading.get_ident()
+        tokenizer = (
+            self.window_tokenizers[thread_id]
+            if thread_id in self.window_tokenizers
+            else self.window_tokenizers.setdefault(thread_id, deepcopy(self.tokenizer))
+        )
+
+        return tokenizer(
+            [str(s).strip() for s in texts],
+            return_attention_mask=True,
+            return_token_type_ids=False,
+            return_overflowing_tokens=True,  # Long texts continue in the next rows
+            return_length=False,
+            return_tensors="pt",
+            truncation=True,
+            padding=True,
+            max_length=self.max_seq_length,
+            stride=window_overlap,
+        )
+
+    def _encode_windows(
+        self,
+        texts: List[str],
+        batch_size: int,
+        device: str,
+        autocast: bool,
+        long_document_pooling: str,
+        window_overlap: int,
+    ) -> EmbeddingResultTuple:
+        """Embed long texts as overlapping windows pooled back to one embedding per text.
+
+        The windows of all texts are batched together. The token count is the sum of
+        the tokens in all windows.
+        """
+        windows = self._get_windows(texts, window_overlap)
+        text_indexes = windows.pop("overflow_to_sample_mapping")
+        window_lengths = windows["attention_mask"].sum(dim=1)
+        input_token_count = int(window_lengths.sum())
+
+        self.to(device)
+        window_embeddings = []
+        for start_index in range(0, len(text_indexes), batch_size):
+            features = {
+                k: v[start_index : start_index + batch_size] for k, v in windows.items()
+            }
+            features = batch_to_device(features, device)
+            with torch.no_grad(), torch.cpu.amp.autocast(enabled=autocast):
+                out_features = self.forward(features)
+                window_embeddings.append(out_features["sentence_embedding"])
+        window_embeddings = torch.cat(window_embeddings)
+
+        if long_document_pooling == "weighted":
+            # Weight by tokens so a short final window does not count as much as a full one
+            special_tokens = self.tokenizer.num_special_tokens_to_add()
+            weights = (window_lengths - special_tokens).clamp(min=1)
+        else:
+            weights = torch.ones(len(text_indexes))
+
+        embeddings = _pool_windows(window_embeddings, text_indexes, weights, len(texts))
+        # A mean of unit vectors is not a unit vector
+        if any(isinstance(m, Normalize) for m in self):
+            embeddings = normalize(embeddings)
+
+        return EmbeddingResultTuple(embeddings, input_token_count)
+
+    def _get_tokenized_cached(self, texts: List[str], **kwargs) -> BatchEncoding:
+        """Like _get_tokenized(), but reuse cached tokens for texts seen before.
+
+        Only the cache misses are sent to the tokenizer. When any text was cached,
+        the batch is assembled by padding the cached ids and offsets instead, so the
+        result has no .encodings (use the attention_mask). Tokenizer kwargs (e.g.
+        padding_strategy) bypass the cache.
+        """
+        if self.tokenization_cache is None or kwargs:
+            return self._get_tokenized(texts, **kwargs)
+
+        cached = self.tokenization_cache.get_many(texts)
+        misses = [i for i, tokens in enumerate(cached) if tokens is None]
+        if misses:
+            tokenized = self._get_tokenized([texts[i] for i in misses])
+            if len(misses) == len(texts):
+                self._cache_tokenized(texts, tokenized)
+                return tokenized
+            for i, tokens in zip(
+                misses, self._cache_tokenized([texts[i] for i in misses], tokenized)
+            ):
+                cached[i] = tokens
+
+        return self._pad_cached_tokens(cached)
+
+    def _cache_tokenized(
+        self, texts: List[str], tokenized: BatchEncoding
+    ) -> List[CachedTokens]:
+        """Strip the padding from tokenizer output and add it to the cache"""
+        masks = tokenized["attention_mask"].bool()
+        input_ids = tokenized["input_ids"]
+        offsets = tokenized["offset_mapping"]
+        tokens_list = []
+        for row, text in enumerate(texts):
+            tokens = CachedTokens(
+                input_ids[row][masks[row]].numpy(), offsets[row][masks[row]].numpy()
+            )
+            self.tokenization_cache.put(text, tokens)
+            tokens_list.append(tokens)
+        return tokens_list
+
+    def _pad_cached_tokens(self, tokens_list: List[CachedTokens]) -> BatchEncoding:
+        """Assemble a padded batch (like the tokenizer's padding=True) from cache"""
+        lengths = [tokens.token_count for tokens in tokens_list]
+        width = max(lengths)
+        input_ids = np.full(
+            (len(tokens_list), width), self.tokenizer.pad_token_id, dtype=np.int64
+        )
+        attention_mask = np.zeros((len(tokens_list), width), dtype=np.int64)
+        offset_mapping = np.zeros((len(tokens_list), width, 2), dtype=np.int64)
+        left = self.tokenizer.padding_side == "left"
+        for row, (tokens, length) in enumerate(zip(tokens_list, lengths)):
+            cols = slice(width - length, width) if left else slice(0, length)
+            input_ids[row, cols] = tokens.input_ids
+            attention_mask[row, cols] = 1
+            offset_mapping[row, cols] = tokens.offsets
+
+        return BatchEncoding(
+            {
+                "input_ids": torch.from_numpy(input_ids),
+                "attention_mask": torch.from_numpy(attention_mask),
+                "offset_mapping": torch.from_numpy(offset_mapping),
+            }
+        )
+
     def _get_tokenized(self, texts, **kwargs):
         """Intentionally always call tokenizer the same way to avoid thread issues.
 
@@ -1087,6 +1401,9 @@ class SentenceTransformerWithTruncate(SentenceTransformer):
         return_token_count: bool = False,
         implicit_truncation_errors: bool = True,
         autocast: bool = False,
+        long_document_pooling: Optional[str] = None,
+        window_overlap: int = 32,
+        index_offset: int = 0,
         **kwargs,
     ) -> Union[EmbeddingResultTuple, List[torch.Tensor], np.ndarray, torch.Tensor]:
         """
@@ -1116,11 +1433,21 @@ class SentenceTransformerWithTruncate(SentenceTransformer):
         :param implicit_truncation_errors: If true (default) implicit truncation throws an error.
                 If false, the model default behavior or used.
         :param autocast: If true (not default) run with torch.cpu.amp.autocast()
+        :param long_document_pooling: If "mean" or "weighted", texts that would otherwise
+                raise a truncation error or be implicitly truncated (truncate_input_tokens is
+                zero or greater than the model's maximum) are split into overlapping windows.
+                The windows of all of those texts are batched together and each text's window
+                embeddings are pooled with a mean or a token count weighted mean.
+                Explicit truncation (truncate_input_tokens < 0 or a usable limit) is honored.
+                Default None (no windows).
+        :param window_overlap: Number of tokens shared by consecutive windows.
+        :param index_offset: Added to the text indexes in truncation errors, when the
+                sentences are a slice of a larger list (starting at this index).
 
         :return:
            If return_token_count is False, the embedding is returned as a numpy matrix.
            If return_token_count is True, a tuple is returned with both the embedding and
-                the input token count.
+                the input token count (the tokens of all windows in long document mode).
         """
 
         # These args are for API compatability, but are currently ignored in our version of encode()
@@ -1147,6 +1474,11 @@ class SentenceTransformerWithTruncate(SentenceTransformer):
             input_was_string = True
 
         error.type_check_all("<NLP82314994E>", str, sentences=list_of_sentences)
+        error.value_check(
+            "<NLP93415287E>",
+            long_document_pooling in (None, *LONG_DOCUMENT_POOLING),
+            f"long_document_pooling must be one of {LONG_DOCUMENT_POOLING}",
+        )
 
         if device is None:
             device = self.device
@@ -1165,16 +1497,30 @@ class SentenceTransformerWithTruncate(SentenceTransformer):
         ]
 
         input_token_count = 0
+        long_sorted_indexes = []  # Texts to embed as windows (long document mode)
 
         for start_index in range(0, len(list_of_sentences), batch_size):
             sentences_batch = sentences_sorted[start_index : start_index + batch_size]
             features, token_count, truncation_needed = self._tokenize_plus(
                 truncate_input_tokens,
                 sentences_batch,
-                implicit_truncation_errors=implicit_truncation_errors,
+                implicit_truncation_errors=implicit_truncation_errors
+                or long_document_pooling is not None,
                 **kwargs,
             )
 
+            long_rows = []
+            if truncation_needed and long_document_pooling is not None:
+                # Embed these as windows after the loop instead of raising or truncating
+                long_rows = truncation_needed
+                truncation_needed = []
+                long_sorted_indexes.extend(start_index + row for row in long_rows)
+                token_count -= int(features["attention_mask"][long_rows].sum())
+                short_rows = [
+                    row for row in range(len(sentences_batch)) if row not in long_rows
+                ]
+                features = {k: v[short_rows] for k, v in features.items()}
+
             if truncation_needed:  # truncation was needed and was not done/not allowed
                 if input_was_string:
                     index_hint = "."
@@ -1184,7 +1530,7 @@ class SentenceTransformerWithTruncate(SentenceTransformer):
                     truncation_needed = [x + start_index for x in truncation_needed]
                     # Convert index to pre-sorted index
                     truncation_needed = [
-                        length_sorted_idx[x] for x in truncation_needed
+                        length_sorted_idx[x] + index_offset for x in truncation_needed
                     ]
                     indexes = f"{', '.join(str(i) for i in truncation_needed)}."
                     index_hint = (
@@ -1205,20 +1551,43 @@ class SentenceTransformerWithTruncate(SentenceTransformer):
 
             features = batch_to_device(features, device)
 
-            if autocast:
+            batch_embeddings = []
+            if len(features["input_ids"]) == 0:
+                pass  # Every text in this batch is a long document
+            elif autocast:
                 with torch.no_grad(), torch.cpu.amp.autocast():
                     out_features = self.forward(features)
                     embeddings = out_features["sentence_embedding"]
                     if convert_to_numpy:
                         embeddings = embeddings.detach().cpu()
-                    all_embeddings.extend(embeddings)
+                    batch_embeddings.extend(embeddings)
             else:
                 with torch.no_grad():
                     out_features = self.forward(features)
                     embeddings = out_features["sentence_embedding"]
                     if convert_to_numpy:
                         embeddings = embeddings.detach().cpu()
-                    all_embeddings.extend(embeddings)
+                    batch_embeddings.extend(embeddings)
+
+            # Placeholders for the long documents (long_rows are in ascending order)
+            for row in long_rows:
+                batch_embeddings.insert(row, None)
+            all_embeddings.extend(batch_embeddings)
+
+        if long_sorted_indexes:
+            window_embeddings, window_token_count = self._encode_windows(
+                [sentences_sorted[i] for i in long_sorted_indexes],
+                batch_size,
+                device,
+                autocast,
+                long_document_pooling,
+                window_overlap,
+            )
+            input_token_count += window_token_count
+            for i, embedding in zip(long_sorted_indexes, window_embeddings):
+                all_embeddings[i] = (
+                    embedding.detach().cpu() if convert_to_numpy else embedding
+                )
 
         # Restore original order
         all_embeddings = [all_embeddings[idx] for idx in np.argsort(length_sorted_idx)]
@@ -12,6 +12,23 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+# Standard
+from collections import OrderedDict
+from typing import Iterable, List, NamedTuple, Optional
+import threading
+import time
+
+# Third Party
+from transformers import BatchEncoding
+import numpy as np
+
+# First Party
+from caikit.interfaces.nlp.data_model import Token, TokenizationResults
+
+# Documents not scored within a rerank time budget rank this far below the lowest
+# score of the scored documents (or get a 0.0 score when none were scored)
+UNSCORED_SCORE_OFFSET = 1.0
+
 
 def env_val_to_bool(val):
     """Returns the bool value of env var"""
@@ -22,3 +39,96 @@ def env_val_to_bool(val):
 
     # For testing env vars for values that mean false (else True!)
     return str(val).lower().strip() not in ("no", "n", "false", "0", "f", "off", "")
+
+
+def get_deadline(time_budget_ms: Optional[int]) -> Optional[float]:
+    """Returns the time.monotonic() deadline for a time budget (None for no budget)"""
+    if time_budget_ms is None or time_budget_ms <= 0:
+        return None
+    return time.monotonic() + time_budget_ms / 1000
+
+
+def deadline_passed(deadline: Optional[float]) -> bool:
+    """Returns True if there is a deadline and it has passed"""
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def get_unscored_score(scores: Iterable[float]) -> float:
+    """Returns a finite score that ranks after all of the given (scored) scores"""
+    scores = [float(score) for score in scores]
+    if not scores:
+        return 0.0
+    return min(scores) - UNSCORED_SCORE_OFFSET
+
+
+class CachedTokens(NamedTuple):
+    """Unpadded tokenizer output for one text (the attention mask is all ones)"""
+
+    input_ids: np.ndarray
+    offsets: np.ndarray
+
+    @property
+    def token_count(self) -> int:
+        return len(self.input_ids)
+
+
+class TokenizationCache:
+    """Thread-safe, bounded LRU cache of tokenizer output per text"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, CachedTokens]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_many(self, texts: List[str]) -> List[Optional[CachedTokens]]:
+        """Returns the cached tokens for each text (None for a miss)"""
+        with self._lock:
+            found = []
+            for text in texts:
+                tokens = self._entries.get(text)
+                if tokens is not None:
+                    self._entries.move_to_end(text)
+                found.append(tokens)
+            hits = sum(tokens is not None for tokens in found)
+            self.hits += hits
+            self.misses += len(texts) - hits
+            return found
+
+    def put(self, text: str, tokens: CachedTokens):
+        """Add (or refresh) a text, dropping the least recently used over max_size"""
+        with self._lock:
+            self._entries[text] = tokens
+            self._entries.move_to_end(text)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+def get_tokenization_results(
+    texts: List[str], tokenized: BatchEncoding, return_tokens: bool = True
+) -> List[TokenizationResults]:
+    """Build TokenizationResults from one (padded) batch tokenizer call.
+
+    The token count of each text is its attention mask sum. Spans are filtered with
+    one vectorized mask over the offsets, which also drops the (0, 0) padding and
+    special token offsets. With return_tokens=False only the counts are returned.
+    """
+    token_counts = tokenized.attention_mask.sum(dim=1).tolist()
+    if not return_tokens:
+        return [TokenizationResults(token_count=count) for count in token_counts]
+
+    offsets = tokenized.offset_mapping.numpy()
+    keep = offsets[..., 1] > offsets[..., 0]
+
+    results = []
+    for text, count, row_offsets, row_keep in zip(texts, token_counts, offsets, keep):
+        tokens = [
+            Token(start=start, end=end, text=text[start:end])
+            for start, end in row_offsets[row_keep].tolist()
+        ]
+        results.append(TokenizationResults(token_count=count, results=tokens))
+    return results
@@ -18,6 +18,7 @@ from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
 import gc
 import json
 import os
+import threading
 
 # Third Party
 from accelerate import Accelerator
@@ -41,6 +42,7 @@ import torch
 import transformers
 
 # First Party
+from caikit import get_config
 from caikit.core.data_model import DataStream
 from caikit.core.exceptions import error_handler
 from caikit.core.modules import ModuleBase, ModuleConfig, ModuleSaver, module
@@ -68,13 +70,27 @@ from ...resources.pretrained_model import (
 from ...toolkit.data_stream_wrapper import SimpleIterableStreamWrapper
 from ...toolkit.data_type_utils import get_torch_dtype, str_to_torch_dtype
 from ...toolkit.task_specific_utils import convert_to_generation_record
+from ...toolkit.text_generation.assisted_decoding import DraftModel, load_draft_model
+from ...toolkit.text_generation.base_model_registry import get_shared_base_model
+from ...toolkit.text_generation.continuous_batching import (
+    create_continuous_batching_engine,
+)
 from ...toolkit.text_generation.model_run_utils import (
     GENERATE_FUNCTION_ARGS,
+    PrefixCache,
+    build_prefix_cache,
     generate_text_func,
+    generate_text_func_batch,
     generate_text_func_stream,
+    get_prompt_embeddings,
+)
+from ...toolkit.text_generation.quantization import (
+    get_quantization,
+    get_quantization_dtype,
+    quantize_model,
 )
 from ...toolkit.trainer_utils import validate_training_data
-from ...toolkit.verbalizer_utils import render_verbalizer
+from ...toolkit.verbalizer_utils import get_static_prefix, render_verbalizer
 from .peft_config import TuningType, get_peft_config, resolve_base_model
 
 log = alog.use_channel("PEFT_PROMPT")
@@ -122,6 +138,7 @@ class PeftPromptTuning(ModuleBase):
         tuning_type: TuningType,
         output_model_types: List[PromptOutputModelType],
         training_metadata: Union[Dict[str, Any], None] = None,
+        draft_model: Optional[DraftModel] = None,
     ):
         super().__init__()
         # Put the PEFT model into evaluation mode for all future calls
@@ -139,9 +156,26 @@ class PeftPromptTuning(ModuleBase):
         self.training_metadata = (
             training_metadata if training_metadata is not None else {}
         )
+        # Decodes concurrent runs together on the base model, if enabled in the config
+        self._continuous_batching_engine = create_continuous_batching_engine(
+            model.get_base_model(), tokenizer
+        )
+        # KV cache of the virtual tokens and static verbalizer prefix, built on the
+        # first run. It belongs to this instance, so a reloaded model rebuilds it.
+        prefix_cache_enabled = str(
+            get_config().get("text_generation", {}).get("prefix_cache", False)
+        ).lower() in ("true", "1")
+        self._use_prefix_cache = prefix_cache_enabled and task_type == "CAUSAL_LM"
+        self._prefix_cache = None
+        self._prefix_cache_lock = threading.Lock()
+        # Assists greedy runs continuing from the prefix cache, see
+        # draft_model.acceptance_rate
+        self.draft_model = draft_model
 
     # pylint: disable=duplicate-code
     def __del__(self):
+        if getattr(self, "_continuous_batching_engine", None) is not None:
+            self._continuous_batching_engine.shutdown()
         del self.model
         del self.tokenizer
         gc.collect()
@@ -209,6 +243,175 @@ class PeftPromptTuning(ModuleBase):
             stop_sequences=stop_sequences,
             preserve_input_text=preserve_input_text,
             task_type=self.task_type,
+            continuous_batching_engine=self._continuous_batching_engine,
+            prefix_cache=self._get_prefix_cache(),
+            draft_model=self.draft_model,
+        )
+
+    def run_batch(
+        self,
+        text: List[str],
+        max_new_tokens: Optional[int] = 20,
+        min_new_tokens: Optional[int] = 0,
+        truncate_input_tokens: Optional[int] = 0,
+        decoding_method: Optional[str] = "GREEDY",
+        top_k: Optional[int] = None,
+        top_p: Optional[float] = None,
+        typical_p: Optional[float] = None,
+        temperature: Optional[float] = None,
+        repetition_penalty: Optional[float] = None,
+        max_time: Optional[float] = None,
+        exponential_decay_length_penalty: Optional[
+            Union[Tuple[int, float], ExponentialDecayLengthPenalty]
+        ] = None,
+        stop_sequences: Optional[List[str]] = None,
+        seed: Optional[np.uint64] = None,
+        preserve_input_text: bool = True,
+        batch_size: Optional[int] = None,
+    ) -> List[GeneratedTextResult]:
+        f"""
+        Run the full text generation model on many texts, batching the generate calls.
+        Args:
+            text: List[str]
+                Input strings to be used to the generation model.
+            {GENERATE_FUNCTION_ARGS}
+            preserve_input_text: bool
+                Applicable only to Causal LLMs.
+                Whether or not the source string should be contained in the generated output,
+                e.g., as a prefix. Default True. (Source string will appear as prefix)
+            batch_size: Optional[int]
+                Number of texts per generate call. Default None - means all at once.
+        Returns:
+            List[GeneratedTextResult]
+                Generated text results produced by PEFT / Transformers, in the given order.
+        """
+
+        verbalized_texts = [
+            render_verbalizer(self.verbalizer, {"input": input_text})
+            for input_text in text
+        ]
+
+        return generate_text_func_batch(
+            self.model,
+            self.tokenizer,
+            self.PRODUCER_ID,
+            self.tokenizer.eos_token,
+            verbalized_texts,
+            max_new_tokens=max_new_tokens,
+            min_new_tokens=min_new_tokens,
+            truncate_input_tokens=truncate_input_tokens,
+            decoding_method=decoding_method,
+            top_k=top_k,
+            top_p=top_p,
+            typical_p=typical_p,
+            temperature=temperature,
+            seed=seed,
+            repetition_penalty=repetition_penalty,
+            max_time=max_time,
+            exponential_decay_length_penalty=exponential_decay_length_penalty,
+            stop_sequences=stop_sequences,
+            preserve_input_text=preserve_input_text,
+            task_type=self.task_type,
+            batch_size=batch_size,
+        )
+
+    @classmethod
+    def run_mixed_batch(
+        cls,
+        models: List["PeftPromptTuning"],
+        text: List[str],
+        max_new_tokens: Optional[int] = 20,
+        min_new_tokens: Optional[int] = 0,
+        truncate_input_tokens: Optional[int] = 0,
+        decoding_method: Optional[str] = "GREEDY",
+        top_k: Optional[int] = None,
+        top_p: Optional[float] = None,
+        typical_p: Optional[float] = None,
+        temperature: Optional[float] = None,
+        repetition_penalty: Optional[float] = None,
+        max_time: Optional[float] = None,
+        exponential_decay_length_penalty: Optional[
+            Union[Tuple[int, float], ExponentialDecayLengthPenalty]
+        ] = None,
+        stop_sequences: Optional[List[str]] = None,
+        seed: Optional[np.uint64] = None,
+        preserve_input_text: bool = True,
+        batch_size: Optional[int] = None,
+    ) -> List[GeneratedTextResult]:
+        f"""
+        Run many prompt tuned causal models over the same base model in batches, where
+        each text is generated with the prompt vectors and verbalizer of its own model.
+        Args:
+            models: List[PeftPromptTuning]
+                Model of each text, all with the same base model instance, e.g.
+                loaded with text_generation.shared_base_models enabled.
+            text: List[str]
+                Input strings to be used to the generation model.
+            {GENERATE_FUNCTION_ARGS}
+            preserve_input_text: bool
+                Whether or not the source string should be contained in the generated output,
+                e.g., as a prefix. Default True. (Source string will appear as prefix)
+            batch_size: Optional[int]
+                Number of texts per generate call. Default None - means all at once.
+        Returns:
+            List[GeneratedTextResult]
+                Generated text results produced by Transformers, in the given order.
+        """
+        error.type_check_all("<NLP36217590E>", cls, models=models)
+        error.value_check(
+            "<NLP36217591E>",
+            len(models) == len(text),
+            "Got {} models for {} texts",
+            len(models),
+            len(text),
+        )
+        error.value_check(
+            "<NLP36217592E>",
+            all(model.task_type == "CAUSAL_LM" for model in models),
+            "Mixed batches are only supported for causal models",
+        )
+        if not models:
+            return []
+        base_model = models[0].model.get_base_model()
+        error.value_check(
+            "<NLP36217593E>",
+            all(model.model.get_base_model() is base_model for model in models),
+            "Models of a mixed batch must share their base model",
+        )
+
+        verbalized_texts = [
+            render_verbalizer(model.verbalizer, {"input": input_text})
+            for model, input_text in zip(models, text)
+        ]
+        # Each distinct model's prompt embeddings are computed once
+        prompt_embeddings = {}
+        for model in models:
+            if id(model) not in prompt_embeddings:
+                prompt_embeddings[id(model)] = get_prompt_embeddings(model.model)
+
+        return generate_text_func_batch(
+            base_model,
+            models[0].tokenizer,
+            cls.PRODUCER_ID,
+            models[0].tokenizer.eos_token,
+            verbalized_texts,
+            max_new_tokens=max_new_tokens,
+            min_new_tokens=min_new_tokens,
+            truncate_input_tokens=truncate_input_tokens,
+            decoding_method=decoding_method,
+            top_k=top_k,
+            top_p=top_p,
+            typical_p=typical_p,
+            temperature=temperature,
+            seed=seed,
+            repetition_penalty=repetition_penalty,
+            max_time=max_time,
+            exponential_decay_length_penalty=exponential_decay_length_penalty,
+            stop_sequences=stop_sequences,
+            preserve_input_text=preserve_input_text,
+            task_type="CAUSAL_LM",
+            batch_size=batch_size,
+            prompt_embeddings=[prompt_embeddings[id(model)] for model in models],
         )
 
     # NOTE: We need to disable wip decorator here otherwise we get issues in
@@ -273,6 +476,9 @@ class PeftPromptTuning(ModuleBase):
             max_time=max_time,
             exponential_decay_length_penalty=exponential_decay_length_penalty,
             stop_sequences=stop_sequences,
+            continuous_batching_engine=self._continuous_batching_engine,
+            prefix_cache=self._get_prefix_cache(),
+            draft_model=self.draft_model,
         )
 
     @TokenizationTask.taskmethod()
@@ -574,6 +780,8 @@ class PeftPromptTuning(ModuleBase):
         model_path: str,
         torch_dtype: str = None,
         device: str = _DETECT_DEVICE,  # TODO: Union[int, str]
+        draft_model_path: Optional[str] = None,
+        quantization: Optional[str] = None,
     ) -> "PeftPromptTuning":
         """Load a PEFT prompt tuning model. This method will currently fail if the original
         model was not saved with the arg value save_base_model=True.
@@ -583,6 +791,13 @@ class PeftPromptTuning(ModuleBase):
                 Path to the model to be loaded.
             torch_dtype: str
                 Torch data type to be used when loading the model.
+            draft_model_path: Optional[str]
+                Path to a small causal model with the vocabulary of the base model,
+                used to speed up greedy generation with assisted decoding.
+            quantization: Optional[str]
+                Quantization of the base model for inference, "int8" or "bf16", or
+                "" for none. Default: None - means text_generation.quantization
+                from config
 
         Returns:
             PeftPromptTuning
@@ -597,16 +812,35 @@ class PeftPromptTuning(ModuleBase):
         if config.has_base_model:
             # TODO: Implement logic for resource loading
             device = cls._get_device(device)
+            quantization = get_quantization(quantization)
+            torch_dtype = get_quantization_dtype(quantization, torch_dtype, device)
             model_config = os.path.join(model_path, config.full_model_path)
             peft_config = PeftConfig.from_pretrained(model_config)
             if peft_config.task_type == "CAUSAL_LM":
                 # get the transformers Causal LM model
-                base_model = AutoModelForCausalLM.from_pretrained(
-                    peft_config.base_model_name_or_path
-                )
+                shared_base_models = str(
+                    get_config().get("text_generation", {}).get("shared_base_models")
+                ).lower() in ("true", "1")
+                if shared_base_models:
+                    # Only the prompt vectors are loaded for each model
+                    base_model = get_shared_base_model(
+                        peft_config.base_model_name_or_path,
+                        torch_dtype,
+                        device,
+                        quantization,
+                    )
+                else:
+                    base_model = AutoModelForCausalLM.from_pretrained(
+                        peft_config.base_model_name_or_path
+                    )
                 # get the PEFT causal LM model
                 model = PeftModel.from_pretrained(base_model, model_config)
-                cls.convert_peft_model_to_type(device, model, torch_dtype)
+                if quantization == "bf16" and torch_dtype == torch.bfloat16:
+                    # Supported on this device, see get_quantization_dtype
+                    model.to(device, torch_dtype)
+                else:
+                    cls.convert_peft_model_to_type(device, model, torch_dtype)
+                quantize_model(model.get_base_model(), quantization)
             else:
                 # TODO: Handle other model types
                 error(
@@ -625,6 +859,9 @@ class PeftPromptTuning(ModuleBase):
             PromptOutputModelType(output_type)
             for output_type in json.loads(config.output_model_types)
         ]
+        draft_model = None
+        if draft_model_path is not None:
+            draft_model = load_draft_model(draft_model_path, model)
 
         return cls(
             tokenizer=tokenizer,
@@ -635,6 +872,7 @@ class PeftPromptTuning(ModuleBase):
             task_type=config.task_type,
             tuning_type=TuningType(config.tuning_type),
             output_model_types=output_model_types,
+            draft_model=draft_model,
         )
 
     ################################## Public Functions ###########################################
@@ -895,6 +1133,32 @@ class PeftPromptTuning(ModuleBase):
 
     ################################## Private Functions ###########################################
 
+    def _get_prefix_cache(self) -> Optional[PrefixCache]:
+        """Get the KV cache of the virtual tokens and static verbalizer prefix, building
+        it on first use. None if the prefix cache is disabled or unsupported.
+
+        Returns:
+            Optional[PrefixCache]
+                Cache that causal generation continues from.
+        """
+        if not self._use_prefix_cache:
+            return None
+        with self._prefix_cache_lock:
+            if self._prefix_cache is None and self._use_prefix_cache:
+                try:
+                    self._prefix_cache = build_prefix_cache(
+                        self.model,
+                        self.tokenizer,
+                        get_static_prefix(self.verbalizer),
+                    )
+                except Exception as err:  # pylint: disable=broad-exception-caught
+                    log.warning(
+                        "<NLP62748391W>",
+                        f"Disabling the prefix cache, failed to build it: {err}",
+                    )
+                    self._use_prefix_cache = False
+            return self._prefix_cache
+
     @classmethod
     def _get_device(cls, device: Optional[Union[str, int]]) -> Union[str, int, None]:
         """Get the device which we expect to run our models on. Defaults to GPU
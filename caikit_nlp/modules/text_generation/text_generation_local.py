@@ -14,7 +14,7 @@
 
 
 # Standard
-from typing import Any, Dict, Optional, Union
+from typing import Any, Dict, List, Optional, Union
 import gc
 import json
 import os
@@ -43,10 +43,17 @@ from ...resources.pretrained_model import (
     PretrainedModelBase,
 )
 from ...toolkit.data_type_utils import get_torch_dtype, str_to_torch_dtype
+from ...toolkit.text_generation.assisted_decoding import DraftModel, load_draft_model
+from ...toolkit.text_generation.continuous_batching import (
+    continuous_batching_enabled,
+    create_continuous_batching_engine,
+)
 from ...toolkit.text_generation.model_run_utils import (
     GENERATE_FUNCTION_ARGS,
     generate_text_func,
+    generate_text_func_batch,
 )
+from ...toolkit.text_generation.quantization import get_quantization
 from ...toolkit.torch_run import get_torch_elastic_launch_config
 
 log = alog.use_channel("TXT_GEN")
@@ -100,10 +107,14 @@ class TextGeneration(ModuleBase):
         eos_token: Optional[str] = None,
         pad_token: Optional[str] = None,
         training_metadata: Union[Dict[str, Any], None] = None,
+        draft_model: Optional[DraftModel] = None,
     ):
         super().__init__()
 
         error.type_check("<NLP48137045E>", str, allow_none=True, eos_token=eos_token)
+        error.type_check(
+            "<NLP48137046E>", DraftModel, allow_none=True, draft_model=draft_model
+        )
         self.model = model
         self.model_name = model_name
 
@@ -114,9 +125,20 @@ class TextGeneration(ModuleBase):
         self.training_metadata = (
             training_metadata if training_metadata is not None else {}
         )
+        # Decodes concurrent runs together, if enabled in the config
+        self._continuous_batching_engine = None
+        # NOTE: checked first so that lazily loaded weights are not loaded here
+        if model is not None and continuous_batching_enabled():
+            self._continuous_batching_engine = create_continuous_batching_engine(
+                model.model, model.tokenizer
+            )
+        # Assists greedy runs, see draft_model.acceptance_rate
+        self.draft_model = draft_model
 
     # pylint: disable=duplicate-code
     def __del__(self):
+        if getattr(self, "_continuous_batching_engine", None) is not None:
+            self._continuous_batching_engine.shutdown()
         del self.model
         gc.collect()
         try:
@@ -125,7 +147,13 @@ class TextGeneration(ModuleBase):
             pass
 
     @classmethod
-    def bootstrap(cls, base_model_path: str, torch_dtype: str = "float32"):
+    def bootstrap(
+        cls,
+        base_model_path: str,
+        torch_dtype: str = "float32",
+        draft_model_path: Optional[str] = None,
+        quantization: Optional[str] = None,
+    ):
         """Function to bootstrap a pre-trained transformers model and
         get a caikit text-generation 'model'.
 
@@ -136,6 +164,14 @@ class TextGeneration(ModuleBase):
             torch_dtype: str
                 Torch data type to be used when loading the model.
                 Default: float32
+            draft_model_path: Optional[str]
+                Path to a small transformers model with the same vocabulary, used
+                to speed up greedy generation with assisted decoding.
+                Default: None - means no draft model
+            quantization: Optional[str]
+                Quantization of the model for inference, "int8" or "bf16", or ""
+                for none. Default: None - means text_generation.quantization
+                from config
         Returns:
             caikit_nlp.blocks.text_generation.TextGeneration
                 Object of TextGeneration class (model)
@@ -161,12 +197,17 @@ class TextGeneration(ModuleBase):
             base_model_path,
             tokenizer_name=base_model_path,
             torch_dtype=torch_dtype,
+            quantization=get_quantization(quantization),
         )
         eos_token = base_model._tokenizer.eos_token or None
+        draft_model = None
+        if draft_model_path is not None:
+            draft_model = load_draft_model(draft_model_path, base_model.model)
         return cls(
             base_model_path,
             base_model,
             eos_token=eos_token,
+            draft_model=draft_model,
         )
 
     @classmethod
@@ -345,7 +386,7 @@ class TextGeneration(ModuleBase):
                     # "default" behavior unless we want to optimize further. We will start with
                     # this generic approach, since it allows us to handle variety
                     # of models and iterate on it, based on what we encounter.
-                    "fsdp_transformer_layer_cls_to_wrap": base_model._model._no_split_modules
+                    "fsdp_transformer_layer_cls_to_wrap": base_model.model._no_split_modules
                 },
             }
 
@@ -449,6 +490,8 @@ class TextGeneration(ModuleBase):
         cls,
         model_path: str,
         torch_dtype: str = None,
+        draft_model_path: Optional[str] = None,
+        quantization: Optional[str] = None,
     ) -> "TextGeneration":
         """Function to load text-generation model
 
@@ -457,6 +500,13 @@ class TextGeneration(ModuleBase):
                 Path to the model to be loaded.
             torch_dtype: str
                 Torch data type to be used when loading the model.
+            draft_model_path: Optional[str]
+                Path to a small transformers model with the same vocabulary, used
+                to speed up greedy generation with assisted decoding.
+            quantization: Optional[str]
+                Quantization of the model for inference, "int8" or "bf16", or ""
+                for none. Default: None - means text_generation.quantization
+                from config
         Returns:
             TextGeneration
                 Instance of this class built from the on disk model.
@@ -474,7 +524,9 @@ class TextGeneration(ModuleBase):
 
         base_model_path = os.path.join(model_path, base_model_path)
         error.dir_check("<NLP01983374E>", base_model_path)
-        return cls.bootstrap(base_model_path, torch_dtype)
+        return cls.bootstrap(
+            base_model_path, torch_dtype, draft_model_path, quantization
+        )
 
     def save(self, model_path):
         """Save caikit model
@@ -574,6 +626,65 @@ class TextGeneration(ModuleBase):
             max_time=max_time,
             preserve_input_text=preserve_input_text,
             task_type=self.model.TASK_TYPE,
+            continuous_batching_engine=self._continuous_batching_engine,
+            draft_model=self.draft_model,
+            **kwargs,
+        )
+
+    def run_batch(
+        self,
+        text: List[str],
+        max_new_tokens: Optional[int] = 20,
+        min_new_tokens: Optional[int] = 0,
+        truncate_input_tokens: Optional[int] = 0,
+        decoding_method: Optional[str] = "GREEDY",
+        top_k: Optional[int] = None,
+        top_p: Optional[float] = None,
+        typical_p: Optional[float] = None,
+        temperature: Optional[float] = None,
+        repetition_penalty: Optional[float] = None,
+        max_time: Optional[float] = None,
+        preserve_input_text: bool = True,
+        batch_size: Optional[int] = None,
+        **kwargs,
+    ) -> List[GeneratedTextResult]:
+        f"""
+        Run the full text generation model on many texts, batching the generate calls.
+        Args:
+            text: List[str]
+                Input strings to be used to the generation model.
+            {GENERATE_FUNCTION_ARGS},
+            preserve_input_text: bool
+                Applicable only to Causal LLMs.
+                Whether or not the source string should be contained in the generated output,
+                e.g., as a prefix. Default True. (Source string will appear as prefix)
+            batch_size: Optional[int]
+                Number of texts per generate call. Default None - means all at once.
+        Returns:
+            List[GeneratedTextResult]
+                Generated text results produced by the model, in the given order.
+        """
+
+        return generate_text_func_batch(
+            # Pass HF model
+            self.model.model,
+            self.model.tokenizer,
+            self.PRODUCER_ID,
+            self._eos_token,
+            text,
+            max_new_tokens=max_new_tokens,
+            min_new_tokens=min_new_tokens,
+            truncate_input_tokens=truncate_input_tokens,
+            decoding_method=decoding_method,
+            top_k=top_k,
+            top_p=top_p,
+            typical_p=typical_p,
+            temperature=temperature,
+            repetition_penalty=repetition_penalty,
+            max_time=max_time,
+            preserve_input_text=preserve_input_text,
+            task_type=self.model.TASK_TYPE,
+            batch_size=batch_size,
             **kwargs,
         )
 
@@ -15,7 +15,7 @@
 
 # Standard
 from functools import cached_property
-from typing import Iterable, List, Optional, Tuple, Union
+from typing import AsyncIterator, Iterable, List, Optional, Tuple, Union
 import os
 
 # Third Party
@@ -42,9 +42,16 @@ from ...resources.pretrained_model import (
     HFAutoSeq2SeqLM,
     PretrainedModelBase,
 )
+from ...toolkit.text_generation.tgis_endpoint_pool import (
+    get_async_endpoint_pool,
+    get_endpoint_pool,
+    get_endpoints,
+)
 from ...toolkit.text_generation.tgis_utils import (
     GENERATE_FUNCTION_TGIS_ARGS,
+    AsyncTGISGenerationClient,
     TGISGenerationClient,
+    get_async_tgis_client,
 )
 from .text_generation_local import TextGeneration
 
@@ -106,6 +113,11 @@ class TextGenerationTGIS(ModuleBase):
     def _client(self):
         # Lazily configure/create the internal tgis backend client
         if self._tgis_backend:
+            if get_endpoints(self.model_name):
+                # Balance the calls over the endpoints configured for the model
+                return get_endpoint_pool(
+                    self.model_name, self._tgis_backend.get_connection(self.model_name)
+                )
             return self._tgis_backend.get_client(self.model_name)
 
     @cached_property
@@ -134,7 +146,8 @@ class TextGenerationTGIS(ModuleBase):
                 Object of TextGeneration class (model)
         """
 
-        text_generation_inst = TextGeneration.bootstrap(model_path)
+        # Only the tokenizer is used, TGIS serves the model
+        text_generation_inst = TextGeneration.bootstrap(model_path, quantization="")
         bos_token = text_generation_inst.model._tokenizer.bos_token
         sep_token = text_generation_inst.model._tokenizer.sep_token
         eos_token = text_generation_inst.model._tokenizer.eos_token or None
@@ -357,6 +370,222 @@ class TextGenerationTGIS(ModuleBase):
                 text=text,
             )
 
+    def run_tokenizer_batch(
+        self,
+        texts: List[str],
+        return_tokens: bool = False,
+        return_offsets: bool = False,
+        context: Optional[RuntimeServerContextType] = None,
+    ) -> List[TokenizationResults]:
+        """Run tokenization against the model running in TGIS for a list of texts
+
+        The texts are sent in batched TGIS tokenize calls, of up to
+        tgis_client.tokenize_max_batch_size texts each.
+
+        Args:
+            texts: List[str]
+                Texts to tokenize
+            return_tokens: bool
+                Default False
+                Setting to True also returns the tokens of each text
+            return_offsets: bool
+                Default False
+                Setting to True also returns the spans of the tokens in each text
+        Returns:
+            List[TokenizationResults]
+                The token count (and tokens) of each text, in the original order
+        """
+        self._register_model_connection_with_context(context)
+
+        if self._model_loaded:
+            return self.tgis_generation_client.batch_tokenize(
+                texts=texts, return_tokens=return_tokens, return_offsets=return_offsets
+            )
+
+    async def run_async(
+        self,
+        text: str,
+        max_new_tokens: Optional[int] = 20,
+        min_new_tokens: Optional[int] = 0,
+        truncate_input_tokens: Optional[int] = 0,
+        decoding_method: Optional[str] = "GREEDY",
+        top_k: Optional[int] = None,
+        top_p: Optional[float] = None,
+        typical_p: Optional[float] = None,
+        temperature: Optional[float] = None,
+        repetition_penalty: Optional[float] = None,
+        max_time: Optional[float] = None,
+        exponential_decay_length_penalty: Optional[
+            Union[Tuple[int, float], ExponentialDecayLengthPenalty]
+        ] = None,
+        stop_sequences: Optional[List[str]] = None,
+        seed: Optional[np.uint64] = None,
+        preserve_input_text: bool = False,
+        input_tokens: bool = False,
+        generated_tokens: bool = False,
+        token_logprobs: bool = False,
+        token_ranks: bool = False,
+        include_stop_sequence: Optional[bool] = None,
+        context: Optional[RuntimeServerContextType] = None,
+    ) -> GeneratedTextResult:
+        f"""Async variant of run for async servers, generating on a grpc.aio channel
+        so that the TGIS call doesn't hold a thread while in flight.
+
+        Args:
+           {GENERATE_FUNCTION_TGIS_ARGS}
+        Returns:
+            GeneratedTextResult
+                Generated text result produced by TGIS.
+        """
+        self._register_model_connection_with_context(context)
+
+        if self._model_loaded:
+            return await self._async_generation_client().unary_generate(
+                text=text,
+                preserve_input_text=preserve_input_text,
+                input_tokens=input_tokens,
+                generated_tokens=generated_tokens,
+                token_logprobs=token_logprobs,
+                token_ranks=token_ranks,
+                include_stop_sequence=include_stop_sequence,
+                max_new_tokens=max_new_tokens,
+                min_new_tokens=min_new_tokens,
+                truncate_input_tokens=truncate_input_tokens,
+                decoding_method=decoding_method,
+                top_k=top_k,
+                top_p=top_p,
+                typical_p=typical_p,
+                temperature=temperature,
+                seed=seed,
+                repetition_penalty=repetition_penalty,
+                max_time=max_time,
+                exponential_decay_length_penalty=exponential_decay_length_penalty,
+                stop_sequences=stop_sequences,
+            )
+
+    async def run_stream_out_async(
+        self,
+        text: str,
+        max_new_tokens: Optional[int] = 20,
+        min_new_tokens: Optional[int] = 0,
+        truncate_input_tokens: Optional[int] = 0,
+        decoding_method: Optional[str] = "GREEDY",
+        top_k: Optional[int] = None,
+        top_p: Optional[float] = None,
+        typical_p: Optional[float] = None,
+        temperature: Optional[float] = None,
+        repetition_penalty: Optional[float] = None,
+        max_time: Optional[float] = None,
+        exponential_decay_length_penalty: Optional[
+            Union[Tuple[int, float], ExponentialDecayLengthPenalty]
+        ] = None,
+        stop_sequences: Optional[List[str]] = None,
+        seed: Optional[np.uint64] = None,
+        preserve_input_text: bool = False,
+        input_tokens: bool = False,
+        generated_tokens: bool = False,
+        token_logprobs: bool = False,
+        token_ranks: bool = False,
+        include_stop_sequence: Optional[bool] = None,
+        context: Optional[RuntimeServerContextType] = None,
+    ) -> AsyncIterator[GeneratedTextStreamResult]:
+        f"""Async variant of run_stream_out for async servers, streaming from a
+        grpc.aio channel so that the TGIS stream doesn't hold a thread.
+
+        Args:
+            {GENERATE_FUNCTION_TGIS_ARGS}
+        Returns:
+            AsyncIterator[GeneratedTextStreamResult]
+        """
+        self._register_model_connection_with_context(context)
+
+        if self._model_loaded:
+            async for result in self._async_generation_client().stream_generate(
+                text=text,
+                preserve_input_text=preserve_input_text,
+                input_tokens=input_tokens,
+                generated_tokens=generated_tokens,
+                token_logprobs=token_logprobs,
+                token_ranks=token_ranks,
+                include_stop_sequence=include_stop_sequence,
+                max_new_tokens=max_new_tokens,
+                min_new_tokens=min_new_tokens,
+                truncate_input_tokens=truncate_input_tokens,
+                decoding_method=decoding_method,
+                top_k=top_k,
+                top_p=top_p,
+                typical_p=typical_p,
+                temperature=temperature,
+                seed=seed,
+                repetition_penalty=repetition_penalty,
+                max_time=max_time,
+                exponential_decay_length_penalty=exponential_decay_length_penalty,
+                stop_sequences=stop_sequences,
+            ):
+                yield result
+
+    async def run_tokenizer_async(
+        self,
+        text: str,
+        context: Optional[RuntimeServerContextType] = None,
+    ) -> TokenizationResults:
+        """Async variant of run_tokenizer for async servers
+
+        Args:
+           text: str
+                Text to tokenize
+        Returns:
+            TokenizationResults
+                The token count
+        """
+        self._register_model_connection_with_context(context)
+
+        if self._model_loaded:
+            return await self._async_generation_client().unary_tokenize(
+                text=text,
+            )
+
+    async def run_tokenizer_batch_async(
+        self,
+        texts: List[str],
+        return_tokens: bool = False,
+        return_offsets: bool = False,
+        context: Optional[RuntimeServerContextType] = None,
+    ) -> List[TokenizationResults]:
+        """Async variant of run_tokenizer_batch for async servers
+
+        Args:
+            texts: List[str]
+                Texts to tokenize
+            return_tokens: bool
+                Default False
+                Setting to True also returns the tokens of each text
+            return_offsets: bool
+                Default False
+                Setting to True also returns the spans of the tokens in each text
+        Returns:
+            List[TokenizationResults]
+                The token count (and tokens) of each text, in the original order
+        """
+        self._register_model_connection_with_context(context)
+
+        if self._model_loaded:
+            return await self._async_generation_client().batch_tokenize(
+                texts=texts, return_tokens=return_tokens, return_offsets=return_offsets
+            )
+
+    def _async_generation_client(self) -> AsyncTGISGenerationClient:
+        """Get a generation client on a grpc.aio channel of the running event loop"""
+        tgis_client = None
+        if self._tgis_backend and self._client is not None:
+            connection = self._tgis_backend.get_connection(self.model_name)
+            tgis_client = get_async_endpoint_pool(
+                self.model_name, connection
+            ) or get_async_tgis_client(connection)
+        return AsyncTGISGenerationClient(
+            self.model_name, self._eos_token, tgis_client, self.PRODUCER_ID
+        )
+
     def _register_model_connection_with_context(
         self, context: Optional[RuntimeServerContextType]
     ):
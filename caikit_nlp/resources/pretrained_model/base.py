@@ -18,10 +18,13 @@ from collections.abc import Mapping
 from typing import Callable, Dict, List, Optional, Tuple, Type, Union
 import json
 import os
+import threading
+import time
 
 # Third Party
 from torch.utils.data import IterableDataset
 from transformers import (
+    AutoConfig,
     AutoTokenizer,
     DataCollatorWithPadding,
     PreTrainedTokenizerBase,
@@ -41,6 +44,11 @@ import alog
 # Local
 from ...data_model import GenerationTrainRecord, PromptOutputModelType
 from ...toolkit.data_type_utils import get_torch_dtype, str_to_torch_dtype
+from ...toolkit.text_generation.quantization import (
+    get_quantization_dtype,
+    is_quantized,
+    quantize_model,
+)
 from ...toolkit.trainer_utils import log_step
 
 log = alog.use_channel("HFRBAS")
@@ -109,19 +117,39 @@ class PretrainedModelBase(ABC, ModuleBase):
         model: _BaseAutoModelClass,
         model_name: str,
         torch_dtype: torch.dtype,
+        model_loader: Optional[Callable[[], _BaseAutoModelClass]] = None,
     ):
-        """Initialize with an in-memory handle to a model"""
+        """Initialize with an in-memory handle to a model, or with a function
+        loading it on first access when model is None
+        """
         super().__init__()
+        error.value_check(
+            "<NLP12813467E>",
+            (model is None) != (model_loader is None),
+            "Exactly one of model and model_loader must be given",
+        )
         self._tokenizer = tokenizer
         self._model = model
+        self._model_loader = model_loader
+        self._model_lock = threading.Lock()
         self._model_name = model_name
         self._torch_dtype = torch_dtype
 
     @property
     def model(self) -> _BaseAutoModelClass:
-        """Get access to the underlying causal LM"""
+        """Get access to the underlying causal LM, loading it if needed"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = self._model_loader()
+                    self._model_loader = None
         return self._model
 
+    @property
+    def is_model_loaded(self) -> bool:
+        """Whether the weights of the underlying model are loaded"""
+        return self._model is not None
+
     @property
     def tokenizer(self) -> AutoTokenizer:
         """Get access to the underlying tokenizer"""
@@ -142,6 +170,9 @@ class PretrainedModelBase(ABC, ModuleBase):
         tokenizer_name: Optional[str] = None,
         padding_side: Optional[str] = None,
         torch_dtype: Optional[torch.dtype] = None,
+        device: Optional[Union[str, int]] = None,
+        lazy: Optional[bool] = None,
+        quantization: Optional[str] = None,
         **kwargs,
     ) -> "HFAutoSequenceClassifier":
         """Bootstrap from a huggingface model
@@ -165,6 +196,17 @@ class PretrainedModelBase(ABC, ModuleBase):
             torch_dtype: (Optional[Union[torch.dtype, str]])
                 Data type to load the model as; if no value is provided, we pull
                 torch_dtype from config.
+            device: (Optional[Union[str, int]])
+                Device to move the model to once loaded. Default None - means the
+                device from_pretrained loads it on.
+            lazy: (Optional[bool])
+                Defer loading the model weights to the first access of the model
+                property; if no value is provided, we pull model_loading.lazy from
+                config.
+            quantization: (Optional[str])
+                Quantization of the model for inference, "int8" or "bf16" (see
+                caikit_nlp.toolkit.text_generation.quantization). Default None -
+                means full precision.
             **kwargs
                 Additional keyword args to pass to from_pretrained
                 (e.g. return_dict=True)
@@ -174,7 +216,16 @@ class PretrainedModelBase(ABC, ModuleBase):
                 The loaded resource model
         """
 
-        torch_dtype = get_torch_dtype(torch_dtype)
+        torch_dtype = get_quantization_dtype(
+            quantization, get_torch_dtype(torch_dtype), device
+        )
+        if lazy is None:
+            # NOTE: env var overrides are strings
+            lazy_cfg = get_config().get("model_loading", {}).get("lazy", False)
+            lazy = str(lazy_cfg).lower() in ("true", "1")
+        # Seconds spent on each step of loading this model
+        load_times = {}
+        start = time.perf_counter()
 
         # Check if we passed the tokenizer directly; for now, we keep
         # the arg name tokenizer_name for compatibility reasons
@@ -216,25 +267,78 @@ class PretrainedModelBase(ABC, ModuleBase):
 
         if tokenizer.pad_token_id is None:
             tokenizer.pad_token_id = tokenizer.eos_token_id
+        load_times["tokenizer"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        # Config attributes in kwargs (e.g. return_dict) are set on the config,
+        # the other ones are passed on to the model
+        config, model_kwargs = AutoConfig.from_pretrained(
+            model_name,
+            local_files_only=not get_config().allow_downloads,
+            return_unused_kwargs=True,
+            **kwargs,
+        )
+        load_times["config"] = time.perf_counter() - start
+        # Weights loaded in the data type they are saved with stay memory mapped
+        # from the safetensors files, sharing their pages with any other process
+        # loading them. Converting them makes a private copy instead.
+        checkpoint_dtype = getattr(config, "torch_dtype", None)
+        if checkpoint_dtype is not None and checkpoint_dtype != torch_dtype:
+            log.info(
+                "<NLP12813472I>",
+                "Model {} weights are converted from {} to {}, so they are "
+                "not shared with other processes".format(
+                    model_name, checkpoint_dtype, torch_dtype
+                ),
+            )
 
-        with alog.ContextTimer(log.info, f"Model {model_name} loaded in "):
-            # Load the model
+        def load_model() -> _BaseAutoModelClass:
+            start = time.perf_counter()
             model = cls.MODEL_TYPE.from_pretrained(
                 model_name,
+                config=config,
                 local_files_only=not get_config().allow_downloads,
                 torch_dtype=torch_dtype,
-                **kwargs,
+                **model_kwargs,
             )
-        log.debug4("Model Details: %s", model)
+            load_times["weights"] = time.perf_counter() - start
+            start = time.perf_counter()
+            if device is not None:
+                model.to(device)
+            load_times["device_move"] = time.perf_counter() - start
+            start = time.perf_counter()
+            quantize_model(model, quantization)
+            load_times["quantization"] = time.perf_counter() - start
+            log.info(
+                "<NLP12813473I>",
+                "Model {} loaded in {:.3f}s (tokenizer {:.3f}s, config {:.3f}s, "
+                "weights {:.3f}s, device move {:.3f}s, quantization {:.3f}s)".format(
+                    model_name, sum(load_times.values()), *load_times.values()
+                ),
+            )
+            log.debug4("Model Details: %s", model)
+            return model
 
         # Create the class instance
         inst_model_name = os.path.split(model_name)[-1]
-        return cls(
-            tokenizer=tokenizer,
-            model=model,
-            model_name=inst_model_name,
-            torch_dtype=torch_dtype,
-        )
+        if lazy:
+            log.debug("Deferring loading model [%s] to its first use", model_name)
+            inst = cls(
+                tokenizer=tokenizer,
+                model=None,
+                model_name=inst_model_name,
+                torch_dtype=torch_dtype,
+                model_loader=load_model,
+            )
+        else:
+            inst = cls(
+                tokenizer=tokenizer,
+                model=load_model(),
+                model_name=inst_model_name,
+                torch_dtype=torch_dtype,
+            )
+        inst.load_times = load_times
+        return inst
 
     @classmethod
     def load(cls, model_path: str) -> Type["PretrainedModelBase"]:
@@ -259,6 +363,12 @@ class PretrainedModelBase(ABC, ModuleBase):
         self, model_path: str, tokenizer_dirname: str = "", base_model_dirname: str = ""
     ):
         """Save the in-memory model to the given path"""
+        error.value_check(
+            "<NLP12813474E>",
+            not is_quantized(self.model),
+            "Model {} is quantized and can't be saved",
+            self._model_name,
+        )
         saver = ModuleSaver(
             self,
             model_path=model_path,
@@ -309,7 +419,7 @@ class PretrainedModelBase(ABC, ModuleBase):
             "eval_dataset": eval_dataset,
         }
 
-        return LoggingTrainer(self._model, training_args, **trainer_arguments)
+        return LoggingTrainer(self.model, training_args, **trainer_arguments)
 
     def _get_data_collator(self, **kwargs):
         """Function to return appropriate data collator based on resource.
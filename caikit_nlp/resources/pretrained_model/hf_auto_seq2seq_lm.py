@@ -131,7 +131,7 @@ class HFAutoSeq2SeqLM(PretrainedModelBase):
             # "generation_max_length": max_target_length,
         }
 
-        return LoggingTrainer(self._model, training_args, **trainer_arguments)
+        return LoggingTrainer(self.model, training_args, **trainer_arguments)
 
     def _get_data_collator(self, **kwargs):
         """Function to return appropriate data collator based on resource.
@@ -151,7 +151,7 @@ class HFAutoSeq2SeqLM(PretrainedModelBase):
         collator_kwargs = {key: kwargs[key] for key in applicable_args if key in kwargs}
 
         return DataCollatorForSeq2Seq(
-            tokenizer=self._tokenizer, model=self._model, **collator_kwargs
+            tokenizer=self._tokenizer, model=self.model, **collator_kwargs
         )
 
     @classmethod
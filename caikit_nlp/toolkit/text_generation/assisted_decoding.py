@@ -0,0 +1,184 @@
+# Copyright The Caikit Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Assisted (speculative) decoding of local models with a small draft model.
+
+The draft model proposes the next tokens and the target model checks all of them
+in one forward pass, keeping the longest prefix it agrees with plus one token of
+its own. Greedy outputs are unchanged, only fewer target forward passes run.
+"""
+
+# Standard
+from typing import Optional, Union
+import threading
+
+# Third Party
+from peft.peft_model import PeftModel
+from transformers import (
+    AutoConfig,
+    AutoModelForCausalLM,
+    AutoModelForSeq2SeqLM,
+    PreTrainedModel,
+)
+import torch
+
+# First Party
+from caikit.core.exceptions import error_handler
+import alog
+
+log = alog.use_channel("ASSISTED_DECODING")
+error = error_handler.get(log)
+
+
+class DraftModel:
+    """Small model proposing tokens to a larger target model sharing its
+    vocabulary, with the count of its proposed and accepted tokens.
+    """
+
+    def __init__(self, model: PreTrainedModel):
+        self.model = model
+        self.proposed_tokens = 0
+        self.accepted_tokens = 0
+        self._lock = threading.Lock()
+
+    @property
+    def acceptance_rate(self) -> Optional[float]:
+        """Fraction of the proposed tokens kept by the target model, or None if
+        no token was proposed yet
+        """
+        with self._lock:
+            if not self.proposed_tokens:
+                return None
+            return self.accepted_tokens / self.proposed_tokens
+
+    def supports(self, model: PreTrainedModel, generate_kwargs: dict) -> bool:
+        """Whether the generate() call of model can be assisted by the draft model.
+
+        Only greedy search of a single sequence is assisted. The PeftModel
+        generate() passes its own arguments on to the draft model, so prompt
+        tuned models are only assisted when they continue from their prefix cache
+        on the base model.
+        """
+        reason = None
+        if generate_kwargs.get("do_sample"):
+            reason = "sampling"
+        elif generate_kwargs["input_ids"].shape[0] != 1:
+            reason = "batch of more than one sequence"
+        elif isinstance(model, PeftModel):
+            reason = "PEFT model generate"
+        elif "inputs_embeds" in generate_kwargs:
+            # The draft model would get the target model's input embeddings
+            reason = "prompt embeddings"
+        if reason is not None:
+            log.debug("Generating without the draft model: %s", reason)
+            return False
+        return True
+
+    def generate(self, model: PreTrainedModel, **generate_kwargs) -> torch.Tensor:
+        """Run model.generate() assisted by the draft model, or without it when the
+        call is not supported.
+
+        Each draft forward pass proposes one token and each target forward pass
+        checks the proposed tokens then adds one, so the difference between the
+        new tokens and the target passes is the number of accepted tokens.
+        """
+        if not self.supports(model, generate_kwargs):
+            return model.generate(**generate_kwargs)
+
+        # NOTE: hooks see the forward passes of every thread using the models
+        thread_id = threading.get_ident()
+        forward_counts = {"target": 0, "draft": 0}
+
+        def count_forward(name):
+            def hook(*_):
+                if threading.get_ident() == thread_id:
+                    forward_counts[name] += 1
+
+            return hook
+
+        handles = [
+            model.register_forward_hook(count_forward("target")),
+            self.model.register_forward_hook(count_forward("draft")),
+        ]
+        try:
+            generate_ids = model.generate(assistant_model=self.model, **generate_kwargs)
+        finally:
+            for handle in handles:
+                handle.remove()
+
+        if model.config.is_encoder_decoder:
+            new_tokens = generate_ids.shape[1] - 1
+        else:
+            new_tokens = generate_ids.shape[1] - generate_kwargs["input_ids"].shape[1]
+        accepted = max(new_tokens - forward_counts["target"], 0)
+        log.debug(
+            "Draft model tokens accepted: %d of %d",
+            accepted,
+            forward_counts["draft"],
+        )
+        with self._lock:
+            self.proposed_tokens += forward_counts["draft"]
+            self.accepted_tokens += accepted
+        return generate_ids
+
+
+def load_draft_model(
+    draft_model_path: str,
+    target_model: Union[PeftModel, PreTrainedModel],
+    torch_dtype: Optional[torch.dtype] = None,
+) -> DraftModel:
+    """Load the draft model of a target model, on the same device.
+
+    Args:
+        draft_model_path: str
+            Path or name of the transformers draft model
+        target_model: PeftModel or transformers.PreTrainedModel
+            Model whose generation is assisted
+        torch_dtype: torch.dtype or None
+            Torch data type to load the draft model with. Default None - means
+            the data type of the target model
+    Returns:
+        DraftModel
+    """
+    error.type_check("<NLP27193804E>", str, draft_model_path=draft_model_path)
+    if isinstance(target_model, PeftModel):
+        target_model = target_model.get_base_model()
+
+    draft_config = AutoConfig.from_pretrained(draft_model_path)
+    error.value_check(
+        "<NLP27193805E>",
+        draft_config.is_encoder_decoder == target_model.config.is_encoder_decoder,
+        "Draft model {} and target model architectures differ",
+        draft_model_path,
+    )
+    error.value_check(
+        "<NLP27193806E>",
+        draft_config.vocab_size == target_model.config.vocab_size,
+        "Draft model vocabulary size {} differs from the target model's {}",
+        draft_config.vocab_size,
+        target_model.config.vocab_size,
+    )
+
+    model_class = (
+        AutoModelForSeq2SeqLM
+        if draft_config.is_encoder_decoder
+        else AutoModelForCausalLM
+    )
+    log.debug("Loading draft model [%s]", draft_model_path)
+    model = model_class.from_pretrained(
+        draft_model_path, torch_dtype=torch_dtype or target_model.dtype
+    )
+    model.to(target_model.device)
+    model.eval()
+    return DraftModel(model)
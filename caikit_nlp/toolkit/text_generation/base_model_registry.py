@@ -0,0 +1,93 @@
+# Copyright The Caikit Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Registry of base models shared by the prompt tuned models loaded over them.
+
+A prompt tuned model only adds its virtual token embeddings to the base model, so
+all the ones tuned from the same base model can use a single copy of it. A base
+model stays loaded as long as a model still references it.
+"""
+
+# Standard
+from typing import Optional, Tuple, Union
+import os
+import threading
+import weakref
+
+# Third Party
+from transformers import AutoModelForCausalLM, PreTrainedModel
+import torch
+
+# First Party
+import alog
+
+# Local
+from .quantization import quantize_model
+
+log = alog.use_channel("BASE_MODEL_REGISTRY")
+
+# Model name, data type, device and quantization of each base model
+_BaseModelKey = Tuple[str, str, str, Optional[str]]
+_BASE_MODELS: "weakref.WeakValueDictionary[_BaseModelKey, PreTrainedModel]" = (
+    weakref.WeakValueDictionary()
+)
+_BASE_MODELS_LOCK = threading.Lock()
+
+
+def get_shared_base_model(
+    model_name: str,
+    torch_dtype: Optional[torch.dtype] = None,
+    device: Optional[Union[str, int]] = None,
+    quantization: Optional[str] = None,
+) -> PreTrainedModel:
+    """Get the causal base model loaded from model_name with the given data type
+    and quantization on the given device, loading it on first use.
+
+    Args:
+        model_name: str
+            Name or path of the transformers causal model
+        torch_dtype: torch.dtype or None
+            Torch data type of the model. Default None - means the default of
+            from_pretrained
+        device: str or int or None
+            Device of the model. Default None - means cpu
+        quantization: str or None
+            Quantization from get_quantization. Default None - means none
+    Returns:
+        transformers.PreTrainedModel
+            The shared model, in evaluation mode
+    """
+    if os.path.isdir(model_name):
+        model_name = os.path.realpath(model_name)
+    key = (model_name, str(torch_dtype), str(device), quantization)
+    with _BASE_MODELS_LOCK:
+        model = _BASE_MODELS.get(key)
+        if model is None:
+            log.debug("Loading shared base model [%s]", model_name)
+            with alog.ContextTimer(log.debug, "Done loading shared base model in: "):
+                model = AutoModelForCausalLM.from_pretrained(
+                    model_name, torch_dtype=torch_dtype
+                )
+                if device is not None:
+                    model.to(device)
+                quantize_model(model, quantization)
+                model.eval()
+            model.is_shared_base_model = True
+            _BASE_MODELS[key] = model
+        return model
+
+
+def is_shared_base_model(model: PreTrainedModel) -> bool:
+    """Whether the model was loaded by get_shared_base_model"""
+    return getattr(model, "is_shared_base_model", False)
@@ -0,0 +1,513 @@
+# Copyright The Caikit Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Continuous (iteration-level) batching of local generation for decoder-only models.
+
+Concurrent requests share one decode loop on a worker thread. Each sequence keeps
+its own KV cache. Between decode steps, new requests are prefilled and admitted
+into the running batch, and finished sequences are retired, so a request never
+waits for the whole batch to finish.
+"""
+
+# Standard
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+import inspect
+import threading
+import time
+
+# Third Party
+from transformers import (
+    AutoTokenizer,
+    DynamicCache,
+    ExponentialDecayLengthPenalty,
+    LogitsProcessorList,
+    MinNewTokensLengthLogitsProcessor,
+    PreTrainedModel,
+    RepetitionPenaltyLogitsProcessor,
+    TemperatureLogitsWarper,
+    TopKLogitsWarper,
+    TopPLogitsWarper,
+    TypicalLogitsWarper,
+)
+import torch
+import torch.nn.functional as F
+
+# First Party
+from caikit import get_config
+from caikit.core.exceptions import error_handler
+from caikit.interfaces.nlp.data_model import FinishReason
+import alog
+
+# Local
+from .generation_metrics import GenerationTimer
+from .model_run_utils import (
+    StopSequenceAutomaton,
+    StopSequenceCriteria,
+    TokenIteratorStreamer,
+)
+
+log = alog.use_channel("CONT_BATCH")
+error = error_handler.get(log)
+
+
+def continuous_batching_enabled() -> bool:
+    """Whether continuous batching is enabled in the config"""
+    generation_cfg = get_config().get("text_generation", {})
+    # NOTE: env var overrides are strings
+    enabled = str(generation_cfg.get("continuous_batching", False)).lower()
+    return enabled in ("true", "1")
+
+
+def create_continuous_batching_engine(
+    model: PreTrainedModel, tokenizer: AutoTokenizer
+) -> Optional["ContinuousBatchingEngine"]:
+    """Create an engine for a decoder-only model if continuous batching is enabled"""
+    if not continuous_batching_enabled():
+        return None
+    if model.config.is_encoder_decoder:
+        log.warning(
+            "<NLP38910278W>",
+            "Continuous batching is not supported for encoder-decoder models",
+        )
+        return None
+    generation_cfg = get_config().get("text_generation", {})
+    return ContinuousBatchingEngine(
+        model, tokenizer, max_batch_size=generation_cfg.get("max_batch_size", 8)
+    )
+
+
+# generate() kwargs that the engine supports (see __process_gen_args)
+SUPPORTED_GENERATE_KWARGS = {
+    "max_new_tokens",
+    "min_new_tokens",
+    "repetition_penalty",
+    "use_cache",
+    "max_time",
+    "exponential_decay_length_penalty",
+    "do_sample",
+    "top_k",
+    "top_p",
+    "typical_p",
+    "temperature",
+    "seed",
+    "stopping_criteria",
+}
+
+
+class GenerationRequest:
+    """A request being served by the engine.
+
+    The generated tokens are fed to streamer as they are produced. Use result() to
+    wait for the generated ids and the finish reason, or cancel() to stop early.
+    """
+
+    def __init__(
+        self,
+        input_ids: torch.Tensor,
+        prefix_embeddings: Optional[torch.Tensor],
+        streamer: TokenIteratorStreamer,
+        logits_processor: LogitsProcessorList,
+        max_new_tokens: int,
+        do_sample: bool,
+        generator: Optional[torch.Generator],
+        stop_automaton: Optional[StopSequenceAutomaton],
+        deadline: Optional[float],
+        timer: Optional[GenerationTimer] = None,
+    ):
+        self.input_ids = input_ids
+        self.prefix_embeddings = prefix_embeddings
+        self.streamer = streamer
+        self.logits_processor = logits_processor
+        self.max_new_tokens = max_new_tokens
+        self.do_sample = do_sample
+        self.generator = generator
+        self.stop_automaton = stop_automaton
+        self.stop_state = 0
+        self.deadline = deadline
+        self.timer = timer
+
+        self.generated_ids: List[int] = []
+        self.finish_reason: Optional[FinishReason] = None
+        self.error: Optional[BaseException] = None
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+
+        # Per-sequence KV cache (one key and value tensor per layer) and its length
+        self.cache: Optional[List[Tuple[torch.Tensor, torch.Tensor]]] = None
+        self.cache_length = 0
+
+    def cancel(self):
+        """Stop generating for this request (retired before the next step)"""
+        self.cancelled.set()
+
+    def result(self, timeout: Optional[float] = None) -> Tuple[List[int], FinishReason]:
+        """Wait for the generated token ids and the finish reason"""
+        if not self.done.wait(timeout):
+            raise TimeoutError("Generation request did not finish in time")
+        if self.error is not None:
+            raise self.error
+        return self.generated_ids, self.finish_reason
+
+    def _finish(self, finish_reason: FinishReason, err: Optional[BaseException] = None):
+        self.finish_reason = finish_reason
+        self.error = err
+        self.cache = None
+        self.streamer.end(err)
+        self.done.set()
+
+
+class ContinuousBatchingEngine:
+    """Serve concurrent generation requests of a decoder-only model from one loop.
+
+    Each decode step runs the last token of every running sequence through the
+    model together. The per-sequence caches are left padded to the longest one and
+    masked, so sequences of any length (and any step) share the batch.
+    """
+
+    def __init__(
+        self,
+        model: PreTrainedModel,
+        tokenizer: AutoTokenizer,
+        max_batch_size: int = 8,
+    ):
+        error.type_check("<NLP38910271E>", int, max_batch_size=max_batch_size)
+        error.value_check(
+            "<NLP38910272E>",
+            max_batch_size > 0,
+            "max_batch_size must be greater than 0",
+        )
+        error.value_check(
+            "<NLP38910273E>",
+            not model.config.is_encoder_decoder,
+            "Continuous batching only supports decoder-only models",
+        )
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_batch_size = max_batch_size
+        self._accepts_position_ids = (
+            "position_ids" in inspect.signature(model.forward).parameters
+        )
+
+        self._pending: Deque[GenerationRequest] = deque()
+        self._running: List[GenerationRequest] = []
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+        # Decode step statistics, e.g. for the mean batch size
+        self.steps = 0
+        self.step_sequences = 0
+
+    ## Public ##################################################################
+
+    def submit(
+        self,
+        input_ids: torch.Tensor,
+        prefix_embeddings: Optional[torch.Tensor] = None,
+        timer: Optional[GenerationTimer] = None,
+        **generate_kwargs,
+    ) -> GenerationRequest:
+        """Queue a request, with the same generation kwargs as model.generate().
+
+        Args:
+            input_ids: torch.Tensor
+                Prompt token ids of shape (1, length)
+            prefix_embeddings: Optional[torch.Tensor]
+                Embeddings of shape (1, n, hidden) put before the prompt, e.g. the
+                virtual tokens of prompt tuning
+            timer: Optional[GenerationTimer]
+                Timer of the request, given its prefill start and token times
+            generate_kwargs: dict
+                Generation parameters (see SUPPORTED_GENERATE_KWARGS)
+        Returns:
+            GenerationRequest
+        """
+        unsupported = set(generate_kwargs) - SUPPORTED_GENERATE_KWARGS
+        error.value_check(
+            "<NLP38910274E>",
+            not unsupported,
+            f"Unsupported generation parameters for continuous batching: {unsupported}",
+        )
+        error.value_check(
+            "<NLP38910275E>",
+            input_ids.dim() == 2 and input_ids.shape[0] == 1,
+            "Continuous batching takes one prompt per request",
+        )
+
+        request = self._build_request(
+            input_ids, prefix_embeddings, generate_kwargs, timer
+        )
+        with self._condition:
+            error.value_check(
+                "<NLP38910276E>", not self._stopped, "The engine has been shut down"
+            )
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._loop, name="continuous-batching", daemon=True
+                )
+                self._thread.start()
+            self._pending.append(request)
+            self._condition.notify()
+        return request
+
+    def shutdown(self):
+        """Stop the decode loop, cancelling the queued and running requests"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    ## Implementation ##########################################################
+
+    def _build_request(
+        self,
+        input_ids: torch.Tensor,
+        prefix_embeddings: Optional[torch.Tensor],
+        generate_kwargs: Dict,
+        timer: Optional[GenerationTimer] = None,
+    ) -> GenerationRequest:
+        eos_token_id = self.tokenizer.eos_token_id
+        prompt_length = input_ids.shape[1]
+        max_new_tokens = generate_kwargs.get("max_new_tokens") or 20
+
+        processors = LogitsProcessorList()
+        repetition_penalty = generate_kwargs.get("repetition_penalty")
+        if repetition_penalty is not None and repetition_penalty != 1.0:
+            processors.append(RepetitionPenaltyLogitsProcessor(repetition_penalty))
+        decay_penalty = generate_kwargs.get("exponential_decay_length_penalty")
+        if decay_penalty is not None:
+            processors.append(
+                ExponentialDecayLengthPenalty(
+                    decay_penalty, eos_token_id, prompt_length
+                )
+            )
+        min_new_tokens = generate_kwargs.get("min_new_tokens") or 0
+        if min_new_tokens > 0 and eos_token_id is not None:
+            processors.append(
+                MinNewTokensLengthLogitsProcessor(
+                    prompt_length, min_new_tokens, eos_token_id
+                )
+            )
+
+        do_sample = bool(generate_kwargs.get("do_sample"))
+        generator = None
+        if do_sample:
+            temperature = generate_kwargs.get("temperature")
+            if temperature is not None and temperature > 0 and temperature != 1.0:
+                processors.append(TemperatureLogitsWarper(temperature))
+            top_k = generate_kwargs.get("top_k")
+            if top_k is not None and top_k > 0:
+                processors.append(TopKLogitsWarper(top_k))
+            top_p = generate_kwargs.get("top_p")
+            if top_p is not None and 0 < top_p < 1:
+                processors.append(TopPLogitsWarper(top_p))
+            typical_p = generate_kwargs.get("typical_p")
+            if typical_p is not None and 0 < typical_p < 1:
+                processors.append(TypicalLogitsWarper(typical_p))
+            seed = generate_kwargs.get("seed")
+            if seed is not None:
+                generator = torch.Generator(device=self.model.device)
+                generator.manual_seed(int(seed))
+
+        # The stop sequences are matched with a state per request
+        stop_automaton = None
+        stopping_criteria = generate_kwargs.get("stopping_criteria")
+        if isinstance(stopping_criteria, StopSequenceCriteria):
+            stop_automaton = stopping_criteria.automaton
+
+        max_time = generate_kwargs.get("max_time")
+        deadline = time.monotonic() + max_time if max_time else None
+
+        streamer = TokenIteratorStreamer(self.tokenizer, timer)
+        streamer.put(input_ids)  # the prompt
+        return GenerationRequest(
+            input_ids=input_ids.to(self.model.device),
+            prefix_embeddings=prefix_embeddings,
+            streamer=streamer,
+            logits_processor=processors,
+            max_new_tokens=max_new_tokens,
+            do_sample=do_sample,
+            generator=generator,
+            stop_automaton=stop_automaton,
+            deadline=deadline,
+            timer=timer,
+        )
+
+    def _loop(self):
+        while True:
+            with self._condition:
+                while not self._stopped and not self._pending and not self._running:
+                    self._condition.wait()
+                if self._stopped:
+                    break
+                # Admit new requests between decode steps
+                admitted = []
+                while self._pending and (
+                    len(self._running) + len(admitted) < self.max_batch_size
+                ):
+                    admitted.append(self._pending.popleft())
+
+            try:
+                with torch.no_grad():
+                    for request in admitted:
+                        self._prefill(request)
+                    self._running = [r for r in self._running if not r.done.is_set()]
+                    if self._running:
+                        self._decode_step()
+                    self._running = [r for r in self._running if not r.done.is_set()]
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                log.error("<NLP38910277E>", f"Continuous batching step failed: {err}")
+                for request in self._running + admitted:
+                    if not request.done.is_set():
+                        request._finish(FinishReason.ERROR, err)
+                self._running = []
+
+        with self._condition:
+            for request in list(self._pending) + self._running:
+                if not request.done.is_set():
+                    request._finish(FinishReason.CANCELLED)
+            self._pending.clear()
+            self._running = []
+
+    def _prefill(self, request: GenerationRequest):
+        """Run the prompt of a new request alone, giving its cache and first token"""
+        if request.cancelled.is_set():
+            request._finish(FinishReason.CANCELLED)
+            return
+        if request.timer is not None:
+            request.timer.prefill_started()
+
+        inputs = {}
+        if request.prefix_embeddings is not None:
+            prompt_embeddings = self.model.get_input_embeddings()(request.input_ids)
+            inputs["inputs_embeds"] = torch.cat(
+                [
+                    request.prefix_embeddings.to(prompt_embeddings.dtype),
+                    prompt_embeddings,
+                ],
+                dim=1,
+            )
+            length = inputs["inputs_embeds"].shape[1]
+        else:
+            inputs["input_ids"] = request.input_ids
+            length = request.input_ids.shape[1]
+        inputs["attention_mask"] = torch.ones(
+            1, length, dtype=torch.long, device=self.model.device
+        )
+
+        outputs = self.model(**inputs, past_key_values=DynamicCache(), use_cache=True)
+        request.cache = [
+            (keys, values) for keys, values in outputs.past_key_values.to_legacy_cache()
+        ]
+        request.cache_length = length
+        self._running.append(request)
+        self._add_token(request, outputs.logits[:, -1, :])
+
+    def _decode_step(self):
+        """Run the last token of every running sequence through the model together"""
+        batch = self._running
+        max_length = max(r.cache_length for r in batch)
+
+        layers = []
+        for layer in range(len(batch[0].cache)):
+            keys = torch.cat(
+                [
+                    F.pad(r.cache[layer][0], (0, 0, max_length - r.cache_length, 0))
+                    for r in batch
+                ]
+            )
+            values = torch.cat(
+                [
+                    F.pad(r.cache[layer][1], (0, 0, max_length - r.cache_length, 0))
+                    for r in batch
+                ]
+            )
+            layers.append((keys, values))
+
+        # Left padding is masked; the new token attends to the real positions only
+        attention_mask = torch.zeros(
+            len(batch), max_length + 1, dtype=torch.long, device=self.model.device
+        )
+        for row, request in enumerate(batch):
+            attention_mask[row, max_length - request.cache_length :] = 1
+        inputs = {
+            "input_ids": torch.tensor(
+                [[r.generated_ids[-1]] for r in batch], device=self.model.device
+            ),
+            "attention_mask": attention_mask,
+        }
+        if self._accepts_position_ids:
+            inputs["position_ids"] = torch.tensor(
+                [[r.cache_length] for r in batch], device=self.model.device
+            )
+
+        outputs = self.model(
+            **inputs,
+            past_key_values=DynamicCache.from_legacy_cache(tuple(layers)),
+            use_cache=True,
+        )
+        self.steps += 1
+        self.step_sequences += len(batch)
+
+        new_layers = outputs.past_key_values.to_legacy_cache()
+        for row, request in enumerate(batch):
+            start = max_length - request.cache_length
+            request.cache = [
+                (keys[row : row + 1, :, start:], values[row : row + 1, :, start:])
+                for keys, values in new_layers
+            ]
+            request.cache_length += 1
+            self._add_token(request, outputs.logits[row : row + 1, -1, :])
+
+    def _add_token(self, request: GenerationRequest, logits: torch.Tensor):
+        """Pick the next token of a request from its logits and check if it is done"""
+        all_ids = torch.cat(
+            [
+                request.input_ids,
+                torch.tensor(
+                    [request.generated_ids], dtype=torch.long, device=logits.device
+                ).reshape(1, -1),
+            ],
+            dim=1,
+        )
+        scores = request.logits_processor(all_ids, logits.float())
+        if request.do_sample:
+            probs = torch.softmax(scores, dim=-1)
+            token_id = int(
+                torch.multinomial(probs, 1, generator=request.generator).item()
+            )
+        else:
+            token_id = int(torch.argmax(scores, dim=-1).item())
+
+        request.generated_ids.append(token_id)
+        request.streamer.put(torch.tensor([token_id]))
+        stop_matched = False
+        if request.stop_automaton is not None:
+            request.stop_state = request.stop_automaton.step(
+                request.stop_state, token_id
+            )
+            stop_matched = request.stop_automaton.is_match(request.stop_state)
+
+        if token_id == self.tokenizer.eos_token_id:
+            request._finish(FinishReason.EOS_TOKEN)
+        elif stop_matched:
+            request._finish(FinishReason.STOP_SEQUENCE)
+        elif len(request.generated_ids) >= request.max_new_tokens:
+            request._finish(FinishReason.MAX_TOKENS)
+        elif request.deadline is not None and time.monotonic() >= request.deadline:
+            request._finish(FinishReason.TIME_LIMIT)
+        elif request.cancelled.is_set():
+            request._finish(FinishReason.CANCELLED)
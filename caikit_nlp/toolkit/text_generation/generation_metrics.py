@@ -0,0 +1,168 @@
+# Copyright The Caikit Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Per-request latency metrics of text generation.
+
+Each local or TGIS generation request times its steps with a GenerationTimer and
+passes the resulting GenerationMetrics to every hook added with
+add_generation_metrics_hook, e.g. to export them to a metrics system:
+
+    add_generation_metrics_hook(
+        lambda metrics: TTFT_HISTOGRAM.observe(metrics.time_to_first_token)
+    )
+
+The timer is only used while at least one hook is added.
+"""
+
+# Standard
+from typing import Callable, List, NamedTuple, Optional
+import threading
+import time
+
+# First Party
+import alog
+
+log = alog.use_channel("GEN_METRICS")
+
+_HOOKS: List[Callable[["GenerationMetrics"], None]] = []
+_HOOKS_LOCK = threading.Lock()
+
+
+class GenerationMetrics(NamedTuple):
+    """Latencies of one generation request, in seconds.
+
+    Steps that a source can't observe are None, e.g. TGIS does not report its
+    queue wait, tokenization or prefill times.
+    """
+
+    # "local" or "tgis"
+    source: str
+    input_token_count: Optional[int]
+    generated_tokens: int
+    # Waiting for a free slot, e.g. in the continuous batching engine
+    queue_wait: Optional[float]
+    tokenization: Optional[float]
+    # Running the prompt through the model, up to its first token
+    prefill: Optional[float]
+    # From the start of the request to its first generated token
+    time_to_first_token: Optional[float]
+    # Between consecutive generated tokens (0 for tokens received together)
+    inter_token_latencies: List[float]
+    # From the first to the last generated token
+    decode: Optional[float]
+    total: float
+
+    @property
+    def tokens_per_second(self) -> float:
+        """Generated tokens per second over the whole request"""
+        return self.generated_tokens / self.total if self.total > 0 else 0.0
+
+    def inter_token_latency(self, percentile: float) -> Optional[float]:
+        """Inter-token latency at the given percentile (0 to 100), or None with
+        fewer than two generated tokens
+        """
+        if not self.inter_token_latencies:
+            return None
+        latencies = sorted(self.inter_token_latencies)
+        index = round(percentile / 100 * (len(latencies) - 1))
+        return latencies[min(max(index, 0), len(latencies) - 1)]
+
+
+def add_generation_metrics_hook(hook: Callable[[GenerationMetrics], None]):
+    """Call hook with the metrics of every generation request once it is done.
+
+    Hooks run on the thread serving the request, so they should be quick.
+    """
+    with _HOOKS_LOCK:
+        _HOOKS.append(hook)
+
+
+def remove_generation_metrics_hook(hook: Callable[[GenerationMetrics], None]):
+    """Stop calling a hook added with add_generation_metrics_hook"""
+    with _HOOKS_LOCK:
+        _HOOKS.remove(hook)
+
+
+def generation_metrics_enabled() -> bool:
+    """Whether any generation metrics hook is added"""
+    return bool(_HOOKS)
+
+
+class GenerationTimer:
+    """Records the times of the steps of one generation request.
+
+    The request starts when the timer is created. All times come from
+    time.perf_counter(), so they can be recorded from any thread.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.start = time.perf_counter()
+        self.tokenized_time: Optional[float] = None
+        self.prefill_time: Optional[float] = None
+        self.token_times: List[float] = []
+
+    def tokenized(self):
+        """Mark the end of the tokenization of the input"""
+        self.tokenized_time = time.perf_counter()
+
+    def prefill_started(self):
+        """Mark the start of the prefill, after any queue wait"""
+        self.prefill_time = time.perf_counter()
+
+    def add_tokens(self, count: int = 1):
+        """Mark the generation of count tokens"""
+        now = time.perf_counter()
+        self.token_times.extend([now] * count)
+
+    def finish(
+        self, generated_tokens: int, input_token_count: Optional[int] = None
+    ) -> GenerationMetrics:
+        """End the request, passing its metrics to the hooks"""
+        end = time.perf_counter()
+        token_times = self.token_times
+        first_token = token_times[0] if token_times else None
+        queue_wait = tokenization = prefill = None
+        if self.tokenized_time is not None:
+            tokenization = self.tokenized_time - self.start
+        if self.prefill_time is not None:
+            queue_wait = self.prefill_time - (self.tokenized_time or self.start)
+            if first_token is not None:
+                prefill = first_token - self.prefill_time
+
+        metrics = GenerationMetrics(
+            source=self.source,
+            input_token_count=input_token_count,
+            generated_tokens=generated_tokens,
+            queue_wait=queue_wait,
+            tokenization=tokenization,
+            prefill=prefill,
+            time_to_first_token=(
+                first_token - self.start if first_token is not None else None
+            ),
+            inter_token_latencies=[
+                later - earlier for earlier, later in zip(token_times, token_times[1:])
+            ],
+            decode=token_times[-1] - first_token if token_times else None,
+            total=end - self.start,
+        )
+        log.debug("Generation metrics: %s", metrics)
+        with _HOOKS_LOCK:
+            hooks = list(_HOOKS)
+        for hook in hooks:
+            try:
+                hook(metrics)
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                log.warning("<NLP71306542W>", f"Generation metrics hook failed: {err}")
+        return metrics
@@ -0,0 +1,161 @@
+# Copyright The Caikit Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""In-process token counting for the tokenize calls of the TGIS modules.
+
+The fast tokenizer of a TGIS model is loaded once, from its local artifacts (the
+model path, or the model name under base_models_dir) or downloaded from the hub
+if allow_downloads is set, and shared by all the clients of the model. The first
+tokenize calls of each model still go to TGIS to check the local counts, and a
+mismatch turns the local tokenizer off for the model.
+"""
+
+# Standard
+from typing import Dict, List, Optional
+import os
+import threading
+
+# Third Party
+from transformers import AutoTokenizer, PreTrainedTokenizerFast
+
+# First Party
+from caikit import get_config
+import alog
+
+log = alog.use_channel("LOCAL_TOK")
+
+
+class LocalTokenCounter:
+    """Counts the tokens of texts like TGIS does, with a local fast tokenizer"""
+
+    def __init__(
+        self, model_name: str, tokenizer: PreTrainedTokenizerFast, parity_checks: int
+    ):
+        """
+        Args:
+            model_name: str
+                Model served by TGIS
+            tokenizer: PreTrainedTokenizerFast
+                Tokenizer of the model
+            parity_checks: int
+                Number of first counts to check against TGIS
+        """
+        self.model_name = model_name
+        self.tokenizer = tokenizer
+        self.enabled = True
+        self._parity_checks_left = parity_checks
+        self._lock = threading.Lock()
+
+    def count(self, text: str) -> int:
+        """Count the tokens of a text, with the special tokens TGIS adds"""
+        return len(self.tokenizer(text, add_special_tokens=True)["input_ids"])
+
+    def count_all(self, texts: List[str]) -> List[int]:
+        """Count the tokens of texts with one batched tokenizer call"""
+        input_ids = self.tokenizer(texts, add_special_tokens=True)["input_ids"]
+        return [len(ids) for ids in input_ids]
+
+    def needs_parity_check(self) -> bool:
+        """Whether the next count must be checked against TGIS"""
+        return self._parity_checks_left > 0
+
+    def check_parity(self, text: str, local_count: int, remote_count: int):
+        """Compare a local count with the TGIS count of the same text, turning the
+        local tokenizer off on a mismatch
+        """
+        with self._lock:
+            self._parity_checks_left = max(self._parity_checks_left - 1, 0)
+            if local_count == remote_count or not self.enabled:
+                return
+            self.enabled = False
+        log.warning(
+            "<NLP53920871W>",
+            "Local tokenizer of {} counted {} tokens where TGIS counted {} for a "
+            "text of {} characters, tokenizing with TGIS instead".format(
+                self.model_name, local_count, remote_count, len(text)
+            ),
+        )
+
+
+def local_tokenizer_enabled() -> bool:
+    """Whether tgis_client.local_tokenizer is enabled in the config"""
+    client_cfg = get_config().get("tgis_client", {})
+    # NOTE: env var overrides are strings
+    enabled = str(client_cfg.get("local_tokenizer", False)).lower()
+    return enabled in ("true", "1")
+
+
+def _load_fast_tokenizer(model_name: str) -> Optional[PreTrainedTokenizerFast]:
+    """Load the fast tokenizer of a model, or None if it isn't available"""
+    tokenizer_path = model_name
+    base_models_dir = get_config().base_models_dir
+    if base_models_dir and os.path.isdir(os.path.join(base_models_dir, model_name)):
+        tokenizer_path = os.path.join(base_models_dir, model_name)
+    try:
+        with alog.ContextTimer(log.debug, "Local tokenizer loaded in "):
+            tokenizer = AutoTokenizer.from_pretrained(
+                tokenizer_path,
+                local_files_only=not get_config().allow_downloads,
+                use_fast=True,
+            )
+    except (OSError, ValueError) as err:
+        log.info(
+            "<NLP53920872I>",
+            "No local tokenizer for {}, tokenizing with TGIS: {}".format(
+                model_name, err
+            ),
+        )
+        return None
+    if not tokenizer.is_fast:
+        log.info(
+            "<NLP53920873I>",
+            "No fast tokenizer for {}, tokenizing with TGIS".format(model_name),
+        )
+        return None
+    return tokenizer
+
+
+# Counters of the models, or None for the models without a fast tokenizer, so that
+# loading is only tried once
+_COUNTERS: Dict[str, Optional[LocalTokenCounter]] = {}
+_COUNTERS_LOCK = threading.Lock()
+
+
+def get_local_token_counter(model_name: str) -> Optional[LocalTokenCounter]:
+    """Get the local token counter shared by the TGIS clients of a model, or None
+    if tgis_client.local_tokenizer is off or the model has no fast tokenizer
+
+    Args:
+        model_name: str
+            Model served by TGIS
+
+    Returns:
+        Optional[LocalTokenCounter]
+            The counter
+    """
+    if not local_tokenizer_enabled():
+        return None
+    with _COUNTERS_LOCK:
+        if model_name not in _COUNTERS:
+            tokenizer = _load_fast_tokenizer(model_name)
+            parity_checks = int(
+                get_config().get("tgis_client", {}).get("local_tokenizer_parity_checks")
+                or 0
+            )
+            _COUNTERS[model_name] = (
+                LocalTokenCounter(model_name, tokenizer, parity_checks)
+                if tokenizer is not None
+                else None
+            )
+        return _COUNTERS[model_name]
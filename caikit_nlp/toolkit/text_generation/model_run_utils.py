@@ -15,11 +15,21 @@
 """Utility functions used for executing run function for text_generation"""
 
 # Standard
-from typing import List, Optional, Tuple, Union
+from collections import deque
+from queue import Queue
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Tuple, Union
+import threading
 
 # Third Party
 from peft.peft_model import PeftModel
-from transformers import AutoModel, AutoTokenizer, StoppingCriteria, TextStreamer
+from transformers import (
+    AutoModel,
+    AutoTokenizer,
+    DynamicCache,
+    StoppingCriteria,
+    StoppingCriteriaList,
+)
+from transformers.generation.streamers import BaseStreamer
 import numpy as np
 import torch
 
@@ -35,8 +45,16 @@ from caikit.interfaces.nlp.data_model import (
 import alog
 
 # Local
+from .base_model_registry import is_shared_base_model
+from .generation_metrics import GenerationTimer, generation_metrics_enabled
+from .stream_coalescing import new_stream_coalescer
 from caikit_nlp.data_model import ExponentialDecayLengthPenalty
 
+if TYPE_CHECKING:
+    # Local
+    from .assisted_decoding import DraftModel
+    from .continuous_batching import ContinuousBatchingEngine
+
 log = alog.use_channel("RUN_UTILS")
 error = error_handler.get(log)
 
@@ -97,32 +115,221 @@ GENERATE_FUNCTION_ARGS = """
         indicates where penalty starts and decay_factor represents the factor
         of exponential decay
     stop_sequences: List[str]
-        List of strings to be used as stopping criteria
+        List of strings to be used as stopping criteria. Generation stops
+        once the generated tokens end with the tokens of one of them.
     seed: numpy.uint64
         Random seed to control sampling. Only applicable when decoding_method
         is SAMPLING. Default: None
 """
 
 
-class Streamer(TextStreamer):
-    # The default TextStreamer currently prints to stdout
-    # so we override that here
-    def on_finalized_text(self, text: str, stream_end: bool = False):
+class TokenIteratorStreamer(BaseStreamer):
+    """Streamer that generate() feeds from a worker thread, iterated by the caller.
+
+    Yields (token_id, text) for each generated token, where text is only the newly
+    finalized text. Text is held back while the decoded tail is an incomplete
+    character, using the prefix/read offsets so each step only decodes a few tokens.
+    After the iteration, final_text holds any held back text and error holds the
+    exception raised by generate(), if any. The token times are recorded by timer,
+    if given.
+    """
+
+    _END = object()
+
+    def __init__(
+        self, tokenizer: "AutoTokenizer", timer: Optional[GenerationTimer] = None
+    ):
+        self.tokenizer = tokenizer
+        self.timer = timer
+        self.token_ids: List[int] = []
+        self.final_text = ""
+        self.error: Optional[BaseException] = None
+        self._queue = Queue()
+        # The first put() is the prompt (or decoder start) ids
+        self._next_is_prompt = True
+        self._prefix_offset = 0
+        self._read_offset = 0
+
+    def _decode(self, token_ids: List[int]) -> str:
+        return self.tokenizer.decode(token_ids, skip_special_tokens=True)
+
+    def put(self, value: torch.Tensor):
+        if self._next_is_prompt:
+            self._next_is_prompt = False
+            return
+
+        if self.timer is not None:
+            self.timer.add_tokens(value.numel())
+        for token_id in value.reshape(-1).tolist():
+            self.token_ids.append(token_id)
+            prefix_text = self._decode(
+                self.token_ids[self._prefix_offset : self._read_offset]
+            )
+            new_text = self._decode(self.token_ids[self._prefix_offset :])
+            text = ""
+            if len(new_text) > len(prefix_text) and not new_text.endswith("\ufffd"):
+                text = new_text[len(prefix_text) :]
+                self._prefix_offset = self._read_offset
+                self._read_offset = len(self.token_ids)
+            self._queue.put((token_id, text))
+
+    def end(self, error: Optional[BaseException] = None):
+        prefix_text = self._decode(
+            self.token_ids[self._prefix_offset : self._read_offset]
+        )
+        self.final_text = self._decode(self.token_ids[self._prefix_offset :])[
+            len(prefix_text) :
+        ]
+        self.error = error
+        self._queue.put(self._END)
+
+    def __deepcopy__(self, memo):
+        # PEFT seq2seq prompt tuning deep copies the generate() kwargs
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Tuple[int, str]:
+        item = self._queue.get()
+        if item is self._END:
+            raise StopIteration()
+        return item
+
+
+class TimingStreamer(BaseStreamer):
+    """Streamer only recording the generated token times of a timer"""
+
+    def __init__(self, timer: GenerationTimer):
+        self.timer = timer
+        # The first put() is the prompt (or decoder start) ids
+        self._next_is_prompt = True
+
+    def put(self, value: torch.Tensor):
+        if self._next_is_prompt:
+            self._next_is_prompt = False
+            return
+        self.timer.add_tokens(value.numel())
+
+    def end(self):
         pass
 
+    def __deepcopy__(self, memo):
+        # PEFT seq2seq prompt tuning deep copies the generate() kwargs
+        return self
+
+
+class CancelledCriteria(StoppingCriteria):
+    """Stops generation once the event is set (e.g. the stream was closed)"""
 
-class SequenceStoppingCriteria(StoppingCriteria):
     # pylint: disable-next=super-init-not-called # false positive: StoppingCriteria is an abc and has no __init__
-    def __init__(self, target_sequence_ids):
-        self.target_sequence_ids = target_sequence_ids
+    def __init__(self, cancelled: threading.Event):
+        self.cancelled = cancelled
 
     def __call__(self, input_ids, scores, **kwargs):
-        # Check if the target sequence appears in the generated text
-        for seq_id in self.target_sequence_ids:
-            if seq_id in input_ids:
-                return True  # Stop generation
+        return self.cancelled.is_set()
+
+    def __deepcopy__(self, memo):
+        # PEFT seq2seq prompt tuning deep copies the generate() kwargs
+        return self
+
+
+class StopSequenceAutomaton:
+    """Aho-Corasick automaton matching stop sequences of token ids in a token stream.
+
+    A state is the longest prefix of a stop sequence that the stream currently ends
+    with. Feeding one token at a time finds the end of any stop sequence, in
+    amortized constant time per token whatever the number of stop sequences.
+    """
+
+    def __init__(self, stop_sequence_ids: List[List[int]]):
+        # Trie of the stop sequences, state 0 is the root
+        self._goto: List[Dict[int, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._match: List[bool] = [False]
+        for sequence in stop_sequence_ids:
+            if not sequence:
+                continue
+            state = 0
+            for token_id in sequence:
+                if token_id not in self._goto[state]:
+                    self._goto[state][token_id] = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._match.append(False)
+                state = self._goto[state][token_id]
+            self._match[state] = True
 
-        return False  # Continue generation
+        # Failure links point to the longest proper suffix that is also a prefix
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token_id, next_state in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and token_id not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(token_id, 0)
+                # A stop sequence may end inside a longer one
+                self._match[next_state] |= self._match[self._fail[next_state]]
+                queue.append(next_state)
+
+    def step(self, state: int, token_id: int) -> int:
+        """Get the state after the next token of the stream"""
+        while state and token_id not in self._goto[state]:
+            state = self._fail[state]
+        return self._goto[state].get(token_id, 0)
+
+    def is_match(self, state: int) -> bool:
+        """Whether the stream ends with a stop sequence in this state"""
+        return self._match[state]
+
+
+class StopSequenceCriteria(StoppingCriteria):
+    """Stops each row of a generate() call once it ends with a stop sequence.
+
+    Each call only feeds the tokens added since the previous call to the automaton,
+    with a state per row, so the prompt is never matched. The first call of a
+    generate() comes after its first new token. After generation, stop_counts holds
+    for each row the number of new tokens up to the end of the matched stop
+    sequence, or None. Use a new criteria for each generate() call.
+    """
+
+    # pylint: disable-next=super-init-not-called # false positive: StoppingCriteria is an abc and has no __init__
+    def __init__(self, automaton: StopSequenceAutomaton):
+        self.automaton = automaton
+        self.stop_counts: List[Optional[int]] = []
+        self._states: List[int] = []
+        self._length: Optional[int] = None
+        self._new_tokens = 0
+
+    def __call__(self, input_ids, scores, **kwargs):
+        if self._length is None:
+            self._length = input_ids.shape[1] - 1
+            self._states = [0] * input_ids.shape[0]
+            self.stop_counts = [None] * input_ids.shape[0]
+
+        for row, new_ids in enumerate(input_ids[:, self._length :].tolist()):
+            if self.stop_counts[row] is not None:
+                continue
+            state = self._states[row]
+            for offset, token_id in enumerate(new_ids):
+                state = self.automaton.step(state, token_id)
+                if self.automaton.is_match(state):
+                    self.stop_counts[row] = self._new_tokens + offset + 1
+                    break
+            self._states[row] = state
+
+        self._new_tokens += input_ids.shape[1] - self._length
+        self._length = input_ids.shape[1]
+        return torch.tensor(
+            [count is not None for count in self.stop_counts],
+            device=input_ids.device,
+        )
+
+    def __deepcopy__(self, memo):
+        # PEFT seq2seq prompt tuning deep copies the generate() kwargs, while
+        # the finish reason is read from this object
+        return self
 
     def __len__(self):
         return 1
@@ -154,6 +361,9 @@ def generate_text_func(
     stop_sequences: Optional[List[str]] = None,
     preserve_input_text: Optional[bool] = True,
     task_type: Optional[str] = None,
+    continuous_batching_engine: Optional["ContinuousBatchingEngine"] = None,
+    prefix_cache: Optional["PrefixCache"] = None,
+    draft_model: Optional["DraftModel"] = None,
     **kwargs,
 ):
     """
@@ -172,6 +382,15 @@ def generate_text_func(
                 e.g., as a prefix. Default True. (Source string will appear as prefix)
             task_type: str or None
                 Task type such as CAUSAL_LM, SEQ_2_SEQ_LM, SEQ_CLS or None
+            continuous_batching_engine: ContinuousBatchingEngine or None
+                Engine of the (decoder-only) model to generate with, decoding
+                together with other concurrent requests instead of calling generate
+            prefix_cache: PrefixCache or None
+                KV cache of the prompt tuned causal model's prompt prefix, used when
+                the text starts with it
+            draft_model: DraftModel or None
+                Draft model assisting greedy generation, when there is no
+                continuous_batching_engine
             {}
         Returns:
             GeneratedTextResult
@@ -181,6 +400,7 @@ def generate_text_func(
 
     error.type_check("<NLP85452187E>", str, allow_none=True, eos_token=eos_token)
     error.type_check("<NLP65883534E>", str, text=text)
+    timer = GenerationTimer("local") if generation_metrics_enabled() else None
 
     error.type_check(
         "<NLP55411551E>",
@@ -199,6 +419,8 @@ def generate_text_func(
         return_tensors="pt",
     )
     inputs = {k: v.to(model.device) for k, v in tok_tensors.items()}
+    if timer is not None:
+        timer.tokenized()
 
     input_token_count = tok_tensors["input_ids"].size(1)
 
@@ -218,23 +440,60 @@ def generate_text_func(
         stop_sequences,
     )
 
-    if "attention_mask" in inputs:
-        gen_optional_params["attention_mask"] = inputs["attention_mask"]
+    draft_model = __get_draft_model(draft_model, gen_optional_params)
 
-    # NOTE: Below is required as `task_id` is a required field for generation
-    # with MPT in PEFT. We are manually setting task id to 0 vector since
-    # we do not allow setting task specific id anyways.
-    if isinstance(model, PeftModel):
-        gen_optional_params["task_ids"] = torch.zeros(
-            inputs["input_ids"].shape[0], dtype=inputs["input_ids"].dtype
-        ).to(model.device)
-
-    with torch.no_grad():
-        generate_ids = model.generate(
-            input_ids=inputs["input_ids"],
-            **gen_optional_params,
-            **kwargs,
+    finish_reason = None
+    if continuous_batching_engine is not None:
+        request = __submit_continuous(
+            continuous_batching_engine,
+            model,
+            inputs,
+            gen_optional_params,
+            kwargs,
+            timer,
+        )
+        new_ids, finish_reason = request.result()
+        generate_ids = torch.cat(
+            [inputs["input_ids"].cpu(), torch.tensor([new_ids], dtype=torch.long)],
+            dim=1,
         )
+    else:
+        if "attention_mask" in inputs:
+            gen_optional_params["attention_mask"] = inputs["attention_mask"]
+
+        # NOTE: Below is required as `task_id` is a required field for generation
+        # with MPT in PEFT. We are manually setting task id to 0 vector since
+        # we do not allow setting task specific id anyways.
+        if isinstance(model, PeftModel):
+            gen_optional_params["task_ids"] = torch.zeros(
+                inputs["input_ids"].shape[0], dtype=inputs["input_ids"].dtype
+            ).to(model.device)
+
+        generate_model = model
+        generate_kwargs = {"input_ids": inputs["input_ids"], **gen_optional_params}
+        base_kwargs = __get_base_model_kwargs(model, tokenizer, prefix_cache, inputs)
+        if base_kwargs is not None:
+            generate_model = model.get_base_model()
+            generate_kwargs.update(base_kwargs)
+            # NOTE: only the PeftModel generate() takes these (it ignores the seed)
+            generate_kwargs.pop("seed", None)
+            generate_kwargs.pop("task_ids", None)
+        if timer is not None:
+            generate_kwargs["streamer"] = TimingStreamer(timer)
+            timer.prefill_started()
+
+        with torch.no_grad():
+            if draft_model is not None:
+                generate_ids = draft_model.generate(
+                    generate_model, **generate_kwargs, **kwargs
+                )
+            else:
+                generate_ids = generate_model.generate(**generate_kwargs, **kwargs)
+        if base_kwargs is not None:
+            # Drop the placeholder ids of the virtual tokens
+            generate_ids = generate_ids[
+                :, base_kwargs["input_ids"].shape[1] - inputs["input_ids"].shape[1] :
+            ]
 
     token_count = generate_ids.size(1) - 1
 
@@ -250,30 +509,471 @@ def generate_text_func(
     else:
         generated_text = preds[0]
 
-    if (eos_token and tokenizer.decode(generate_ids[0, -1].item()) == eos_token) or (
-        generate_ids[0, -1] == tokenizer.eos_token_id
-    ):
-        finish_reason = FinishReason.EOS_TOKEN
-    elif ("stopping_criteria" in gen_optional_params) and (
-        gen_optional_params["stopping_criteria"](
-            generate_ids,
-            None,  # scores, unused by SequenceStoppingCriteria
-        )
-    ):
-        finish_reason = FinishReason.STOP_SEQUENCE
-    else:
-        finish_reason = FinishReason.MAX_TOKENS
+    if timer is not None:
+        timer.finish(len(timer.token_times), input_token_count)
 
     return GeneratedTextResult(
         generated_tokens=token_count,
         generated_text=generated_text,
-        finish_reason=finish_reason,
+        finish_reason=finish_reason
+        or __get_finish_reason(
+            tokenizer,
+            eos_token,
+            generate_ids,
+            gen_optional_params.get("stopping_criteria"),
+        ),
         producer_id=producer_id,
         input_token_count=input_token_count,
         seed=seed,
     )
 
 
+def __submit_continuous(engine, model, inputs, gen_optional_params, kwargs, timer):
+    """Utility function to submit a tokenized prompt to a continuous batching engine.
+
+    The engine runs the base model, so the virtual tokens of a prompt tuned
+    PeftModel are passed as prefix embeddings.
+    """
+    prefix_embeddings = None
+    if isinstance(model, PeftModel):
+        with torch.no_grad():
+            # NOTE: task ids are only used by MPT, where we always use task 0
+            prefix_embeddings = model.get_prompt(
+                batch_size=1,
+                task_ids=torch.zeros(1, dtype=torch.long).to(model.device),
+            )
+    return engine.submit(
+        inputs["input_ids"],
+        prefix_embeddings=prefix_embeddings,
+        timer=timer,
+        **gen_optional_params,
+        **kwargs,
+    )
+
+
+def generate_text_func_batch(
+    model: "Union[PeftModel, AutoModel]",
+    tokenizer: "AutoTokenizer",
+    producer_id: ProducerId,
+    eos_token: Optional[str],
+    texts: List[str],
+    max_new_tokens: Optional[int] = 20,
+    min_new_tokens: Optional[int] = 0,
+    truncate_input_tokens: Optional[int] = 0,
+    decoding_method: Optional[str] = "GREEDY",
+    top_k: Optional[int] = 0,
+    top_p: Optional[float] = 1.0,
+    typical_p: Optional[float] = 1.0,
+    temperature: Optional[float] = 1.0,
+    seed: Optional[np.uint64] = None,
+    repetition_penalty: Optional[float] = 1.0,
+    max_time: Optional[float] = None,
+    exponential_decay_length_penalty: Optional[
+        Union[Tuple[int, float], ExponentialDecayLengthPenalty]
+    ] = None,
+    stop_sequences: Optional[List[str]] = None,
+    preserve_input_text: Optional[bool] = True,
+    task_type: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    prompt_embeddings: Optional[List[torch.Tensor]] = None,
+    **kwargs,
+) -> List[GeneratedTextResult]:
+    """
+        Generate for many texts with one generate() call per batch. Texts are padded
+        on the tokenizer's padding_side (decoder-only models need "left").
+
+        Args:
+            model: PeftModel or transformers.AutoModel
+                Peft model or Transformers model
+            tokenizer: AutoTokenizer
+                Tokenizer to be used with the model
+            producer_id: ProducerId
+                Caikit producer id associated with the module
+            eos_token: str
+                End of sequence token to be used with generation
+            texts: List[str]
+                Input strings to be used to the generation model.
+            preserve_input_text: bool
+                Applicable only for CAUSAL_LM task type.
+                Whether or not the source string should be contained in the generated output,
+                e.g., as a prefix. Default True. (Source string will appear as prefix)
+            task_type: str or None
+                Task type such as CAUSAL_LM, SEQ_2_SEQ_LM, SEQ_CLS or None
+            batch_size: int or None
+                Number of texts per generate() call. Texts of similar token length are
+                batched together. Default None - means all texts in one call.
+            prompt_embeddings: List[torch.Tensor] or None
+                Virtual token embeddings (see get_prompt_embeddings) to prepend to
+                each text, e.g. of prompt tuned models sharing model as their base
+                model. Applicable only for CAUSAL_LM task type.
+            {}
+        Returns:
+            List[GeneratedTextResult]
+                One result per text, in the given order
+    """.format(
+        GENERATE_FUNCTION_ARGS
+    )
+
+    error.type_check("<NLP46513830E>", str, allow_none=True, eos_token=eos_token)
+    error.type_check_all("<NLP46513831E>", str, texts=texts)
+    error.type_check(
+        "<NLP46513832E>",
+        int,
+        allow_none=True,
+        truncate_input_tokens=truncate_input_tokens,
+        batch_size=batch_size,
+    )
+    error.value_check(
+        "<NLP46513833E>",
+        tokenizer.pad_token_id is not None,
+        "Batched generation needs a tokenizer with a pad token",
+    )
+    if __generates_on_base_model(model):
+        prompt_embeddings = [get_prompt_embeddings(model)] * len(texts)
+        model = model.get_base_model()
+        task_type = "CAUSAL_LM"
+    if prompt_embeddings is not None:
+        error.value_check(
+            "<NLP46513834E>",
+            len(prompt_embeddings) == len(texts),
+            "Got {} prompt embeddings for {} texts",
+            len(prompt_embeddings),
+            len(texts),
+        )
+
+    gen_optional_params = __process_gen_args(
+        tokenizer,
+        max_new_tokens,
+        min_new_tokens,
+        decoding_method,
+        top_k,
+        top_p,
+        typical_p,
+        temperature,
+        seed,
+        repetition_penalty,
+        max_time,
+        exponential_decay_length_penalty,
+        stop_sequences,
+    )
+    stop_automaton = None
+    if "stopping_criteria" in gen_optional_params:
+        stop_automaton = gen_optional_params.pop("stopping_criteria").automaton
+
+    # NOTE: below is to match TGIS API, where 0 identifies as no truncation
+    truncation = truncate_input_tokens != 0
+
+    # Batch texts of similar length together to limit the padding
+    if batch_size is None or batch_size < 1:
+        batch_size = max(len(texts), 1)
+    order = (
+        np.argsort([-len(text) for text in texts], kind="stable")
+        if batch_size < len(texts)
+        else np.arange(len(texts))
+    )
+
+    results = [None] * len(texts)
+    for start in range(0, len(texts), batch_size):
+        batch_indexes = order[start : start + batch_size]
+        tok_tensors = tokenizer(
+            [texts[i] for i in batch_indexes],
+            truncation=truncation,
+            max_length=truncate_input_tokens if truncation else None,
+            padding=True,
+            return_tensors="pt",
+        )
+        inputs = {k: v.to(model.device) for k, v in tok_tensors.items()}
+        batch_params = dict(gen_optional_params)
+        stopping_criteria = None
+        if stop_automaton is not None:
+            # Rows are matched separately, so one row stopping does not stop the others
+            stopping_criteria = StopSequenceCriteria(stop_automaton)
+            batch_params["stopping_criteria"] = stopping_criteria
+        if "attention_mask" in inputs:
+            batch_params["attention_mask"] = inputs["attention_mask"]
+        # NOTE: task_ids are required for generation with MPT in PEFT (see above)
+        if isinstance(model, PeftModel):
+            batch_params["task_ids"] = torch.zeros(
+                inputs["input_ids"].shape[0], dtype=inputs["input_ids"].dtype
+            ).to(model.device)
+
+        generate_inputs = {"input_ids": inputs["input_ids"]}
+        if prompt_embeddings is not None:
+            generate_inputs = __get_prompt_embedding_kwargs(
+                model,
+                tokenizer,
+                inputs,
+                [prompt_embeddings[i] for i in batch_indexes],
+            )
+            # NOTE: only the PeftModel generate() takes the seed (and ignores it)
+            batch_params.pop("seed", None)
+        batch_params.update(generate_inputs)
+
+        with torch.no_grad():
+            generate_ids = model.generate(**batch_params, **kwargs)
+
+        prompt_width = generate_inputs["input_ids"].size(1)
+        for row, text_index in enumerate(batch_indexes):
+            prompt_ids = tok_tensors["input_ids"][row][
+                tok_tensors["attention_mask"][row].bool()
+            ]
+            if task_type == "CAUSAL_LM":
+                new_ids = generate_ids[row, prompt_width:].tolist()
+            else:
+                new_ids = generate_ids[row, 1:].tolist()  # skip the decoder start
+            token_count, finish_reason = __get_row_finish(
+                tokenizer,
+                eos_token,
+                new_ids,
+                stopping_criteria.stop_counts[row]
+                if stopping_criteria is not None and stopping_criteria.stop_counts
+                else None,
+            )
+            new_ids = new_ids[:token_count]
+
+            if task_type == "CAUSAL_LM" and preserve_input_text is True:
+                output_ids = prompt_ids.tolist() + new_ids
+            else:
+                output_ids = new_ids
+            generated_text = tokenizer.decode(
+                output_ids, skip_special_tokens=True, clean_up_tokenization_spaces=True
+            )
+
+            results[text_index] = GeneratedTextResult(
+                generated_tokens=token_count,
+                generated_text=generated_text,
+                finish_reason=finish_reason,
+                producer_id=producer_id,
+                input_token_count=len(prompt_ids),
+                seed=seed,
+            )
+
+    return results
+
+
+class PrefixCache(NamedTuple):
+    """KV cache of the start shared by all prompts of a prompt tuned causal model.
+
+    The cached positions are the virtual tokens, then token_ids (the static
+    verbalizer text before its first placeholder).
+    """
+
+    num_virtual_tokens: int
+    token_ids: List[int]
+    # Legacy format: (key, value) per layer, for a batch of 1
+    past_key_values: Tuple[Tuple[torch.Tensor, torch.Tensor], ...]
+
+
+def build_prefix_cache(
+    model: PeftModel, tokenizer: "AutoTokenizer", prefix_text: str
+) -> PrefixCache:
+    """Run the virtual tokens and the static prompt prefix of a prompt tuned causal
+    model through its base model once, keeping the KV cache to continue from.
+
+    Args:
+        model: PeftModel
+            Prompt tuned causal LM
+        tokenizer: AutoTokenizer
+            Tokenizer to be used with the model
+        prefix_text: str
+            Text that every prompt starts with, e.g. the verbalizer text before
+            its first placeholder
+    Returns:
+        PrefixCache
+    """
+    # The last token of the prefix may merge with the text that follows it
+    token_ids = tokenizer(prefix_text)["input_ids"][:-1]
+    base_model = model.get_base_model()
+    with torch.no_grad():
+        # NOTE: task ids are only used by MPT, where we always use task 0
+        virtual_embeddings = model.get_prompt(
+            batch_size=1, task_ids=torch.zeros(1, dtype=torch.long).to(model.device)
+        )
+        token_embeddings = base_model.get_input_embeddings()(
+            torch.tensor([token_ids], dtype=torch.long, device=model.device)
+        )
+        inputs_embeds = torch.cat(
+            [virtual_embeddings.to(token_embeddings.dtype), token_embeddings], dim=1
+        )
+        outputs = base_model(
+            inputs_embeds=inputs_embeds,
+            attention_mask=torch.ones(
+                inputs_embeds.shape[:2], dtype=torch.long, device=model.device
+            ),
+            past_key_values=DynamicCache(),
+            use_cache=True,
+        )
+    return PrefixCache(
+        num_virtual_tokens=virtual_embeddings.shape[1],
+        token_ids=token_ids,
+        past_key_values=outputs.past_key_values.to_legacy_cache(),
+    )
+
+
+def __get_prefix_cache_kwargs(model, prefix_cache, inputs):
+    """Utility function to get the base model generate() kwargs continuing from a
+    prefix cache, or None if the prompt does not extend the cached prefix.
+
+    generate() only runs the positions after the cache, so the virtual tokens get
+    placeholder ids. They repeat the first prompt id, which leaves repetition
+    penalties unchanged.
+    """
+    if prefix_cache is None or not isinstance(model, PeftModel):
+        return None
+    input_ids = inputs["input_ids"]
+    prefix_length = len(prefix_cache.token_ids)
+    if (
+        input_ids.shape[0] != 1
+        or input_ids.shape[1] <= prefix_length
+        or input_ids[0, :prefix_length].tolist() != prefix_cache.token_ids
+    ):
+        return None
+
+    placeholder_ids = input_ids[:, :1].expand(1, prefix_cache.num_virtual_tokens)
+    input_ids = torch.cat([placeholder_ids, input_ids], dim=1)
+    return {
+        "input_ids": input_ids,
+        "attention_mask": torch.ones_like(input_ids),
+        # generate() extends the cache, so each call gets its own
+        "past_key_values": DynamicCache.from_legacy_cache(prefix_cache.past_key_values),
+    }
+
+
+def get_prompt_embeddings(model: PeftModel) -> torch.Tensor:
+    """Get the virtual token embeddings of a prompt tuned model.
+
+    Args:
+        model: PeftModel
+            Prompt tuned model
+    Returns:
+        torch.Tensor
+            Embeddings of shape (num_virtual_tokens, hidden_size)
+    """
+    with torch.no_grad():
+        # NOTE: task ids are only used by MPT, where we always use task 0
+        return model.get_prompt(
+            batch_size=1, task_ids=torch.zeros(1, dtype=torch.long).to(model.device)
+        )[0]
+
+
+def __generates_on_base_model(model):
+    """Utility function to check whether a model generates on its base model with its
+    prompt embeddings instead of with PeftModel generate().
+
+    PeftModel generate() patches its base model while generating, so prompt tuned
+    causal models over a shared base model (see base_model_registry) never use it.
+    """
+    return (
+        isinstance(model, PeftModel)
+        and model.active_peft_config.is_prompt_learning
+        and model.active_peft_config.task_type == "CAUSAL_LM"
+        and is_shared_base_model(model.get_base_model())
+    )
+
+
+def __get_base_model_kwargs(model, tokenizer, prefix_cache, inputs):
+    """Utility function to get the base model generate() kwargs of a prompt tuned
+    causal model, or None if it generates with PeftModel generate().
+    """
+    base_kwargs = __get_prefix_cache_kwargs(model, prefix_cache, inputs)
+    if base_kwargs is None and __generates_on_base_model(model):
+        base_kwargs = __get_prompt_embedding_kwargs(
+            model.get_base_model(),
+            tokenizer,
+            inputs,
+            [get_prompt_embeddings(model)] * inputs["input_ids"].shape[0],
+        )
+    return base_kwargs
+
+
+def __get_prompt_embedding_kwargs(base_model, tokenizer, inputs, prompt_embeddings):
+    """Utility function to get the base model generate() kwargs prepending the
+    prompt embeddings of each row to its input embeddings.
+
+    Rows are left padded, so each row may have its own prompt. As with the prefix
+    cache, the virtual tokens get placeholder ids repeating the first prompt id.
+    """
+    embedding_layer = base_model.get_input_embeddings()
+    rows = []
+    with torch.no_grad():
+        for row_ids, row_mask, row_prompt in zip(
+            inputs["input_ids"], inputs["attention_mask"], prompt_embeddings
+        ):
+            row_ids = row_ids[row_mask.bool()]
+            row_embeds = embedding_layer(row_ids)
+            rows.append(
+                (
+                    torch.cat([row_ids[:1].expand(row_prompt.shape[0]), row_ids]),
+                    torch.cat([row_prompt.to(row_embeds.dtype), row_embeds]),
+                )
+            )
+
+    width = max(len(row_ids) for row_ids, _ in rows)
+    input_ids = torch.full(
+        (len(rows), width),
+        tokenizer.pad_token_id or 0,
+        dtype=torch.long,
+        device=base_model.device,
+    )
+    attention_mask = torch.zeros_like(input_ids)
+    inputs_embeds = torch.zeros(
+        (len(rows), width, rows[0][1].shape[1]),
+        dtype=rows[0][1].dtype,
+        device=base_model.device,
+    )
+    for row, (row_ids, row_embeds) in enumerate(rows):
+        input_ids[row, width - len(row_ids) :] = row_ids
+        attention_mask[row, width - len(row_ids) :] = 1
+        inputs_embeds[row, width - len(row_ids) :] = row_embeds
+    return {
+        "input_ids": input_ids,
+        "attention_mask": attention_mask,
+        "inputs_embeds": inputs_embeds,
+    }
+
+
+def __get_draft_model(draft_model, gen_optional_params):
+    """Utility function to get the draft model to assist a request with, or None.
+
+    Assisted decoding adds several tokens per step and keeps all of them, so a stop
+    sequence may end before the last one. Requests with stop sequences are not
+    assisted.
+    """
+    if draft_model is not None and "stopping_criteria" in gen_optional_params:
+        log.debug("Generating without the draft model: stop sequences")
+        return None
+    return draft_model
+
+
+def __get_row_finish(tokenizer, eos_token, new_ids, stop_count):
+    """Utility function to get the generated token count and finish reason of a row.
+
+    Rows that finish early are padded up to the longest row, so the count is up to
+    the first token that finished the row.
+    """
+    for i, token_id in enumerate(new_ids):
+        if token_id == tokenizer.eos_token_id or (
+            eos_token and tokenizer.decode(token_id) == eos_token
+        ):
+            return i + 1, FinishReason.EOS_TOKEN
+        if i + 1 == stop_count:
+            return i + 1, FinishReason.STOP_SEQUENCE
+    return len(new_ids), FinishReason.MAX_TOKENS
+
+
+def __get_finish_reason(tokenizer, eos_token, generate_ids, stopping_criteria):
+    """Utility function to get the finish reason of a single generated sequence"""
+    if (eos_token and tokenizer.decode(generate_ids[0, -1].item()) == eos_token) or (
+        generate_ids[0, -1] == tokenizer.eos_token_id
+    ):
+        return FinishReason.EOS_TOKEN
+    if stopping_criteria is not None and any(
+        count is not None for count in stopping_criteria.stop_counts
+    ):
+        return FinishReason.STOP_SEQUENCE
+    return FinishReason.MAX_TOKENS
+
+
 def __postprocess_remove_input_text(tokenizer, preds, inputs, task_type):
     """For Causal LM task types, preserve_input_text set to False will
     remove the input text from generated output.
@@ -318,6 +1018,9 @@ def generate_text_func_stream(
         Union[Tuple[int, float], ExponentialDecayLengthPenalty]
     ] = None,
     stop_sequences: Optional[List[str]] = None,
+    continuous_batching_engine: Optional["ContinuousBatchingEngine"] = None,
+    prefix_cache: Optional["PrefixCache"] = None,
+    draft_model: Optional["DraftModel"] = None,
     **kwargs,
 ):
     """
@@ -330,14 +1033,27 @@ def generate_text_func_stream(
                 Caikit producer id associated with the module
             eos_token: str
                 End of sequence token to be used with generation
+            continuous_batching_engine: ContinuousBatchingEngine or None
+                Engine of the (decoder-only) model to generate with, decoding
+                together with other concurrent requests instead of calling generate
+            prefix_cache: PrefixCache or None
+                KV cache of the prompt tuned causal model's prompt prefix, used when
+                the text starts with it
+            draft_model: DraftModel or None
+                Draft model assisting greedy generation, when there is no
+                continuous_batching_engine
             {}
         Returns:
-            GeneratedTextResult
+            Iterable[GeneratedTextStreamResult]
+                One result per generated token (or per group of tokens with
+                stream coalescing) with its newly finalized text, then a last
+                result with any remaining text and the finish reason
     """.format(
         GENERATE_FUNCTION_ARGS
     )
     error.type_check("<NLP53933302E>", str, eos_token=eos_token)
     error.type_check("<NLP61673437E>", str, text=text)
+    timer = GenerationTimer("local") if generation_metrics_enabled() else None
 
     error.type_check(
         "<NLP60192564E>",
@@ -356,10 +1072,10 @@ def generate_text_func_stream(
         return_tensors="pt",
     )
     inputs = {k: v.to(model.device) for k, v in tok_tensors.items()}
+    if timer is not None:
+        timer.tokenized()
 
-    input_token_count = len(tok_tensors)
-
-    streamer = Streamer(tokenizer)
+    input_token_count = tok_tensors["input_ids"].size(1)
 
     gen_optional_params = __process_gen_args(
         tokenizer,
@@ -377,27 +1093,122 @@ def generate_text_func_stream(
         stop_sequences,
     )
 
-    with torch.no_grad():
-        # Run tokenized tensors through the rest of the PEFT model
-        stream_outputs = model.generate(
-            input_ids=inputs["input_ids"],
-            attention_mask=inputs["attention_mask"],
-            streamer=streamer,
-            **gen_optional_params,
-            **kwargs,
+    draft_model = __get_draft_model(draft_model, gen_optional_params)
+
+    request = None
+    if continuous_batching_engine is not None:
+        # The engine decodes on its own thread and feeds the request's streamer
+        request = __submit_continuous(
+            continuous_batching_engine,
+            model,
+            inputs,
+            gen_optional_params,
+            kwargs,
+            timer,
         )
-        details = TokenStreamDetails(
-            input_token_count=input_token_count,
-            seed=seed,
+        streamer = request.streamer
+        stop_generating = request.cancel
+        wait_generated = request.done.wait
+    else:
+        # Stop generating when the stream is closed early
+        cancelled = threading.Event()
+        stopping_criteria = StoppingCriteriaList([CancelledCriteria(cancelled)])
+        if "stopping_criteria" in gen_optional_params:
+            stopping_criteria.append(gen_optional_params["stopping_criteria"])
+
+        streamer = TokenIteratorStreamer(tokenizer, timer)
+
+        generate_model = model
+        generate_kwargs = {
+            "input_ids": inputs["input_ids"],
+            "attention_mask": inputs["attention_mask"],
+            "streamer": streamer,
+            **gen_optional_params,
+            "stopping_criteria": stopping_criteria,
+        }
+        base_kwargs = __get_base_model_kwargs(model, tokenizer, prefix_cache, inputs)
+        if base_kwargs is not None:
+            generate_model = model.get_base_model()
+            generate_kwargs.update(base_kwargs)
+            # NOTE: only the PeftModel generate() takes these (it ignores the seed)
+            generate_kwargs.pop("seed", None)
+            generate_kwargs.pop("task_ids", None)
+
+        def generate():
+            try:
+                # NOTE: no_grad() is thread local, so it is entered on this thread
+                with torch.no_grad():
+                    if draft_model is not None:
+                        draft_model.generate(
+                            generate_model, **generate_kwargs, **kwargs
+                        )
+                    else:
+                        generate_model.generate(**generate_kwargs, **kwargs)
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                streamer.end(err)
+
+        # Generate on a worker thread, yielding each token's text as it is finalized
+        if timer is not None:
+            timer.prefill_started()
+        generate_thread = threading.Thread(
+            target=generate, name="generate-stream", daemon=True
         )
-        for stream_part in stream_outputs:
-            gen_text = tokenizer.batch_decode(
-                stream_part.detach().cpu().numpy(), skip_special_tokens=True
-            )
+        generate_thread.start()
+        stop_generating = cancelled.set
+        wait_generated = generate_thread.join
+    # Merge the texts of consecutive tokens into fewer results, if configured
+    coalescer = new_stream_coalescer()
+    pending_text = ""
+    try:
+        generated_tokens = 0
+        for _, text in streamer:
+            generated_tokens += 1
+            if coalescer is not None:
+                pending_text += text
+                if not coalescer.due(1):
+                    continue
+                text, pending_text = pending_text, ""
             yield GeneratedTextStreamResult(
-                generated_text=gen_text, details=details, producer_id=producer_id
+                generated_text=text,
+                details=TokenStreamDetails(
+                    finish_reason=FinishReason.NOT_FINISHED,
+                    generated_tokens=generated_tokens,
+                    input_token_count=input_token_count,
+                    seed=seed,
+                ),
+                producer_id=producer_id,
             )
 
+        if streamer.error is not None:
+            raise streamer.error
+
+        # The last message has any held back text and the finish reason
+        finish_reason = FinishReason.MAX_TOKENS
+        if request is not None:
+            finish_reason = request.finish_reason
+        elif streamer.token_ids:
+            finish_reason = __get_finish_reason(
+                tokenizer,
+                eos_token,
+                torch.tensor([streamer.token_ids]),
+                gen_optional_params.get("stopping_criteria"),
+            )
+        yield GeneratedTextStreamResult(
+            generated_text=pending_text + streamer.final_text,
+            details=TokenStreamDetails(
+                finish_reason=finish_reason,
+                generated_tokens=generated_tokens,
+                input_token_count=input_token_count,
+                seed=seed,
+            ),
+            producer_id=producer_id,
+        )
+        if timer is not None:
+            timer.finish(generated_tokens, input_token_count)
+    finally:
+        stop_generating()
+        wait_generated()
+
 
 def __process_gen_args(
     tokenizer,
@@ -490,9 +1301,13 @@ def __process_gen_args(
         gen_optional_params["seed"] = seed
 
     if stop_sequences and len(stop_sequences) > 0:
-        # Tokenize sequences
-        stop_sequence_ids = tokenizer.encode(stop_sequences)
-        stopping_criteria = SequenceStoppingCriteria(stop_sequence_ids)
-        gen_optional_params["stopping_criteria"] = stopping_criteria
+        # Tokenize each sequence on its own, to match the full token sequences
+        stop_sequence_ids = [
+            tokenizer.encode(stop_sequence, add_special_tokens=False)
+            for stop_sequence in stop_sequences
+        ]
+        gen_optional_params["stopping_criteria"] = StopSequenceCriteria(
+            StopSequenceAutomaton(stop_sequence_ids)
+        )
 
     return gen_optional_params
@@ -0,0 +1,206 @@
+# Copyright The Caikit Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Quantized loading of local generation models for inference.
+
+"int8" replaces the linear layers of a CPU float32 model by dynamically quantized
+ones, with int8 weights and int8 matrix multiplications. "bf16" loads the model in
+bfloat16 where the device supports it. int8 models can't be trained or saved.
+"""
+
+# Standard
+from typing import Optional, Union
+
+# Third Party
+from transformers import PreTrainedModel
+import torch
+
+# First Party
+from caikit import get_config
+from caikit.core.exceptions import error_handler
+import alog
+
+log = alog.use_channel("QUANTIZATION")
+error = error_handler.get(log)
+
+QUANTIZATION_TYPES = ("int8", "bf16")
+
+
+class _PartialStateDictMixin:
+    """Keeps the weights of a quantized module when loading a state dict without
+    them, like the PEFT adapter weights loaded into a whole model
+    """
+
+    # Key of the module state dicts that is always saved
+    _STATE_DICT_KEY = None
+
+    # pylint: disable=too-many-arguments
+    def _load_from_state_dict(
+        self,
+        state_dict,
+        prefix,
+        local_metadata,
+        strict,
+        missing_keys,
+        unexpected_keys,
+        error_msgs,
+    ):
+        if prefix + self._STATE_DICT_KEY not in state_dict:
+            if strict:
+                missing_keys.append(prefix + self._STATE_DICT_KEY)
+            return
+        super()._load_from_state_dict(
+            state_dict,
+            prefix,
+            local_metadata,
+            strict,
+            missing_keys,
+            unexpected_keys,
+            error_msgs,
+        )
+
+
+class _LinearPackedParams(
+    _PartialStateDictMixin, torch.ao.nn.quantized.modules.linear.LinearPackedParams
+):
+    _STATE_DICT_KEY = "dtype"
+
+
+class _DynamicQuantizedLinear(
+    _PartialStateDictMixin, torch.ao.nn.quantized.dynamic.Linear
+):
+    _STATE_DICT_KEY = "scale"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._packed_params.__class__ = _LinearPackedParams
+
+
+def get_quantization(quantization: Optional[str] = None) -> Optional[str]:
+    """Get the quantization to load local generation models with.
+
+    Args:
+        quantization: Optional[str]
+            One of QUANTIZATION_TYPES, or "" for none. If None is provided, fall
+            back to text_generation.quantization in config.
+
+    Returns:
+        Optional[str]
+            The quantization, or None for full precision
+    """
+    error.type_check("<NLP52018371E>", str, allow_none=True, quantization=quantization)
+    if quantization is None:
+        quantization = get_config().get("text_generation", {}).get("quantization")
+    if not quantization:
+        return None
+    error.value_check(
+        "<NLP52018372E>",
+        quantization in QUANTIZATION_TYPES,
+        "Unsupported quantization {}, expected one of {}",
+        quantization,
+        QUANTIZATION_TYPES,
+    )
+    return quantization
+
+
+def get_quantization_dtype(
+    quantization: Optional[str],
+    torch_dtype: torch.dtype,
+    device: Optional[Union[str, int]] = None,
+) -> torch.dtype:
+    """Get the data type to load a model with before quantizing it.
+
+    Args:
+        quantization: Optional[str]
+            Quantization from get_quantization
+        torch_dtype: torch.dtype
+            Data type requested for the model
+        device: Optional[Union[str, int]]
+            Device of the model. Default None - means cpu
+
+    Returns:
+        torch.dtype
+            bfloat16 for "bf16" when supported, float32 for "int8", otherwise
+            torch_dtype
+    """
+    if quantization == "int8":
+        # The quantized linear layers take and return float32 activations
+        return torch.float32
+    if quantization == "bf16":
+        if device is None or str(device) == "cpu":
+            supported = torch.ops.mkldnn._is_mkldnn_bf16_supported()
+        else:
+            supported = torch.cuda.is_bf16_supported()
+        if supported:
+            return torch.bfloat16
+        log.warning(
+            "<NLP52018373W>",
+            "bfloat16 is not supported on device {}; using {}".format(
+                device or "cpu", torch_dtype
+            ),
+        )
+    return torch_dtype
+
+
+def quantize_model(
+    model: PreTrainedModel, quantization: Optional[str]
+) -> PreTrainedModel:
+    """Quantize a model loaded with get_quantization_dtype, in place.
+
+    For "int8", every linear layer but the output embeddings, which are usually
+    tied to the input embeddings, is quantized. Other quantizations were already
+    applied by the data type the model was loaded with.
+
+    Args:
+        model: transformers.PreTrainedModel
+            Model to quantize
+        quantization: Optional[str]
+            Quantization from get_quantization
+
+    Returns:
+        transformers.PreTrainedModel
+            The quantized model
+    """
+    if quantization != "int8" or is_quantized(model):
+        return model
+    if model.device.type != "cpu" or model.dtype != torch.float32:
+        log.warning(
+            "<NLP52018374W>",
+            "int8 quantization needs a float32 model on cpu, not {} on {}; "
+            "skipping it".format(model.dtype, model.device),
+        )
+        return model
+
+    output_embeddings = model.get_output_embeddings()
+    qconfig_spec = {
+        name: torch.ao.quantization.default_dynamic_qconfig
+        for name, module in model.named_modules()
+        if isinstance(module, torch.nn.Linear) and module is not output_embeddings
+    }
+    log.debug("Quantizing %d linear layers to int8", len(qconfig_spec))
+    with alog.ContextTimer(log.debug, "Done quantizing model in: "):
+        torch.ao.quantization.quantize_dynamic(
+            model,
+            qconfig_spec,
+            dtype=torch.qint8,
+            mapping={torch.nn.Linear: _DynamicQuantizedLinear},
+            inplace=True,
+        )
+    model.weight_quantization = quantization
+    return model
+
+
+def is_quantized(model: PreTrainedModel) -> bool:
+    """Whether the model was quantized by quantize_model"""
+    return getattr(model, "weight_quantization", None) is not None
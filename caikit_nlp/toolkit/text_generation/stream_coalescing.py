@@ -0,0 +1,148 @@
+# Copyright The Caikit Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Coalescing of the parts of generation streams.
+
+Streaming generation yields a result per generated token. With coalescing, the
+consecutive parts of a stream are merged until they hold stream_coalesce_tokens
+generated tokens, or until stream_coalesce_window_ms passed since the last result
+was sent, so that fast models send fewer, larger results. The first generated
+token is always sent at once, and the last result carries the final details.
+
+Local streams (text_generation config) merge the generated text, and TGIS streams
+(tgis_client config) merge the TGIS stream parts before converting them.
+"""
+
+# Standard
+from typing import Optional, Tuple
+import time
+
+# First Party
+from caikit import get_config
+from caikit.core.exceptions import error_handler
+from caikit_tgis_backend.protobufs import generation_pb2
+import alog
+
+log = alog.use_channel("STREAM_COAL")
+error = error_handler.get(log)
+
+
+class StreamCoalescer:
+    """Decides when the merged parts of one generation stream are sent"""
+
+    def __init__(self, max_tokens: int = 0, window_ms: float = 0):
+        """
+        Args:
+            max_tokens: int
+                Number of generated tokens sent together, or 0 for no limit
+            window_ms: float
+                Min time between two results, or 0 for no limit
+        """
+        error.value_check(
+            "<NLP84150617E>",
+            max_tokens >= 0 and window_ms >= 0,
+            "max_tokens and window_ms must not be negative",
+        )
+        error.value_check(
+            "<NLP84150618E>",
+            max_tokens > 0 or window_ms > 0,
+            "max_tokens or window_ms must be set",
+        )
+        self.max_tokens = max_tokens
+        self.window = window_ms / 1000
+        self._pending_tokens = 0
+        # Time the last result was sent, None until the first generated token
+        self._last_sent: Optional[float] = None
+
+    def due(self, new_tokens: int) -> bool:
+        """Add a part with new_tokens generated tokens to the pending parts,
+        returning whether they are due to be sent
+        """
+        self._pending_tokens += new_tokens
+        if not self._pending_tokens:
+            # Parts without generated tokens (e.g. input details) wait for one
+            return False
+        now = time.monotonic()
+        if (
+            self._last_sent is None
+            or (self.max_tokens and self._pending_tokens >= self.max_tokens)
+            or (self.window and now - self._last_sent >= self.window)
+        ):
+            self._pending_tokens = 0
+            self._last_sent = now
+            return True
+        return False
+
+
+class StreamPartCoalescer(StreamCoalescer):
+    """Merges the consecutive parts of a TGIS generation stream"""
+
+    def __init__(self, max_tokens: int = 0, window_ms: float = 0):
+        super().__init__(max_tokens, window_ms)
+        self._pending: Optional[generation_pb2.GenerationResponse] = None
+        self._generated_token_count = 0
+
+    def add(
+        self, stream_part: generation_pb2.GenerationResponse
+    ) -> Optional[generation_pb2.GenerationResponse]:
+        """Add a stream part, returning the merged pending parts if they are due"""
+        new_tokens = max(
+            stream_part.generated_token_count - self._generated_token_count, 0
+        )
+        self._generated_token_count += new_tokens
+        if self._pending is None:
+            self._pending = stream_part
+        else:
+            # Repeated fields are appended and the set scalars (counts, stop
+            # reason, seed) overwritten, but the texts are concatenated
+            text = self._pending.text + stream_part.text
+            self._pending.MergeFrom(stream_part)
+            self._pending.text = text
+        if not self.due(new_tokens):
+            return None
+        return self.flush()
+
+    def flush(self) -> Optional[generation_pb2.GenerationResponse]:
+        """Get the merged pending parts, if any, at the end of the stream"""
+        pending, self._pending = self._pending, None
+        return pending
+
+
+def _coalescing_settings(config_section: str) -> Optional[Tuple[int, float]]:
+    """Token count and time window of the coalescing of a config section, or None
+    if it is off
+    """
+    section_cfg = get_config().get(config_section, {})
+    # NOTE: env var overrides are strings
+    max_tokens = int(section_cfg.get("stream_coalesce_tokens") or 0)
+    window_ms = float(section_cfg.get("stream_coalesce_window_ms") or 0)
+    if max_tokens <= 0 and window_ms <= 0:
+        return None
+    return max(max_tokens, 0), max(window_ms, 0.0)
+
+
+def new_stream_coalescer() -> Optional[StreamCoalescer]:
+    """Get a coalescer for a local generation stream, or None if the
+    text_generation config doesn't coalesce streams
+    """
+    settings = _coalescing_settings("text_generation")
+    return StreamCoalescer(*settings) if settings else None
+
+
+def new_stream_part_coalescer() -> Optional[StreamPartCoalescer]:
+    """Get a coalescer for a TGIS generation stream, or None if the tgis_client
+    config doesn't coalesce streams
+    """
+    settings = _coalescing_settings("tgis_client")
+    return StreamPartCoalescer(*settings) if settings else None
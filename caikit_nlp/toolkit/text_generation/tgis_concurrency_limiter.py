@@ -0,0 +1,370 @@
+# Copyright The Caikit Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Adaptive concurrency limits of the TGIS generate calls of each model.
+
+Each generate call takes slots of its model's limit while in flight: one, plus
+one per tokens_per_slot tokens of its max_new_tokens. A call that doesn't fit
+waits up to queue_timeout_ms for slots, and is then rejected with a
+RESOURCE_EXHAUSTED status instead of queueing in TGIS until it times out.
+
+The limits adapt with AIMD (additive increase, multiplicative decrease): calls
+that fail because TGIS is overloaded, or whose latency per generated token is
+over latency_tolerance times the lowest one of the model's recent calls, cut the
+limit by backoff. Other calls raise it by their slots over the limit, so about
+one slot per limit's worth of calls. Only calls started after the last cut can
+cut the limit again.
+
+The limits, the slots in flight and the rejected calls are exported as Prometheus
+metrics, which the runtime exports with its own.
+"""
+
+# Standard
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Dict, Iterator, Optional, Tuple, Union
+import asyncio
+import threading
+import time
+
+# Third Party
+from prometheus_client import Counter, Gauge
+import grpc
+
+# First Party
+from caikit import get_config
+from caikit.core.exceptions import error_handler
+from caikit.runtime.types.caikit_runtime_exception import CaikitRuntimeException
+from caikit_tgis_backend.protobufs import generation_pb2
+import alog
+
+log = alog.use_channel("TGIS_LIMIT")
+error = error_handler.get(log)
+
+CONCURRENCY_LIMIT_GAUGE = Gauge(
+    "tgis_concurrency_limit",
+    "Adaptive limit of the slots of the TGIS generate calls in flight",
+    ["model_id"],
+)
+INFLIGHT_GAUGE = Gauge(
+    "tgis_inflight_slots",
+    "Slots taken by the TGIS generate calls in flight",
+    ["model_id"],
+)
+REJECTED_COUNTER = Counter(
+    "tgis_rejected_generate_calls",
+    "Count of TGIS generate calls rejected over the concurrency limit",
+    ["model_id"],
+)
+
+# Status codes of the calls that failed because TGIS is overloaded
+_OVERLOAD_CODES = (
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+)
+
+# Number of calls of each of the two windows of the lowest recent latency per token
+_BASELINE_WINDOW = 500
+
+# Max time between the checks of an async call waiting for slots
+_ASYNC_POLL_SECONDS = 0.005
+
+_GenerationRequest = Union[
+    generation_pb2.BatchedGenerationRequest, generation_pb2.SingleGenerationRequest
+]
+
+
+class LimitedCall:
+    """A generate call holding slots of its model's limit"""
+
+    def __init__(self, slots: int):
+        self.slots = slots
+        self.started = time.monotonic()
+        # Set by the caller from the response, to measure the latency per token
+        self.generated_tokens = 0
+
+
+class _ModelLimit:
+    """Adaptive concurrency limit of the calls of a model"""
+
+    def __init__(self, model_id: str, initial_limit: float):
+        self.model_id = model_id
+        self.limit = initial_limit
+        self.inflight = 0
+        # Lowest latencies per generated token of the current and previous windows
+        # of calls, so that the baseline follows the model getting slower
+        self.window_min = float("inf")
+        self.previous_min = float("inf")
+        self.window_calls = 0
+        self.last_cut = 0.0
+        self.condition = threading.Condition()
+        CONCURRENCY_LIMIT_GAUGE.labels(model_id).set(self.limit)
+
+    @property
+    def baseline(self) -> float:
+        """Lowest recent latency per generated token"""
+        return min(self.window_min, self.previous_min)
+
+
+class TGISConcurrencyLimiter:
+    """Adaptive concurrency limits of the TGIS generate calls of each model"""
+
+    def __init__(
+        self,
+        initial_limit: int = 16,
+        min_limit: int = 1,
+        max_limit: int = 256,
+        tokens_per_slot: int = 256,
+        latency_tolerance: float = 2.0,
+        backoff: float = 0.9,
+        queue_timeout_ms: float = 0,
+    ):
+        """
+        Args:
+            initial_limit: int
+                Slots of each model before adapting
+            min_limit: int
+                Lowest limit of a model
+            max_limit: int
+                Highest limit of a model
+            tokens_per_slot: int
+                max_new_tokens of a call that take one more slot
+            latency_tolerance: float
+                Ratio of the latency per token to the lowest recent one over which
+                the limit is cut
+            backoff: float
+                Factor of the limit when it is cut
+            queue_timeout_ms: float
+                Time a call waits for slots before it is rejected
+        """
+        error.value_check(
+            "<NLP39812470E>",
+            0 < min_limit <= initial_limit <= max_limit,
+            "The limits must be positive with min_limit <= initial_limit <= max_limit",
+        )
+        error.value_check(
+            "<NLP39812471E>", tokens_per_slot > 0, "tokens_per_slot must be positive"
+        )
+        error.value_check(
+            "<NLP39812472E>",
+            latency_tolerance > 1,
+            "latency_tolerance must be greater than 1",
+        )
+        error.value_check(
+            "<NLP39812473E>", 0 < backoff < 1, "backoff must be between 0 and 1"
+        )
+        self.initial_limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tokens_per_slot = tokens_per_slot
+        self.latency_tolerance = latency_tolerance
+        self.backoff = backoff
+        self.queue_timeout = queue_timeout_ms / 1000
+        self._models: Dict[str, _ModelLimit] = {}
+        self._lock = threading.Lock()
+
+    def _model(self, model_id: str) -> _ModelLimit:
+        with self._lock:
+            model = self._models.get(model_id)
+            if model is None:
+                model = _ModelLimit(model_id, self.initial_limit)
+                self._models[model_id] = model
+            return model
+
+    def limit(self, model_id: str) -> float:
+        """Current concurrency limit of a model, in slots"""
+        return self._model(model_id).limit
+
+    def inflight(self, model_id: str) -> int:
+        """Slots taken by the calls of a model in flight"""
+        return self._model(model_id).inflight
+
+    def slots(self, request: _GenerationRequest) -> int:
+        """Slots taken by a generate request, from its max_new_tokens"""
+        if isinstance(request, generation_pb2.SingleGenerationRequest):
+            texts = 1
+        else:
+            texts = max(len(request.requests), 1)
+        max_new_tokens = request.params.stopping.max_new_tokens
+        return texts * (1 + max_new_tokens // self.tokens_per_slot)
+
+    @staticmethod
+    def _try_take(model: _ModelLimit, slots: int) -> bool:
+        """Take slots of a model if they fit, with the model's condition held. A
+        call larger than the limit is let through when nothing else is in flight.
+        """
+        if model.inflight and model.inflight + slots > model.limit:
+            return False
+        model.inflight += slots
+        INFLIGHT_GAUGE.labels(model.model_id).set(model.inflight)
+        return True
+
+    def _reject(self, model: _ModelLimit, slots: int):
+        REJECTED_COUNTER.labels(model.model_id).inc()
+        log.debug(
+            "Rejecting a TGIS generate call of %s taking %d slots: %d of %.1f in use",
+            model.model_id,
+            slots,
+            model.inflight,
+            model.limit,
+        )
+        raise CaikitRuntimeException(
+            grpc.StatusCode.RESOURCE_EXHAUSTED,
+            f"Too many concurrent generation requests for model {model.model_id}, "
+            "retry later",
+        )
+
+    def _release(
+        self,
+        model: _ModelLimit,
+        call: LimitedCall,
+        err: Optional[BaseException] = None,
+    ):
+        """Give back the slots of a call and adapt the limit of its model. Calls
+        that failed for other reasons than overload, or were cancelled, don't adapt
+        it.
+        """
+        latency = time.monotonic() - call.started
+        # The TGIS errors are raised as CaikitCoreExceptions from them
+        rpc_error = err if isinstance(err, grpc.RpcError) else err and err.__cause__
+        overloaded = isinstance(rpc_error, grpc.RpcError) and (
+            rpc_error.code() in _OVERLOAD_CODES
+        )
+        with model.condition:
+            model.inflight -= call.slots
+            INFLIGHT_GAUGE.labels(model.model_id).set(model.inflight)
+            if err is None or overloaded:
+                self._adapt(model, call, latency, overloaded)
+            model.condition.notify_all()
+
+    def _adapt(
+        self, model: _ModelLimit, call: LimitedCall, latency: float, overloaded: bool
+    ):
+        """Update the limit of a model from a finished call"""
+        latency_per_token = latency / (call.generated_tokens + 1)
+        slow = False
+        if not overloaded:
+            slow = latency_per_token > self.latency_tolerance * model.baseline
+            model.window_min = min(model.window_min, latency_per_token)
+            model.window_calls += 1
+            if model.window_calls >= _BASELINE_WINDOW:
+                model.previous_min = model.window_min
+                model.window_min = float("inf")
+                model.window_calls = 0
+        if overloaded or slow:
+            # Calls started before the last cut saw the previous limit
+            if call.started >= model.last_cut:
+                model.limit = max(self.min_limit, model.limit * self.backoff)
+                model.last_cut = time.monotonic()
+        else:
+            model.limit = min(self.max_limit, model.limit + call.slots / model.limit)
+        CONCURRENCY_LIMIT_GAUGE.labels(model.model_id).set(model.limit)
+
+    @contextmanager
+    def limited(self, request: _GenerationRequest) -> Iterator[LimitedCall]:
+        """Hold the slots of a generate call while it runs, waiting up to
+        queue_timeout_ms for them
+
+        Raises:
+            CaikitRuntimeException
+                RESOURCE_EXHAUSTED if the slots aren't free in time
+        """
+        model = self._model(request.model_id)
+        slots = self.slots(request)
+        deadline = time.monotonic() + self.queue_timeout
+        with model.condition:
+            while not self._try_take(model, slots):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._reject(model, slots)
+                model.condition.wait(remaining)
+        call = LimitedCall(slots)
+        try:
+            yield call
+        except BaseException as err:
+            self._release(model, call, err)
+            raise
+        self._release(model, call)
+
+    @asynccontextmanager
+    async def limited_async(
+        self, request: _GenerationRequest
+    ) -> AsyncIterator[LimitedCall]:
+        """Async variant of limited, for the calls on the event loop"""
+        model = self._model(request.model_id)
+        slots = self.slots(request)
+        deadline = time.monotonic() + self.queue_timeout
+        while True:
+            with model.condition:
+                if self._try_take(model, slots):
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._reject(model, slots)
+            await asyncio.sleep(min(remaining, _ASYNC_POLL_SECONDS))
+        call = LimitedCall(slots)
+        try:
+            yield call
+        except BaseException as err:
+            self._release(model, call, err)
+            raise
+        self._release(model, call)
+
+
+_LIMITER: Optional[TGISConcurrencyLimiter] = None
+_LIMITER_LOCK = threading.Lock()
+
+
+def _limiter_settings() -> Optional[Tuple]:
+    """Settings of the concurrency limiter, or None if it is off"""
+    client_cfg = get_config().get("tgis_client", {})
+    # NOTE: env var overrides are strings
+    enabled = str(client_cfg.get("concurrency_limit", False)).lower()
+    if enabled not in ("true", "1"):
+        return None
+    return (
+        int(client_cfg.get("concurrency_initial_limit") or 16),
+        int(client_cfg.get("concurrency_min_limit") or 1),
+        int(client_cfg.get("concurrency_max_limit") or 256),
+        int(client_cfg.get("concurrency_tokens_per_slot") or 256),
+        float(client_cfg.get("concurrency_latency_tolerance") or 2.0),
+        float(client_cfg.get("concurrency_backoff") or 0.9),
+        float(client_cfg.get("concurrency_queue_timeout_ms") or 0),
+    )
+
+
+def get_concurrency_limiter() -> Optional[TGISConcurrencyLimiter]:
+    """Get the concurrency limiter shared by the TGIS generation clients, or None
+    if tgis_client.concurrency_limit is off in the config
+    """
+    global _LIMITER  # pylint: disable=global-statement
+    settings = _limiter_settings()
+    if settings is None:
+        return None
+    with _LIMITER_LOCK:
+        if (
+            _LIMITER is None
+            or (
+                _LIMITER.initial_limit,
+                _LIMITER.min_limit,
+                _LIMITER.max_limit,
+                _LIMITER.tokens_per_slot,
+                _LIMITER.latency_tolerance,
+                _LIMITER.backoff,
+                _LIMITER.queue_timeout * 1000,
+            )
+            != settings
+        ):
+            _LIMITER = TGISConcurrencyLimiter(*settings)
+        return _LIMITER
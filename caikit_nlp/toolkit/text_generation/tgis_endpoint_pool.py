@@ -0,0 +1,479 @@
+# Copyright The Caikit Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Client-side balancing of TGIS calls over several endpoints serving a model.
+
+A pool keeps a channel per endpoint and sends each call to the endpoint with the
+least outstanding load: the number of calls in flight ("requests"), or an
+estimate of their tokens, i.e. input words plus max new tokens ("tokens"). An
+endpoint that fails a call as unavailable is ejected for a while, and the call
+is retried on another endpoint if it didn't stream any output yet.
+
+The pools have the methods of the GenerationServiceStub, so the TGIS generation
+clients use them like the backend clients.
+"""
+
+# Standard
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import asyncio
+import threading
+import time
+import weakref
+
+# Third Party
+import grpc
+
+# First Party
+from caikit import get_config
+from caikit.core.exceptions import error_handler
+from caikit_tgis_backend.protobufs import generation_pb2, generation_pb2_grpc
+from caikit_tgis_backend.tgis_connection import TGISConnection
+import alog
+
+# Local
+from .tgis_utils import create_tgis_channel
+
+log = alog.use_channel("TGIS_POOL")
+error = error_handler.get(log)
+
+BALANCE_BY = ("requests", "tokens")
+
+# Status codes of the calls that an endpoint failed without processing them
+_EJECT_CODES = (grpc.StatusCode.UNAVAILABLE,)
+
+
+class _Endpoint:
+    """A TGIS endpoint of a pool with its outstanding load"""
+
+    def __init__(self, hostname: str, channel: Any):
+        self.hostname = hostname
+        self.channel = channel
+        self.stub = generation_pb2_grpc.GenerationServiceStub(channel)
+        self.outstanding = 0
+        self.ejected_until = 0.0
+
+    def __repr__(self):
+        return f"{self.hostname} (outstanding {self.outstanding})"
+
+
+class _EndpointBalancer:
+    """Least outstanding load selection and ejection of the endpoints of a pool"""
+
+    def __init__(
+        self,
+        endpoints: List[_Endpoint],
+        balance_by: str = "requests",
+        ejection_seconds: float = 10.0,
+    ):
+        error.value_check("<NLP61739401E>", endpoints, "No TGIS endpoints given")
+        error.value_check(
+            "<NLP61739402E>",
+            balance_by in BALANCE_BY,
+            "Unsupported balance_by {}, expected one of {}",
+            balance_by,
+            BALANCE_BY,
+        )
+        self.endpoints = endpoints
+        self.balance_by = balance_by
+        self.ejection_seconds = ejection_seconds
+        self._lock = threading.Lock()
+        # Rotating start of the selection, so that ties don't all go to the
+        # first endpoint
+        self._next = 0
+
+    def _weight(self, request: Any) -> int:
+        """Load of a call: 1 per call, or its estimated tokens"""
+        if self.balance_by == "requests":
+            return 1
+        if isinstance(request, generation_pb2.BatchedGenerationRequest):
+            texts = [req.text for req in request.requests]
+        elif isinstance(request, generation_pb2.SingleGenerationRequest):
+            texts = [request.request.text]
+        elif isinstance(request, generation_pb2.BatchedTokenizeRequest):
+            return sum(len(req.text.split()) for req in request.requests) or 1
+        else:
+            return 1
+        max_new_tokens = request.params.stopping.max_new_tokens
+        return sum(len(text.split()) + max_new_tokens for text in texts) or 1
+
+    def _acquire(self, weight: int, tried: Set[str]) -> _Endpoint:
+        """Pick the healthy endpoint with the least load that wasn't tried yet,
+        falling back to the one that comes back soonest if all are ejected
+        """
+        now = time.monotonic()
+        with self._lock:
+            start = self._next % len(self.endpoints)
+            self._next += 1
+            rotated = self.endpoints[start:] + self.endpoints[:start]
+            candidates = [
+                endpoint for endpoint in rotated if endpoint.hostname not in tried
+            ] or rotated
+            healthy = [
+                endpoint for endpoint in candidates if endpoint.ejected_until <= now
+            ]
+            if healthy:
+                endpoint = min(healthy, key=lambda endpoint: endpoint.outstanding)
+            else:
+                endpoint = min(candidates, key=lambda endpoint: endpoint.ejected_until)
+            endpoint.outstanding += weight
+        tried.add(endpoint.hostname)
+        return endpoint
+
+    def _release(self, endpoint: _Endpoint, weight: int):
+        with self._lock:
+            endpoint.outstanding -= weight
+
+    def _eject(self, endpoint: _Endpoint, err: grpc.RpcError) -> bool:
+        """Eject the endpoint of a call if it failed as unavailable"""
+        if err.code() not in _EJECT_CODES:
+            return False
+        log.warning(
+            "<NLP61739403W>",
+            "Ejecting TGIS endpoint {} for {}s: {}".format(
+                endpoint.hostname, self.ejection_seconds, err.details()
+            ),
+        )
+        with self._lock:
+            endpoint.ejected_until = time.monotonic() + self.ejection_seconds
+        return True
+
+    def _should_retry(
+        self, endpoint: _Endpoint, err: grpc.RpcError, tried: Set[str]
+    ) -> bool:
+        """Eject the endpoint of a call that failed as unavailable, and check
+        whether another endpoint can serve the call
+        """
+        return self._eject(endpoint, err) and any(
+            endpoint.hostname not in tried for endpoint in self.endpoints
+        )
+
+    @contextmanager
+    def _endpoint(self, weight: int, tried: Set[str]):
+        endpoint = self._acquire(weight, tried)
+        try:
+            yield endpoint
+        finally:
+            self._release(endpoint, weight)
+
+
+class TGISEndpointPool(_EndpointBalancer):
+    """GenerationServiceStub balancing the calls over several TGIS endpoints"""
+
+    def __init__(
+        self,
+        hostnames: List[str],
+        balance_by: str = "requests",
+        ejection_seconds: float = 10.0,
+        connection: Optional[TGISConnection] = None,
+    ):
+        """
+        Args:
+            hostnames: List[str]
+                Addresses of the TGIS endpoints
+            balance_by: str
+                "requests" to balance the number of calls in flight, "tokens" to
+                balance their estimated tokens
+            ejection_seconds: float
+                Time an endpoint gets no calls after failing one as unavailable
+            connection: Optional[TGISConnection]
+                Connection whose TLS settings to use for the endpoints
+        """
+        super().__init__(
+            [
+                _Endpoint(hostname, create_tgis_channel(hostname, connection))
+                for hostname in hostnames
+            ],
+            balance_by,
+            ejection_seconds,
+        )
+
+    def _unary(self, method: str, request: Any, **kwargs) -> Any:
+        weight = self._weight(request)
+        tried = set()
+        while True:
+            with self._endpoint(weight, tried) as endpoint:
+                try:
+                    return getattr(endpoint.stub, method)(request, **kwargs)
+                except grpc.RpcError as err:
+                    if not self._should_retry(endpoint, err, tried):
+                        raise
+
+    # pylint: disable=invalid-name
+    def Generate(self, request, **kwargs):
+        return self._unary("Generate", request, **kwargs)
+
+    def Tokenize(self, request, **kwargs):
+        return self._unary("Tokenize", request, **kwargs)
+
+    def ModelInfo(self, request, **kwargs):
+        return self._unary("ModelInfo", request, **kwargs)
+
+    def generate_future(
+        self,
+        request: generation_pb2.BatchedGenerationRequest,
+        tried: Set[str],
+        **kwargs,
+    ) -> grpc.Future:
+        """Start a Generate call on the endpoint with the least load that wasn't
+        tried yet, without retries. The endpoint is added to tried, and ejected if
+        it fails the call as unavailable.
+        """
+        weight = self._weight(request)
+        endpoint = self._acquire(weight, tried)
+        call = endpoint.stub.Generate.future(request, **kwargs)
+
+        def _done(call):
+            self._release(endpoint, weight)
+            if not call.cancelled() and call.exception() is not None:
+                self._eject(endpoint, call.exception())
+
+        call.add_done_callback(_done)
+        return call
+
+    def GenerateStream(
+        self, request, **kwargs
+    ) -> Iterable[generation_pb2.GenerationResponse]:
+        weight = self._weight(request)
+        tried = set()
+        while True:
+            with self._endpoint(weight, tried) as endpoint:
+                call = endpoint.stub.GenerateStream(request, **kwargs)
+                streamed = False
+                try:
+                    for stream_part in call:
+                        streamed = True
+                        yield stream_part
+                    return
+                except grpc.RpcError as err:
+                    if streamed or not self._should_retry(endpoint, err, tried):
+                        raise
+                finally:
+                    call.cancel()
+
+    def close(self):
+        """Close the channels of the endpoints"""
+        for endpoint in self.endpoints:
+            endpoint.channel.close()
+
+
+class AsyncTGISEndpointPool(_EndpointBalancer):
+    """grpc.aio GenerationServiceStub balancing the calls over several TGIS
+    endpoints. Like grpc.aio channels, it belongs to the event loop it is created
+    in.
+    """
+
+    def __init__(
+        self,
+        hostnames: List[str],
+        balance_by: str = "requests",
+        ejection_seconds: float = 10.0,
+        connection: Optional[TGISConnection] = None,
+    ):
+        """
+        Args:
+            hostnames: List[str]
+                Addresses of the TGIS endpoints
+            balance_by: str
+                "requests" to balance the number of calls in flight, "tokens" to
+                balance their estimated tokens
+            ejection_seconds: float
+                Time an endpoint gets no calls after failing one as unavailable
+            connection: Optional[TGISConnection]
+                Connection whose TLS settings to use for the endpoints
+        """
+        super().__init__(
+            [
+                _Endpoint(
+                    hostname, create_tgis_channel(hostname, connection, use_aio=True)
+                )
+                for hostname in hostnames
+            ],
+            balance_by,
+            ejection_seconds,
+        )
+
+    async def _unary(self, method: str, request: Any, **kwargs) -> Any:
+        weight = self._weight(request)
+        tried = set()
+        while True:
+            with self._endpoint(weight, tried) as endpoint:
+                try:
+                    return await getattr(endpoint.stub, method)(request, **kwargs)
+                except grpc.RpcError as err:
+                    if not self._should_retry(endpoint, err, tried):
+                        raise
+
+    # pylint: disable=invalid-name
+    def Generate(self, request, **kwargs):
+        return self._unary("Generate", request, **kwargs)
+
+    def Tokenize(self, request, **kwargs):
+        return self._unary("Tokenize", request, **kwargs)
+
+    def ModelInfo(self, request, **kwargs):
+        return self._unary("ModelInfo", request, **kwargs)
+
+    def GenerateStream(self, request, **kwargs) -> "_AsyncStream":
+        return _AsyncStream(self, request, kwargs)
+
+    async def close(self):
+        """Close the channels of the endpoints"""
+        for endpoint in self.endpoints:
+            await endpoint.channel.close()
+
+
+class _AsyncStream:
+    """Streaming call of an AsyncTGISEndpointPool, iterated and cancelled like a
+    grpc.aio streaming call
+    """
+
+    def __init__(self, pool: AsyncTGISEndpointPool, request: Any, kwargs: dict):
+        self._pool = pool
+        self._request = request
+        self._kwargs = kwargs
+        self._weight = pool._weight(request)
+        self._tried = set()
+        self._endpoint = None
+        self._call = None
+        self._streamed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> generation_pb2.GenerationResponse:
+        while True:
+            if self._call is None:
+                self._endpoint = self._pool._acquire(self._weight, self._tried)
+                self._call = self._endpoint.stub.GenerateStream(
+                    self._request, **self._kwargs
+                )
+            endpoint = self._endpoint
+            try:
+                stream_part = await self._call.read()
+            except grpc.RpcError as err:
+                self._release()
+                if self._streamed or not self._pool._should_retry(
+                    endpoint, err, self._tried
+                ):
+                    raise
+                self._call = None
+                continue
+            if stream_part is grpc.aio.EOF:
+                self._release()
+                raise StopAsyncIteration
+            self._streamed = True
+            return stream_part
+
+    def _release(self):
+        if self._endpoint is not None:
+            self._pool._release(self._endpoint, self._weight)
+            self._endpoint = None
+
+    def cancel(self) -> bool:
+        self._release()
+        return self._call.cancel() if self._call is not None else False
+
+
+def get_endpoints(model_id: str) -> Optional[List[str]]:
+    """Get the TGIS endpoints of a model from tgis_client.endpoints in the config"""
+    endpoints = get_config().get("tgis_client", {}).get("endpoints") or {}
+    hostnames = endpoints.get(model_id)
+    if not hostnames:
+        return None
+    if isinstance(hostnames, str):
+        # NOTE: env var overrides are strings
+        hostnames = hostnames.split(",")
+    return [hostname.strip() for hostname in hostnames if hostname.strip()]
+
+
+def _pool_settings(model_id: str) -> Optional[Tuple[Tuple[str, ...], str, float]]:
+    hostnames = get_endpoints(model_id)
+    if not hostnames:
+        return None
+    client_cfg = get_config().get("tgis_client", {})
+    return (
+        tuple(hostnames),
+        client_cfg.get("balance_by") or "requests",
+        float(client_cfg.get("ejection_seconds") or 10.0),
+    )
+
+
+_POOLS: Dict[Tuple[str, Tuple], TGISEndpointPool] = {}
+_ASYNC_POOLS: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_POOLS_LOCK = threading.Lock()
+
+
+def get_endpoint_pool(
+    model_id: str, connection: Optional[TGISConnection] = None
+) -> Optional[TGISEndpointPool]:
+    """Get the pool of the TGIS endpoints of a model, shared by all the modules of
+    the model, or None if no endpoints are configured for it.
+
+    Args:
+        model_id: str
+            Model served by the endpoints
+        connection: Optional[TGISConnection]
+            Connection whose TLS settings to use for the endpoints
+
+    Returns:
+        Optional[TGISEndpointPool]
+            The pool
+    """
+    settings = _pool_settings(model_id)
+    if settings is None:
+        return None
+    with _POOLS_LOCK:
+        pool = _POOLS.get((model_id, settings))
+        if pool is None:
+            log.debug("Creating TGIS endpoint pool for %s: %s", model_id, settings)
+            pool = TGISEndpointPool(*settings, connection=connection)
+            _POOLS[(model_id, settings)] = pool
+        return pool
+
+
+def get_async_endpoint_pool(
+    model_id: str, connection: Optional[TGISConnection] = None
+) -> Optional[AsyncTGISEndpointPool]:
+    """Get the async pool of the TGIS endpoints of a model for the running event
+    loop, or None if no endpoints are configured for it.
+
+    Args:
+        model_id: str
+            Model served by the endpoints
+        connection: Optional[TGISConnection]
+            Connection whose TLS settings to use for the endpoints
+
+    Returns:
+        Optional[AsyncTGISEndpointPool]
+            The pool
+    """
+    settings = _pool_settings(model_id)
+    if settings is None:
+        return None
+    loop_pools = _ASYNC_POOLS.setdefault(asyncio.get_running_loop(), {})
+    pool = loop_pools.get((model_id, settings))
+    if pool is None:
+        pool = AsyncTGISEndpointPool(*settings, connection=connection)
+        loop_pools[(model_id, settings)] = pool
+    return pool
+
+
+async def close_async_endpoint_pools():
+    """Close the async pools of the running event loop, e.g. before the loop is
+    closed
+    """
+    loop_pools = _ASYNC_POOLS.pop(asyncio.get_running_loop(), {})
+    for pool in loop_pools.values():
+        await pool.close()
@@ -0,0 +1,173 @@
+# Copyright The Caikit Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Coalescing of concurrent unary TGIS generate calls into batched requests.
+
+The first call for a TGIS client, model, prefix, parameters and timeout opens a
+batch and waits up to the coalescing window for other calls with the same key.
+It then sends all of their generation requests as one BatchedGenerationRequest
+and hands each call back its own slice of the responses. A batch is sent early
+once it reaches the max batch size.
+"""
+
+# Standard
+from typing import Any, Dict, List, Optional, Tuple
+import threading
+
+# First Party
+from caikit import get_config
+from caikit.core.exceptions import error_handler
+from caikit_tgis_backend.protobufs import generation_pb2
+import alog
+
+log = alog.use_channel("TGIS_COALESCE")
+error = error_handler.get(log)
+
+_BatchKey = Tuple[Any, str, str, bytes, Optional[float]]
+
+
+class _Batch:
+    """Generation requests being collected for one batched TGIS call"""
+
+    def __init__(self):
+        self.requests: List[generation_pb2.GenerationRequest] = []
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.response: Optional[generation_pb2.BatchedGenerationResponse] = None
+        self.error: Optional[Exception] = None
+
+
+class TGISRequestCoalescer:
+    """Coalesces concurrent unary generate calls into batched TGIS calls"""
+
+    def __init__(self, window_ms: float, max_batch_size: int = 16):
+        """
+        Args:
+            window_ms: float
+                Time the first call of a batch waits for more calls, in milliseconds
+            max_batch_size: int
+                Max number of generation requests sent in one batch
+        """
+        error.value_check("<NLP14852303E>", window_ms > 0, "window_ms must be positive")
+        error.value_check(
+            "<NLP14852304E>", max_batch_size > 0, "max_batch_size must be positive"
+        )
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._batches: Dict[_BatchKey, _Batch] = {}
+        self._lock = threading.Lock()
+
+    def generate(
+        self,
+        tgis_client: Any,
+        request: generation_pb2.BatchedGenerationRequest,
+        timeout: Optional[float] = None,
+    ) -> generation_pb2.BatchedGenerationResponse:
+        """Send a batched generation request to TGIS with the concurrent requests
+        that share its model, prefix, parameters and timeout.
+
+        Args:
+            tgis_client: Any
+                TGIS gRPC client (GenerationServiceStub)
+            request: generation_pb2.BatchedGenerationRequest
+                Request to send
+            timeout: Optional[float]
+                Timeout of the TGIS call, in seconds
+
+        Returns:
+            generation_pb2.BatchedGenerationResponse
+                The responses to the generation requests of request. Errors of the
+                TGIS call are raised by every call of the batch.
+        """
+        key = (
+            tgis_client,
+            request.model_id,
+            request.prefix_id,
+            request.params.SerializeToString(deterministic=True),
+            timeout,
+        )
+        with self._lock:
+            batch = self._batches.get(key)
+            is_leader = batch is None
+            if is_leader:
+                batch = _Batch()
+                self._batches[key] = batch
+            start = len(batch.requests)
+            batch.requests.extend(request.requests)
+            if len(batch.requests) >= self.max_batch_size:
+                # Later calls open a new batch
+                del self._batches[key]
+                batch.full.set()
+
+        if is_leader:
+            batch.full.wait(self.window)
+            with self._lock:
+                if self._batches.get(key) is batch:
+                    del self._batches[key]
+            self._send(tgis_client, request, batch, timeout)
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        return generation_pb2.BatchedGenerationResponse(
+            responses=batch.response.responses[start : start + len(request.requests)]
+        )
+
+    @staticmethod
+    def _send(
+        tgis_client: Any,
+        request: generation_pb2.BatchedGenerationRequest,
+        batch: _Batch,
+        timeout: Optional[float],
+    ):
+        """Send the requests of a closed batch, with the model, prefix and
+        parameters of request
+        """
+        batched_request = generation_pb2.BatchedGenerationRequest()
+        batched_request.CopyFrom(request)
+        del batched_request.requests[:]
+        batched_request.requests.extend(batch.requests)
+        log.debug("Sending %d coalesced generation requests", len(batch.requests))
+        try:
+            batch.response = tgis_client.Generate(batched_request, timeout=timeout)
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            batch.error = err
+        finally:
+            batch.done.set()
+
+
+_COALESCER: Optional[TGISRequestCoalescer] = None
+_COALESCER_LOCK = threading.Lock()
+
+
+def get_request_coalescer() -> Optional[TGISRequestCoalescer]:
+    """Get the coalescer shared by the TGIS generation clients, or None if
+    tgis_client.coalesce_window_ms is not set in the config
+    """
+    global _COALESCER  # pylint: disable=global-statement
+    client_cfg = get_config().get("tgis_client", {})
+    # NOTE: env var overrides are strings
+    window_ms = float(client_cfg.get("coalesce_window_ms") or 0)
+    if window_ms <= 0:
+        return None
+    max_batch_size = int(client_cfg.get("coalesce_max_batch_size") or 16)
+    with _COALESCER_LOCK:
+        if (
+            _COALESCER is None
+            or _COALESCER.window != window_ms / 1000
+            or _COALESCER.max_batch_size != max_batch_size
+        ):
+            _COALESCER = TGISRequestCoalescer(window_ms, max_batch_size)
+        return _COALESCER
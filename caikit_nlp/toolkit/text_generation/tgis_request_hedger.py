@@ -0,0 +1,290 @@
+# Copyright The Caikit Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Hedging of deterministic unary TGIS generate calls.
+
+A hedged call that got no response after a percentile of the recent latencies of
+its model sends the same request again, to another endpoint if the TGIS client is
+a TGISEndpointPool. The first response wins and the other call is cancelled. Only
+greedy and seeded sampling requests are hedged, since both calls must give the
+same output. Until a model has enough latency samples, its calls aren't hedged.
+
+The hedged calls, hedges sent and hedges that won are counted in Prometheus
+metrics, which the runtime exports with its own.
+"""
+
+# Standard
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set
+import queue
+import threading
+import time
+
+# Third Party
+from prometheus_client import Counter
+import grpc
+
+# First Party
+from caikit import get_config
+from caikit.core.exceptions import error_handler
+from caikit_tgis_backend.protobufs import generation_pb2
+import alog
+
+log = alog.use_channel("TGIS_HEDGE")
+error = error_handler.get(log)
+
+HEDGEABLE_CALL_COUNTER = Counter(
+    "tgis_hedgeable_generate_calls",
+    "Count of deterministic unary TGIS generate calls that can be hedged",
+    ["model_id"],
+)
+HEDGE_COUNTER = Counter(
+    "tgis_generate_hedges",
+    "Count of hedge requests sent for slow unary TGIS generate calls",
+    ["model_id"],
+)
+HEDGE_WIN_COUNTER = Counter(
+    "tgis_generate_hedge_wins",
+    "Count of hedged unary TGIS generate calls answered by the hedge request",
+    ["model_id"],
+)
+
+# Status codes of the failed calls that send the hedge right away
+_HEDGE_NOW_CODES = (grpc.StatusCode.UNAVAILABLE,)
+
+# New latency samples after which the hedge delay of a model is computed again
+_DELAY_REFRESH_SAMPLES = 16
+
+
+def is_deterministic(params: generation_pb2.Parameters) -> bool:
+    """Whether generation parameters give the same output for the same text:
+    greedy decoding or seeded sampling
+    """
+    greedy = params.method == generation_pb2.DecodingMethod.GREEDY
+    return greedy or params.sampling.HasField("seed")
+
+
+class _ModelLatencies:
+    """Recent latencies of the calls of a model and their hedge delay"""
+
+    def __init__(self, window: int):
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.new_samples = 0
+        self.delay: Optional[float] = None
+
+
+class TGISRequestHedger:
+    """Hedges deterministic unary generate calls that are slower than usual"""
+
+    def __init__(
+        self,
+        percentile: float,
+        min_delay_ms: float = 10.0,
+        window: int = 1000,
+        min_samples: int = 20,
+    ):
+        """
+        Args:
+            percentile: float
+                Percentile of the recent call latencies of a model after which
+                its calls are hedged
+            min_delay_ms: float
+                Min time before a call is hedged, in milliseconds
+            window: int
+                Number of recent call latencies kept per model
+            min_samples: int
+                Number of latencies a model needs before its calls are hedged
+        """
+        error.value_check(
+            "<NLP48327310E>",
+            0 < percentile < 100,
+            "percentile must be between 0 and 100",
+        )
+        error.value_check(
+            "<NLP48327311E>",
+            0 < min_samples <= window,
+            "min_samples must be positive and at most window",
+        )
+        self.percentile = percentile
+        self.min_delay = min_delay_ms / 1000
+        self.window = window
+        self.min_samples = min_samples
+        self._latencies: Dict[str, _ModelLatencies] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def hedgeable(request: generation_pb2.BatchedGenerationRequest) -> bool:
+        """Whether a request gives the same output when sent twice: greedy or
+        seeded sampling
+        """
+        return is_deterministic(request.params)
+
+    def hedge_delay(self, model_id: str) -> Optional[float]:
+        """Time after which the calls of a model are hedged, in seconds, or None
+        if it doesn't have enough latency samples yet
+        """
+        with self._lock:
+            latencies = self._latencies.get(model_id)
+            if latencies is None or len(latencies.samples) < self.min_samples:
+                return None
+            if latencies.delay is None or (
+                latencies.new_samples >= _DELAY_REFRESH_SAMPLES
+            ):
+                samples = sorted(latencies.samples)
+                index = min(int(len(samples) * self.percentile / 100), len(samples) - 1)
+                latencies.delay = max(samples[index], self.min_delay)
+                latencies.new_samples = 0
+            return latencies.delay
+
+    def _add_latency(self, model_id: str, latency: float):
+        with self._lock:
+            latencies = self._latencies.get(model_id)
+            if latencies is None:
+                latencies = _ModelLatencies(self.window)
+                self._latencies[model_id] = latencies
+            latencies.samples.append(latency)
+            latencies.new_samples += 1
+
+    def generate(
+        self,
+        tgis_client: Any,
+        request: generation_pb2.BatchedGenerationRequest,
+        timeout: Optional[float] = None,
+    ) -> generation_pb2.BatchedGenerationResponse:
+        """Send a generation request to TGIS, and again if it gets no response
+        within the hedge delay of its model.
+
+        Args:
+            tgis_client: Any
+                TGIS gRPC client (GenerationServiceStub or TGISEndpointPool)
+            request: generation_pb2.BatchedGenerationRequest
+                Deterministic request to send
+            timeout: Optional[float]
+                Timeout of the TGIS call, in seconds
+
+        Returns:
+            generation_pb2.BatchedGenerationResponse
+                The first response to the request. If all the calls sent fail,
+                the error of the last one is raised.
+        """
+        model_id = request.model_id
+        HEDGEABLE_CALL_COUNTER.labels(model_id).inc()
+        start = time.monotonic()
+        delay = self.hedge_delay(model_id)
+        if delay is None:
+            response = tgis_client.Generate(request, timeout=timeout)
+            self._add_latency(model_id, time.monotonic() - start)
+            return response
+
+        tried = set()
+        calls: List[grpc.Future] = []
+        finished: queue.Queue = queue.Queue()
+
+        def send():
+            remaining = None
+            if timeout is not None:
+                remaining = max(timeout - (time.monotonic() - start), 0)
+            call = self._start_call(tgis_client, request, remaining, tried)
+            calls.append(call)
+            call.add_done_callback(finished.put)
+
+        send()
+        wait = delay
+        pending = 1
+        call = None
+        try:
+            while True:
+                try:
+                    call = finished.get(timeout=wait)
+                except queue.Empty:
+                    log.debug("Hedging %s call after %.3fs", model_id, delay)
+                    HEDGE_COUNTER.labels(model_id).inc()
+                    send()
+                    pending += 1
+                    wait = None
+                    continue
+                pending -= 1
+                err = call.exception()
+                if err is None:
+                    break
+                if len(calls) == 1 and err.code() in _HEDGE_NOW_CODES:
+                    log.debug("Hedging failed %s call: %s", model_id, err.code())
+                    HEDGE_COUNTER.labels(model_id).inc()
+                    send()
+                    pending += 1
+                    wait = None
+                elif pending == 0:
+                    raise err
+                else:
+                    # The other call may still succeed
+                    wait = None
+        finally:
+            for other_call in calls:
+                if other_call is not call:
+                    other_call.cancel()
+
+        if call is not calls[0]:
+            HEDGE_WIN_COUNTER.labels(model_id).inc()
+        self._add_latency(model_id, time.monotonic() - start)
+        return call.result()
+
+    @staticmethod
+    def _start_call(
+        tgis_client: Any,
+        request: generation_pb2.BatchedGenerationRequest,
+        timeout: Optional[float],
+        tried: Set[str],
+    ) -> grpc.Future:
+        """Start a Generate call as a future, on an endpoint not tried yet if the
+        client is a pool of endpoints
+        """
+        generate_future = getattr(tgis_client, "generate_future", None)
+        if generate_future is not None:
+            return generate_future(request, tried, timeout=timeout)
+        return tgis_client.Generate.future(request, timeout=timeout)
+
+
+_HEDGER: Optional[TGISRequestHedger] = None
+_HEDGER_LOCK = threading.Lock()
+
+
+def get_request_hedger() -> Optional[TGISRequestHedger]:
+    """Get the hedger shared by the TGIS generation clients, or None if
+    tgis_client.hedge_percentile is not set in the config
+    """
+    global _HEDGER  # pylint: disable=global-statement
+    client_cfg = get_config().get("tgis_client", {})
+    # NOTE: env var overrides are strings
+    percentile = float(client_cfg.get("hedge_percentile") or 0)
+    if percentile <= 0:
+        return None
+    settings = (
+        percentile,
+        float(client_cfg.get("hedge_min_delay_ms") or 10.0),
+        int(client_cfg.get("hedge_window") or 1000),
+        int(client_cfg.get("hedge_min_samples") or 20),
+    )
+    with _HEDGER_LOCK:
+        if (
+            _HEDGER is None
+            or (
+                _HEDGER.percentile,
+                _HEDGER.min_delay * 1000,
+                _HEDGER.window,
+                _HEDGER.min_samples,
+            )
+            != settings
+        ):
+            _HEDGER = TGISRequestHedger(*settings)
+        return _HEDGER
@@ -0,0 +1,211 @@
+# Copyright The Caikit Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Cache of the TGIS responses to deterministic generation requests.
+
+The unary generate calls of the TGIS generation clients look up the responses
+of greedy and seeded sampling requests by model, prompt prefix, text and
+parameters, and cache the responses they get from TGIS. Streaming calls replay a
+cached response as a stream. Entries expire after a TTL, and the least recently
+used entries are dropped over the max number of entries.
+
+The hits and misses are counted in Prometheus metrics, which the runtime exports
+with its own.
+"""
+
+# Standard
+from collections import OrderedDict
+from typing import List, Optional, Tuple, Union
+import threading
+import time
+
+# Third Party
+from prometheus_client import Counter, Gauge
+
+# First Party
+from caikit import get_config
+from caikit.core.exceptions import error_handler
+from caikit_tgis_backend.protobufs import generation_pb2
+import alog
+
+# Local
+from .tgis_request_hedger import is_deterministic
+
+log = alog.use_channel("TGIS_CACHE")
+error = error_handler.get(log)
+
+CACHE_HIT_COUNTER = Counter(
+    "tgis_response_cache_hits",
+    "Count of deterministic TGIS generate calls answered from the response cache",
+    ["model_id"],
+)
+CACHE_MISS_COUNTER = Counter(
+    "tgis_response_cache_misses",
+    "Count of deterministic TGIS generate calls not found in the response cache",
+    ["model_id"],
+)
+CACHE_ENTRIES_GAUGE = Gauge(
+    "tgis_response_cache_entries", "Number of entries in the TGIS response cache"
+)
+
+# Responses of generations that stopped for a reason that doesn't depend on
+# timing or cancellation, so the same request always gets them
+_CACHEABLE_STOP_REASONS = (
+    generation_pb2.StopReason.MAX_TOKENS,
+    generation_pb2.StopReason.EOS_TOKEN,
+    generation_pb2.StopReason.STOP_SEQUENCE,
+    generation_pb2.StopReason.TOKEN_LIMIT,
+)
+
+_GenerationRequest = Union[
+    generation_pb2.BatchedGenerationRequest, generation_pb2.SingleGenerationRequest
+]
+_CacheKey = Tuple[str, str, str, bytes]
+# Expiry time and response
+_CacheEntry = Tuple[float, generation_pb2.GenerationResponse]
+
+
+class TGISResponseCache:
+    """Thread-safe, bounded LRU cache of TGIS generation responses with a TTL"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        """
+        Args:
+            max_entries: int
+                Max number of cached responses
+            ttl_seconds: float
+                Time a response stays cached
+        """
+        error.value_check(
+            "<NLP26583910E>", max_entries > 0, "max_entries must be positive"
+        )
+        error.value_check(
+            "<NLP26583911E>", ttl_seconds > 0, "ttl_seconds must be positive"
+        )
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[_CacheKey, _CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _key(request: _GenerationRequest) -> Optional[_CacheKey]:
+        """Key of a deterministic request for a single generation, else None"""
+        if isinstance(request, generation_pb2.SingleGenerationRequest):
+            texts = [request.request.text]
+        else:
+            texts = [req.text for req in request.requests]
+        if len(texts) != 1 or not is_deterministic(request.params):
+            return None
+        return (
+            request.model_id,
+            request.prefix_id,
+            texts[0],
+            request.params.SerializeToString(deterministic=True),
+        )
+
+    def get(
+        self, request: _GenerationRequest
+    ) -> Optional[generation_pb2.GenerationResponse]:
+        """Get the cached response to a request, or None if it isn't cached or
+        can't be
+        """
+        key = self._key(request)
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            CACHE_ENTRIES_GAUGE.set(len(self._entries))
+        if entry is None:
+            CACHE_MISS_COUNTER.labels(request.model_id).inc()
+            return None
+        CACHE_HIT_COUNTER.labels(request.model_id).inc()
+        return entry[1]
+
+    def put(
+        self,
+        request: _GenerationRequest,
+        response: generation_pb2.GenerationResponse,
+    ):
+        """Cache the response to a request if it is deterministic and finished,
+        dropping the least recently used entries over max_entries
+        """
+        key = self._key(request)
+        if key is None or response.stop_reason not in _CACHEABLE_STOP_REASONS:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            CACHE_ENTRIES_GAUGE.set(len(self._entries))
+
+
+def replay_stream(
+    response: generation_pb2.GenerationResponse,
+) -> List[generation_pb2.GenerationResponse]:
+    """Split a cached response into the parts of a TGIS stream: the input
+    details, then all the generated text and tokens at once
+    """
+    return [
+        generation_pb2.GenerationResponse(
+            input_token_count=response.input_token_count,
+            input_tokens=response.input_tokens,
+        ),
+        generation_pb2.GenerationResponse(
+            text=response.text,
+            generated_token_count=response.generated_token_count,
+            stop_reason=response.stop_reason,
+            stop_sequence=response.stop_sequence,
+            seed=response.seed,
+            tokens=response.tokens,
+        ),
+    ]
+
+
+_CACHE: Optional[TGISResponseCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_response_cache() -> Optional[TGISResponseCache]:
+    """Get the response cache shared by the TGIS generation clients, or None if
+    tgis_client.response_cache_max_entries is not set in the config
+    """
+    global _CACHE  # pylint: disable=global-statement
+    client_cfg = get_config().get("tgis_client", {})
+    # NOTE: env var overrides are strings
+    max_entries = int(client_cfg.get("response_cache_max_entries") or 0)
+    if max_entries <= 0:
+        return None
+    ttl_seconds = float(client_cfg.get("response_cache_ttl_seconds") or 300.0)
+    with _CACHE_LOCK:
+        if (
+            _CACHE is None
+            or _CACHE.max_entries != max_entries
+            or _CACHE.ttl != ttl_seconds
+        ):
+            _CACHE = TGISResponseCache(max_entries, ttl_seconds)
+        return _CACHE
@@ -14,7 +14,11 @@
 """This file is for helper functions related to TGIS."""
 
 # Standard
-from typing import Iterable
+from contextlib import asynccontextmanager, contextmanager
+from functools import cached_property
+from typing import AsyncIterator, Iterable, Iterator, List, Optional, Union
+import asyncio
+import weakref
 
 # Third Party
 import grpc
@@ -30,16 +34,25 @@ from caikit.interfaces.nlp.data_model import (
     GeneratedTextResult,
     GeneratedTextStreamResult,
     GeneratedToken,
+    Token,
     TokenizationResults,
     TokenStreamDetails,
 )
 from caikit_tgis_backend import TGISBackend
-from caikit_tgis_backend.protobufs import generation_pb2
+from caikit_tgis_backend.protobufs import generation_pb2, generation_pb2_grpc
+from caikit_tgis_backend.tgis_connection import TGISConnection
 import alog
 
 # Local
 from ...data_model import ExponentialDecayLengthPenalty
+from .generation_metrics import GenerationTimer, generation_metrics_enabled
+from .local_tokenizer import LocalTokenCounter, get_local_token_counter
 from .model_run_utils import GENERATE_FUNCTION_ARGS, VALID_DECODING_METHODS
+from .stream_coalescing import new_stream_part_coalescer
+from .tgis_concurrency_limiter import LimitedCall, get_concurrency_limiter
+from .tgis_request_coalescer import get_request_coalescer
+from .tgis_request_hedger import get_request_hedger
+from .tgis_response_cache import get_response_cache, replay_stream
 
 log = alog.use_channel("TGIS_UTILS")
 error = error_handler.get(log)
@@ -334,8 +347,55 @@ def get_params(
     return params
 
 
-class TGISGenerationClient:
-    """Client for TGIS generation calls"""
+def _generated_tokens(tokens) -> List[GeneratedToken]:
+    """Convert TGIS token infos to GeneratedTokens"""
+    if tokens is None:
+        return []
+    return [
+        GeneratedToken(text=token.text, logprob=token.logprob, rank=token.rank)
+        for token in tokens
+    ]
+
+
+def _raise_generation_error(err: grpc.RpcError, log_code: str):
+    """Raise the CaikitCoreException of a failed TGIS generate call"""
+    if isinstance(err, (grpc._channel._InactiveRpcError, grpc.aio.AioRpcError)):
+        details = err.details()
+        log.error(log_code, details)
+        caikit_status_code = GRPC_TO_CAIKIT_CORE_STATUS.get(
+            err.code(), CaikitCoreStatusCode.UNKNOWN
+        )
+        if caikit_status_code == CaikitCoreStatusCode.CONNECTION_ERROR:
+            raise CaikitCoreException(
+                caikit_status_code, INACTIVE_RPC_CONN_ERR_MESSAGE
+            ) from err
+        raise CaikitCoreException(caikit_status_code, details) from err
+    raise_caikit_core_exception(err)
+
+
+class _StreamProgress:
+    """Feeds the generated tokens of TGIS stream parts to a GenerationTimer"""
+
+    def __init__(self, timer: GenerationTimer):
+        self.timer = timer
+        self.input_token_count = 0
+        self.generated_token_count = 0
+
+    def update(self, stream_part: generation_pb2.GenerationResponse):
+        new_tokens = stream_part.generated_token_count - self.generated_token_count
+        if new_tokens > 0:
+            self.timer.add_tokens(new_tokens)
+            self.generated_token_count = stream_part.generated_token_count
+        self.input_token_count = max(
+            self.input_token_count, stream_part.input_token_count
+        )
+
+    def finish(self):
+        self.timer.finish(self.generated_token_count, self.input_token_count)
+
+
+class _TGISGenerationClientBase:
+    """Request building and response conversion of the TGIS generation clients"""
 
     def __init__(
         self, base_model_name, eos_token, tgis_client, producer_id, prefix_id=None
@@ -345,6 +405,8 @@ class TGISGenerationClient:
         self.tgis_client = tgis_client
         self.producer_id = producer_id
         self.prefix_id = prefix_id
+        self.response_cache = get_response_cache()
+        self.concurrency_limiter = get_concurrency_limiter()
 
         self.tgis_req_timeout = get_config().tgis_request_timeout
 
@@ -363,6 +425,276 @@ class TGISGenerationClient:
                 self.tgis_req_timeout,
             )
 
+    def _request_kwargs(self) -> dict:
+        """Model and prompt prefix of the generation requests"""
+        if not self.prefix_id:
+            return {"model_id": self.base_model_name}
+        return {"model_id": self.base_model_name, "prefix_id": self.prefix_id}
+
+    def _generation_params(self, text, **kwargs) -> generation_pb2.Parameters:
+        """Validate the generation parameters of a request and convert them"""
+        validate_inf_params(text=text, eos_token=self.eos_token, **kwargs)
+        log.debug("Building protobuf request to send to TGIS")
+        return get_params(**kwargs)
+
+    def _unary_request(self, text, **kwargs) -> generation_pb2.BatchedGenerationRequest:
+        """Build the request of a unary generate call"""
+        return generation_pb2.BatchedGenerationRequest(
+            requests=[generation_pb2.GenerationRequest(text=text)],
+            params=self._generation_params(text, **kwargs),
+            **self._request_kwargs(),
+        )
+
+    def _stream_request(self, text, **kwargs) -> generation_pb2.SingleGenerationRequest:
+        """Build the request of a streaming generate call"""
+        return generation_pb2.SingleGenerationRequest(
+            request=generation_pb2.GenerationRequest(text=text),
+            params=self._generation_params(text, **kwargs),
+            **self._request_kwargs(),
+        )
+
+    @cached_property
+    def local_token_counter(self) -> Optional[LocalTokenCounter]:
+        """Counter of the tokenize calls with the local tokenizer of the model, if
+        enabled and available
+        """
+        return get_local_token_counter(self.base_model_name)
+
+    def _local_token_count(self, text: str) -> Optional[int]:
+        """Count the tokens of a text with the local tokenizer, if enabled"""
+        counter = self.local_token_counter
+        if counter is None or not counter.enabled:
+            return None
+        return counter.count(text)
+
+    def _checked_tokenization_results(
+        self,
+        text: str,
+        batch_response: generation_pb2.BatchedTokenizeResponse,
+        local_count: Optional[int],
+    ) -> TokenizationResults:
+        """Convert the response of a tokenize call, checking the local count of
+        the same text against it
+        """
+        results = self._tokenization_results(batch_response)
+        if local_count is not None:
+            self.local_token_counter.check_parity(
+                text, local_count, results.token_count
+            )
+        return results
+
+    def _tokenize_request(self, text: str) -> generation_pb2.BatchedTokenizeRequest:
+        """Build the request of a tokenize call"""
+        log.debug("Building protobuf request to send to TGIS")
+        return generation_pb2.BatchedTokenizeRequest(
+            requests=[generation_pb2.TokenizeRequest(text=text)],
+            model_id=self.base_model_name,
+        )
+
+    def _local_token_counts(self, texts: List[str]) -> Optional[List[int]]:
+        """Count the tokens of texts with the local tokenizer, if enabled"""
+        counter = self.local_token_counter
+        if counter is None or not counter.enabled:
+            return None
+        return counter.count_all(texts)
+
+    def _batch_tokenize_requests(
+        self, texts: List[str], return_tokens: bool, return_offsets: bool
+    ) -> List[generation_pb2.BatchedTokenizeRequest]:
+        """Build the requests of a batched tokenize call, each with at most
+        tgis_client.tokenize_max_batch_size texts
+        """
+        # NOTE: env var overrides are strings
+        max_batch_size = int(
+            get_config().get("tgis_client", {}).get("tokenize_max_batch_size") or 0
+        )
+        max_batch_size = max_batch_size if max_batch_size > 0 else len(texts)
+        log.debug(
+            "Building %d protobuf requests to send to TGIS",
+            -(-len(texts) // max_batch_size),
+        )
+        return [
+            generation_pb2.BatchedTokenizeRequest(
+                requests=[
+                    generation_pb2.TokenizeRequest(text=text)
+                    for text in texts[start : start + max_batch_size]
+                ],
+                model_id=self.base_model_name,
+                return_tokens=return_tokens,
+                return_offsets=return_offsets,
+            )
+            for start in range(0, len(texts), max_batch_size)
+        ]
+
+    @staticmethod
+    def _batch_tokenization_results(
+        request: generation_pb2.BatchedTokenizeRequest,
+        batch_response: generation_pb2.BatchedTokenizeResponse,
+    ) -> List[TokenizationResults]:
+        """Convert the response of a batched tokenize request, with the tokens and
+        offsets it asked for
+        """
+        error.value_check(
+            "<NLP38899082E>",
+            len(batch_response.responses) == len(request.requests),
+            f"Got {len(batch_response.responses)} responses for "
+            f"{len(request.requests)} texts",
+        )
+        results = []
+        for req, response in zip(request.requests, batch_response.responses):
+            tokens = []
+            if request.return_offsets:
+                texts = response.tokens or [
+                    req.text[offset.start : offset.end] for offset in response.offsets
+                ]
+                tokens = [
+                    Token(start=offset.start, end=offset.end, text=text)
+                    for offset, text in zip(response.offsets, texts)
+                ]
+            elif request.return_tokens:
+                tokens = [Token(text=text) for text in response.tokens]
+            results.append(
+                TokenizationResults(token_count=response.token_count, results=tokens)
+            )
+        return results
+
+    def _checked_batch_tokenization_results(
+        self,
+        texts: List[str],
+        results: List[TokenizationResults],
+        local_counts: Optional[List[int]],
+    ) -> List[TokenizationResults]:
+        """Check the local counts of texts against the TGIS counts of a batched
+        tokenize call
+        """
+        if local_counts is not None:
+            for text, local_count, result in zip(texts, local_counts, results):
+                self.local_token_counter.check_parity(
+                    text, local_count, result.token_count
+                )
+        return results
+
+    def _cached_response(
+        self,
+        request: Union[
+            generation_pb2.BatchedGenerationRequest,
+            generation_pb2.SingleGenerationRequest,
+        ],
+    ) -> Optional[generation_pb2.GenerationResponse]:
+        """Get the cached response to a deterministic generation request"""
+        if self.response_cache is None:
+            return None
+        return self.response_cache.get(request)
+
+    def _cache_response(
+        self,
+        request: generation_pb2.BatchedGenerationRequest,
+        batch_response: generation_pb2.BatchedGenerationResponse,
+    ):
+        """Cache the response to a deterministic unary generation request"""
+        if self.response_cache is not None and len(batch_response.responses) == 1:
+            self.response_cache.put(request, batch_response.responses[0])
+
+    @contextmanager
+    def _limited(
+        self,
+        request: Union[
+            generation_pb2.BatchedGenerationRequest,
+            generation_pb2.SingleGenerationRequest,
+        ],
+    ) -> Iterator[LimitedCall]:
+        """Hold the slots of a generate call in the concurrency limit of its model,
+        if on
+        """
+        if self.concurrency_limiter is None:
+            yield LimitedCall(0)
+            return
+        with self.concurrency_limiter.limited(request) as call:
+            yield call
+
+    @asynccontextmanager
+    async def _limited_async(
+        self,
+        request: Union[
+            generation_pb2.BatchedGenerationRequest,
+            generation_pb2.SingleGenerationRequest,
+        ],
+    ) -> AsyncIterator[LimitedCall]:
+        """Async variant of _limited"""
+        if self.concurrency_limiter is None:
+            yield LimitedCall(0)
+            return
+        async with self.concurrency_limiter.limited_async(request) as call:
+            yield call
+
+    def _generated_text_result(
+        self, batch_response: generation_pb2.BatchedGenerationResponse, seed
+    ) -> GeneratedTextResult:
+        """Convert the response of a unary generate call"""
+        # We send a batch request of len(x)==1, so we expect one response back
+        error.value_check(
+            "<NLP38899018E>",
+            len(batch_response.responses) == 1,
+            f"Got {len(batch_response.responses)} responses for a single request",
+        )
+        response = batch_response.responses[0]
+        return GeneratedTextResult(
+            generated_text=response.text,
+            generated_tokens=response.generated_token_count,
+            finish_reason=response.stop_reason,
+            producer_id=self.producer_id,
+            input_token_count=response.input_token_count,
+            seed=seed,
+            tokens=_generated_tokens(response.tokens),
+            input_tokens=_generated_tokens(response.input_tokens),
+        )
+
+    @staticmethod
+    def _stream_result(
+        stream_part: generation_pb2.GenerationResponse,
+    ) -> GeneratedTextStreamResult:
+        """Convert a part of the response of a streaming generate call"""
+        details = TokenStreamDetails(
+            finish_reason=stream_part.stop_reason,
+            generated_tokens=stream_part.generated_token_count,
+            seed=stream_part.seed,
+            input_token_count=stream_part.input_token_count,
+        )
+        return GeneratedTextStreamResult(
+            generated_text=stream_part.text,
+            tokens=_generated_tokens(stream_part.tokens),
+            input_tokens=_generated_tokens(stream_part.input_tokens),
+            details=details,
+        )
+
+    @staticmethod
+    def _tokenization_results(
+        batch_response: generation_pb2.BatchedTokenizeResponse,
+    ) -> TokenizationResults:
+        """Convert the response of a tokenize call"""
+        # We send a batch request of len(x)==1, so we expect one response back
+        error.value_check(
+            "<NLP38899081E>",
+            len(batch_response.responses) == 1,
+            f"Got {len(batch_response.responses)} responses for a single request",
+        )
+        return TokenizationResults(
+            token_count=batch_response.responses[0].token_count,
+        )
+
+
+class TGISGenerationClient(_TGISGenerationClientBase):
+    """Client for TGIS generation calls"""
+
+    def __init__(
+        self, base_model_name, eos_token, tgis_client, producer_id, prefix_id=None
+    ):
+        super().__init__(
+            base_model_name, eos_token, tgis_client, producer_id, prefix_id
+        )
+        self.request_coalescer = get_request_coalescer()
+        self.request_hedger = get_request_hedger()
+
     def unary_generate(
         self,
         text,
@@ -406,7 +738,7 @@ class TGISGenerationClient:
             "Backend must be configured and loaded for generate",
         )
 
-        validate_inf_params(
+        request = self._unary_request(
             text=text,
             preserve_input_text=preserve_input_text,
             input_tokens=input_tokens,
@@ -414,7 +746,6 @@ class TGISGenerationClient:
             token_logprobs=token_logprobs,
             token_ranks=token_ranks,
             include_stop_sequence=include_stop_sequence,
-            eos_token=self.eos_token,
             max_new_tokens=max_new_tokens,
             min_new_tokens=min_new_tokens,
             truncate_input_tokens=truncate_input_tokens,
@@ -430,9 +761,89 @@ class TGISGenerationClient:
             stop_sequences=stop_sequences,
         )
 
-        log.debug("Building protobuf request to send to TGIS")
+        cached_response = self._cached_response(request)
+        if cached_response is not None:
+            return self._generated_text_result(
+                generation_pb2.BatchedGenerationResponse(responses=[cached_response]),
+                seed,
+            )
 
-        params = get_params(
+        # The coalescer may send the request with others, but only returns its
+        # response. Deterministic requests are hedged instead when hedging is on.
+        timer = GenerationTimer("tgis") if generation_metrics_enabled() else None
+        with alog.ContextTimer(log.trace, "TGIS request duration: "), self._limited(
+            request
+        ) as limited_call:
+            try:
+                if self.request_hedger is not None and self.request_hedger.hedgeable(
+                    request
+                ):
+                    batch_response = self.request_hedger.generate(
+                        self.tgis_client, request, self.tgis_req_timeout
+                    )
+                elif self.request_coalescer is not None:
+                    batch_response = self.request_coalescer.generate(
+                        self.tgis_client, request, self.tgis_req_timeout
+                    )
+                else:
+                    batch_response = self.tgis_client.Generate(
+                        request, timeout=self.tgis_req_timeout
+                    )
+            except grpc.RpcError as err:
+                _raise_generation_error(err, "<NLP30829218E>")
+            result = self._generated_text_result(batch_response, seed)
+            limited_call.generated_tokens = result.generated_tokens
+
+        self._cache_response(request, batch_response)
+        if timer is not None:
+            # NOTE: all the tokens come at once, so only the total time is known
+            timer.finish(result.generated_tokens, result.input_token_count)
+        return result
+
+    def stream_generate(
+        self,
+        text,
+        preserve_input_text,
+        input_tokens,
+        generated_tokens,
+        token_logprobs,
+        token_ranks,
+        include_stop_sequence,
+        max_new_tokens,
+        min_new_tokens,
+        truncate_input_tokens,
+        decoding_method,
+        top_k,
+        top_p,
+        typical_p,
+        temperature,
+        seed,
+        repetition_penalty,
+        max_time,
+        exponential_decay_length_penalty,
+        stop_sequences,
+    ) -> Iterable[GeneratedTextStreamResult]:
+        """Generate stream output from model in TGIS
+
+        Args:
+            {}
+        Returns:
+            Iterable[GeneratedTextStreamResult]
+        """.format(
+            GENERATE_FUNCTION_TGIS_ARGS
+        )
+
+        # In case internal client is not configured - generation
+        # cannot be done (individual modules may already check
+        # for this)
+        error.value_check(
+            "<NLP77278635E>",
+            self.tgis_client is not None,
+            "Backend must be configured and loaded for generate",
+        )
+
+        request = self._stream_request(
+            text=text,
             preserve_input_text=preserve_input_text,
             input_tokens=input_tokens,
             generated_tokens=generated_tokens,
@@ -454,78 +865,153 @@ class TGISGenerationClient:
             stop_sequences=stop_sequences,
         )
 
-        gen_reqs = [generation_pb2.GenerationRequest(text=text)]
-        if not self.prefix_id:
-            request = generation_pb2.BatchedGenerationRequest(
-                requests=gen_reqs,
-                model_id=self.base_model_name,
-                params=params,
-            )
-        else:
-            request = generation_pb2.BatchedGenerationRequest(
-                requests=gen_reqs,
-                model_id=self.base_model_name,
-                prefix_id=self.prefix_id,
-                params=params,
-            )
+        cached_response = self._cached_response(request)
+        if cached_response is not None:
+            for stream_part in replay_stream(cached_response):
+                yield self._stream_result(stream_part)
+            return
 
-        # Currently, we send a batch request of len(x)==1, so we expect one response back
-        with alog.ContextTimer(log.trace, "TGIS request duration: "):
+        # stream GenerationResponse
+        progress = (
+            _StreamProgress(GenerationTimer("tgis"))
+            if generation_metrics_enabled()
+            else None
+        )
+        coalescer = new_stream_part_coalescer()
+        with self._limited(request) as limited_call:
             try:
-                batch_response = self.tgis_client.Generate(
+                stream_response = self.tgis_client.GenerateStream(
                     request, timeout=self.tgis_req_timeout
                 )
-            except grpc._channel._InactiveRpcError as err:
-                details = err.details()
-                log.error("<NLP30829218E>", details)
-                caikit_status_code = GRPC_TO_CAIKIT_CORE_STATUS.get(
-                    err.code(), CaikitCoreStatusCode.UNKNOWN
-                )
-                if caikit_status_code == CaikitCoreStatusCode.CONNECTION_ERROR:
-                    raise CaikitCoreException(
-                        caikit_status_code, INACTIVE_RPC_CONN_ERR_MESSAGE
-                    ) from err
-                raise CaikitCoreException(caikit_status_code, details) from err
+
+                for stream_part in stream_response:
+                    limited_call.generated_tokens = stream_part.generated_token_count
+                    if progress is not None:
+                        progress.update(stream_part)
+                    if coalescer is not None:
+                        stream_part = coalescer.add(stream_part)
+                        if stream_part is None:
+                            continue
+                    yield self._stream_result(stream_part)
+                # The last merged parts carry the final details
+                stream_part = coalescer.flush() if coalescer is not None else None
+                if stream_part is not None:
+                    yield self._stream_result(stream_part)
+                if progress is not None:
+                    progress.finish()
             except grpc.RpcError as err:
-                raise_caikit_core_exception(err)
+                _raise_generation_error(err, "<NLP11829118E>")
+
+    def unary_tokenize(
+        self,
+        text: str,
+    ) -> TokenizationResults:
+        """Tokenize unary input using TGIS
 
+        Args:
+            text: str
+                Text to tokenize
+        Returns:
+            TokenizationResults
+                The token count
+        """
+
+        # In case internal client is not configured - tokenization
+        # cannot be done (individual modules may already check
+        # for this)
         error.value_check(
-            "<NLP38899018E>",
-            len(batch_response.responses) == 1,
-            f"Got {len(batch_response.responses)} responses for a single request",
+            "<NLP72786256E>",
+            self.tgis_client is not None,
+            "Backend must be configured and loaded for tokenization",
         )
-        response = batch_response.responses[0]
 
-        token_list = []
-        if response.tokens is not None:
-            for token in response.tokens:
-                token_list.append(
-                    GeneratedToken(
-                        text=token.text, logprob=token.logprob, rank=token.rank
-                    )
+        # Count locally when possible, still asking TGIS for the first parity checks
+        local_count = self._local_token_count(text)
+        if local_count is not None and not (
+            self.local_token_counter.needs_parity_check()
+        ):
+            return TokenizationResults(token_count=local_count)
+
+        request = self._tokenize_request(text)
+
+        with alog.ContextTimer(log.trace, "TGIS request duration: "):
+            try:
+                batch_response = self.tgis_client.Tokenize(
+                    request, timeout=self.tgis_req_timeout
                 )
+            except grpc.RpcError as err:
+                raise_caikit_core_exception(err)
+
+        return self._checked_tokenization_results(text, batch_response, local_count)
+
+    def batch_tokenize(
+        self,
+        texts: List[str],
+        return_tokens: bool = False,
+        return_offsets: bool = False,
+    ) -> List[TokenizationResults]:
+        """Tokenize a list of texts using batched TGIS tokenize calls
 
-        input_token_list = []
-        if response.input_tokens is not None:
-            for token in response.input_tokens:
-                input_token_list.append(
-                    GeneratedToken(
-                        text=token.text, logprob=token.logprob, rank=token.rank
+        Args:
+            texts: List[str]
+                Texts to tokenize
+            return_tokens: bool
+                Default False
+                Setting to True also returns the tokens of each text
+            return_offsets: bool
+                Default False
+                Setting to True also returns the spans of the tokens in each text
+        Returns:
+            List[TokenizationResults]
+                The token count (and tokens) of each text, in the original order
+        """
+        error.value_check(
+            "<NLP72786258E>",
+            self.tgis_client is not None,
+            "Backend must be configured and loaded for tokenization",
+        )
+        error.type_check_all("<NLP72786259E>", str, texts=texts)
+        if not texts:
+            return []
+
+        # Only token counts can be computed locally
+        local_counts = None
+        if not (return_tokens or return_offsets):
+            local_counts = self._local_token_counts(texts)
+            if local_counts is not None and not (
+                self.local_token_counter.needs_parity_check()
+            ):
+                return [
+                    TokenizationResults(token_count=count) for count in local_counts
+                ]
+
+        results = []
+        with alog.ContextTimer(log.trace, "TGIS batched tokenize duration: "):
+            for request in self._batch_tokenize_requests(
+                texts, return_tokens, return_offsets
+            ):
+                try:
+                    batch_response = self.tgis_client.Tokenize(
+                        request, timeout=self.tgis_req_timeout
                     )
+                except grpc.RpcError as err:
+                    raise_caikit_core_exception(err)
+                results.extend(
+                    self._batch_tokenization_results(request, batch_response)
                 )
 
-        return GeneratedTextResult(
-            generated_text=response.text,
-            generated_tokens=response.generated_token_count,
-            finish_reason=response.stop_reason,
-            producer_id=self.producer_id,
-            input_token_count=response.input_token_count,
-            seed=seed,
-            tokens=token_list,
-            input_tokens=input_token_list,
-        )
+        return self._checked_batch_tokenization_results(texts, results, local_counts)
 
-    def stream_generate(
+
+class AsyncTGISGenerationClient(_TGISGenerationClientBase):
+    """Client for TGIS generation calls on a grpc.aio channel.
+
+    The calls are coroutines (and an async generator for streaming), so an in-flight
+    call doesn't hold a thread. tgis_client must be a GenerationServiceStub on a
+    grpc.aio channel of the running event loop, e.g. from get_async_tgis_client.
+    """
+
+    async def unary_generate(
         self,
         text,
         preserve_input_text,
@@ -547,28 +1033,24 @@ class TGISGenerationClient:
         max_time,
         exponential_decay_length_penalty,
         stop_sequences,
-    ) -> Iterable[GeneratedTextStreamResult]:
-        """Generate stream output from model in TGIS
+    ) -> GeneratedTextResult:
+        """Generate unary output from model in TGIS
 
         Args:
             {}
         Returns:
-            Iterable[GeneratedTextStreamResult]
+            GeneratedTextResult
+                Generated text result produced by TGIS.
         """.format(
             GENERATE_FUNCTION_TGIS_ARGS
         )
-
-        # In case internal client is not configured - generation
-        # cannot be done (individual modules may already check
-        # for this)
         error.value_check(
-            "<NLP77278635E>",
+            "<NLP72700257E>",
             self.tgis_client is not None,
             "Backend must be configured and loaded for generate",
         )
-        log.debug("Building protobuf request to send to TGIS")
 
-        validate_inf_params(
+        request = self._unary_request(
             text=text,
             preserve_input_text=preserve_input_text,
             input_tokens=input_tokens,
@@ -576,7 +1058,6 @@ class TGISGenerationClient:
             token_logprobs=token_logprobs,
             token_ranks=token_ranks,
             include_stop_sequence=include_stop_sequence,
-            eos_token=self.eos_token,
             max_new_tokens=max_new_tokens,
             min_new_tokens=min_new_tokens,
             truncate_input_tokens=truncate_input_tokens,
@@ -592,7 +1073,69 @@ class TGISGenerationClient:
             stop_sequences=stop_sequences,
         )
 
-        params = get_params(
+        cached_response = self._cached_response(request)
+        if cached_response is not None:
+            return self._generated_text_result(
+                generation_pb2.BatchedGenerationResponse(responses=[cached_response]),
+                seed,
+            )
+
+        timer = GenerationTimer("tgis") if generation_metrics_enabled() else None
+        async with self._limited_async(request) as limited_call:
+            try:
+                batch_response = await self.tgis_client.Generate(
+                    request, timeout=self.tgis_req_timeout
+                )
+            except grpc.RpcError as err:
+                _raise_generation_error(err, "<NLP30829219E>")
+            result = self._generated_text_result(batch_response, seed)
+            limited_call.generated_tokens = result.generated_tokens
+
+        self._cache_response(request, batch_response)
+        if timer is not None:
+            timer.finish(result.generated_tokens, result.input_token_count)
+        return result
+
+    async def stream_generate(
+        self,
+        text,
+        preserve_input_text,
+        input_tokens,
+        generated_tokens,
+        token_logprobs,
+        token_ranks,
+        include_stop_sequence,
+        max_new_tokens,
+        min_new_tokens,
+        truncate_input_tokens,
+        decoding_method,
+        top_k,
+        top_p,
+        typical_p,
+        temperature,
+        seed,
+        repetition_penalty,
+        max_time,
+        exponential_decay_length_penalty,
+        stop_sequences,
+    ) -> AsyncIterator[GeneratedTextStreamResult]:
+        """Generate stream output from model in TGIS
+
+        Args:
+            {}
+        Returns:
+            AsyncIterator[GeneratedTextStreamResult]
+        """.format(
+            GENERATE_FUNCTION_TGIS_ARGS
+        )
+        error.value_check(
+            "<NLP77278636E>",
+            self.tgis_client is not None,
+            "Backend must be configured and loaded for generate",
+        )
+
+        request = self._stream_request(
+            text=text,
             preserve_input_text=preserve_input_text,
             input_tokens=input_tokens,
             generated_tokens=generated_tokens,
@@ -614,72 +1157,45 @@ class TGISGenerationClient:
             stop_sequences=stop_sequences,
         )
 
-        gen_req = generation_pb2.GenerationRequest(text=text)
-
-        if not self.prefix_id:
-            request = generation_pb2.SingleGenerationRequest(
-                request=gen_req,
-                model_id=self.base_model_name,
-                params=params,
-            )
-        else:
-            request = generation_pb2.SingleGenerationRequest(
-                request=gen_req,
-                model_id=self.base_model_name,
-                prefix_id=self.prefix_id,
-                params=params,
-            )
+        cached_response = self._cached_response(request)
+        if cached_response is not None:
+            for stream_part in replay_stream(cached_response):
+                yield self._stream_result(stream_part)
+            return
 
-        # stream GenerationResponse
-        try:
-            stream_response = self.tgis_client.GenerateStream(
+        progress = (
+            _StreamProgress(GenerationTimer("tgis"))
+            if generation_metrics_enabled()
+            else None
+        )
+        coalescer = new_stream_part_coalescer()
+        async with self._limited_async(request) as limited_call:
+            call = self.tgis_client.GenerateStream(
                 request, timeout=self.tgis_req_timeout
             )
+            try:
+                async for stream_part in call:
+                    limited_call.generated_tokens = stream_part.generated_token_count
+                    if progress is not None:
+                        progress.update(stream_part)
+                    if coalescer is not None:
+                        stream_part = coalescer.add(stream_part)
+                        if stream_part is None:
+                            continue
+                    yield self._stream_result(stream_part)
+                # The last merged parts carry the final details
+                stream_part = coalescer.flush() if coalescer is not None else None
+                if stream_part is not None:
+                    yield self._stream_result(stream_part)
+                if progress is not None:
+                    progress.finish()
+            except grpc.RpcError as err:
+                _raise_generation_error(err, "<NLP11829119E>")
+            finally:
+                # Stop the TGIS generation if the consumer stops early
+                call.cancel()
 
-            for stream_part in stream_response:
-                details = TokenStreamDetails(
-                    finish_reason=stream_part.stop_reason,
-                    generated_tokens=stream_part.generated_token_count,
-                    seed=stream_part.seed,
-                    input_token_count=stream_part.input_token_count,
-                )
-                token_list = []
-                if stream_part.tokens is not None:
-                    for token in stream_part.tokens:
-                        token_list.append(
-                            GeneratedToken(
-                                text=token.text, logprob=token.logprob, rank=token.rank
-                            )
-                        )
-                input_token_list = []
-                if stream_part.input_tokens is not None:
-                    for token in stream_part.input_tokens:
-                        input_token_list.append(
-                            GeneratedToken(
-                                text=token.text, logprob=token.logprob, rank=token.rank
-                            )
-                        )
-                yield GeneratedTextStreamResult(
-                    generated_text=stream_part.text,
-                    tokens=token_list,
-                    input_tokens=input_token_list,
-                    details=details,
-                )
-        except grpc._channel._InactiveRpcError as err:
-            details = err.details()
-            log.error("<NLP11829118E>", details)
-            caikit_status_code = GRPC_TO_CAIKIT_CORE_STATUS.get(
-                err.code(), CaikitCoreStatusCode.UNKNOWN
-            )
-            if caikit_status_code == CaikitCoreStatusCode.CONNECTION_ERROR:
-                raise CaikitCoreException(
-                    caikit_status_code, INACTIVE_RPC_CONN_ERR_MESSAGE
-                ) from err
-            raise CaikitCoreException(caikit_status_code, details) from err
-        except grpc.RpcError as err:
-            raise_caikit_core_exception(err)
-
-    def unary_tokenize(
+    async def unary_tokenize(
         self,
         text: str,
     ) -> TokenizationResults:
@@ -692,41 +1208,182 @@ class TGISGenerationClient:
             TokenizationResults
                 The token count
         """
-
-        # In case internal client is not configured - tokenization
-        # cannot be done (individual modules may already check
-        # for this)
         error.value_check(
-            "<NLP72786256E>",
+            "<NLP72786257E>",
             self.tgis_client is not None,
             "Backend must be configured and loaded for tokenization",
         )
 
-        log.debug("Building protobuf request to send to TGIS")
+        local_count = self._local_token_count(text)
+        if local_count is not None and not (
+            self.local_token_counter.needs_parity_check()
+        ):
+            return TokenizationResults(token_count=local_count)
 
-        gen_reqs = [generation_pb2.TokenizeRequest(text=text)]
+        request = self._tokenize_request(text)
+        try:
+            batch_response = await self.tgis_client.Tokenize(
+                request, timeout=self.tgis_req_timeout
+            )
+        except grpc.RpcError as err:
+            raise_caikit_core_exception(err)
 
-        request = generation_pb2.BatchedTokenizeRequest(
-            requests=gen_reqs,
-            model_id=self.base_model_name,
-        )
+        return self._checked_tokenization_results(text, batch_response, local_count)
 
-        # Currently, we send a batch request of len(x)==1, so we expect one response back
-        with alog.ContextTimer(log.trace, "TGIS request duration: "):
-            try:
-                batch_response = self.tgis_client.Tokenize(
-                    request, timeout=self.tgis_req_timeout
-                )
-            except grpc.RpcError as err:
-                raise_caikit_core_exception(err)
+    async def batch_tokenize(
+        self,
+        texts: List[str],
+        return_tokens: bool = False,
+        return_offsets: bool = False,
+    ) -> List[TokenizationResults]:
+        """Tokenize a list of texts using concurrent batched TGIS tokenize calls
 
+        Args:
+            texts: List[str]
+                Texts to tokenize
+            return_tokens: bool
+                Default False
+                Setting to True also returns the tokens of each text
+            return_offsets: bool
+                Default False
+                Setting to True also returns the spans of the tokens in each text
+        Returns:
+            List[TokenizationResults]
+                The token count (and tokens) of each text, in the original order
+        """
         error.value_check(
-            "<NLP38899081E>",
-            len(batch_response.responses) == 1,
-            f"Got {len(batch_response.responses)} responses for a single request",
+            "<NLP72786260E>",
+            self.tgis_client is not None,
+            "Backend must be configured and loaded for tokenization",
         )
-        response = batch_response.responses[0]
+        error.type_check_all("<NLP72786261E>", str, texts=texts)
+        if not texts:
+            return []
+
+        local_counts = None
+        if not (return_tokens or return_offsets):
+            local_counts = self._local_token_counts(texts)
+            if local_counts is not None and not (
+                self.local_token_counter.needs_parity_check()
+            ):
+                return [
+                    TokenizationResults(token_count=count) for count in local_counts
+                ]
+
+        requests = self._batch_tokenize_requests(texts, return_tokens, return_offsets)
+        try:
+            batch_responses = await asyncio.gather(
+                *(
+                    self.tgis_client.Tokenize(request, timeout=self.tgis_req_timeout)
+                    for request in requests
+                )
+            )
+        except grpc.RpcError as err:
+            raise_caikit_core_exception(err)
 
-        return TokenizationResults(
-            token_count=response.token_count,
+        results = [
+            result
+            for request, batch_response in zip(requests, batch_responses)
+            for result in self._batch_tokenization_results(request, batch_response)
+        ]
+        return self._checked_batch_tokenization_results(texts, results, local_counts)
+
+
+# Channels and async clients of each event loop, by settings of the TGIS connections
+_ASYNC_CLIENTS: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def get_async_tgis_client(
+    connection: TGISConnection,
+) -> generation_pb2_grpc.GenerationServiceStub:
+    """Get a TGIS client on a grpc.aio channel for a TGIS connection.
+
+    grpc.aio channels belong to the event loop they are created in, so a client is
+    created and kept for each connection and running event loop.
+
+    Args:
+        connection: TGISConnection
+            Connection of the model, e.g. from TGISBackend.get_connection
+
+    Returns:
+        generation_pb2_grpc.GenerationServiceStub
+            Client whose calls are awaitable
+    """
+    loop = asyncio.get_running_loop()
+    loop_clients = _ASYNC_CLIENTS.setdefault(loop, {})
+    key = (
+        connection.hostname,
+        connection.ca_cert_file,
+        connection.client_tls.cert_file if connection.client_tls else None,
+        connection.client_tls.key_file if connection.client_tls else None,
+        connection.tls_hostname_override,
+        connection.lb_policy,
+    )
+    if key not in loop_clients:
+        log.debug("Creating async TGIS client for [%s]", connection.hostname)
+        channel = create_tgis_channel(connection.hostname, connection, use_aio=True)
+        loop_clients[key] = (
+            channel,
+            generation_pb2_grpc.GenerationServiceStub(channel),
         )
+    return loop_clients[key][1]
+
+
+async def close_async_tgis_clients():
+    """Close the channels of the async TGIS clients of the running event loop, e.g.
+    before the loop is closed
+    """
+    loop_clients = _ASYNC_CLIENTS.pop(asyncio.get_running_loop(), {})
+    for channel, _ in loop_clients.values():
+        await channel.close()
+
+
+def create_tgis_channel(
+    hostname: str,
+    connection: Optional[TGISConnection] = None,
+    use_aio: bool = False,
+) -> Union[grpc.Channel, grpc.aio.Channel]:
+    """Create a channel to a TGIS server with the TLS and load balancing settings of
+    a TGIS connection.
+
+    Args:
+        hostname: str
+            Address of the TGIS server
+        connection: Optional[TGISConnection]
+            Connection whose settings to use. Default None - means an insecure
+            channel with the default settings
+        use_aio: bool
+            Whether to create a grpc.aio channel for the running event loop
+
+    Returns:
+        Union[grpc.Channel, grpc.aio.Channel]
+            The channel
+    """
+    grpc_module = grpc.aio if use_aio else grpc
+    options = []
+    if connection is not None and connection.lb_policy:
+        options.append(("grpc.lb_policy_name", connection.lb_policy))
+    if connection is None or not connection.tls_enabled:
+        return grpc_module.insecure_channel(hostname, options=options)
+
+    creds_kwargs = {"root_certificates": _read_tls_file(connection.ca_cert_file)}
+    if connection.mtls_enabled:
+        creds_kwargs["certificate_chain"] = _read_tls_file(
+            connection.client_tls.cert_file
+        )
+        creds_kwargs["private_key"] = _read_tls_file(connection.client_tls.key_file)
+    if connection.tls_hostname_override:
+        options.append(
+            ("grpc.ssl_target_name_override", connection.tls_hostname_override)
+        )
+    return grpc_module.secure_channel(
+        hostname, grpc.ssl_channel_credentials(**creds_kwargs), options=options
+    )
+
+
+def _read_tls_file(file_path: Optional[str]) -> Optional[bytes]:
+    """Read a TLS file of a TGIS connection"""
+    if file_path is None:
+        return None
+    with open(file_path, "rb") as handle:
+        return handle.read()
@@ -103,3 +103,23 @@ def render_verbalizer(verbalizer_template: str, source_object) -> str:
         return getattr(source_object, index_object)
 
     return re.sub(r"{{([_a-zA-Z0-9]+)}}", replace_text, verbalizer_template)
+
+
+def get_static_prefix(verbalizer_template: str) -> str:
+    """Given a verbalizer template, get the text before its first renderable field, which
+    every rendered string starts with.
+
+    Examples:
+        "Instruction: summarize. Input: {{input}}" -> "Instruction: summarize. Input: "
+        "{{input}}" -> ""
+
+    Args:
+        verbalizer_template: str
+            Verbalizer template to be used in text generation.
+
+    Returns:
+        str
+            Static text at the start of the rendered verbalizer.
+    """
+    match = re.search(r"{{([_a-zA-Z0-9]+)}}", verbalizer_template)
+    return verbalizer_template[: match.start()] if match else verbalizer_template
@@ -77,12 +77,18 @@ def parse_args() -> argparse.Namespace:
         type=int,
         default=0,
     )
+    parser.add_argument(
+        "--batch_size",
+        help="Number of examples to generate for with one .run_batch() call",
+        type=int,
+        default=1,
+    )
     args = parser.parse_args()
     return args
 
 
 def get_model_preds_and_references(
-    model, validation_stream, max_new_tokens, truncate_input_tokens
+    model, validation_stream, max_new_tokens, truncate_input_tokens, batch_size=1
 ):
     """Given a model & a validation stream, run the model against every example in the validation
     stream and compare the outputs to the target/output sequence.
@@ -97,6 +103,8 @@ def get_model_preds_and_references(
             Max number of new tokens to be generated, i.e., output limit
         truncate_input_tokens: int
             Number of allowed input tokens, i.e., input limit
+        batch_size: int
+            Number of examples per .run_batch() call (1 to call .run() per example)
 
     Returns:
         Tuple(List)
@@ -105,17 +113,30 @@ def get_model_preds_and_references(
     model_preds = []
     targets = []
 
-    for datum in tqdm(validation_stream):
-        # Local .run() currently prepends the input text to the generated string;
-        # Ensure that we're just splitting the first predicted token & beyond.
-        raw_model_text = model.run(
-            datum.input,
-            max_new_tokens=max_new_tokens,
-            truncate_input_tokens=truncate_input_tokens,
-        ).generated_text
-        parse_pred_text = raw_model_text.split(datum.input)[-1].strip()
-        model_preds.append(parse_pred_text)
-        targets.append(datum.output)
+    data = list(validation_stream)
+    for start in tqdm(range(0, len(data), batch_size)):
+        batch = data[start : start + batch_size]
+        if batch_size > 1:
+            results = model.run_batch(
+                [datum.input for datum in batch],
+                max_new_tokens=max_new_tokens,
+                truncate_input_tokens=truncate_input_tokens,
+            )
+        else:
+            results = [
+                model.run(
+                    datum.input,
+                    max_new_tokens=max_new_tokens,
+                    truncate_input_tokens=truncate_input_tokens,
+                )
+                for datum in batch
+            ]
+        for datum, result in zip(batch, results):
+            # Local .run() currently prepends the input text to the generated string;
+            # Ensure that we're just splitting the first predicted token & beyond.
+            parse_pred_text = result.generated_text.split(datum.input)[-1].strip()
+            model_preds.append(parse_pred_text)
+            targets.append(datum.output)
     return (
         model_preds,
         targets,
@@ -176,7 +197,11 @@ if __name__ == "__main__":
     # Run the data through the model; save the predictions & references
     print_colored("Getting model predictions...")
     predictions, references = get_model_preds_and_references(
-        model, validation_stream, args.max_new_tokens, args.truncate_input_tokens
+        model,
+        validation_stream,
+        args.max_new_tokens,
+        args.truncate_input_tokens,
+        args.batch_size,
     )
     print_colored(
         "Exporting model preds, source, verbalized source, and ground truth targets to {}".format(
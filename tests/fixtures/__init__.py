@@ -1,16 +1,21 @@
 """Helpful fixtures for configuring individual unit tests."""
 
 # Standard
+from concurrent import futures
 from contextlib import contextmanager
 from typing import Iterable, Optional, Union
 from unittest import mock
 import json
 import os
 import random
+import re
 import tempfile
+import threading
+import time
 
 # Third Party
 from datasets import load_dataset
+import grpc
 import numpy as np
 import pytest
 import torch
@@ -20,6 +25,7 @@ import transformers
 from caikit.config.config import merge_configs
 from caikit.interfaces.nlp.data_model import GeneratedTextResult, TokenizationResults
 from caikit_tgis_backend import TGISBackend
+from caikit_tgis_backend.protobufs import generation_pb2, generation_pb2_grpc
 from caikit_tgis_backend.tgis_connection import TGISConnection
 import aconfig
 import caikit
@@ -255,7 +261,7 @@ class StubTGISClient:
         fake_response = mock.Mock()
         fake_result = mock.Mock()
         fake_result.token_count = 1
-        fake_response.responses = [fake_result]
+        fake_response.responses = [fake_result for _ in request.requests]
         return fake_response
 
     @staticmethod
@@ -327,6 +333,99 @@ def stub_tgis_backend():
         yield StubTGISBackend(temp_dir=temp_dir)
 
 
+def _tokenize_words(
+    text: str, return_tokens: bool, return_offsets: bool
+) -> generation_pb2.TokenizeResponse:
+    """Tokenize a text into its words, with their offsets"""
+    spans = [match.span() for match in re.finditer(r"\S+", text)]
+    return generation_pb2.TokenizeResponse(
+        token_count=len(spans),
+        tokens=[text[start:end] for start, end in spans] if return_tokens else [],
+        offsets=[
+            generation_pb2.TokenizeResponse.Offset(start=start, end=end)
+            for start, end in spans
+        ]
+        if return_offsets
+        else [],
+    )
+
+
+class FakeTGISServicer(generation_pb2_grpc.GenerationServiceServicer):
+    """TGIS generation service that echoes the texts it gets, one token per word,
+    and records the requests it serves
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.lock = threading.Lock()
+        # Set to a grpc.StatusCode to fail all the calls with
+        self.error_code = None
+        # Seconds each call waits before it is served
+        self.delay = 0.0
+
+    def _record(self, request, context):
+        with self.lock:
+            self.requests.append(request)
+        if self.delay:
+            time.sleep(self.delay)
+        if self.error_code is not None:
+            context.abort(self.error_code, "It's a fake error")
+
+    @staticmethod
+    def _response(text):
+        words = text.split()
+        return generation_pb2.GenerationResponse(
+            text=text,
+            input_token_count=len(words),
+            generated_token_count=len(words),
+            stop_reason=generation_pb2.StopReason.EOS_TOKEN,
+        )
+
+    def Generate(self, request, context):
+        self._record(request, context)
+        return generation_pb2.BatchedGenerationResponse(
+            responses=[self._response(req.text) for req in request.requests]
+        )
+
+    def GenerateStream(self, request, context):
+        self._record(request, context)
+        words = request.request.text.split()
+        yield generation_pb2.GenerationResponse(input_token_count=len(words))
+        for i, word in enumerate(words):
+            yield generation_pb2.GenerationResponse(
+                text=f" {word}" if i else word, generated_token_count=i + 1
+            )
+
+    def Tokenize(self, request, context):
+        self._record(request, context)
+        return generation_pb2.BatchedTokenizeResponse(
+            responses=[
+                _tokenize_words(req.text, request.return_tokens, request.return_offsets)
+                for req in request.requests
+            ]
+        )
+
+
+@contextmanager
+def serve_fake_tgis():
+    """Serve a FakeTGISServicer on a local port, yielding it with its address"""
+    servicer = FakeTGISServicer()
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=16))
+    generation_pb2_grpc.add_GenerationServiceServicer_to_server(servicer, server)
+    port = server.add_insecure_port("localhost:0")
+    server.start()
+    try:
+        yield servicer, f"localhost:{port}"
+    finally:
+        server.stop(None)
+
+
+@pytest.fixture
+def fake_tgis_server():
+    with serve_fake_tgis() as servicer_and_address:
+        yield servicer_and_address
+
+
 ### Args for commonly used datasets that we can use with our fixtures accepting params
 TWITTER_DATA_DOWNLOAD_ARGS = [
     {"dataset_path": "ought/raft", "dataset_name": "twitter_complaints"}
@@ -16,10 +16,13 @@
 # Standard
 from contextlib import contextmanager
 from typing import Optional
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 import copy
+import threading
+import time
 
 # Third Party
+import grpc
 import pytest
 
 # First Party
@@ -38,6 +41,44 @@ from caikit_nlp.modules.text_generation.text_generation_tgis import TextGenerati
 # Convenient aliases
 LOCAL_INITIALIZER_NAME = tgis_auto_finder.TGISAutoFinder._LOCAL_INITIALIZER_NAME_KEY
 TGIS_BACKEND_PRIORITY = tgis_auto_finder.TGISAutoFinder._TGIS_BACKEND_PRIORITY_KEY
+POSITIVE_TTL = tgis_auto_finder.TGISAutoFinder._POSITIVE_TTL_KEY
+NEGATIVE_TTL = tgis_auto_finder.TGISAutoFinder._NEGATIVE_TTL_KEY
+REFRESH_AHEAD = tgis_auto_finder.TGISAutoFinder._REFRESH_AHEAD_KEY
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRpcError(grpc.RpcError):
+    pass
+
+
+class FakeConnections:
+    """Stand-in for TGISBackend.get_connection, counting the connections it
+    creates
+    """
+
+    def __init__(self, found: bool = True, delay: float = 0):
+        self.found = found
+        self.delay = delay
+        self.created = 0
+        self.connection = None
+        self.lock = threading.Lock()
+
+    def __call__(self, model_id, create=True):
+        if self.connection is not None or not create:
+            return self.connection
+        with self.lock:
+            self.created += 1
+        time.sleep(self.delay)
+        if self.found:
+            self.connection = MagicMock()
+        return self.connection
 
 
 def make_tgis_config(hostname: str):
@@ -262,3 +303,130 @@ def test_bad_tgis_connection():
         finder = mmgr._finders["default"]
         assert isinstance(finder, tgis_auto_finder.TGISAutoFinder)
         assert finder.find_model("flan-t5-xl") is None
+
+
+def test_probe_results_cached(monkeypatch):
+    """Make sure that the probes of missing and found models are reused until
+    their ttls expire
+    """
+    clock = FakeClock()
+    monkeypatch.setattr(tgis_auto_finder.time, "monotonic", clock)
+    with temp_model_manager(
+        auto_finder_config={POSITIVE_TTL: 60, NEGATIVE_TTL: 5},
+    ) as mmgr:
+        finder = mmgr._finders["default"]
+        connections = FakeConnections(found=False)
+        with patch.object(finder._tgis_backend, "get_connection", connections):
+            assert finder.find_model("flan-t5-xl") is None
+            assert finder.find_model("flan-t5-xl") is None
+            assert connections.created == 1
+
+            # The model shows up once the negative result expires
+            connections.found = True
+            clock.now += 5
+            assert finder.find_model("flan-t5-xl")
+            assert connections.created == 2
+            clock.now += 59
+            assert finder.find_model("flan-t5-xl")
+            # Without connection tests, the expired probe reuses the connection
+            clock.now += 1
+            assert finder.find_model("flan-t5-xl")
+            assert connections.created == 2
+            connections.connection.test_connection.assert_not_called()
+
+
+def test_probe_cache_off_by_default():
+    """Make sure that the missing models are probed on every lookup by default"""
+    with temp_model_manager() as mmgr:
+        finder = mmgr._finders["default"]
+        connections = FakeConnections(found=False)
+        with patch.object(finder._tgis_backend, "get_connection", connections):
+            assert finder.find_model("flan-t5-xl") is None
+            assert finder.find_model("flan-t5-xl") is None
+            assert connections.created == 2
+
+
+def test_expired_positive_probe_tests_connection(monkeypatch):
+    """Make sure that with connection tests, an expired positive probe tests the
+    connection again and caches a failure as a missing model
+    """
+    clock = FakeClock()
+    monkeypatch.setattr(tgis_auto_finder.time, "monotonic", clock)
+    tgis_config = make_tgis_config("foo.bar:123")
+    tgis_config["config"].update(test_connections=True, connect_timeout=3)
+    with temp_model_manager(
+        auto_finder_config={POSITIVE_TTL: 60, NEGATIVE_TTL: 5},
+        backend_priority=[tgis_config],
+    ) as mmgr:
+        finder = mmgr._finders["default"]
+        connections = FakeConnections()
+        with patch.object(finder._tgis_backend, "get_connection", connections):
+            assert finder.find_model("flan-t5-xl")
+            clock.now += 60
+            assert finder.find_model("flan-t5-xl")
+            connections.connection.test_connection.assert_called_once_with(3)
+
+            connections.connection.test_connection.side_effect = FakeRpcError()
+            clock.now += 60
+            assert finder.find_model("flan-t5-xl") is None
+            assert finder.find_model("flan-t5-xl") is None
+            assert connections.connection.test_connection.call_count == 2
+            assert connections.created == 1
+
+
+def test_concurrent_probes_shared():
+    """Make sure that concurrent lookups of a model share one probe"""
+    with temp_model_manager() as mmgr:
+        finder = mmgr._finders["default"]
+        connections = FakeConnections(found=False, delay=0.2)
+        results = []
+
+        def find():
+            results.append(finder.find_model("flan-t5-xl"))
+
+        with patch.object(finder._tgis_backend, "get_connection", connections):
+            threads = [threading.Thread(target=find) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        assert results == [None] * 8
+        assert connections.created == 1
+        assert not finder._probes
+
+
+def test_found_model_refreshed_ahead(monkeypatch):
+    """Make sure that a lookup close to the expiry of a positive probe gets the
+    cached result and probes the model again in the background
+    """
+    clock = FakeClock()
+    monkeypatch.setattr(tgis_auto_finder.time, "monotonic", clock)
+    with temp_model_manager(
+        auto_finder_config={POSITIVE_TTL: 60, REFRESH_AHEAD: 10},
+    ) as mmgr:
+        finder = mmgr._finders["default"]
+        connections = FakeConnections()
+        with patch.object(finder._tgis_backend, "get_connection", connections):
+            assert finder.find_model("flan-t5-xl")
+            assert finder._probe_cache["flan-t5-xl"] == (True, 160)
+            clock.now += 55
+            with patch.object(finder, "_probe", return_value=True) as probe_mock:
+                assert finder.find_model("flan-t5-xl")
+                finder._refresh_pool.shutdown(wait=True)
+            probe_mock.assert_called_once_with("flan-t5-xl")
+            assert finder._probe_cache["flan-t5-xl"] == (True, 215)
+
+
+def test_bad_probe_cache_config_args():
+    """Make sure that bad probe cache times are handled with appropriate errors"""
+    # Bad ttl type
+    with pytest.raises(TypeError):
+        tgis_auto_finder.TGISAutoFinder(
+            aconfig.Config({NEGATIVE_TTL: "5"}, override_env_vars=False)
+        )
+
+    # Negative refresh time
+    with pytest.raises(ValueError):
+        tgis_auto_finder.TGISAutoFinder(
+            aconfig.Config({REFRESH_AHEAD: -1}, override_env_vars=False)
+        )
@@ -4,6 +4,7 @@
 from typing import List
 import os
 import tempfile
+import threading
 
 # Third Party
 from pytest import approx
@@ -21,7 +22,7 @@ from caikit.interfaces.nlp.data_model import (
 )
 
 # Local
-from caikit_nlp.modules.text_embedding import CrossEncoderModule
+from caikit_nlp.modules.text_embedding import CrossEncoderModule, crossencoder, utils
 from tests.fixtures import SEQ_CLASS_MODEL
 
 ## Setup ########################################################################
@@ -219,6 +220,35 @@ def test_run_tokenization(loaded_model):
     assert res.token_count == INPUT_TOKEN_COUNT
 
 
+def test_run_tokenizer_batch(loaded_model):
+    """Batched tokenization matches tokenizing each text alone"""
+    texts = [INPUT, "foo", "Where is the bar"]
+    results = loaded_model.run_tokenizer_batch(texts=texts)
+
+    assert len(results) == len(texts)
+    assert results[0].token_count == INPUT_TOKEN_COUNT
+    for text, res in zip(texts, results):
+        expected = loaded_model.run_tokenizer(text=text)
+        assert res.token_count == expected.token_count
+        assert [(t.start, t.end, t.text) for t in res.results] == [
+            (t.start, t.end, t.text) for t in expected.results
+        ]
+
+
+def test_run_tokenizer_batch_counts_only(loaded_model):
+    results = loaded_model.run_tokenizer_batch(
+        texts=[INPUT, "foo"], return_tokens=False
+    )
+    assert [r.token_count for r in results] == [INPUT_TOKEN_COUNT, 3 + 2]
+    assert all(not r.results for r in results)
+
+
+def test_run_tokenizer_batch_type_error(loaded_model):
+    with pytest.raises(TypeError):
+        loaded_model.run_tokenizer_batch(texts=[INPUT, 1])
+    assert loaded_model.run_tokenizer_batch(texts=[]) == []
+
+
 @pytest.mark.parametrize(
     "query,docs,top_n",
     [
@@ -515,3 +545,114 @@ def test_truncation(truncate_input_tokens, loaded_model):
 
         # x...xy is the same as x...xyz because we truncated the z token -- it worked!
         assert indexed_query_scores[1] == indexed_query_scores[2]
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 32])
+def test_predict_pipelined_tokenization(batch_size, loaded_model):
+    """Pipelined tokenization produces the same scores and token counts"""
+    pairs = [[QUERY, doc.get("text") or doc.get("_text")] for doc in DOCS]
+
+    expected = loaded_model.model.predict(pairs, batch_size=batch_size)
+    actual = loaded_model.model.predict(
+        pairs, batch_size=batch_size, pipelined_tokenization=True
+    )
+
+    assert np.array_equal(expected.scores, actual.scores)
+    assert actual.input_token_count == expected.input_token_count == QUERY_DOCS_TOKENS
+
+
+def test_predict_pipelined_tokenization_releases_helper(loaded_model):
+    """The helper thread is shut down and uses the caller's tokenizer copy"""
+    pairs = [[QUERY, doc.get("text") or doc.get("_text")] for doc in DOCS]
+    loaded_model.model.predict(pairs, batch_size=1)  # caller's tokenizer copy
+    tokenizer_copies = len(loaded_model.model.tokenizers)
+
+    for _ in range(3):
+        loaded_model.model.predict(pairs, batch_size=1, pipelined_tokenization=True)
+
+    assert len(loaded_model.model.tokenizers) == tokenizer_copies
+    assert not [t for t in threading.enumerate() if t.name.startswith("xenc-tokenize")]
+
+
+def test_predict_pipelined_tokenization_truncation_error(loaded_model):
+    """Truncation checks still index into the input with pipelined tokenization"""
+    model_max = loaded_model.model.tokenizer.model_max_length
+    too_long = "a " * (model_max - 3)
+    pairs = [["q", "a"]] * 50 + [["q", too_long]]
+
+    match = rf"exceeds the maximum sequence length for this model \({model_max}\) for text at index: 50."
+    with pytest.raises(ValueError, match=match):
+        loaded_model.model.predict(pairs, batch_size=8, pipelined_tokenization=True)
+
+
+def test_rank_deadline_scores_in_given_order(loaded_model):
+    """A passed deadline scores the first batch and ranks the rest last"""
+    docs = [doc.get("text") or doc.get("_text") for doc in DOCS]
+
+    res = loaded_model.model.rank(QUERY, docs, batch_size=1, deadline=0.0)
+
+    assert res.scored_count == 1
+    assert res.input_token_count == (QUERY_TOKEN_COUNT - 1) + (3 + 2)  # only "foo"
+    assert res.scores[0]["corpus_id"] == 0
+    assert [r["corpus_id"] for r in res.scores[1:]] == [1, 2, 3]
+    # Unscored documents get a finite score below the scored ones
+    fallback = res.scores[0]["score"] - utils.UNSCORED_SCORE_OFFSET
+    assert all(r["score"] == approx(fallback) for r in res.scores[1:])
+    assert all(np.isfinite(r["score"]) for r in res.scores)
+
+
+def test_rank_deadline_without_first_batch(loaded_model):
+    """With score_first_batch=False a passed deadline skips the model entirely"""
+    docs = [doc.get("text") or doc.get("_text") for doc in DOCS]
+
+    res = loaded_model.model.rank(
+        QUERY, docs, top_k=3, deadline=0.0, score_first_batch=False
+    )
+
+    assert res.scored_count == 0
+    assert res.input_token_count == 0
+    assert [(r["corpus_id"], r["score"]) for r in res.scores] == [
+        (0, 0.0),
+        (1, 0.0),
+        (2, 0.0),
+    ]
+
+
+def test_rerank_result_tuple_scored_count_default():
+    """Code that builds the tuple without a scored_count still works"""
+    result = crossencoder.RerankResultTuple([], 0)
+    assert result.scored_count is None
+
+
+def test_run_rerank_queries_time_budget(loaded_model, monkeypatch):
+    """Only the first query's first batch is scored once the budget is spent"""
+    monkeypatch.setattr(loaded_model, "batch_size", 2)
+    # A budget that is already spent
+    monkeypatch.setattr(crossencoder, "get_deadline", lambda _: 0.0)
+
+    res = loaded_model.run_rerank_queries(
+        queries=QUERIES, documents=DOCS, top_n=3, time_budget_ms=10
+    )
+
+    first, second = res.results
+    assert {s.index for s in first.scores[:2]} == {0, 1}
+    assert first.scores[2].index == 2
+    assert first.scores[2].score == approx(
+        min(s.score for s in first.scores[:2]) - utils.UNSCORED_SCORE_OFFSET
+    )
+    # The remaining queries are skipped, in the given order with a 0.0 score
+    assert [(s.index, s.score) for s in second.scores] == [(0, 0.0), (1, 0.0), (2, 0.0)]
+    # [CLS] Whoisfoo? [SEP] foo [SEP], [CLS] Whoisfoo? [SEP] bar [SEP]
+    assert res.input_token_count == 2 * (9 + 2 - 1) + (3 + 2) + (3 + 2)
+
+
+def test_run_rerank_query_large_time_budget(loaded_model):
+    """A budget that is not spent gives the same results as no budget"""
+    expected = loaded_model.run_rerank_query(query=QUERY, documents=DOCS)
+    actual = loaded_model.run_rerank_query(
+        query=QUERY, documents=DOCS, time_budget_ms=60000
+    )
+    assert [(s.index, s.score) for s in actual.result.scores] == [
+        (s.index, s.score) for s in expected.result.scores
+    ]
+    assert actual.input_token_count == expected.input_token_count == QUERY_DOCS_TOKENS
@@ -8,6 +8,7 @@ import tempfile
 
 # Third Party
 from pytest import approx
+from sentence_transformers.models import Normalize
 from torch.backends import mps
 from transformers import BatchEncoding
 import numpy as np
@@ -29,13 +30,13 @@ from caikit.interfaces.nlp.data_model import (
 import aconfig
 
 # Local
-from caikit_nlp.modules.text_embedding import EmbeddingModule, utils
+from caikit_nlp.modules.text_embedding import EmbeddingModule, embedding, utils
 from caikit_nlp.modules.text_embedding.embedding import (
     _truncate_texts,
     get_sample_start_indexes,
     sum_token_count,
 )
-from tests.fixtures import SEQ_CLASS_MODEL
+from tests.fixtures import SEQ_CLASS_MODEL, temp_config
 
 ## Setup ########################################################################
 
@@ -305,6 +306,35 @@ def test_run_tokenization(loaded_model):
     assert res.token_count == INPUT_TOKEN_COUNT
 
 
+def test_run_tokenizer_batch(loaded_model):
+    """Batched tokenization matches tokenizing each text alone"""
+    texts = [INPUT, "foo", "Where is the bar"]
+    results = loaded_model.run_tokenizer_batch(texts=texts)
+
+    assert len(results) == len(texts)
+    assert results[0].token_count == INPUT_TOKEN_COUNT
+    for text, res in zip(texts, results):
+        expected = loaded_model.run_tokenizer(text=text)
+        assert res.token_count == expected.token_count
+        assert [(t.start, t.end, t.text) for t in res.results] == [
+            (t.start, t.end, t.text) for t in expected.results
+        ]
+
+
+def test_run_tokenizer_batch_counts_only(loaded_model):
+    results = loaded_model.run_tokenizer_batch(
+        texts=[INPUT, "foo"], return_tokens=False
+    )
+    assert [r.token_count for r in results] == [INPUT_TOKEN_COUNT, 3 + 2]
+    assert all(not r.results for r in results)
+
+
+def test_run_tokenizer_batch_type_error(loaded_model):
+    with pytest.raises(TypeError):
+        loaded_model.run_tokenizer_batch(texts=[INPUT, 1])
+    assert loaded_model.run_tokenizer_batch(texts=[]) == []
+
+
 @pytest.mark.parametrize(
     "query,docs,top_n",
     [
@@ -1213,3 +1243,293 @@ def test_pad_to_max_length(padding_strategy, loaded_model):
             )
             assert normal_result.input_token_count != padded_result.input_token_count
             assert not np.all(normal_result.embedding == padded_result.embedding)
+
+
+def test_run_rerank_queries_time_budget(loaded_model, monkeypatch):
+    """Time budget stops embedding documents; unscored documents rank last"""
+    monkeypatch.setattr(loaded_model, "batch_size", 2)
+    # A budget that is already spent (the first batch is always scored)
+    monkeypatch.setattr(embedding, "get_deadline", lambda _: 0.0)
+
+    res = loaded_model.run_rerank_queries(
+        queries=QUERIES, documents=DOCS, top_n=3, time_budget_ms=10
+    )
+
+    for result in res.results:
+        assert len(result.scores) == 3
+        assert {s.index for s in result.scores[:2]} == {0, 1}
+        assert result.scores[2].index == 2
+        # A finite fallback score below the scored documents
+        assert result.scores[2].score == approx(
+            min(s.score for s in result.scores[:2]) - utils.UNSCORED_SCORE_OFFSET
+        )
+    # Only foo and bar were embedded
+    assert res.input_token_count == QUERIES_TOKEN_COUNT + (3 + 2) + (3 + 2)
+
+
+def test_run_rerank_queries_time_budget_truncation_index(loaded_model, monkeypatch):
+    """Truncation errors index into all documents, not the current chunk"""
+    monkeypatch.setattr(loaded_model, "batch_size", 2)
+    too_long = "x " * 1000
+    docs = DOCS[:3] + [{"text": too_long}]
+
+    match = r"for text at index: 3\."
+    with pytest.raises(ValueError, match=match):
+        loaded_model.run_rerank_queries(
+            queries=QUERIES, documents=docs, time_budget_ms=60000
+        )
+
+
+def test_run_rerank_query_large_time_budget(loaded_model):
+    """A budget that is not spent gives the same results as no budget"""
+    expected = loaded_model.run_rerank_query(query=QUERY, documents=DOCS)
+    actual = loaded_model.run_rerank_query(
+        query=QUERY, documents=DOCS, time_budget_ms=60000
+    )
+    assert [s.index for s in actual.result.scores] == [
+        s.index for s in expected.result.scores
+    ]
+    assert [s.score for s in actual.result.scores] == approx(
+        [s.score for s in expected.result.scores]
+    )
+    assert actual.input_token_count == QUERY_TOKEN_COUNT + DOCS_TOKEN_COUNT
+
+
+## Long document (sliding-window) embedding ####################################
+
+
+def test_get_windows_overlap(loaded_model):
+    """Long texts continue in extra rows; more overlap means more windows"""
+    model = loaded_model.model
+    long_text = "x " * (model.max_seq_length * 2)
+
+    no_overlap = model._get_windows(["short", long_text], window_overlap=0)
+    overlap = model._get_windows(["short", long_text], window_overlap=300)
+
+    mapping = no_overlap["overflow_to_sample_mapping"].tolist()
+    assert mapping[0] == 0 and set(mapping[1:]) == {1}
+    assert len(mapping) == 1 + 3  # 1024 x's in windows of 510
+    assert len(overlap["overflow_to_sample_mapping"]) > len(mapping)
+    assert no_overlap["input_ids"].shape[1] == model.max_seq_length
+
+
+@pytest.mark.parametrize("window_overlap", [-1, 510, 1000])
+def test_get_windows_overlap_bounds(window_overlap, loaded_model):
+    with pytest.raises(ValueError, match="window_overlap"):
+        loaded_model.model._get_windows([INPUT], window_overlap=window_overlap)
+
+
+def test_pool_windows_mean_and_weighted():
+    window_embeddings = torch.tensor([[1.0, 0.0], [3.0, 0.0], [0.0, 2.0]])
+    text_indexes = torch.tensor([0, 0, 1])
+
+    mean = embedding._pool_windows(
+        window_embeddings, text_indexes, torch.ones(3), text_count=2
+    )
+    assert mean.tolist() == [[2.0, 0.0], [0.0, 2.0]]
+
+    weighted = embedding._pool_windows(
+        window_embeddings, text_indexes, torch.tensor([3, 1, 5]), text_count=2
+    )
+    assert weighted.tolist() == [[1.5, 0.0], [0.0, 2.0]]
+
+
+@pytest.mark.parametrize("pooling", ["mean", "weighted"])
+def test_encode_long_document(pooling, loaded_model):
+    """A text over the model max does not raise and counts the tokens of all windows"""
+    model = loaded_model.model
+    long_text = "x " * (model.max_seq_length * 2)
+
+    with pytest.raises(ValueError):
+        model.encode(long_text)
+
+    ret = model.encode(
+        long_text, return_token_count=True, long_document_pooling=pooling
+    )
+    assert isinstance(ret.embedding, np.ndarray)
+    assert ret.embedding.shape == (model.get_sentence_embedding_dimension(),)
+
+    windows = model._get_windows([long_text], window_overlap=32)
+    assert len(windows["input_ids"]) > 1
+    assert ret.input_token_count == windows["attention_mask"].sum()
+
+
+@pytest.mark.parametrize("pooling", ["mean", "weighted"])
+def test_encode_long_document_short_texts_unchanged(pooling, loaded_model):
+    """Texts that fit are one window, so their embeddings are unchanged"""
+    model = loaded_model.model
+    expected = model.encode(SENTENCES, return_token_count=True)
+    actual = model.encode(
+        SENTENCES, return_token_count=True, long_document_pooling=pooling
+    )
+    assert actual.embedding.shape == expected.embedding.shape
+    assert actual.embedding == approx(expected.embedding, abs=1e-5)
+    assert actual.input_token_count == expected.input_token_count
+
+
+def test_encode_long_document_explicit_truncation(loaded_model):
+    """Explicit truncation is honored instead of embedding windows"""
+    model = loaded_model.model
+    long_text = "x " * (model.max_seq_length * 2)
+
+    truncated = model.encode(
+        long_text,
+        truncate_input_tokens=10,
+        return_token_count=True,
+        long_document_pooling="mean",
+    )
+    assert truncated.input_token_count == 10 + 2
+
+    mixed = model.encode(
+        [INPUT, long_text, "foo"],
+        return_token_count=True,
+        long_document_pooling="weighted",
+    )
+    windows = model._get_windows([long_text], window_overlap=32)
+    assert mixed.input_token_count == INPUT_TOKEN_COUNT + windows[
+        "attention_mask"
+    ].sum() + (3 + 2)
+    assert mixed.embedding[0] == approx(model.encode(INPUT), abs=1e-5)
+    assert mixed.embedding[2] == approx(model.encode("foo"), abs=1e-5)
+
+
+def test_encode_long_document_return_types(loaded_model):
+    model = loaded_model.model
+    texts = [INPUT, "x " * (model.max_seq_length * 2)]
+    dim = model.get_sentence_embedding_dimension()
+
+    as_tensor = model.encode(
+        texts, convert_to_tensor=True, long_document_pooling="mean"
+    )
+    assert isinstance(as_tensor, torch.Tensor)
+    assert as_tensor.shape == (2, dim)
+
+    as_list = model.encode(texts, convert_to_numpy=False, long_document_pooling="mean")
+    assert isinstance(as_list, list)
+    assert len(as_list) == 2
+    assert all(isinstance(e, torch.Tensor) and e.shape == (dim,) for e in as_list)
+
+
+def test_encode_long_document_invalid_pooling(loaded_model):
+    with pytest.raises(ValueError, match="long_document_pooling"):
+        loaded_model.model.encode(INPUT, long_document_pooling="max")
+
+
+def test_encode_long_document_normalized(tmp_path):
+    """Models that normalize still return unit vectors after pooling windows"""
+    model_path = str(tmp_path / "model_id")
+    BOOTSTRAPPED_MODEL.save(model_path)
+    model = EmbeddingModule.load(model_path).model
+    model.append(Normalize())
+
+    texts = [INPUT, "x " * (model.max_seq_length * 3)]
+    embeddings = model.encode(
+        texts, convert_to_tensor=True, long_document_pooling="mean"
+    )
+    assert torch.linalg.norm(embeddings, dim=1).tolist() == approx([1.0, 1.0])
+
+
+def test_run_embedding_long_document_config(tmp_path):
+    """long_document_pooling from config is used by the module"""
+    model_path = str(tmp_path / "model_id")
+    BOOTSTRAPPED_MODEL.save(model_path)
+    long_text = "x " * 1000
+
+    with temp_config(embedding={"long_document_pooling": "weighted"}):
+        model = EmbeddingModule.load(model_path)
+    res = model.run_embedding(text=long_text)
+    assert len(res.result.data.values) == 32
+    assert res.input_token_count > model.model.max_seq_length
+
+    with temp_config(embedding={"long_document_pooling": "median"}):
+        with pytest.raises(ValueError):
+            EmbeddingModule.load(model_path)
+
+
+@pytest.mark.parametrize("window_overlap", [-1, 510])
+def test_window_overlap_config_checked_at_load(window_overlap, tmp_path):
+    model_path = str(tmp_path / "model_id")
+    BOOTSTRAPPED_MODEL.save(model_path)
+    with temp_config(embedding={"window_overlap": window_overlap}):
+        with pytest.raises(ValueError, match="EMBEDDING_WINDOW_OVERLAP"):
+            EmbeddingModule.load(model_path)
+
+
+## Tokenization cache ###########################################################
+
+
+@pytest.fixture(name="cached_model")
+def fixture_cached_model(tmp_path):
+    model_path = str(tmp_path / "model_id")
+    BOOTSTRAPPED_MODEL.save(model_path)
+    with temp_config(embedding={"tokenization_cache_size": 3}):
+        return EmbeddingModule.load(model_path)
+
+
+def test_tokenization_cache_disabled_by_default(loaded_model):
+    assert loaded_model.model.tokenization_cache is None
+
+
+def test_tokenization_cache_matches_tokenizer(loaded_model, cached_model):
+    """Batches padded from cache equal the tokenizer's padded batches"""
+    model = cached_model.model
+    texts = ["foo", "foo and bar", "Where is the bar"]
+    model._get_tokenized_cached(texts[:2])  # cache 2 of 3
+
+    tokenized = model._get_tokenized_cached(texts)
+    expected = loaded_model.model._get_tokenized(texts)
+
+    assert tokenized.encodings is None  # assembled from the cache
+    for key in ("input_ids", "attention_mask", "offset_mapping"):
+        assert torch.equal(tokenized[key], expected[key])
+    assert sum_token_count(tokenized) == sum_token_count(expected)
+    assert model.tokenization_cache.hits == 2
+
+
+@pytest.mark.parametrize("truncate_input_tokens", [-1, 0, 3, 99])
+def test_tokenization_cache_same_embeddings(
+    loaded_model, cached_model, truncate_input_tokens
+):
+    """Repeated encode calls with the cache give the same results as without"""
+    expected = loaded_model.run_embeddings(
+        texts=MANY_INPUTS, truncate_input_tokens=truncate_input_tokens
+    )
+    for _ in range(2):
+        actual = cached_model.run_embeddings(
+            texts=MANY_INPUTS, truncate_input_tokens=truncate_input_tokens
+        )
+        assert actual.input_token_count == expected.input_token_count
+        for a, e in zip(actual.results.vectors, expected.results.vectors):
+            assert a.data.values == approx(e.data.values, abs=1e-6)
+
+
+def test_tokenization_cache_truncation_error(cached_model):
+    """Cached long texts are still detected as needing truncation"""
+    too_long = "x " * 1000
+    for _ in range(2):
+        with pytest.raises(ValueError, match="for text at index: 1."):
+            cached_model.run_embeddings(texts=["foo", too_long])
+
+
+def test_tokenization_cache_lru(cached_model):
+    """The least recently used texts are dropped over the max size"""
+    model = cached_model.model
+    model._get_tokenized_cached(["a", "b", "c"])
+    model._get_tokenized_cached(["a", "d"])  # b is the least recently used
+
+    cache = model.tokenization_cache
+    assert len(cache) == 3
+    assert [tokens is not None for tokens in cache.get_many(["a", "b", "c", "d"])] == [
+        True,
+        False,
+        True,
+        True,
+    ]
+
+
+def test_tokenization_cache_size_config_type(tmp_path):
+    model_path = str(tmp_path / "model_id")
+    BOOTSTRAPPED_MODEL.save(model_path)
+    with temp_config(embedding={"tokenization_cache_size": "big"}):
+        with pytest.raises(TypeError):
+            EmbeddingModule.load(model_path)
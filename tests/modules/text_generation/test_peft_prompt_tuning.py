@@ -27,7 +27,11 @@ import caikit
 from caikit_nlp.data_model import ExponentialDecayLengthPenalty
 from caikit_nlp.modules.text_generation import PeftPromptTuning
 from caikit_nlp.modules.text_generation.peft_prompt_tuning import TuningType
+from caikit_nlp.resources.pretrained_model import HFAutoCausalLM
+from caikit_nlp.toolkit.text_generation.assisted_decoding import load_draft_model
+from caikit_nlp.toolkit.text_generation.quantization import is_quantized
 from tests.fixtures import (
+    CAUSAL_LM_MODEL,
     causal_lm_dummy_model,
     causal_lm_train_kwargs,
     seq2seq_lm_dummy_model,
@@ -57,6 +61,93 @@ def test_save_and_reload_with_base_model(causal_lm_dummy_model, set_cpu_device):
     )
 
 
+def test_reload_shares_base_model(causal_lm_dummy_model, set_cpu_device):
+    """Ensure that reloaded prompt tuned models share their base model and
+    generate as with their own base model
+    """
+    with tempfile.TemporaryDirectory() as model_dir:
+        causal_lm_dummy_model.save(model_dir, save_base_model=True)
+        models = [PeftPromptTuning.load(model_dir) for _ in range(2)]
+        with temp_config(text_generation={"shared_base_models": False}):
+            own_model = PeftPromptTuning.load(model_dir)
+    base_model = models[0].model.get_base_model()
+    assert models[1].model.get_base_model() is base_model
+    assert own_model.model.get_base_model() is not base_model
+
+    texts = ["@foo what a cute dog!", "hello"]
+    for text in texts:
+        expected = own_model.run(text, max_new_tokens=8, repetition_penalty=1.2)
+        result = models[0].run(text, max_new_tokens=8, repetition_penalty=1.2)
+        assert result.generated_text == expected.generated_text
+        stream = list(models[0].run_stream_out(text, max_new_tokens=8))
+        assert stream[-1].details.generated_tokens > 0
+    batch = models[1].run_batch(texts, max_new_tokens=8, repetition_penalty=1.2)
+    assert [result.generated_text for result in batch] == [
+        models[1].run(text, max_new_tokens=8, repetition_penalty=1.2).generated_text
+        for text in texts
+    ]
+
+
+@pytest.mark.parametrize("shared_base_models", [True, False])
+def test_reload_quantized(causal_lm_dummy_model, set_cpu_device, shared_base_models):
+    """Ensure that prompt tuned models can be reloaded over an int8 base model"""
+    with tempfile.TemporaryDirectory() as model_dir:
+        causal_lm_dummy_model.save(model_dir, save_base_model=True)
+        with temp_config(text_generation={"shared_base_models": shared_base_models}):
+            model = PeftPromptTuning.load(model_dir, quantization="int8")
+            full_model = PeftPromptTuning.load(model_dir)
+    assert is_quantized(model.model.get_base_model())
+    assert not is_quantized(full_model.model.get_base_model())
+    result = model.run("@foo what a cute dog!", max_new_tokens=4, min_new_tokens=4)
+    assert result.generated_tokens > 0
+
+
+def test_run_mixed_batch(causal_lm_train_kwargs, set_cpu_device):
+    """Ensure each text of a mixed batch is generated with its own model"""
+    models = []
+    with tempfile.TemporaryDirectory() as model_dir:
+        for verbalizer in ["{{input}}", "Question: {{input}} Answer:"]:
+            PeftPromptTuning.train(
+                **get_prompt_tuning_train_kwargs(causal_lm_train_kwargs["base_model"]),
+                verbalizer=verbalizer,
+            ).save(model_dir, save_base_model=True)
+            models.append(PeftPromptTuning.load(model_dir))
+    texts = ["@foo what a cute dog!", "hello", "x"]
+    batch_models = [models[0], models[1], models[1]]
+    results = PeftPromptTuning.run_mixed_batch(batch_models, texts, max_new_tokens=8)
+    for model, text, result in zip(batch_models, texts, results):
+        assert result.generated_text == model.run(text, max_new_tokens=8).generated_text
+    assert results[1].generated_text.startswith("Question: hello Answer:")
+    assert PeftPromptTuning.run_mixed_batch([], []) == []
+
+
+def test_run_mixed_batch_needs_shared_base_model(causal_lm_dummy_model):
+    other_model = PeftPromptTuning.train(
+        **get_prompt_tuning_train_kwargs(
+            HFAutoCausalLM.bootstrap(
+                model_name=CAUSAL_LM_MODEL, tokenizer_name=CAUSAL_LM_MODEL
+            )
+        )
+    )
+    with pytest.raises(ValueError):
+        PeftPromptTuning.run_mixed_batch(
+            [causal_lm_dummy_model, other_model], ["foo", "bar"]
+        )
+    with pytest.raises(ValueError):
+        PeftPromptTuning.run_mixed_batch([causal_lm_dummy_model], ["foo", "bar"])
+
+
+def test_reload_with_draft_model(causal_lm_dummy_model, set_cpu_device):
+    """Ensure that a draft model can be given when loading"""
+    with tempfile.TemporaryDirectory() as model_dir:
+        causal_lm_dummy_model.save(model_dir, save_base_model=True)
+        reloaded_model = PeftPromptTuning.load(
+            model_dir, torch_dtype="float16", draft_model_path=CAUSAL_LM_MODEL
+        )
+    assert reloaded_model.draft_model.model.dtype is torch.float16
+    assert causal_lm_dummy_model.draft_model is None
+
+
 def test_save_and_reload_without_base_model(causal_lm_dummy_model):
     """Ensure that if we don't save the base model, we get the expected behavior."""
     with tempfile.TemporaryDirectory() as model_dir:
@@ -404,6 +495,79 @@ def test_run_sampling_param_ignored_greedy_decoding(causal_lm_dummy_model):
     assert isinstance(pred, GeneratedTextResult)
 
 
+def get_prompt_tuning_train_kwargs(base_model):
+    """Get train kwargs for an untrained prompt tuned model"""
+    return {
+        "base_model": base_model,
+        "train_stream": caikit.core.data_model.DataStream.from_iterable(
+            [
+                caikit_nlp.data_model.GenerationTrainRecord(
+                    input="@foo what a cute dog!", output="no complaint"
+                ),
+            ]
+        ),
+        "num_epochs": 0,
+        "tuning_config": caikit_nlp.data_model.TuningConfig(
+            num_virtual_tokens=8, prompt_tuning_init_text="hello world"
+        ),
+    }
+
+
+def test_run_with_prefix_cache(causal_lm_train_kwargs):
+    """Ensure runs continuing from the cached prompt prefix generate the same text"""
+    model = PeftPromptTuning.train(
+        **get_prompt_tuning_train_kwargs(causal_lm_train_kwargs["base_model"]),
+        verbalizer="Instruction: answer politely. Question: {{input}} Answer:",
+    )
+    texts = ["what a cute dog!", "x"]
+    cached = [
+        model.run(text, max_new_tokens=8, repetition_penalty=1.2) for text in texts
+    ]
+    prefix_cache = model._get_prefix_cache()
+    assert prefix_cache is not None
+    assert prefix_cache.num_virtual_tokens == 8
+    prefix_text = model.tokenizer.decode(prefix_cache.token_ids)
+    assert "Instruction: answer politely. Question: ".startswith(prefix_text)
+    cached_stream = list(model.run_stream_out(texts[0], max_new_tokens=8))
+
+    model._use_prefix_cache = False
+    for text, result in zip(texts, cached):
+        expected = model.run(text, max_new_tokens=8, repetition_penalty=1.2)
+        assert result.generated_text == expected.generated_text
+        assert result.generated_tokens == expected.generated_tokens
+        assert result.finish_reason == expected.finish_reason
+    expected_stream = list(model.run_stream_out(texts[0], max_new_tokens=8))
+    assert [r.generated_text for r in cached_stream] == [
+        r.generated_text for r in expected_stream
+    ]
+
+
+def test_run_with_prefix_cache_and_draft_model(causal_lm_train_kwargs):
+    """Ensure greedy runs continuing from the prefix cache are assisted by the
+    draft model without changing the text
+    """
+    model = PeftPromptTuning.train(
+        **get_prompt_tuning_train_kwargs(causal_lm_train_kwargs["base_model"]),
+        verbalizer="Instruction: answer politely. Question: {{input}} Answer:",
+    )
+    expected = model.run("what a cute dog!", max_new_tokens=8)
+    model.draft_model = load_draft_model(CAUSAL_LM_MODEL, model.model)
+    assert model.run("what a cute dog!", max_new_tokens=8) == expected
+    assert model.draft_model.proposed_tokens > 0
+    assert 0 <= model.draft_model.acceptance_rate <= 1
+
+
+def test_prefix_cache_disabled(causal_lm_train_kwargs, seq2seq_lm_dummy_model):
+    """Ensure the prefix cache is only used for causal models when enabled"""
+    assert seq2seq_lm_dummy_model._get_prefix_cache() is None
+    with temp_config(text_generation={"prefix_cache": False}):
+        model = PeftPromptTuning.train(
+            **get_prompt_tuning_train_kwargs(causal_lm_train_kwargs["base_model"])
+        )
+    assert model._get_prefix_cache() is None
+    assert isinstance(model.run("@foo what a cute dog!"), GeneratedTextResult)
+
+
 def test_run_with_custom_stop_criteria(causal_lm_dummy_model):
     """Ensure custom stop sequences works with run"""
     pred = causal_lm_dummy_model.run(
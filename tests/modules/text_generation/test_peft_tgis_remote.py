@@ -4,18 +4,24 @@ TGIS client and do NOT actually start/hit a TGIS server instance.
 # Standard
 from typing import Iterable
 from unittest import mock
+import asyncio
 import os
 import tempfile
 
 # Third Party
 import pytest
 
+# First Party
+from caikit_tgis_backend import TGISBackend
+
 # Local
 from caikit_nlp.modules.text_generation import PeftPromptTuningTGIS
+from caikit_nlp.toolkit.text_generation.tgis_utils import close_async_tgis_clients
 from tests.fixtures import (
     StubTGISClient,
     causal_lm_dummy_model,
     causal_lm_train_kwargs,
+    fake_tgis_server,
     saved_causal_lm_dummy_model,
     stub_tgis_backend,
     temp_config,
@@ -77,6 +83,18 @@ def test_load_and_tokenize(causal_lm_dummy_model, stub_tgis_backend):
     assert mock_tgis_model.verbalizer == causal_lm_dummy_model.verbalizer
 
 
+def test_load_and_tokenize_batch(causal_lm_dummy_model, stub_tgis_backend):
+    """Ensure we can export an in memory model, load it, and tokenize a list of texts"""
+    with tempfile.TemporaryDirectory() as model_dir:
+        causal_lm_dummy_model.save(model_dir)
+        mock_tgis_model = PeftPromptTuningTGIS.load(model_dir, stub_tgis_backend)
+
+    results = mock_tgis_model.run_tokenizer_batch([SAMPLE_TEXT] * 3)
+    assert len(results) == 3
+    for result in results:
+        StubTGISClient.validate_tokenize_response(result)
+
+
 def test_load_and_run_stream_out(causal_lm_dummy_model, stub_tgis_backend):
     """Ensure we can export an in memory model, load it, and (mock) run output streaming
     with the right text & prefix ID."""
@@ -144,3 +162,32 @@ def test_purge_prompt_disabled_on_del(saved_causal_lm_dummy_model, stub_tgis_bac
     with temp_config(unload_tgis_prompt_artifacts=False):
         mock_tgis_model.__del__()
         assert not stub_tgis_backend.unload_prompt_artifacts.called
+
+
+def test_run_async(fake_tgis_server):
+    """Ensure the async methods send the verbalized text and prefix ID through the
+    async TGIS client
+    """
+    servicer, address = fake_tgis_server
+    model = PeftPromptTuningTGIS(
+        "base-model",
+        "my-prompt",
+        "</s>",
+        "hello distributed {{input}}",
+        tgis_backend=TGISBackend({"connection": {"hostname": address}}),
+    )
+
+    async def run():
+        result = await model.run_async(SAMPLE_TEXT)
+        stream = [part async for part in model.run_stream_out_async(SAMPLE_TEXT)]
+        tokenization = await model.run_tokenizer_async(SAMPLE_TEXT)
+        await close_async_tgis_clients()
+        return result, stream, tokenization
+
+    result, stream, tokenization = asyncio.run(run())
+    assert result.generated_text == "hello distributed Hello stub"
+    assert stream[-1].details.generated_tokens == 4
+    assert tokenization.token_count == 2
+    generate_request, stream_request, _ = servicer.requests
+    assert generate_request.prefix_id == stream_request.prefix_id == "my-prompt"
+    assert generate_request.model_id == "base-model"
@@ -18,11 +18,13 @@ import caikit
 from caikit_nlp.data_model import GenerationTrainRecord
 from caikit_nlp.modules.text_generation import TextGeneration
 from caikit_nlp.resources.pretrained_model import HFAutoCausalLM, HFAutoSeq2SeqLM
+from caikit_nlp.toolkit.text_generation.quantization import is_quantized
 from tests.fixtures import (
     CAUSAL_LM_MODEL,
     SEQ2SEQ_LM_MODEL,
     disable_wip,
     set_cpu_device,
+    temp_config,
 )
 
 ### Stub Modules
@@ -48,6 +50,64 @@ def test_bootstrap_and_run_seq2seq():
     assert isinstance(generated_text, GeneratedTextResult)
 
 
+def test_bootstrap_lazy_loads_weights_on_first_run():
+    """Check that lazily loaded weights are only loaded by the first run"""
+    with temp_config(model_loading={"lazy": True}):
+        model = TextGeneration.bootstrap(CAUSAL_LM_MODEL)
+    assert not model.model.is_model_loaded
+    model.run_tokenizer("Hello stub")
+    assert not model.model.is_model_loaded
+
+    generated_text = model.run("Hello stub")
+    assert isinstance(generated_text, GeneratedTextResult)
+    assert model.model.is_model_loaded
+
+
+@pytest.mark.parametrize("model_name", [CAUSAL_LM_MODEL, SEQ2SEQ_LM_MODEL])
+def test_bootstrap_and_run_quantized(model_name):
+    """Check that int8 quantized models can run, quantized from the config"""
+    with temp_config(text_generation={"quantization": "int8"}):
+        model = TextGeneration.bootstrap(model_name)
+    assert is_quantized(model.model.model)
+    generated_text = model.run("Hello stub", max_new_tokens=4)
+    assert isinstance(generated_text, GeneratedTextResult)
+
+
+@pytest.mark.parametrize("model_name", [CAUSAL_LM_MODEL, SEQ2SEQ_LM_MODEL])
+def test_run_batch_matches_run(model_name):
+    """Batched generation gives the same results as running one text at a time"""
+    model = TextGeneration.bootstrap(model_name)
+    # Decoder-only models need left padding to generate in a batch
+    model.model.tokenizer.padding_side = "left"
+    texts = ["Hello stub", "A much longer text to pad the others", "Hi"]
+
+    batch_results = model.run_batch(texts, max_new_tokens=5, batch_size=2)
+
+    assert len(batch_results) == len(texts)
+    for text, batch_result in zip(texts, batch_results):
+        result = model.run(text, max_new_tokens=5)
+        assert isinstance(batch_result, GeneratedTextResult)
+        assert batch_result.generated_text == result.generated_text
+        assert batch_result.finish_reason == result.finish_reason
+        assert batch_result.input_token_count == result.input_token_count
+        assert 0 < batch_result.generated_tokens <= 5
+
+
+def test_run_batch_right_padding_token_counts():
+    """Right padded batches still count the tokens of each row"""
+    model = TextGeneration.bootstrap(SEQ2SEQ_LM_MODEL)
+    assert model.model.tokenizer.padding_side == "right"
+    texts = ["Hi", "A much longer text to pad the others"]
+
+    batch_results = model.run_batch(texts, max_new_tokens=4, min_new_tokens=4)
+
+    tokenizer = model.model.tokenizer
+    assert [r.input_token_count for r in batch_results] == [
+        len(tokenizer(text)["input_ids"]) for text in texts
+    ]
+    assert [r.generated_tokens for r in batch_results] == [4, 4]
+
+
 def test_bootstrap_and_save_model():
     """Check if we can bootstrap and save the model successfully"""
 
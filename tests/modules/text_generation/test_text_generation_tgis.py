@@ -2,6 +2,7 @@
 
 # Standard
 from unittest import mock
+import asyncio
 import os
 import platform
 import tempfile
@@ -19,12 +20,14 @@ import caikit
 from caikit_nlp.data_model import ExponentialDecayLengthPenalty, GenerationTrainRecord
 from caikit_nlp.modules.text_generation import TextGeneration, TextGenerationTGIS
 from caikit_nlp.resources.pretrained_model.hf_auto_seq2seq_lm import HFAutoSeq2SeqLM
+from caikit_nlp.toolkit.text_generation.tgis_utils import close_async_tgis_clients
 from tests.fixtures import set_cpu_device  # noqa
 from tests.fixtures import (
     CAUSAL_LM_MODEL,
     SEQ2SEQ_LM_MODEL,
     StubTGISBackend,
     StubTGISClient,
+    fake_tgis_server,
 )
 
 SAMPLE_TEXT = "Hello stub"
@@ -72,6 +75,18 @@ def test_bootstrap_and_tokenize_seq2seq():
     StubTGISClient.validate_tokenize_response(result)
 
 
+def test_bootstrap_and_tokenize_batch():
+    """Check if we can bootstrap and tokenize a list of texts"""
+    model = TextGenerationTGIS.bootstrap(
+        CAUSAL_LM_MODEL, load_backend=StubTGISBackend()
+    )
+
+    results = model.run_tokenizer_batch([SAMPLE_TEXT] * 3)
+    assert len(results) == 3
+    for result in results:
+        StubTGISClient.validate_tokenize_response(result)
+
+
 def test_run_multi_response_errors():
     """Check if multiple responses errors"""
     with mock.patch.object(StubTGISClient, "Generate") as mock_gen_stream:
@@ -273,3 +288,29 @@ def test_invalid_optional_params():
 
     with pytest.raises(ValueError):
         _ = model.run(SAMPLE_TEXT, decoding_method="GREEDY", seed=5)
+
+
+### Async tests #########################################################################
+
+
+def test_run_async(fake_tgis_server):
+    """Check that the async methods serve from the async TGIS client"""
+    servicer, address = fake_tgis_server
+    tgis_backend = TGISBackend({"connection": {"hostname": address}})
+    model = TextGenerationTGIS(
+        "model-name", eos_token="</s>", tgis_backend=tgis_backend
+    )
+
+    async def run():
+        result = await model.run_async(SAMPLE_TEXT)
+        stream = [part async for part in model.run_stream_out_async(SAMPLE_TEXT)]
+        tokenization = await model.run_tokenizer_async(SAMPLE_TEXT)
+        await close_async_tgis_clients()
+        return result, stream, tokenization
+
+    result, stream, tokenization = asyncio.run(run())
+    assert result.generated_text == SAMPLE_TEXT
+    assert "".join(part.generated_text for part in stream) == SAMPLE_TEXT
+    assert tokenization.token_count == 2
+    assert len(servicer.requests) == 3
+    assert all(request.model_id == "model-name" for request in servicer.requests)
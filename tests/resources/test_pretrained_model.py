@@ -7,6 +7,7 @@ NOTE: If the subclasses become sufficiently complex, this test file should be sp
 """
 # Standard
 from unittest.mock import patch
+import tempfile
 
 # Third Party
 from datasets import IterableDataset as TransformersIterableDataset
@@ -28,6 +29,7 @@ from tests.fixtures import (
     SEQ2SEQ_LM_MODEL,
     models_cache_dir,
     temp_cache_dir,
+    temp_config,
 )
 
 
@@ -95,6 +97,59 @@ def test_boostrap_model_path(models_cache_dir):
     assert base_model.TASK_TYPE == "CAUSAL_LM"
 
 
+def test_bootstrap_lazy_loads_model_on_first_use(models_cache_dir):
+    """Ensure that a lazily bootstrapped model loads its weights when first used"""
+    with patch.object(
+        transformers.AutoModelForCausalLM,
+        "from_pretrained",
+        wraps=transformers.AutoModelForCausalLM.from_pretrained,
+    ) as mock_from_pretrained:
+        base_model = HFAutoCausalLM.bootstrap(model_name=CAUSAL_LM_MODEL, lazy=True)
+        assert not base_model.is_model_loaded
+        assert base_model.tokenizer is not None
+        assert set(base_model.load_times) == {"tokenizer", "config"}
+        mock_from_pretrained.assert_not_called()
+
+        assert base_model.model is base_model.model
+        assert base_model.is_model_loaded
+        mock_from_pretrained.assert_called_once()
+    assert set(base_model.load_times) == {
+        "tokenizer",
+        "config",
+        "weights",
+        "device_move",
+        "quantization",
+    }
+
+
+def test_bootstrap_lazy_from_config(models_cache_dir):
+    """Ensure that lazy loading can be enabled in the config"""
+    with temp_config(model_loading={"lazy": "true"}):
+        base_model = HFAutoCausalLM.bootstrap(model_name=CAUSAL_LM_MODEL)
+    assert not base_model.is_model_loaded
+    assert base_model.model.dtype is torch.float32
+    assert HFAutoCausalLM.bootstrap(model_name=CAUSAL_LM_MODEL).is_model_loaded
+
+
+def test_bootstrap_config_kwargs(models_cache_dir):
+    """Ensure that config attributes passed as kwargs are set on the model config"""
+    base_model = HFAutoCausalLM.bootstrap(
+        model_name=CAUSAL_LM_MODEL, lazy=True, return_dict=False
+    )
+    assert base_model.model.config.return_dict is False
+
+
+def test_bootstrap_quantized_model_cannot_be_saved(models_cache_dir):
+    """Ensure that int8 models load in float32 and refuse to be saved"""
+    base_model = HFAutoCausalLM.bootstrap(
+        model_name=CAUSAL_LM_MODEL, torch_dtype=torch.float16, quantization="int8"
+    )
+    assert base_model.model.dtype is torch.float32
+    with tempfile.TemporaryDirectory() as model_dir:
+        with pytest.raises(ValueError):
+            base_model.save(model_dir)
+
+
 ### Tests for tokenization behaviors
 SAMPLE_TRAINING_DATA = caikit.core.data_model.DataStream.from_iterable(
     [
@@ -4,7 +4,11 @@
 import pytest
 
 # Local
-from caikit_nlp.toolkit.verbalizer_utils import is_valid_verbalizer, render_verbalizer
+from caikit_nlp.toolkit.verbalizer_utils import (
+    get_static_prefix,
+    is_valid_verbalizer,
+    render_verbalizer,
+)
 import caikit_nlp
 
 SAMPLE_DM = caikit_nlp.data_model.GenerationTrainRecord(
@@ -58,6 +62,14 @@ def test_empty_verbalizer_substitution():
     assert render_verbalizer(verbalizer_template, SAMPLE_DICT) == expected_render_result
 
 
+def test_get_static_prefix():
+    """Ensure that the static prefix is the text before the first placeholder."""
+    assert get_static_prefix("{{input}}") == ""
+    assert get_static_prefix("text: {{input}} label: {{output}}") == "text: "
+    assert get_static_prefix("text: {{}} label: {{input}}") == "text: {{}} label: "
+    assert get_static_prefix("text: foo") == "text: foo"
+
+
 ### sad path rendering cases
 def test_is_invalid_verbalizer():
     """Ensure that when we have happy verbalizers, it's easy to check."""
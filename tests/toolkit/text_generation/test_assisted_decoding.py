@@ -0,0 +1,113 @@
+# Third Party
+from transformers import AutoModelForCausalLM, AutoTokenizer
+import pytest
+
+# First Party
+from caikit.core.data_model.producer import ProducerId
+
+# Local
+from caikit_nlp.modules.text_generation import TextGeneration
+from caikit_nlp.toolkit.text_generation.assisted_decoding import (
+    DraftModel,
+    load_draft_model,
+)
+from caikit_nlp.toolkit.text_generation.model_run_utils import (
+    generate_text_func,
+    generate_text_func_stream,
+)
+from tests.fixtures import CAUSAL_LM_MODEL, SEQ2SEQ_LM_MODEL
+
+PROMPT = "the quick brown fox jumps over the lazy dog"
+
+
+@pytest.fixture(scope="module")
+def causal_lm():
+    model = AutoModelForCausalLM.from_pretrained(CAUSAL_LM_MODEL).eval()
+    tokenizer = AutoTokenizer.from_pretrained(CAUSAL_LM_MODEL)
+    return model, tokenizer
+
+
+@pytest.fixture
+def draft_model(causal_lm):
+    # The same weights as the target, so every proposed token is accepted
+    return load_draft_model(CAUSAL_LM_MODEL, causal_lm[0])
+
+
+def generate(causal_lm, draft_model=None, **kwargs):
+    model, tokenizer = causal_lm
+    return generate_text_func(
+        model,
+        tokenizer,
+        ProducerId("Test", "0.0.1"),
+        tokenizer.eos_token,
+        PROMPT,
+        max_new_tokens=16,
+        min_new_tokens=16,
+        draft_model=draft_model,
+        **kwargs,
+    )
+
+
+def test_greedy_output_unchanged(causal_lm, draft_model):
+    expected = generate(causal_lm)
+    result = generate(causal_lm, draft_model)
+    assert result.generated_text == expected.generated_text
+    assert result.generated_tokens == expected.generated_tokens
+    assert result.finish_reason == expected.finish_reason
+    assert draft_model.proposed_tokens > 0
+    assert draft_model.acceptance_rate == 1.0
+
+
+def test_stream_output_unchanged(causal_lm, draft_model):
+    model, tokenizer = causal_lm
+    stream = list(
+        generate_text_func_stream(
+            model,
+            tokenizer,
+            ProducerId("Test", "0.0.1"),
+            tokenizer.eos_token,
+            PROMPT,
+            max_new_tokens=16,
+            min_new_tokens=16,
+            draft_model=draft_model,
+        )
+    )
+    expected = generate(causal_lm)
+    assert (
+        "".join(r.generated_text for r in stream)
+        == expected.generated_text[len(PROMPT) :]
+    )
+    assert stream[-1].details.generated_tokens == 16
+    assert draft_model.acceptance_rate == 1.0
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"decoding_method": "SAMPLING"},
+        {"stop_sequences": ["foo"]},
+    ],
+)
+def test_falls_back_without_draft(causal_lm, draft_model, kwargs):
+    result = generate(causal_lm, draft_model, **kwargs)
+    assert result.generated_tokens == generate(causal_lm, **kwargs).generated_tokens
+    assert draft_model.proposed_tokens == 0
+    assert draft_model.acceptance_rate is None
+
+
+def test_draft_architecture_must_match(causal_lm):
+    with pytest.raises(ValueError):
+        load_draft_model(SEQ2SEQ_LM_MODEL, causal_lm[0])
+
+
+def test_text_generation_bootstrap_with_draft():
+    model = TextGeneration.bootstrap(CAUSAL_LM_MODEL, draft_model_path=CAUSAL_LM_MODEL)
+    draft_model = model.draft_model
+    assert isinstance(draft_model, DraftModel)
+    assert draft_model.model is not model.model.model
+    model.draft_model = None
+    expected = model.run(PROMPT, max_new_tokens=8, min_new_tokens=8)
+    model.draft_model = draft_model
+    result = model.run(PROMPT, max_new_tokens=8, min_new_tokens=8)
+    assert result.generated_text == expected.generated_text
+    assert draft_model.acceptance_rate == 1.0
@@ -0,0 +1,35 @@
+# Standard
+import gc
+import weakref
+
+# Third Party
+import torch
+
+# Local
+from caikit_nlp.toolkit.text_generation.base_model_registry import (
+    get_shared_base_model,
+    is_shared_base_model,
+)
+from tests.fixtures import CAUSAL_LM_MODEL
+
+
+def test_same_base_model_is_shared():
+    model = get_shared_base_model(CAUSAL_LM_MODEL)
+    assert is_shared_base_model(model)
+    assert not model.training
+    assert get_shared_base_model(CAUSAL_LM_MODEL + "/") is model
+
+
+def test_base_model_per_dtype():
+    model = get_shared_base_model(CAUSAL_LM_MODEL, torch.float32)
+    half_model = get_shared_base_model(CAUSAL_LM_MODEL, torch.float16)
+    assert half_model is not model
+    assert half_model.dtype is torch.float16
+
+
+def test_unreferenced_base_model_is_released():
+    model_ref = weakref.ref(get_shared_base_model(CAUSAL_LM_MODEL, torch.bfloat16))
+    gc.collect()
+    assert model_ref() is None
+    model = get_shared_base_model(CAUSAL_LM_MODEL, torch.bfloat16)
+    assert model.dtype is torch.bfloat16
@@ -0,0 +1,273 @@
+# Standard
+import threading
+
+# Third Party
+from transformers import AutoModelForCausalLM, AutoModelForSeq2SeqLM, AutoTokenizer
+import pytest
+import torch
+
+# First Party
+from caikit.core.data_model.producer import ProducerId
+from caikit.interfaces.nlp.data_model import FinishReason
+
+# Local
+from caikit_nlp.modules.text_generation import TextGeneration
+from caikit_nlp.toolkit.text_generation.continuous_batching import (
+    ContinuousBatchingEngine,
+    create_continuous_batching_engine,
+)
+from caikit_nlp.toolkit.text_generation.model_run_utils import (
+    StopSequenceAutomaton,
+    StopSequenceCriteria,
+    generate_text_func,
+    generate_text_func_stream,
+)
+from tests.fixtures import (
+    CAUSAL_LM_MODEL,
+    SEQ2SEQ_LM_MODEL,
+    causal_lm_dummy_model,
+    causal_lm_train_kwargs,
+    temp_config,
+)
+
+PROMPTS = [
+    "hello world",
+    "the quick brown fox jumps over the lazy dog",
+    "a",
+    "foo bar baz qux quux",
+    "once upon a time",
+]
+
+
+@pytest.fixture(scope="module")
+def causal_lm():
+    model = AutoModelForCausalLM.from_pretrained(CAUSAL_LM_MODEL).eval()
+    tokenizer = AutoTokenizer.from_pretrained(CAUSAL_LM_MODEL)
+    return model, tokenizer
+
+
+@pytest.fixture
+def engine(causal_lm):
+    engine = ContinuousBatchingEngine(*causal_lm, max_batch_size=3)
+    yield engine
+    engine.shutdown()
+
+
+def greedy_generate(causal_lm, text, max_new_tokens):
+    """Get the new token ids of one generate() call"""
+    model, tokenizer = causal_lm
+    input_ids = tokenizer(text, return_tensors="pt")["input_ids"]
+    with torch.no_grad():
+        output = model.generate(
+            input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            max_new_tokens=max_new_tokens,
+            pad_token_id=tokenizer.eos_token_id,
+        )
+    return output[0, input_ids.shape[1] :].tolist()
+
+
+def submit(engine, text, **kwargs):
+    input_ids = engine.tokenizer(text, return_tensors="pt")["input_ids"]
+    return engine.submit(input_ids, **kwargs)
+
+
+## ContinuousBatchingEngine ####################################################
+
+
+def test_concurrent_requests_match_generate(causal_lm, engine):
+    """Greedy requests decoded together give the same tokens as generate()"""
+    requests = [submit(engine, text, max_new_tokens=10) for text in PROMPTS]
+    for text, request in zip(PROMPTS, requests):
+        generated_ids, finish_reason = request.result(timeout=60)
+        expected = greedy_generate(causal_lm, text, 10)
+        assert generated_ids == expected
+        if finish_reason != FinishReason.EOS_TOKEN:
+            assert finish_reason == FinishReason.MAX_TOKENS
+            assert len(generated_ids) == 10
+
+    # More requests than max_batch_size are served, never more at once
+    assert engine.steps > 0
+    assert engine.step_sequences <= engine.steps * engine.max_batch_size
+
+
+def test_request_admitted_while_decoding(causal_lm, engine):
+    """A request submitted mid-run joins the running batch"""
+    first = submit(engine, PROMPTS[1], max_new_tokens=30, min_new_tokens=30)
+    # Wait for the first request to be decoding
+    next(iter(first.streamer))
+    second = submit(engine, PROMPTS[0], max_new_tokens=5, min_new_tokens=5)
+
+    second_ids, _ = second.result(timeout=60)
+    # The second request finished while the first one was still decoding
+    assert not first.done.is_set()
+    assert second_ids == greedy_generate(causal_lm, PROMPTS[0], 5)
+    first_ids, finish_reason = first.result(timeout=60)
+    assert len(first_ids) == 30
+    assert finish_reason == FinishReason.MAX_TOKENS
+
+
+def test_streamer_gets_each_token(engine):
+    request = submit(engine, PROMPTS[0], max_new_tokens=8, min_new_tokens=8)
+    streamed_ids = [token_id for token_id, _ in request.streamer]
+    generated_ids, _ = request.result(timeout=60)
+    assert streamed_ids == generated_ids
+    assert len(streamed_ids) == 8
+
+
+def test_cancel_retires_request(engine):
+    request = submit(engine, PROMPTS[0], max_new_tokens=1000, min_new_tokens=1000)
+    next(iter(request.streamer))
+    request.cancel()
+    generated_ids, finish_reason = request.result(timeout=60)
+    assert finish_reason == FinishReason.CANCELLED
+    assert len(generated_ids) < 1000
+
+
+def test_stop_sequence(causal_lm, engine):
+    expected = greedy_generate(causal_lm, PROMPTS[3], 10)
+    stop_sequence = expected[2:4]
+    request = submit(
+        engine,
+        PROMPTS[3],
+        max_new_tokens=10,
+        stopping_criteria=StopSequenceCriteria(StopSequenceAutomaton([stop_sequence])),
+    )
+    generated_ids, finish_reason = request.result(timeout=60)
+    assert finish_reason == FinishReason.STOP_SEQUENCE
+    assert generated_ids[-2:] == stop_sequence
+    assert generated_ids == expected[: len(generated_ids)]
+
+
+def test_seeded_sampling_is_reproducible(engine):
+    kwargs = {
+        "max_new_tokens": 10,
+        "min_new_tokens": 10,
+        "do_sample": True,
+        "top_k": 50,
+        "temperature": 0.8,
+        "seed": 42,
+    }
+    first = submit(engine, PROMPTS[0], **kwargs)
+    second = submit(engine, PROMPTS[0], **kwargs)
+    assert first.result(timeout=60)[0] == second.result(timeout=60)[0]
+
+
+def test_unsupported_generate_kwargs(engine):
+    with pytest.raises(ValueError):
+        submit(engine, PROMPTS[0], num_beams=2)
+
+
+def test_shutdown_rejects_requests(engine):
+    engine.shutdown()
+    with pytest.raises(ValueError):
+        submit(engine, PROMPTS[0])
+
+
+def test_encoder_decoder_not_supported():
+    model = AutoModelForSeq2SeqLM.from_pretrained(SEQ2SEQ_LM_MODEL)
+    tokenizer = AutoTokenizer.from_pretrained(SEQ2SEQ_LM_MODEL)
+    with pytest.raises(ValueError):
+        ContinuousBatchingEngine(model, tokenizer)
+    with temp_config(text_generation={"continuous_batching": True}):
+        assert create_continuous_batching_engine(model, tokenizer) is None
+
+
+def test_create_engine_from_config(causal_lm):
+    assert create_continuous_batching_engine(*causal_lm) is None
+    with temp_config(
+        text_generation={"continuous_batching": True, "max_batch_size": 4}
+    ):
+        engine = create_continuous_batching_engine(*causal_lm)
+    assert engine.max_batch_size == 4
+
+
+## generate_text_func integration ##############################################
+
+
+def test_generate_text_func_peft_matches_generate(causal_lm_dummy_model):
+    """Prompt tuning virtual tokens are prefilled by the engine"""
+    model = causal_lm_dummy_model.model
+    tokenizer = causal_lm_dummy_model.tokenizer
+    engine = ContinuousBatchingEngine(model.get_base_model(), tokenizer)
+    try:
+        kwargs = {
+            "eos_token": tokenizer.eos_token,
+            "max_new_tokens": 10,
+            "task_type": "CAUSAL_LM",
+        }
+        results = [None] * len(PROMPTS)
+
+        def run(index):
+            results[index] = generate_text_func(
+                model,
+                tokenizer,
+                ProducerId("Test", "0.0.1"),
+                text=PROMPTS[index],
+                continuous_batching_engine=engine,
+                **kwargs,
+            )
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for text, result in zip(PROMPTS, results):
+            expected = generate_text_func(
+                model, tokenizer, ProducerId("Test", "0.0.1"), text=text, **kwargs
+            )
+            assert result.generated_text == expected.generated_text
+            assert result.generated_tokens == expected.generated_tokens
+            assert result.input_token_count == expected.input_token_count
+    finally:
+        engine.shutdown()
+
+
+def test_generate_text_func_stream_with_engine(causal_lm_dummy_model):
+    model = causal_lm_dummy_model.model
+    tokenizer = causal_lm_dummy_model.tokenizer
+    engine = ContinuousBatchingEngine(model.get_base_model(), tokenizer)
+    try:
+        kwargs = {"eos_token": tokenizer.eos_token, "max_new_tokens": 10}
+        stream = list(
+            generate_text_func_stream(
+                model,
+                tokenizer,
+                ProducerId("Test", "0.0.1"),
+                text=PROMPTS[0],
+                continuous_batching_engine=engine,
+                **kwargs,
+            )
+        )
+        expected = list(
+            generate_text_func_stream(
+                model,
+                tokenizer,
+                ProducerId("Test", "0.0.1"),
+                text=PROMPTS[0],
+                **kwargs,
+            )
+        )
+        assert "".join(r.generated_text for r in stream) == "".join(
+            r.generated_text for r in expected
+        )
+        assert (
+            stream[-1].details.generated_tokens == expected[-1].details.generated_tokens
+        )
+        assert stream[-1].details.finish_reason in (
+            FinishReason.MAX_TOKENS,
+            FinishReason.EOS_TOKEN,
+        )
+    finally:
+        engine.shutdown()
+
+
+def test_text_generation_run_uses_engine():
+    with temp_config(text_generation={"continuous_batching": True}):
+        model = TextGeneration.bootstrap(CAUSAL_LM_MODEL)
+    assert model._continuous_batching_engine is not None
+    result = model.run(PROMPTS[0], max_new_tokens=5, min_new_tokens=5)
+    assert result.generated_tokens > 0
+    assert model._continuous_batching_engine.steps == 4
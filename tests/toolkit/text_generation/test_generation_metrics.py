@@ -0,0 +1,197 @@
+# Standard
+from typing import Iterable
+
+# Third Party
+from transformers import AutoModelForCausalLM, AutoTokenizer
+import pytest
+
+# First Party
+from caikit.core.data_model.producer import ProducerId
+from caikit_tgis_backend.protobufs import generation_pb2
+
+# Local
+from caikit_nlp.toolkit.text_generation import tgis_utils
+from caikit_nlp.toolkit.text_generation.continuous_batching import (
+    ContinuousBatchingEngine,
+)
+from caikit_nlp.toolkit.text_generation.generation_metrics import (
+    GenerationTimer,
+    add_generation_metrics_hook,
+    generation_metrics_enabled,
+    remove_generation_metrics_hook,
+)
+from caikit_nlp.toolkit.text_generation.model_run_utils import (
+    generate_text_func,
+    generate_text_func_stream,
+)
+from tests.fixtures import CAUSAL_LM_MODEL
+
+PRODUCER_ID = ProducerId("Test", "0.0.1")
+
+
+@pytest.fixture(scope="module")
+def causal_lm():
+    model = AutoModelForCausalLM.from_pretrained(CAUSAL_LM_MODEL).eval()
+    tokenizer = AutoTokenizer.from_pretrained(CAUSAL_LM_MODEL)
+    return model, tokenizer
+
+
+@pytest.fixture
+def collected_metrics():
+    metrics = []
+    add_generation_metrics_hook(metrics.append)
+    yield metrics
+    remove_generation_metrics_hook(metrics.append)
+
+
+def check_local_metrics(metrics, new_tokens):
+    assert metrics.source == "local"
+    assert metrics.generated_tokens == new_tokens
+    assert len(metrics.inter_token_latencies) == new_tokens - 1
+    assert 0 < metrics.tokenization < metrics.time_to_first_token
+    assert metrics.prefill <= metrics.time_to_first_token
+    assert metrics.time_to_first_token + metrics.decode <= metrics.total
+    assert metrics.tokens_per_second > 0
+
+
+def test_timer_metrics(collected_metrics):
+    timer = GenerationTimer("local")
+    timer.tokenized()
+    timer.prefill_started()
+    timer.add_tokens()
+    timer.add_tokens(2)
+    metrics = timer.finish(3, 5)
+    assert collected_metrics == [metrics]
+    assert metrics.input_token_count == 5
+    assert metrics.queue_wait >= 0
+    assert len(metrics.inter_token_latencies) == 2
+    assert metrics.inter_token_latencies[1] == 0
+    assert metrics.inter_token_latency(0) == 0
+    assert metrics.inter_token_latency(100) == max(metrics.inter_token_latencies)
+
+
+def test_failing_hook_does_not_fail_request(collected_metrics):
+    def failing_hook(_):
+        raise RuntimeError("It's a mock")
+
+    add_generation_metrics_hook(failing_hook)
+    try:
+        GenerationTimer("local").finish(0)
+    finally:
+        remove_generation_metrics_hook(failing_hook)
+    assert len(collected_metrics) == 1
+
+
+def test_no_metrics_without_hooks(causal_lm):
+    assert not generation_metrics_enabled()
+    model, tokenizer = causal_lm
+    generate_text_func(
+        model, tokenizer, PRODUCER_ID, tokenizer.eos_token, "foo", max_new_tokens=2
+    )
+
+
+def test_generate_text_func_metrics(causal_lm, collected_metrics):
+    model, tokenizer = causal_lm
+    generate_text_func(
+        model,
+        tokenizer,
+        PRODUCER_ID,
+        tokenizer.eos_token,
+        "the quick brown fox",
+        max_new_tokens=5,
+        min_new_tokens=5,
+    )
+    (metrics,) = collected_metrics
+    check_local_metrics(metrics, 5)
+    assert metrics.input_token_count == len(tokenizer("the quick brown fox").input_ids)
+
+
+def test_generate_text_func_stream_metrics(causal_lm, collected_metrics):
+    model, tokenizer = causal_lm
+    results = list(
+        generate_text_func_stream(
+            model,
+            tokenizer,
+            PRODUCER_ID,
+            tokenizer.eos_token,
+            "the quick brown fox",
+            max_new_tokens=5,
+            min_new_tokens=5,
+        )
+    )
+    (metrics,) = collected_metrics
+    check_local_metrics(metrics, 5)
+    assert metrics.generated_tokens == results[-1].details.generated_tokens
+
+
+def test_continuous_batching_metrics(causal_lm, collected_metrics):
+    model, tokenizer = causal_lm
+    engine = ContinuousBatchingEngine(model, tokenizer)
+    try:
+        generate_text_func(
+            model,
+            tokenizer,
+            PRODUCER_ID,
+            tokenizer.eos_token,
+            "the quick brown fox",
+            max_new_tokens=4,
+            min_new_tokens=4,
+            continuous_batching_engine=engine,
+        )
+    finally:
+        engine.shutdown()
+    (metrics,) = collected_metrics
+    check_local_metrics(metrics, 4)
+    assert metrics.queue_wait >= 0
+
+
+class StreamingTgisClient:
+    """TGIS client streaming two tokens, then a message with the last token"""
+
+    def GenerateStream(
+        self, request: generation_pb2.SingleGenerationRequest, **kwargs
+    ) -> Iterable[generation_pb2.GenerationResponse]:
+        yield generation_pb2.GenerationResponse(input_token_count=3)
+        yield generation_pb2.GenerationResponse(text="a b", generated_token_count=2)
+        yield generation_pb2.GenerationResponse(
+            text=" c", generated_token_count=3, stop_reason=1
+        )
+
+
+def test_tgis_stream_metrics(collected_metrics):
+    client = tgis_utils.TGISGenerationClient(
+        "foo", None, StreamingTgisClient(), PRODUCER_ID
+    )
+    results = list(
+        client.stream_generate(
+            text="hello",
+            preserve_input_text=False,
+            input_tokens=False,
+            generated_tokens=True,
+            token_logprobs=False,
+            token_ranks=False,
+            include_stop_sequence=False,
+            max_new_tokens=3,
+            min_new_tokens=0,
+            truncate_input_tokens=0,
+            decoding_method="GREEDY",
+            top_k=0,
+            top_p=1.0,
+            typical_p=1.0,
+            temperature=1.0,
+            seed=None,
+            repetition_penalty=1.0,
+            max_time=None,
+            exponential_decay_length_penalty=None,
+            stop_sequences=None,
+        )
+    )
+    assert len(results) == 3
+    (metrics,) = collected_metrics
+    assert metrics.source == "tgis"
+    assert metrics.input_token_count == 3
+    assert metrics.generated_tokens == 3
+    assert len(metrics.inter_token_latencies) == 2
+    assert metrics.inter_token_latencies[0] == 0
+    assert metrics.tokenization is None and metrics.prefill is None
+    assert metrics.time_to_first_token <= metrics.total
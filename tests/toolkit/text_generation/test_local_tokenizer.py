@@ -0,0 +1,191 @@
+"""
+Tests for the local token counting of the TGIS tokenize calls
+"""
+
+# Standard
+import asyncio
+
+# Third Party
+from transformers import AutoTokenizer
+import grpc
+import pytest
+
+# First Party
+from caikit.core.data_model import ProducerId
+from caikit_tgis_backend.protobufs import generation_pb2, generation_pb2_grpc
+from caikit_tgis_backend.tgis_connection import TGISConnection
+
+# Local
+from caikit_nlp.toolkit.text_generation import local_tokenizer
+from caikit_nlp.toolkit.text_generation.local_tokenizer import get_local_token_counter
+from caikit_nlp.toolkit.text_generation.tgis_utils import (
+    AsyncTGISGenerationClient,
+    TGISGenerationClient,
+    close_async_tgis_clients,
+    get_async_tgis_client,
+)
+from tests.fixtures import (
+    CAUSAL_LM_MODEL,
+    SEQ2SEQ_LM_MODEL,
+    fake_tgis_server,
+    temp_config,
+)
+
+## Helpers #####################################################################
+
+TEXTS = [
+    "hello",
+    "Hello there, how are you doing today?",
+    "  leading and trailing spaces  ",
+    "Ünïcödé and emojis 🙂 are tokenized too",
+    "",
+]
+
+
+class TokenizingTGISClient:
+    """TGIS client stub tokenizing like TGIS, with the special tokens"""
+
+    def __init__(self, model_name):
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.calls = 0
+
+    def Tokenize(self, request, **kwargs):
+        self.calls += 1
+        return generation_pb2.BatchedTokenizeResponse(
+            responses=[
+                generation_pb2.TokenizeResponse(
+                    token_count=len(self.tokenizer.encode(req.text))
+                )
+                for req in request.requests
+            ]
+        )
+
+
+@pytest.fixture(autouse=True)
+def reset_counters(monkeypatch):
+    """Load the local tokenizers again in each test"""
+    monkeypatch.setattr(local_tokenizer, "_COUNTERS", {})
+
+
+def local_config(parity_checks=3):
+    return temp_config(
+        tgis_client={
+            "local_tokenizer": True,
+            "local_tokenizer_parity_checks": parity_checks,
+        }
+    )
+
+
+def gen_client(model_name, tgis_client):
+    return TGISGenerationClient(
+        model_name, "</s>", tgis_client, ProducerId("Test", "0.0.1")
+    )
+
+
+## Tests #######################################################################
+
+
+def test_local_tokenizer_off_by_default():
+    assert get_local_token_counter(CAUSAL_LM_MODEL) is None
+
+
+def test_local_tokenizer_loaded_once(monkeypatch):
+    with local_config():
+        counter = get_local_token_counter(CAUSAL_LM_MODEL)
+        assert counter.tokenizer.is_fast
+        assert get_local_token_counter(CAUSAL_LM_MODEL) is counter
+
+        # Models without tokenizer artifacts fall back to TGIS, without loading again
+        loads = []
+        load = local_tokenizer._load_fast_tokenizer
+        monkeypatch.setattr(
+            local_tokenizer,
+            "_load_fast_tokenizer",
+            lambda name: loads.append(name) or load(name),
+        )
+        for _ in range(2):
+            assert get_local_token_counter("not/a-local-model") is None
+        assert loads == ["not/a-local-model"]
+
+
+def test_local_tokenizer_under_base_models_dir():
+    with temp_config(
+        base_models_dir=CAUSAL_LM_MODEL.rsplit("/", 1)[0],
+        tgis_client={"local_tokenizer": "true"},
+    ):
+        assert get_local_token_counter("BloomForCausalLM") is not None
+
+
+@pytest.mark.parametrize("model_name", [CAUSAL_LM_MODEL, SEQ2SEQ_LM_MODEL])
+def test_parity_with_tgis_counts(model_name):
+    tgis_client = TokenizingTGISClient(model_name)
+    with local_config(parity_checks=2):
+        client = gen_client(model_name, tgis_client)
+        counts = [client.unary_tokenize(text).token_count for text in TEXTS]
+    assert counts == [
+        len(tgis_client.tokenizer.encode(text, add_special_tokens=True))
+        for text in TEXTS
+    ]
+    # Only the parity checks went to TGIS
+    assert tgis_client.calls == 2
+    assert client.local_token_counter.enabled
+
+
+def test_parity_mismatch_falls_back_to_tgis(fake_tgis_server):
+    servicer, address = fake_tgis_server
+    text = "Hello there, how are you doing today?"
+    with local_config(parity_checks=3), grpc.insecure_channel(address) as channel:
+        client = gen_client(
+            CAUSAL_LM_MODEL, generation_pb2_grpc.GenerationServiceStub(channel)
+        )
+        # The fake TGIS server counts words, so the first check fails
+        counts = [client.unary_tokenize(text).token_count for _ in range(5)]
+    assert counts == [7] * 5
+    assert len(servicer.requests) == 5
+    assert not client.local_token_counter.enabled
+
+
+def test_batch_tokenize_counts_locally():
+    tgis_client = TokenizingTGISClient(CAUSAL_LM_MODEL)
+    with local_config(parity_checks=2):
+        client = gen_client(CAUSAL_LM_MODEL, tgis_client)
+        # The parity checks take one batched call, the next counts are local
+        checked = client.batch_tokenize(TEXTS)
+        counts = client.batch_tokenize(TEXTS)
+        assert tgis_client.calls == 1
+        assert [result.token_count for result in counts] == [
+            result.token_count for result in checked
+        ]
+
+        # Tokens are only returned by TGIS
+        client.batch_tokenize(TEXTS[:1], return_tokens=True)
+        assert tgis_client.calls == 2
+
+
+def test_no_parity_checks():
+    tgis_client = TokenizingTGISClient(CAUSAL_LM_MODEL)
+    with local_config(parity_checks=0):
+        client = gen_client(CAUSAL_LM_MODEL, tgis_client)
+        assert client.unary_tokenize("hello there").token_count > 0
+    assert tgis_client.calls == 0
+
+
+def test_async_client_local_tokenizer(fake_tgis_server):
+    servicer, address = fake_tgis_server
+
+    async def run():
+        client = AsyncTGISGenerationClient(
+            CAUSAL_LM_MODEL,
+            "</s>",
+            get_async_tgis_client(TGISConnection(hostname=address, model_id="foo")),
+            ProducerId("Test", "0.0.1"),
+        )
+        result = await client.unary_tokenize("hello there")
+        await close_async_tgis_clients()
+        return result
+
+    with local_config(parity_checks=0):
+        result = asyncio.run(run())
+        counter = get_local_token_counter(CAUSAL_LM_MODEL)
+    assert result.token_count == counter.count("hello there")
+    assert not servicer.requests
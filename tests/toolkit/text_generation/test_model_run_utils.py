@@ -1,12 +1,29 @@
+# Standard
+from unittest import mock
+import threading
+import time
+
 # Third Party
+from transformers import LogitsProcessorList
 import pytest
+import torch
 
 # First Party
 from caikit.core.data_model.producer import ProducerId
-from caikit.interfaces.nlp.data_model import GeneratedTextResult
+from caikit.interfaces.nlp.data_model import (
+    FinishReason,
+    GeneratedTextResult,
+    GeneratedTextStreamResult,
+)
 
 # Local
-from caikit_nlp.toolkit.text_generation.model_run_utils import generate_text_func
+from caikit_nlp.toolkit.text_generation.model_run_utils import (
+    StopSequenceAutomaton,
+    StopSequenceCriteria,
+    TokenIteratorStreamer,
+    generate_text_func,
+    generate_text_func_stream,
+)
 from tests.fixtures import (
     causal_lm_dummy_model,
     causal_lm_train_kwargs,
@@ -105,3 +122,200 @@ def test_generate_text_func_preserve_input(request, seq_model_fixture):
     )
     after_pred = generated_text.generated_text
     assert before_pred == after_pred
+
+
+def test_generate_text_func_stream_is_incremental(causal_lm_dummy_model):
+    """Tokens are yielded while generation is still running"""
+    first_token_received = threading.Event()
+
+    def wait_for_first_token(input_ids, scores):
+        # Block generating the rest until the first token reached the caller
+        if input_ids.shape[1] > prompt_length + 1:
+            first_token_received.wait(timeout=10)
+        return scores
+
+    text = "What is the boiling point of liquid Nitrogen?"
+    tokenizer = causal_lm_dummy_model.tokenizer
+    prompt_length = tokenizer(text, return_tensors="pt")["input_ids"].size(1)
+
+    start = time.perf_counter()
+    stream = generate_text_func_stream(
+        model=causal_lm_dummy_model.model,
+        tokenizer=tokenizer,
+        producer_id=ProducerId("TextGeneration", "0.1.0"),
+        eos_token="<\n>",
+        text=text,
+        max_new_tokens=5,
+        min_new_tokens=5,
+        logits_processor=LogitsProcessorList([wait_for_first_token]),
+    )
+    first = next(stream)
+    time_to_first_token = time.perf_counter() - start
+    first_token_received.set()
+    rest = list(stream)
+    total_time = time.perf_counter() - start
+
+    assert time_to_first_token < 10  # did not wait for the whole generation
+    assert time_to_first_token < total_time
+    results = [first, *rest]
+    assert all(isinstance(r, GeneratedTextStreamResult) for r in results)
+    assert [r.details.generated_tokens for r in results] == [1, 2, 3, 4, 5, 5]
+    assert all(r.details.input_token_count == prompt_length for r in results)
+    assert [r.details.finish_reason for r in results] == [
+        FinishReason.NOT_FINISHED
+    ] * 5 + [FinishReason.MAX_TOKENS]
+
+
+@pytest.mark.parametrize(
+    "model_fixture", ["seq2seq_lm_dummy_model", "causal_lm_dummy_model"]
+)
+def test_generate_text_func_stream_text_matches_unary(request, model_fixture):
+    """The streamed text chunks add up to the generated text"""
+    model = request.getfixturevalue(model_fixture)
+    kwargs = {
+        "model": model.model,
+        "tokenizer": model.tokenizer,
+        "producer_id": ProducerId("TextGeneration", "0.1.0"),
+        "eos_token": "<\n>",
+        "text": "What is the boiling point of liquid Nitrogen?",
+        "max_new_tokens": 8,
+    }
+    unary = generate_text_func(
+        preserve_input_text=False, task_type=model.task_type, **kwargs
+    )
+    stream = list(generate_text_func_stream(**kwargs))
+
+    assert "".join(r.generated_text for r in stream).strip() == (
+        unary.generated_text.strip()
+    )
+    assert stream[-1].details.generated_tokens == len(stream) - 1
+    assert stream[-1].details.finish_reason == unary.finish_reason
+
+
+def test_generate_text_func_stream_close_stops_generation(causal_lm_dummy_model):
+    """Closing the stream early stops the generation thread"""
+    stream = generate_text_func_stream(
+        model=causal_lm_dummy_model.model,
+        tokenizer=causal_lm_dummy_model.tokenizer,
+        producer_id=ProducerId("TextGeneration", "0.1.0"),
+        eos_token="<\n>",
+        text="What is the boiling point of liquid Nitrogen?",
+        max_new_tokens=1000,
+        min_new_tokens=1000,
+    )
+    next(stream)
+    stream.close()
+    assert not any(t.name == "generate-stream" for t in threading.enumerate())
+
+
+def test_token_iterator_streamer_holds_back_incomplete_text():
+    """Text is only emitted once the decoded characters are complete"""
+    tokenizer = mock.Mock()
+    # Token 1 and 2 together decode to one character
+    pieces = {(): "", (1,): "�", (1, 2): "é", (1, 2, 3): "é!", (3,): "!"}
+    tokenizer.decode = lambda ids, **_: pieces[tuple(ids)]
+
+    streamer = TokenIteratorStreamer(tokenizer)
+    streamer.put(torch.tensor([[0]]))  # the prompt
+    for token_id in (1, 2, 3):
+        streamer.put(torch.tensor([token_id]))
+    streamer.end()
+
+    assert list(streamer) == [(1, ""), (2, "é"), (3, "!")]
+    assert streamer.final_text == ""
+
+
+def feed(automaton, token_ids):
+    """Get the 1-based positions where the stream ends with a stop sequence"""
+    state, matches = 0, []
+    for i, token_id in enumerate(token_ids):
+        state = automaton.step(state, token_id)
+        if automaton.is_match(state):
+            matches.append(i + 1)
+    return matches
+
+
+def test_stop_sequence_automaton_matches_full_sequences():
+    automaton = StopSequenceAutomaton([[1, 2, 3], [2, 4], [5]])
+    # Partial sequences do not match
+    assert feed(automaton, [1, 2, 6, 3, 2]) == []
+    # [2, 4] is found after a failed [1, 2, 3]
+    assert feed(automaton, [1, 2, 4]) == [3]
+    assert feed(automaton, [1, 1, 2, 3, 5]) == [4, 5]
+
+
+def test_stop_sequence_automaton_nested_sequences():
+    """A stop sequence ending inside a longer one is matched"""
+    automaton = StopSequenceAutomaton([[1, 2, 3, 4], [2, 3], []])
+    assert feed(automaton, [1, 2, 3, 4]) == [3, 4]
+    assert feed(automaton, [9, 9]) == []
+
+
+def test_stop_sequence_criteria_rows():
+    """Only new tokens are matched, each row separately"""
+    criteria = StopSequenceCriteria(StopSequenceAutomaton([[7, 8]]))
+    # The prompts end with 7 and contain 7, 8, which must not match
+    input_ids = torch.tensor([[7, 8, 7, 8], [7, 8, 7, 1], [0, 0, 7, 7]])
+    assert criteria(input_ids, None).tolist() == [False, False, False]
+
+    input_ids = torch.cat([input_ids, torch.tensor([[7], [7], [8]])], dim=1)
+    assert criteria(input_ids, None).tolist() == [False, False, True]
+
+    input_ids = torch.cat([input_ids, torch.tensor([[8], [8], [0]])], dim=1)
+    assert criteria(input_ids, None).tolist() == [True, True, True]
+    assert criteria.stop_counts == [3, 3, 2]
+
+
+def test_stop_sequence_criteria_several_new_tokens():
+    """Tokens added together since the last call are all matched"""
+    criteria = StopSequenceCriteria(StopSequenceAutomaton([[3, 4]]))
+    assert not criteria(torch.tensor([[1, 2]]), None)[0]
+    assert criteria(torch.tensor([[1, 2, 3, 4, 5]]), None)[0]
+    assert criteria.stop_counts == [3]
+
+
+def test_generate_text_func_stop_sequence(causal_lm_dummy_model):
+    """Generation stops at a full stop sequence of new tokens and reports it"""
+    # The dummy model keeps generating "!" after a prompt ending with "!"
+    text = "@foo what a cute dog!"
+    result = causal_lm_dummy_model.run(
+        text, max_new_tokens=8, min_new_tokens=8, preserve_input_text=False
+    )
+    assert result.generated_text == "!" * 8
+    stop_sequence, stop_count = "!!!", 3
+
+    result = causal_lm_dummy_model.run(
+        text,
+        max_new_tokens=8,
+        stop_sequences=[stop_sequence],
+        preserve_input_text=False,
+    )
+    assert result.finish_reason == FinishReason.STOP_SEQUENCE
+    assert result.generated_text == stop_sequence
+
+    batch_result = causal_lm_dummy_model.run_batch(
+        [text], max_new_tokens=8, stop_sequences=[stop_sequence]
+    )[0]
+    assert batch_result.finish_reason == FinishReason.STOP_SEQUENCE
+    assert batch_result.generated_tokens == stop_count
+
+    stream = list(
+        causal_lm_dummy_model.run_stream_out(
+            text, max_new_tokens=8, stop_sequences=[stop_sequence]
+        )
+    )
+    assert stream[-1].details.finish_reason == FinishReason.STOP_SEQUENCE
+    assert stream[-1].details.generated_tokens == stop_count
+
+
+def test_generate_text_func_batch_peft(causal_lm_dummy_model, monkeypatch):
+    """Prompt tuned models generate a batch like one text at a time"""
+    monkeypatch.setattr(causal_lm_dummy_model.tokenizer, "padding_side", "left")
+    texts = ["@foo what a cute dog!", "@bar this is the worst idea ever."]
+
+    batch_results = causal_lm_dummy_model.run_batch(texts, max_new_tokens=4)
+
+    for text, batch_result in zip(texts, batch_results):
+        result = causal_lm_dummy_model.run(text, max_new_tokens=4)
+        assert batch_result.generated_text == result.generated_text
+        assert batch_result.finish_reason == result.finish_reason
@@ -0,0 +1,70 @@
+# Third Party
+from transformers import AutoModelForCausalLM, AutoTokenizer
+import pytest
+import torch
+
+# First Party
+from caikit.core.data_model.producer import ProducerId
+
+# Local
+from caikit_nlp.toolkit.text_generation.model_run_utils import generate_text_func
+from caikit_nlp.toolkit.text_generation.quantization import (
+    get_quantization,
+    get_quantization_dtype,
+    is_quantized,
+    quantize_model,
+)
+from tests.fixtures import CAUSAL_LM_MODEL, temp_config
+
+
+def test_get_quantization_from_config():
+    assert get_quantization() is None
+    with temp_config(text_generation={"quantization": "int8"}):
+        assert get_quantization() == "int8"
+        assert get_quantization("") is None
+    assert get_quantization("bf16") == "bf16"
+
+
+def test_get_quantization_unsupported():
+    with pytest.raises(ValueError):
+        get_quantization("int4")
+
+
+def test_int8_loads_float32():
+    assert get_quantization_dtype("int8", torch.float16) is torch.float32
+    assert get_quantization_dtype(None, torch.float16) is torch.float16
+
+
+def test_quantize_model_int8():
+    model = AutoModelForCausalLM.from_pretrained(CAUSAL_LM_MODEL).eval()
+    tokenizer = AutoTokenizer.from_pretrained(CAUSAL_LM_MODEL)
+    quantize_model(model, "int8")
+    assert is_quantized(model)
+    assert not any(
+        isinstance(module, torch.nn.Linear) and module is not model.lm_head
+        for module in model.modules()
+    )
+    # Output embeddings stay tied to the input embeddings
+    assert model.lm_head.weight is model.transformer.word_embeddings.weight
+    # Full state dicts reload, partial ones (e.g. adapter weights) keep the weights
+    model.load_state_dict(model.state_dict())
+    assert model.load_state_dict({}, strict=False).missing_keys
+
+    result = generate_text_func(
+        model,
+        tokenizer,
+        ProducerId("Test", "0.0.1"),
+        tokenizer.eos_token,
+        "the quick brown fox",
+        max_new_tokens=4,
+        min_new_tokens=4,
+    )
+    assert result.generated_tokens > 0
+
+
+def test_quantize_model_int8_skips_half_models():
+    model = AutoModelForCausalLM.from_pretrained(
+        CAUSAL_LM_MODEL, torch_dtype=torch.float16
+    )
+    quantize_model(model, "int8")
+    assert not is_quantized(model)
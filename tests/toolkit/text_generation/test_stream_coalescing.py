@@ -0,0 +1,235 @@
+"""
+Tests for the coalescing of the parts of generation streams
+"""
+
+# Standard
+import asyncio
+
+# Third Party
+import grpc
+import pytest
+
+# First Party
+from caikit.core.data_model import ProducerId
+from caikit_tgis_backend.protobufs import generation_pb2, generation_pb2_grpc
+from caikit_tgis_backend.tgis_connection import TGISConnection
+
+# Local
+from caikit_nlp.toolkit.text_generation import stream_coalescing
+from caikit_nlp.toolkit.text_generation.model_run_utils import generate_text_func_stream
+from caikit_nlp.toolkit.text_generation.stream_coalescing import (
+    StreamCoalescer,
+    StreamPartCoalescer,
+    new_stream_coalescer,
+    new_stream_part_coalescer,
+)
+from caikit_nlp.toolkit.text_generation.tgis_utils import (
+    AsyncTGISGenerationClient,
+    TGISGenerationClient,
+    close_async_tgis_clients,
+    get_async_tgis_client,
+)
+from tests.fixtures import (
+    causal_lm_dummy_model,
+    causal_lm_train_kwargs,
+    fake_tgis_server,
+    temp_config,
+)
+
+## Helpers #####################################################################
+
+GENERATE_KWARGS = dict(
+    preserve_input_text=False,
+    input_tokens=False,
+    generated_tokens=True,
+    token_logprobs=False,
+    token_ranks=False,
+    include_stop_sequence=False,
+    max_new_tokens=20,
+    min_new_tokens=0,
+    truncate_input_tokens=0,
+    decoding_method="GREEDY",
+    top_k=0,
+    top_p=1.0,
+    typical_p=1.0,
+    temperature=1.0,
+    seed=None,
+    repetition_penalty=1.0,
+    max_time=None,
+    exponential_decay_length_penalty=None,
+    stop_sequences=None,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def token_part(text, count, stop_reason=generation_pb2.StopReason.NOT_FINISHED):
+    return generation_pb2.GenerationResponse(
+        text=text,
+        generated_token_count=count,
+        stop_reason=stop_reason,
+        tokens=[generation_pb2.TokenInfo(text=text)],
+    )
+
+
+## Tests #######################################################################
+
+
+def test_coalescer_by_tokens():
+    coalescer = StreamCoalescer(max_tokens=3)
+    # The first token is sent at once, then every 3 tokens
+    assert [coalescer.due(1) for _ in range(7)] == [
+        True,
+        False,
+        False,
+        True,
+        False,
+        False,
+        True,
+    ]
+
+
+def test_coalescer_by_window(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(stream_coalescing.time, "monotonic", clock)
+    coalescer = StreamCoalescer(window_ms=10)
+    assert coalescer.due(1)
+    clock.now += 0.004
+    assert not coalescer.due(1)
+    clock.now += 0.004
+    assert not coalescer.due(1)
+    clock.now += 0.004
+    assert coalescer.due(1)
+    # Slow tokens are sent as they come
+    clock.now += 0.050
+    assert coalescer.due(1)
+
+
+def test_coalescer_waits_for_tokens():
+    coalescer = StreamCoalescer(max_tokens=2)
+    assert not coalescer.due(0)
+    assert coalescer.due(1)
+
+
+@pytest.mark.parametrize(
+    "max_tokens,window_ms", [(0, 0), (-1, 10), (2, -1)], ids=["none", "tokens", "ms"]
+)
+def test_coalescer_settings_validated(max_tokens, window_ms):
+    with pytest.raises(ValueError):
+        StreamCoalescer(max_tokens, window_ms)
+
+
+def test_part_coalescer_merges_parts():
+    coalescer = StreamPartCoalescer(max_tokens=3)
+    parts = [
+        generation_pb2.GenerationResponse(input_token_count=4, seed=42),
+        token_part("a", 1),
+        token_part(" b", 2),
+        token_part(" c", 3),
+        token_part(" d", 4),
+        token_part(" e", 5, generation_pb2.StopReason.EOS_TOKEN),
+    ]
+    merged = [coalescer.add(part) for part in parts]
+    merged.append(coalescer.flush())
+    merged = [part for part in merged if part is not None]
+
+    assert [part.text for part in merged] == ["a", " b c d", " e"]
+    assert [part.generated_token_count for part in merged] == [1, 4, 5]
+    assert [[token.text for token in part.tokens] for part in merged] == [
+        ["a"],
+        [" b", " c", " d"],
+        [" e"],
+    ]
+    # The input details come with the first token, the stop reason with the last
+    assert merged[0].input_token_count == 4
+    assert merged[0].seed == 42
+    assert [part.stop_reason for part in merged] == [
+        generation_pb2.StopReason.NOT_FINISHED,
+        generation_pb2.StopReason.NOT_FINISHED,
+        generation_pb2.StopReason.EOS_TOKEN,
+    ]
+    assert coalescer.flush() is None
+
+
+def test_new_coalescers_from_config():
+    assert new_stream_coalescer() is None
+    assert new_stream_part_coalescer() is None
+    with temp_config(
+        text_generation={"stream_coalesce_window_ms": "20"},
+        tgis_client={"stream_coalesce_tokens": "8"},
+    ):
+        local = new_stream_coalescer()
+        assert (local.max_tokens, local.window) == (0, 0.02)
+        tgis = new_stream_part_coalescer()
+        assert isinstance(tgis, StreamPartCoalescer)
+        assert (tgis.max_tokens, tgis.window) == (8, 0)
+        assert new_stream_part_coalescer() is not tgis
+
+
+def test_tgis_stream_coalesced(fake_tgis_server):
+    servicer, address = fake_tgis_server
+    with temp_config(tgis_client={"stream_coalesce_tokens": 2}):
+        with grpc.insecure_channel(address) as channel:
+            client = TGISGenerationClient(
+                "foo",
+                "</s>",
+                generation_pb2_grpc.GenerationServiceStub(channel),
+                ProducerId("Test", "0.0.1"),
+            )
+            stream = list(client.stream_generate(text="a b c d e", **GENERATE_KWARGS))
+
+    assert [part.generated_text for part in stream] == ["a", " b c", " d e"]
+    assert [part.details.generated_tokens for part in stream] == [1, 3, 5]
+    assert stream[0].details.input_token_count == 5
+
+
+def test_async_tgis_stream_coalesced(fake_tgis_server):
+    _, address = fake_tgis_server
+
+    async def run():
+        client = AsyncTGISGenerationClient(
+            "foo",
+            "</s>",
+            get_async_tgis_client(TGISConnection(hostname=address, model_id="foo")),
+            ProducerId("Test", "0.0.1"),
+        )
+        stream = [
+            part
+            async for part in client.stream_generate(
+                text="a b c d e", **GENERATE_KWARGS
+            )
+        ]
+        await close_async_tgis_clients()
+        return stream
+
+    with temp_config(tgis_client={"stream_coalesce_tokens": 4}):
+        stream = asyncio.run(run())
+    assert [part.generated_text for part in stream] == ["a", " b c d e"]
+    assert stream[-1].details.generated_tokens == 5
+
+
+def test_local_stream_coalesced(causal_lm_dummy_model):
+    kwargs = dict(
+        model=causal_lm_dummy_model.model,
+        tokenizer=causal_lm_dummy_model.tokenizer,
+        producer_id=ProducerId("TextGeneration", "0.1.0"),
+        eos_token="<\n>",
+        text="What is the boiling point of liquid Nitrogen?",
+        max_new_tokens=7,
+        min_new_tokens=7,
+    )
+    per_token = list(generate_text_func_stream(**kwargs))
+    with temp_config(text_generation={"stream_coalesce_tokens": 3}):
+        coalesced = list(generate_text_func_stream(**kwargs))
+
+    assert [part.details.generated_tokens for part in coalesced] == [1, 4, 7, 7]
+    assert "".join(part.generated_text for part in coalesced) == "".join(
+        part.generated_text for part in per_token
+    )
+    assert coalesced[-1].details == per_token[-1].details
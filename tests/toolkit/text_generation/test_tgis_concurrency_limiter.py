@@ -0,0 +1,361 @@
+"""
+Tests for the adaptive concurrency limits of the TGIS generate calls
+"""
+
+# Standard
+import asyncio
+import threading
+import time
+
+# Third Party
+from prometheus_client import REGISTRY
+import grpc
+import pytest
+
+# First Party
+from caikit.core.data_model import ProducerId
+from caikit.core.exceptions.caikit_core_exception import CaikitCoreException
+from caikit.runtime.types.caikit_runtime_exception import CaikitRuntimeException
+from caikit_tgis_backend.protobufs import generation_pb2, generation_pb2_grpc
+from caikit_tgis_backend.tgis_connection import TGISConnection
+
+# Local
+from caikit_nlp.toolkit.text_generation import tgis_concurrency_limiter
+from caikit_nlp.toolkit.text_generation.tgis_concurrency_limiter import (
+    TGISConcurrencyLimiter,
+    get_concurrency_limiter,
+)
+from caikit_nlp.toolkit.text_generation.tgis_utils import (
+    AsyncTGISGenerationClient,
+    TGISGenerationClient,
+    close_async_tgis_clients,
+    get_async_tgis_client,
+)
+from tests.fixtures import fake_tgis_server, temp_config
+
+## Helpers #####################################################################
+
+GENERATE_KWARGS = dict(
+    preserve_input_text=False,
+    input_tokens=False,
+    generated_tokens=False,
+    token_logprobs=False,
+    token_ranks=False,
+    include_stop_sequence=False,
+    max_new_tokens=20,
+    min_new_tokens=0,
+    truncate_input_tokens=0,
+    decoding_method="SAMPLING",
+    top_k=0,
+    top_p=1.0,
+    typical_p=1.0,
+    temperature=1.0,
+    seed=None,
+    repetition_penalty=1.0,
+    max_time=None,
+    exponential_decay_length_penalty=None,
+    stop_sequences=None,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRpcError(grpc.RpcError):
+    def __init__(self, code):
+        self._code = code
+
+    def code(self):
+        return self._code
+
+
+def request(model_id="foo", max_new_tokens=20, texts=1):
+    return generation_pb2.BatchedGenerationRequest(
+        model_id=model_id,
+        requests=[generation_pb2.GenerationRequest(text="a b") for _ in range(texts)],
+        params=generation_pb2.Parameters(
+            stopping=generation_pb2.StoppingCriteria(max_new_tokens=max_new_tokens)
+        ),
+    )
+
+
+def metric(name, model_id):
+    return REGISTRY.get_sample_value(name, {"model_id": model_id}) or 0
+
+
+def run_call(limiter, req, clock, seconds, generated_tokens=9):
+    with limiter.limited(req) as call:
+        clock.now += seconds
+        call.generated_tokens = generated_tokens
+
+
+def client(tgis_client, model_id="foo", **limiter_kwargs):
+    client = TGISGenerationClient(
+        model_id, "</s>", tgis_client, ProducerId("Test", "0.0.1")
+    )
+    client.concurrency_limiter = TGISConcurrencyLimiter(**limiter_kwargs)
+    return client
+
+
+## Tests #######################################################################
+
+
+def test_slots_by_max_new_tokens():
+    limiter = TGISConcurrencyLimiter(tokens_per_slot=256)
+    assert limiter.slots(request(max_new_tokens=20)) == 1
+    assert limiter.slots(request(max_new_tokens=600)) == 3
+    assert limiter.slots(request(max_new_tokens=600, texts=2)) == 6
+    stream_request = generation_pb2.SingleGenerationRequest(
+        model_id="foo",
+        request=generation_pb2.GenerationRequest(text="a b"),
+        params=generation_pb2.Parameters(
+            stopping=generation_pb2.StoppingCriteria(max_new_tokens=256)
+        ),
+    )
+    assert limiter.slots(stream_request) == 2
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"min_limit": 0},
+        {"initial_limit": 300},
+        {"tokens_per_slot": 0},
+        {"latency_tolerance": 1.0},
+        {"backoff": 1.0},
+    ],
+    ids=["min_limit", "initial_limit", "tokens_per_slot", "tolerance", "backoff"],
+)
+def test_settings_validated(kwargs):
+    with pytest.raises(ValueError):
+        TGISConcurrencyLimiter(**kwargs)
+
+
+def test_limit_grows_with_fast_calls(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(tgis_concurrency_limiter.time, "monotonic", clock)
+    limiter = TGISConcurrencyLimiter(initial_limit=4, max_limit=5)
+    for _ in range(4):
+        run_call(limiter, request(model_id="grow"), clock, 0.1)
+    assert limiter.limit("grow") == pytest.approx(4.9, abs=0.05)
+    for _ in range(20):
+        run_call(limiter, request(model_id="grow"), clock, 0.1)
+    assert limiter.limit("grow") == 5
+    assert limiter.inflight("grow") == 0
+    assert metric("tgis_concurrency_limit", "grow") == 5
+
+
+def test_limit_cut_by_slow_calls(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(tgis_concurrency_limiter.time, "monotonic", clock)
+    limiter = TGISConcurrencyLimiter(initial_limit=10, latency_tolerance=2.0)
+    run_call(limiter, request(model_id="slow"), clock, 0.1)
+    limit = limiter.limit("slow")
+    # Slower in total, but not per generated token
+    run_call(limiter, request(model_id="slow"), clock, 0.4, generated_tokens=39)
+    assert limiter.limit("slow") > limit
+    limit = limiter.limit("slow")
+    run_call(limiter, request(model_id="slow"), clock, 0.4)
+    assert limiter.limit("slow") == pytest.approx(limit * 0.9)
+
+
+def test_limit_cut_once_per_overloaded_round(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(tgis_concurrency_limiter.time, "monotonic", clock)
+    limiter = TGISConcurrencyLimiter(initial_limit=10, backoff=0.5)
+    contexts = [limiter.limited(request(model_id="overload")) for _ in range(3)]
+    for context in contexts:
+        context.__enter__()
+    clock.now += 0.1
+    # The calls started before the first cut don't cut the limit again
+    for context in contexts:
+        err = FakeRpcError(grpc.StatusCode.RESOURCE_EXHAUSTED)
+        assert not context.__exit__(type(err), err, None)
+    assert limiter.limit("overload") == 5
+    assert limiter.inflight("overload") == 0
+
+    clock.now += 0.1
+    with pytest.raises(CaikitCoreException):
+        with limiter.limited(request(model_id="overload")):
+            # Raised like the TGIS clients do
+            try:
+                raise FakeRpcError(grpc.StatusCode.UNAVAILABLE)
+            except grpc.RpcError as err:
+                raise CaikitCoreException(None, "unavailable") from err
+    assert limiter.limit("overload") == 2.5
+
+
+@pytest.mark.parametrize(
+    "err",
+    [FakeRpcError(grpc.StatusCode.INVALID_ARGUMENT), GeneratorExit()],
+    ids=["invalid", "cancelled"],
+)
+def test_limit_kept_on_other_errors(err):
+    limiter = TGISConcurrencyLimiter(initial_limit=10)
+    with pytest.raises(type(err)):
+        with limiter.limited(request(model_id="other")):
+            raise err
+    assert limiter.limit("other") == 10
+    assert limiter.inflight("other") == 0
+
+
+def test_call_over_limit_rejected():
+    limiter = TGISConcurrencyLimiter(initial_limit=2, min_limit=1)
+    rejected = metric("tgis_rejected_generate_calls_total", "full")
+    with limiter.limited(request(model_id="full")):
+        assert metric("tgis_inflight_slots", "full") == 1
+        # A call larger than the limit only goes through alone
+        with pytest.raises(CaikitRuntimeException) as exc_info:
+            with limiter.limited(request(model_id="full", max_new_tokens=600)):
+                pass
+        assert exc_info.value.status_code == grpc.StatusCode.RESOURCE_EXHAUSTED
+        with limiter.limited(request(model_id="full")):
+            assert limiter.inflight("full") == 2
+    with limiter.limited(request(model_id="full", max_new_tokens=600)):
+        assert limiter.inflight("full") == 3
+    assert metric("tgis_rejected_generate_calls_total", "full") == rejected + 1
+
+
+def test_call_queued_until_slots_free():
+    limiter = TGISConcurrencyLimiter(
+        initial_limit=1, max_limit=1, queue_timeout_ms=5000
+    )
+    released = threading.Event()
+
+    def hold():
+        with limiter.limited(request(model_id="queue")):
+            time.sleep(0.1)
+            released.set()
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    while not limiter.inflight("queue"):
+        time.sleep(0.001)
+    with limiter.limited(request(model_id="queue")):
+        assert released.is_set()
+    holder.join()
+
+    limiter.queue_timeout = 0.05
+    with limiter.limited(request(model_id="queue")):
+        start = time.monotonic()
+        with pytest.raises(CaikitRuntimeException):
+            with limiter.limited(request(model_id="queue")):
+                pass
+        assert time.monotonic() - start >= 0.05
+
+
+def test_async_call_queued_or_rejected():
+    limiter = TGISConcurrencyLimiter(initial_limit=1, max_limit=1, queue_timeout_ms=50)
+
+    async def run():
+        async def hold(seconds):
+            async with limiter.limited_async(request(model_id="async")):
+                await asyncio.sleep(seconds)
+
+        # Queued for less than the timeout
+        await asyncio.gather(hold(0.01), hold(0.01))
+        with pytest.raises(CaikitRuntimeException):
+            await asyncio.gather(hold(0.2), hold(0.01))
+
+    asyncio.run(run())
+    assert limiter.inflight("async") == 0
+
+
+def test_limiter_from_config():
+    assert get_concurrency_limiter() is None
+    with temp_config(
+        tgis_client={
+            "concurrency_limit": "true",
+            "concurrency_initial_limit": "8",
+            "concurrency_queue_timeout_ms": "20",
+        }
+    ):
+        limiter = get_concurrency_limiter()
+        assert (limiter.initial_limit, limiter.queue_timeout) == (8, 0.02)
+        assert get_concurrency_limiter() is limiter
+        assert TGISGenerationClient(
+            "foo", "</s>", None, ProducerId("Test", "0.0.1")
+        ).concurrency_limiter is limiter
+    with temp_config(
+        tgis_client={"concurrency_limit": True, "concurrency_initial_limit": 4}
+    ):
+        assert get_concurrency_limiter().initial_limit == 4
+
+
+def test_client_calls_limited(fake_tgis_server):
+    servicer, address = fake_tgis_server
+    with grpc.insecure_channel(address) as channel:
+        limited_client = client(
+            generation_pb2_grpc.GenerationServiceStub(channel),
+            model_id="client",
+            initial_limit=1,
+        )
+        limiter = limited_client.concurrency_limiter
+        with limiter.limited(request(model_id="client")):
+            with pytest.raises(CaikitRuntimeException) as exc_info:
+                limited_client.unary_generate(text="a b c", **GENERATE_KWARGS)
+            assert exc_info.value.status_code == grpc.StatusCode.RESOURCE_EXHAUSTED
+            with pytest.raises(CaikitRuntimeException):
+                next(limited_client.stream_generate(text="a b c", **GENERATE_KWARGS))
+        assert not servicer.requests
+
+        result = limited_client.unary_generate(text="a b c", **GENERATE_KWARGS)
+        assert result.generated_text == "a b c"
+        stream = list(limited_client.stream_generate(text="a b", **GENERATE_KWARGS))
+        assert stream[-1].details.generated_tokens == 2
+        assert limiter.limit("client") > 1
+        assert limiter.inflight("client") == 0
+
+        # An early closed stream gives back its slot
+        stream = limited_client.stream_generate(text="a b", **GENERATE_KWARGS)
+        next(stream)
+        assert limiter.inflight("client") == 1
+        stream.close()
+        assert limiter.inflight("client") == 0
+
+        # TGIS failing as overloaded cuts the limit
+        limit = limiter.limit("client")
+        servicer.error_code = grpc.StatusCode.RESOURCE_EXHAUSTED
+        with pytest.raises(CaikitCoreException):
+            limited_client.unary_generate(text="a b c", **GENERATE_KWARGS)
+        assert limiter.limit("client") == pytest.approx(max(limit * 0.9, 1))
+        assert limiter.inflight("client") == 0
+
+
+def test_async_client_calls_limited(fake_tgis_server):
+    _, address = fake_tgis_server
+
+    async def run():
+        limited_client = AsyncTGISGenerationClient(
+            "async_client",
+            "</s>",
+            get_async_tgis_client(
+                TGISConnection(hostname=address, model_id="async_client")
+            ),
+            ProducerId("Test", "0.0.1"),
+        )
+        limiter = TGISConcurrencyLimiter(initial_limit=1)
+        limited_client.concurrency_limiter = limiter
+        async with limiter.limited_async(request(model_id="async_client")):
+            with pytest.raises(CaikitRuntimeException):
+                await limited_client.unary_generate(text="a b", **GENERATE_KWARGS)
+        result = await limited_client.unary_generate(text="a b", **GENERATE_KWARGS)
+        stream = [
+            part
+            async for part in limited_client.stream_generate(
+                text="a b", **GENERATE_KWARGS
+            )
+        ]
+        await close_async_tgis_clients()
+        return limiter, result, stream
+
+    limiter, result, stream = asyncio.run(run())
+    assert result.generated_text == "a b"
+    assert stream[-1].details.generated_tokens == 2
+    assert limiter.limit("async_client") > 1
+    assert limiter.inflight("async_client") == 0
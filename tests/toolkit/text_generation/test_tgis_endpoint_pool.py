@@ -0,0 +1,240 @@
+"""
+Tests for the balancing of TGIS calls over several endpoints, against local fake
+TGIS servers
+"""
+
+# Standard
+from contextlib import ExitStack
+import asyncio
+
+# Third Party
+import grpc
+import pytest
+
+# First Party
+from caikit.core.data_model import ProducerId
+from caikit.core.exceptions.caikit_core_exception import CaikitCoreException
+
+# Local
+from caikit_nlp.modules.text_generation import TextGenerationTGIS
+from caikit_nlp.toolkit.text_generation.tgis_endpoint_pool import (
+    AsyncTGISEndpointPool,
+    TGISEndpointPool,
+    close_async_endpoint_pools,
+    get_endpoint_pool,
+)
+from caikit_nlp.toolkit.text_generation.tgis_utils import (
+    AsyncTGISGenerationClient,
+    TGISGenerationClient,
+)
+from tests.fixtures import StubTGISBackend, serve_fake_tgis, temp_config
+
+## Helpers #####################################################################
+
+GENERATE_KWARGS = dict(
+    preserve_input_text=False,
+    input_tokens=False,
+    generated_tokens=False,
+    token_logprobs=False,
+    token_ranks=False,
+    include_stop_sequence=False,
+    max_new_tokens=20,
+    min_new_tokens=0,
+    truncate_input_tokens=0,
+    decoding_method="GREEDY",
+    top_k=0,
+    top_p=1.0,
+    typical_p=1.0,
+    temperature=1.0,
+    seed=None,
+    repetition_penalty=1.0,
+    max_time=None,
+    exponential_decay_length_penalty=None,
+    stop_sequences=None,
+)
+
+
+@pytest.fixture
+def fake_tgis_servers():
+    """Three fake TGIS servers, as a list of (servicer, address)"""
+    with ExitStack() as stack:
+        yield [stack.enter_context(serve_fake_tgis()) for _ in range(3)]
+
+
+def request_counts(servers):
+    return [len(servicer.requests) for servicer, _ in servers]
+
+
+def gen_client(pool):
+    return TGISGenerationClient("foo", "</s>", pool, ProducerId("Test", "0.0.1"))
+
+
+## Tests #######################################################################
+
+
+def test_least_outstanding_requests(fake_tgis_servers):
+    pool = TGISEndpointPool([address for _, address in fake_tgis_servers])
+    client = gen_client(pool)
+
+    # Two streams in flight on the first two endpoints
+    streams = [
+        client.stream_generate(text="a b c", **GENERATE_KWARGS) for _ in range(2)
+    ]
+    for stream in streams:
+        next(stream)
+    assert request_counts(fake_tgis_servers) == [1, 1, 0]
+    assert [endpoint.outstanding for endpoint in pool.endpoints] == [1, 1, 0]
+
+    # Unary calls go to the idle endpoint
+    for _ in range(3):
+        assert client.unary_generate(text="hi", **GENERATE_KWARGS).generated_text
+    assert request_counts(fake_tgis_servers) == [1, 1, 3]
+
+    # Finished streams release their endpoints
+    for stream in streams:
+        assert "".join(part.generated_text for part in stream) == "a b c"
+    assert [endpoint.outstanding for endpoint in pool.endpoints] == [0, 0, 0]
+    pool.close()
+
+
+def test_least_outstanding_tokens(fake_tgis_servers):
+    pool = TGISEndpointPool(
+        [address for _, address in fake_tgis_servers], balance_by="tokens"
+    )
+    client = gen_client(pool)
+    long_stream = client.stream_generate(
+        text="a b c d", **{**GENERATE_KWARGS, "max_new_tokens": 100}
+    )
+    next(long_stream)
+    short_streams = [
+        client.stream_generate(text="a", **{**GENERATE_KWARGS, "max_new_tokens": 5})
+        for _ in range(2)
+    ]
+    for stream in short_streams:
+        next(stream)
+    # 4 input words + 100 new tokens, and 1 + 5 for each short stream
+    assert [endpoint.outstanding for endpoint in pool.endpoints] == [104, 6, 6]
+
+    # The next call goes to one of the endpoints with short streams
+    client.unary_generate(text="hi", **GENERATE_KWARGS)
+    assert request_counts(fake_tgis_servers)[0] == 1
+    for stream in [long_stream] + short_streams:
+        list(stream)
+    pool.close()
+
+
+def test_unavailable_endpoints_are_ejected(fake_tgis_servers):
+    fake_tgis_servers[0][0].error_code = grpc.StatusCode.UNAVAILABLE
+    pool = TGISEndpointPool([address for _, address in fake_tgis_servers])
+    client = gen_client(pool)
+
+    # The failed call is retried on another endpoint
+    result = client.unary_generate(text="hello", **GENERATE_KWARGS)
+    assert result.generated_text == "hello"
+    assert request_counts(fake_tgis_servers) == [1, 1, 0]
+    assert pool.endpoints[0].ejected_until > 0
+
+    # The ejected endpoint gets no calls
+    for _ in range(4):
+        client.unary_generate(text="hello", **GENERATE_KWARGS)
+    assert request_counts(fake_tgis_servers)[0] == 1
+
+    # Streams are retried too, before they stream any output
+    fake_tgis_servers[1][0].error_code = grpc.StatusCode.UNAVAILABLE
+    stream = client.stream_generate(text="x y", **GENERATE_KWARGS)
+    assert "".join(part.generated_text for part in stream) == "x y"
+    assert [endpoint.outstanding for endpoint in pool.endpoints] == [0, 0, 0]
+    pool.close()
+
+
+def test_all_endpoints_unavailable(fake_tgis_servers):
+    for servicer, _ in fake_tgis_servers:
+        servicer.error_code = grpc.StatusCode.UNAVAILABLE
+    pool = TGISEndpointPool([address for _, address in fake_tgis_servers])
+    with pytest.raises(CaikitCoreException):
+        gen_client(pool).unary_generate(text="hello", **GENERATE_KWARGS)
+    assert request_counts(fake_tgis_servers) == [1, 1, 1]
+
+    # Ejected endpoints are still used once they all are
+    for servicer, _ in fake_tgis_servers:
+        servicer.error_code = None
+    assert gen_client(pool).unary_generate(text="hello", **GENERATE_KWARGS)
+    pool.close()
+
+
+def test_other_errors_are_not_retried(fake_tgis_servers):
+    fake_tgis_servers[0][0].error_code = grpc.StatusCode.INVALID_ARGUMENT
+    pool = TGISEndpointPool([address for _, address in fake_tgis_servers])
+    with pytest.raises(CaikitCoreException):
+        gen_client(pool).unary_generate(text="hello", **GENERATE_KWARGS)
+    assert request_counts(fake_tgis_servers) == [1, 0, 0]
+    assert pool.endpoints[0].ejected_until == 0
+    assert pool.endpoints[0].outstanding == 0
+    pool.close()
+
+
+def test_async_pool(fake_tgis_servers):
+    fake_tgis_servers[0][0].error_code = grpc.StatusCode.UNAVAILABLE
+
+    async def run():
+        pool = AsyncTGISEndpointPool([address for _, address in fake_tgis_servers])
+        client = AsyncTGISGenerationClient(
+            "foo", "</s>", pool, ProducerId("Test", "0.0.1")
+        )
+        result = await client.unary_generate(text="hello", **GENERATE_KWARGS)
+        stream = client.stream_generate(text="x y z", **GENERATE_KWARGS)
+        first = await stream.__anext__()
+        outstanding = [endpoint.outstanding for endpoint in pool.endpoints]
+        rest = [part.generated_text async for part in stream]
+        tokenization = await client.unary_tokenize(text="a b")
+        await pool.close()
+        return result, first, outstanding, rest, tokenization, pool
+
+    result, first, outstanding, rest, tokenization, pool = asyncio.run(run())
+    assert result.generated_text == "hello"
+    assert first.details.input_token_count == 3
+    assert outstanding == [0, 0, 1]
+    assert "".join(rest) == "x y z"
+    assert tokenization.token_count == 2
+    assert [endpoint.outstanding for endpoint in pool.endpoints] == [0, 0, 0]
+    assert request_counts(fake_tgis_servers) == [1, 2, 1]
+
+
+def test_async_pool_stream_stopped_early(fake_tgis_servers):
+    async def run():
+        pool = AsyncTGISEndpointPool([address for _, address in fake_tgis_servers])
+        client = AsyncTGISGenerationClient(
+            "foo", "</s>", pool, ProducerId("Test", "0.0.1")
+        )
+        stream = client.stream_generate(text="a b c d", **GENERATE_KWARGS)
+        await stream.__anext__()
+        await stream.aclose()
+        outstanding = [endpoint.outstanding for endpoint in pool.endpoints]
+        await pool.close()
+        return outstanding
+
+    assert asyncio.run(run()) == [0, 0, 0]
+
+
+def test_module_uses_configured_endpoints(fake_tgis_servers):
+    addresses = [address for _, address in fake_tgis_servers]
+    with temp_config(tgis_client={"endpoints": {"model-name": ",".join(addresses)}}):
+        pool = get_endpoint_pool("model-name")
+        assert get_endpoint_pool("model-name") is pool
+        assert get_endpoint_pool("other-model") is None
+
+        model = TextGenerationTGIS(
+            "model-name", eos_token="</s>", tgis_backend=StubTGISBackend()
+        )
+        assert model._client is pool
+        for _ in range(3):
+            model.run("hello")
+        assert request_counts(fake_tgis_servers) == [1, 1, 1]
+
+        async def run_async():
+            result = await model.run_async("hello")
+            await close_async_endpoint_pools()
+            return result
+
+        assert asyncio.run(run_async()).generated_text == "hello"
+        assert sum(request_counts(fake_tgis_servers)) == 4
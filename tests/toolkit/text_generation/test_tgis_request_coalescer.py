@@ -0,0 +1,159 @@
+"""
+Tests for the coalescing of unary TGIS generate calls, against a local fake TGIS
+server
+"""
+
+# Standard
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+# Third Party
+import grpc
+import pytest
+
+# First Party
+from caikit.core.data_model import ProducerId
+from caikit.core.exceptions.caikit_core_exception import (
+    CaikitCoreException,
+    CaikitCoreStatusCode,
+)
+from caikit_tgis_backend.protobufs import generation_pb2_grpc
+
+# Local
+from caikit_nlp.toolkit.text_generation import tgis_utils
+from caikit_nlp.toolkit.text_generation.tgis_request_coalescer import (
+    TGISRequestCoalescer,
+    get_request_coalescer,
+)
+from tests.fixtures import fake_tgis_server, temp_config
+
+## Helpers #####################################################################
+
+GENERATE_KWARGS = dict(
+    preserve_input_text=False,
+    input_tokens=False,
+    generated_tokens=False,
+    token_logprobs=False,
+    token_ranks=False,
+    include_stop_sequence=False,
+    max_new_tokens=20,
+    min_new_tokens=0,
+    truncate_input_tokens=0,
+    decoding_method="GREEDY",
+    top_k=0,
+    top_p=1.0,
+    typical_p=1.0,
+    temperature=1.0,
+    seed=None,
+    repetition_penalty=1.0,
+    max_time=None,
+    exponential_decay_length_penalty=None,
+    stop_sequences=None,
+)
+
+
+@pytest.fixture
+def tgis_stub(fake_tgis_server):
+    servicer, address = fake_tgis_server
+    with grpc.insecure_channel(address) as channel:
+        yield servicer, generation_pb2_grpc.GenerationServiceStub(channel)
+
+
+def make_client(stub, coalescer, prefix_id=None):
+    client = tgis_utils.TGISGenerationClient(
+        "foo", "</s>", stub, ProducerId("Test", "0.0.1"), prefix_id=prefix_id
+    )
+    client.request_coalescer = coalescer
+    return client
+
+
+def generate_concurrently(clients_and_kwargs):
+    """Run unary_generate for each (client, text, kwargs) at the same time"""
+    barrier = threading.Barrier(len(clients_and_kwargs))
+
+    def generate(client, text, kwargs):
+        barrier.wait()
+        return client.unary_generate(text=text, **{**GENERATE_KWARGS, **kwargs})
+
+    with ThreadPoolExecutor(len(clients_and_kwargs)) as pool:
+        futures = [pool.submit(generate, *args) for args in clients_and_kwargs]
+        return [future.result() for future in futures]
+
+
+## Tests #######################################################################
+
+
+def test_coalesces_concurrent_calls(tgis_stub):
+    servicer, stub = tgis_stub
+    client = make_client(stub, TGISRequestCoalescer(window_ms=200))
+    texts = [f"hello number {i}" for i in range(8)]
+    results = generate_concurrently([(client, text, {}) for text in texts])
+
+    # Each call gets its own response back
+    assert [result.generated_text for result in results] == texts
+    assert all(result.generated_tokens == 3 for result in results)
+    assert len(servicer.requests) == 1
+    assert len(servicer.requests[0].requests) == 8
+    assert servicer.requests[0].model_id == "foo"
+
+
+def test_coalesced_batches_are_limited(tgis_stub):
+    servicer, stub = tgis_stub
+    client = make_client(stub, TGISRequestCoalescer(window_ms=200, max_batch_size=3))
+    texts = [f"hello {i}" for i in range(7)]
+    results = generate_concurrently([(client, text, {}) for text in texts])
+    assert [result.generated_text for result in results] == texts
+    assert sorted(len(request.requests) for request in servicer.requests) == [1, 3, 3]
+
+
+def test_different_params_and_prefixes_are_not_coalesced(tgis_stub):
+    servicer, stub = tgis_stub
+    coalescer = TGISRequestCoalescer(window_ms=200)
+    client = make_client(stub, coalescer)
+    prefix_client = make_client(stub, coalescer, prefix_id="my-prompt")
+    results = generate_concurrently(
+        [
+            (client, "a", {}),
+            (client, "b", {}),
+            (client, "c", {"max_new_tokens": 5}),
+            (prefix_client, "d", {}),
+        ]
+    )
+    assert [result.generated_text for result in results] == ["a", "b", "c", "d"]
+    batches = {
+        (request.prefix_id, request.params.stopping.max_new_tokens): sorted(
+            req.text for req in request.requests
+        )
+        for request in servicer.requests
+    }
+    assert batches == {("", 20): ["a", "b"], ("", 5): ["c"], ("my-prompt", 20): ["d"]}
+
+
+def test_errors_are_raised_by_every_coalesced_call(tgis_stub):
+    servicer, stub = tgis_stub
+    servicer.error_code = grpc.StatusCode.INVALID_ARGUMENT
+    client = make_client(stub, TGISRequestCoalescer(window_ms=200))
+    barrier = threading.Barrier(3)
+
+    def generate(text):
+        barrier.wait()
+        with pytest.raises(CaikitCoreException) as context:
+            client.unary_generate(text=text, **GENERATE_KWARGS)
+        return context.value.status_code
+
+    with ThreadPoolExecutor(3) as pool:
+        codes = list(pool.map(generate, ["a", "b", "c"]))
+    assert codes == [CaikitCoreStatusCode.INVALID_ARGUMENT] * 3
+    assert len(servicer.requests) == 1
+
+
+def test_get_request_coalescer_from_config():
+    assert get_request_coalescer() is None
+    with temp_config(tgis_client={"coalesce_window_ms": "5"}):
+        coalescer = get_request_coalescer()
+        assert coalescer.window == 0.005
+        assert get_request_coalescer() is coalescer
+        client = tgis_utils.TGISGenerationClient(
+            "foo", "</s>", None, ProducerId("Test", "0.0.1")
+        )
+        assert client.request_coalescer is coalescer
@@ -0,0 +1,216 @@
+"""
+Tests for the hedging of unary TGIS generate calls, against local fake TGIS servers
+"""
+
+# Standard
+from contextlib import ExitStack
+import time
+
+# Third Party
+from prometheus_client import REGISTRY
+import grpc
+import pytest
+
+# First Party
+from caikit.core.data_model import ProducerId
+from caikit.core.exceptions.caikit_core_exception import CaikitCoreException
+from caikit_tgis_backend.protobufs import generation_pb2_grpc
+
+# Local
+from caikit_nlp.toolkit.text_generation.tgis_endpoint_pool import TGISEndpointPool
+from caikit_nlp.toolkit.text_generation.tgis_request_hedger import (
+    TGISRequestHedger,
+    get_request_hedger,
+)
+from caikit_nlp.toolkit.text_generation.tgis_utils import TGISGenerationClient
+from tests.fixtures import serve_fake_tgis, temp_config
+
+## Helpers #####################################################################
+
+GENERATE_KWARGS = dict(
+    preserve_input_text=False,
+    input_tokens=False,
+    generated_tokens=False,
+    token_logprobs=False,
+    token_ranks=False,
+    include_stop_sequence=False,
+    max_new_tokens=20,
+    min_new_tokens=0,
+    truncate_input_tokens=0,
+    decoding_method="GREEDY",
+    top_k=0,
+    top_p=1.0,
+    typical_p=1.0,
+    temperature=1.0,
+    seed=None,
+    repetition_penalty=1.0,
+    max_time=None,
+    exponential_decay_length_penalty=None,
+    stop_sequences=None,
+)
+
+
+@pytest.fixture
+def fake_tgis_servers():
+    """Two fake TGIS servers, as a list of (servicer, address)"""
+    with ExitStack() as stack:
+        yield [stack.enter_context(serve_fake_tgis()) for _ in range(2)]
+
+
+@pytest.fixture
+def pool(fake_tgis_servers):
+    pool = TGISEndpointPool([address for _, address in fake_tgis_servers])
+    yield pool
+    pool.close()
+
+
+def request_counts(servers):
+    return [len(servicer.requests) for servicer, _ in servers]
+
+
+def hedged_client(tgis_client, model_id, **hedger_kwargs):
+    """Generation client whose hedger has warmed up with 10ms latencies"""
+    client = TGISGenerationClient(
+        model_id, "</s>", tgis_client, ProducerId("Test", "0.0.1")
+    )
+    client.request_hedger = TGISRequestHedger(
+        **{"percentile": 90, "min_delay_ms": 50, "min_samples": 5, **hedger_kwargs}
+    )
+    for _ in range(5):
+        client.request_hedger._add_latency(model_id, 0.01)
+    return client
+
+
+def metric(name, model_id):
+    return REGISTRY.get_sample_value(name, {"model_id": model_id}) or 0
+
+
+## Tests #######################################################################
+
+
+@pytest.mark.parametrize(
+    "kwargs,hedgeable",
+    [
+        ({"decoding_method": "GREEDY"}, True),
+        ({"decoding_method": "SAMPLING"}, False),
+        ({"decoding_method": "SAMPLING", "seed": 42}, True),
+    ],
+)
+def test_hedgeable(kwargs, hedgeable):
+    client = TGISGenerationClient("foo", "</s>", None, ProducerId("Test", "0.0.1"))
+    request = client._unary_request(text="hello", **{**GENERATE_KWARGS, **kwargs})
+    assert TGISRequestHedger.hedgeable(request) == hedgeable
+
+
+def test_hedge_delay():
+    hedger = TGISRequestHedger(percentile=90, min_delay_ms=5, min_samples=10)
+    for latency in range(1, 10):
+        hedger._add_latency("foo", latency / 1000)
+    assert hedger.hedge_delay("foo") is None
+    hedger._add_latency("foo", 0.01)
+    assert hedger.hedge_delay("foo") == pytest.approx(0.01)
+    assert hedger.hedge_delay("bar") is None
+
+    # The delay is at least the min delay
+    for _ in range(20):
+        hedger._add_latency("bar", 0.001)
+    assert hedger.hedge_delay("bar") == pytest.approx(0.005)
+
+
+def test_calls_are_not_hedged_while_warming_up(fake_tgis_servers, pool):
+    client = TGISGenerationClient("warmup", "</s>", pool, ProducerId("Test", "0.0.1"))
+    client.request_hedger = TGISRequestHedger(percentile=90, min_samples=3)
+    fake_tgis_servers[0][0].delay = 0.1
+    for _ in range(3):
+        client.unary_generate(text="hello", **GENERATE_KWARGS)
+    assert sum(request_counts(fake_tgis_servers)) == 3
+    assert metric("tgis_generate_hedges_total", "warmup") == 0
+    assert metric("tgis_hedgeable_generate_calls_total", "warmup") == 3
+    assert client.request_hedger.hedge_delay("warmup") is not None
+
+
+def test_slow_call_is_hedged(fake_tgis_servers, pool):
+    client = hedged_client(pool, "slow")
+    fake_tgis_servers[0][0].delay = 1.0
+    start = time.monotonic()
+    result = client.unary_generate(text="hello there", **GENERATE_KWARGS)
+    assert time.monotonic() - start < 0.5
+    assert result.generated_text == "hello there"
+    assert request_counts(fake_tgis_servers) == [1, 1]
+    assert metric("tgis_generate_hedges_total", "slow") == 1
+    assert metric("tgis_generate_hedge_wins_total", "slow") == 1
+
+    # The slow call is cancelled, and its endpoint released from its done callback
+    deadline = time.monotonic() + 5
+    while any(endpoint.outstanding for endpoint in pool.endpoints):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_fast_call_is_not_hedged(fake_tgis_servers, pool):
+    client = hedged_client(pool, "fast")
+    for _ in range(4):
+        client.unary_generate(text="hello", **GENERATE_KWARGS)
+    assert sum(request_counts(fake_tgis_servers)) == 4
+    assert metric("tgis_generate_hedges_total", "fast") == 0
+
+
+def test_sampling_without_seed_is_not_hedged(fake_tgis_servers, pool):
+    client = hedged_client(pool, "sampling")
+    fake_tgis_servers[0][0].delay = 0.2
+    client.unary_generate(
+        text="hello", **{**GENERATE_KWARGS, "decoding_method": "SAMPLING"}
+    )
+    assert request_counts(fake_tgis_servers) == [1, 0]
+    assert metric("tgis_hedgeable_generate_calls_total", "sampling") == 0
+
+
+def test_unavailable_call_is_hedged_right_away(fake_tgis_servers, pool):
+    client = hedged_client(pool, "unavailable", min_delay_ms=5000)
+    fake_tgis_servers[0][0].error_code = grpc.StatusCode.UNAVAILABLE
+    result = client.unary_generate(text="hello", **GENERATE_KWARGS)
+    assert result.generated_text == "hello"
+    assert request_counts(fake_tgis_servers) == [1, 1]
+    assert metric("tgis_generate_hedge_wins_total", "unavailable") == 1
+    assert pool.endpoints[0].ejected_until > 0
+
+
+def test_failed_calls_raise(fake_tgis_servers, pool):
+    client = hedged_client(pool, "failed")
+    for servicer, _ in fake_tgis_servers:
+        servicer.error_code = grpc.StatusCode.INVALID_ARGUMENT
+    with pytest.raises(CaikitCoreException):
+        client.unary_generate(text="hello", **GENERATE_KWARGS)
+    assert request_counts(fake_tgis_servers) == [1, 0]
+
+    # The next call goes to the second endpoint, and its failed hedge waits for it
+    fake_tgis_servers[1][0].error_code = None
+    fake_tgis_servers[1][0].delay = 0.2
+    result = client.unary_generate(text="hello", **GENERATE_KWARGS)
+    assert result.generated_text == "hello"
+    assert request_counts(fake_tgis_servers) == [2, 1]
+    assert metric("tgis_generate_hedge_wins_total", "failed") == 0
+
+
+def test_hedge_on_single_channel(fake_tgis_servers):
+    servicer, address = fake_tgis_servers[0]
+    with grpc.insecure_channel(address) as channel:
+        client = hedged_client(
+            generation_pb2_grpc.GenerationServiceStub(channel), "single"
+        )
+        servicer.delay = 0.2
+        result = client.unary_generate(text="hello", **GENERATE_KWARGS)
+    assert result.generated_text == "hello"
+    assert len(servicer.requests) == 2
+    assert metric("tgis_generate_hedges_total", "single") == 1
+
+
+def test_get_request_hedger():
+    assert get_request_hedger() is None
+    with temp_config(tgis_client={"hedge_percentile": "95", "hedge_window": "100"}):
+        hedger = get_request_hedger()
+        assert hedger.percentile == 95
+        assert hedger.window == 100
+        assert get_request_hedger() is hedger
+        client = TGISGenerationClient("foo", "</s>", None, ProducerId("Test", "0.0.1"))
+        assert client.request_hedger is hedger
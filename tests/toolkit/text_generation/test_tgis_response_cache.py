@@ -0,0 +1,238 @@
+"""
+Tests for the cache of the TGIS responses to deterministic generation requests
+"""
+
+# Standard
+import asyncio
+import time
+
+# Third Party
+from prometheus_client import REGISTRY
+import grpc
+import pytest
+
+# First Party
+from caikit.core.data_model import ProducerId
+from caikit_tgis_backend.protobufs import generation_pb2, generation_pb2_grpc
+from caikit_tgis_backend.tgis_connection import TGISConnection
+
+# Local
+from caikit_nlp.toolkit.text_generation.tgis_response_cache import (
+    TGISResponseCache,
+    get_response_cache,
+)
+from caikit_nlp.toolkit.text_generation.tgis_utils import (
+    AsyncTGISGenerationClient,
+    TGISGenerationClient,
+    close_async_tgis_clients,
+    get_async_tgis_client,
+)
+from tests.fixtures import fake_tgis_server, temp_config
+
+## Helpers #####################################################################
+
+GENERATE_KWARGS = dict(
+    preserve_input_text=False,
+    input_tokens=False,
+    generated_tokens=False,
+    token_logprobs=False,
+    token_ranks=False,
+    include_stop_sequence=False,
+    max_new_tokens=20,
+    min_new_tokens=0,
+    truncate_input_tokens=0,
+    decoding_method="GREEDY",
+    top_k=0,
+    top_p=1.0,
+    typical_p=1.0,
+    temperature=1.0,
+    seed=None,
+    repetition_penalty=1.0,
+    max_time=None,
+    exponential_decay_length_penalty=None,
+    stop_sequences=None,
+)
+
+
+def make_request(text="hello", model_id="foo", prefix_id=None, **kwargs):
+    client = TGISGenerationClient(
+        model_id, "</s>", None, ProducerId("Test", "0.0.1"), prefix_id
+    )
+    return client._unary_request(text=text, **{**GENERATE_KWARGS, **kwargs})
+
+
+def make_response(text="hello", stop_reason=generation_pb2.StopReason.EOS_TOKEN):
+    return generation_pb2.GenerationResponse(
+        text=text, generated_token_count=1, stop_reason=stop_reason
+    )
+
+
+@pytest.fixture
+def cached_client(fake_tgis_server):
+    """Generation client of a fake TGIS server with a response cache"""
+    servicer, address = fake_tgis_server
+    with grpc.insecure_channel(address) as channel:
+        client = TGISGenerationClient(
+            "cached-model",
+            "</s>",
+            generation_pb2_grpc.GenerationServiceStub(channel),
+            ProducerId("Test", "0.0.1"),
+        )
+        client.response_cache = TGISResponseCache(max_entries=10, ttl_seconds=60)
+        yield servicer, client
+
+
+## Tests #######################################################################
+
+
+def test_cache_get_put():
+    cache = TGISResponseCache(max_entries=10, ttl_seconds=60)
+    assert cache.get(make_request()) is None
+    cache.put(make_request(), make_response())
+    assert cache.get(make_request()).text == "hello"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # The model, prefix, text and parameters are all part of the key
+    for request in [
+        make_request(model_id="bar"),
+        make_request(prefix_id="prefix"),
+        make_request(text="hello there"),
+        make_request(max_new_tokens=10),
+    ]:
+        assert cache.get(request) is None
+
+
+def test_cache_deterministic_requests_only():
+    cache = TGISResponseCache(max_entries=10, ttl_seconds=60)
+    sampling = make_request(decoding_method="SAMPLING")
+    cache.put(sampling, make_response())
+    assert cache.get(sampling) is None
+    assert len(cache) == 0
+    assert cache.misses == 0
+
+    seeded = make_request(decoding_method="SAMPLING", seed=42)
+    cache.put(seeded, make_response())
+    assert cache.get(seeded) is not None
+
+
+@pytest.mark.parametrize(
+    "stop_reason,cached",
+    [
+        (generation_pb2.StopReason.MAX_TOKENS, True),
+        (generation_pb2.StopReason.STOP_SEQUENCE, True),
+        (generation_pb2.StopReason.TIME_LIMIT, False),
+        (generation_pb2.StopReason.CANCELLED, False),
+    ],
+)
+def test_cache_finished_responses_only(stop_reason, cached):
+    cache = TGISResponseCache(max_entries=10, ttl_seconds=60)
+    cache.put(make_request(), make_response(stop_reason=stop_reason))
+    assert (cache.get(make_request()) is not None) == cached
+
+
+def test_cache_max_entries():
+    cache = TGISResponseCache(max_entries=2, ttl_seconds=60)
+    for text in ["a", "b"]:
+        cache.put(make_request(text), make_response(text))
+    # "a" is used, so "b" is dropped for "c"
+    assert cache.get(make_request("a")) is not None
+    cache.put(make_request("c"), make_response("c"))
+    assert len(cache) == 2
+    assert cache.get(make_request("b")) is None
+    assert cache.get(make_request("a")) is not None
+    assert cache.get(make_request("c")) is not None
+
+
+def test_cache_ttl():
+    cache = TGISResponseCache(max_entries=10, ttl_seconds=0.05)
+    cache.put(make_request(), make_response())
+    assert cache.get(make_request()) is not None
+    time.sleep(0.1)
+    assert cache.get(make_request()) is None
+    assert len(cache) == 0
+
+
+def test_unary_generate_cached(cached_client):
+    servicer, client = cached_client
+    hits = REGISTRY.get_sample_value(
+        "tgis_response_cache_hits_total", {"model_id": "cached-model"}
+    )
+    results = [
+        client.unary_generate(text="hello there", **GENERATE_KWARGS) for _ in range(3)
+    ]
+    assert len(servicer.requests) == 1
+    assert all(result.generated_text == "hello there" for result in results)
+    assert all(result.generated_tokens == 2 for result in results)
+    assert (
+        REGISTRY.get_sample_value(
+            "tgis_response_cache_hits_total", {"model_id": "cached-model"}
+        )
+        == (hits or 0) + 2
+    )
+
+    # Sampling without a seed always goes to TGIS
+    for _ in range(2):
+        client.unary_generate(
+            text="hello there", **{**GENERATE_KWARGS, "decoding_method": "SAMPLING"}
+        )
+    assert len(servicer.requests) == 3
+
+
+def test_stream_generate_replays_cached(cached_client):
+    servicer, client = cached_client
+    streamed = list(client.stream_generate(text="a b c", **GENERATE_KWARGS))
+    assert len(servicer.requests) == 1
+
+    # Streams don't populate the cache
+    client.unary_generate(text="a b c", **GENERATE_KWARGS)
+    assert len(servicer.requests) == 2
+
+    replayed = list(client.stream_generate(text="a b c", **GENERATE_KWARGS))
+    assert len(servicer.requests) == 2
+    assert "".join(part.generated_text for part in replayed) == "".join(
+        part.generated_text for part in streamed
+    )
+    assert replayed[0].details.input_token_count == 3
+    assert replayed[-1].details.generated_tokens == 3
+    assert replayed[-1].details.finish_reason == generation_pb2.StopReason.EOS_TOKEN
+
+
+def test_async_client_uses_cache(fake_tgis_server):
+    servicer, address = fake_tgis_server
+
+    async def run():
+        client = AsyncTGISGenerationClient(
+            "foo",
+            "</s>",
+            get_async_tgis_client(TGISConnection(hostname=address, model_id="foo")),
+            ProducerId("Test", "0.0.1"),
+        )
+        client.response_cache = TGISResponseCache(max_entries=10, ttl_seconds=60)
+        result = await client.unary_generate(text="hello", **GENERATE_KWARGS)
+        cached = await client.unary_generate(text="hello", **GENERATE_KWARGS)
+        replayed = [
+            part.generated_text
+            async for part in client.stream_generate(text="hello", **GENERATE_KWARGS)
+        ]
+        await close_async_tgis_clients()
+        return result, cached, replayed
+
+    result, cached, replayed = asyncio.run(run())
+    assert len(servicer.requests) == 1
+    assert cached.generated_text == result.generated_text == "hello"
+    assert "".join(replayed) == "hello"
+
+
+def test_get_response_cache():
+    assert get_response_cache() is None
+    with temp_config(
+        tgis_client={
+            "response_cache_max_entries": "100",
+            "response_cache_ttl_seconds": "30",
+        }
+    ):
+        cache = get_response_cache()
+        assert (cache.max_entries, cache.ttl) == (100, 30)
+        assert get_response_cache() is cache
+        client = TGISGenerationClient("foo", "</s>", None, ProducerId("Test", "0.0.1"))
+        assert client.response_cache is cache
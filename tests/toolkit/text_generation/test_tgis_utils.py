@@ -17,6 +17,7 @@ Tests for tgis_utils
 
 # Standard
 from typing import Iterable, Optional, Type
+import asyncio
 
 # Third Party
 import fastapi
@@ -28,11 +29,12 @@ import pytest
 from caikit.core.data_model import ProducerId
 from caikit.core.exceptions.caikit_core_exception import CaikitCoreException
 from caikit.interfaces.runtime.data_model import RuntimeServerContextType
-from caikit_tgis_backend.protobufs import generation_pb2
+from caikit_tgis_backend.protobufs import generation_pb2, generation_pb2_grpc
+from caikit_tgis_backend.tgis_connection import TGISConnection
 
 # Local
 from caikit_nlp.toolkit.text_generation import tgis_utils
-from tests.fixtures import TestServicerContext
+from tests.fixtures import TestServicerContext, fake_tgis_server, temp_config
 
 ## Helpers #####################################################################
 
@@ -134,6 +136,225 @@ def test_TGISGenerationClient_rpc_errors(status_code, method):
     assert isinstance(rpc_err, grpc.RpcError)
 
 
+## AsyncTGISGenerationClient ###################################################
+
+GENERATE_KWARGS = dict(
+    preserve_input_text=False,
+    input_tokens=False,
+    generated_tokens=False,
+    token_logprobs=False,
+    token_ranks=False,
+    include_stop_sequence=False,
+    max_new_tokens=20,
+    min_new_tokens=0,
+    truncate_input_tokens=0,
+    decoding_method="GREEDY",
+    top_k=0,
+    top_p=1.0,
+    typical_p=1.0,
+    temperature=1.0,
+    seed=None,
+    repetition_penalty=1.0,
+    max_time=None,
+    exponential_decay_length_penalty=None,
+    stop_sequences=None,
+)
+
+
+def async_gen_client(address, prefix_id=None):
+    connection = TGISConnection(hostname=address, model_id="foo")
+    return tgis_utils.AsyncTGISGenerationClient(
+        "foo",
+        "bar",
+        tgis_utils.get_async_tgis_client(connection),
+        ProducerId("foobar"),
+        prefix_id,
+    )
+
+
+def test_AsyncTGISGenerationClient(fake_tgis_server):
+    servicer, address = fake_tgis_server
+
+    async def run():
+        gen_client = async_gen_client(address, prefix_id="my-prompt")
+        result = await gen_client.unary_generate(text="hello world", **GENERATE_KWARGS)
+        stream = [
+            part
+            async for part in gen_client.stream_generate(
+                text="hello there world", **GENERATE_KWARGS
+            )
+        ]
+        tokenization = await gen_client.unary_tokenize(text="hello")
+        await tgis_utils.close_async_tgis_clients()
+        return result, stream, tokenization
+
+    result, stream, tokenization = asyncio.run(run())
+    assert result.generated_text == "hello world"
+    assert result.generated_tokens == 2
+    assert [part.generated_text for part in stream] == ["", "hello", " there", " world"]
+    assert stream[-1].details.generated_tokens == 3
+    assert tokenization.token_count == 1
+    assert [request.prefix_id for request in servicer.requests[:2]] == ["my-prompt"] * 2
+
+
+def test_AsyncTGISGenerationClient_stops_stream_early(fake_tgis_server):
+    _, address = fake_tgis_server
+
+    async def run():
+        stream = async_gen_client(address).stream_generate(
+            text="a b c d e f", **GENERATE_KWARGS
+        )
+        async for part in stream:
+            if part.generated_text:
+                break
+        await stream.aclose()
+        await tgis_utils.close_async_tgis_clients()
+        return part
+
+    assert asyncio.run(run()).generated_text == "a"
+
+
+@pytest.mark.parametrize(
+    "status_code", [grpc.StatusCode.INVALID_ARGUMENT, grpc.StatusCode.UNAVAILABLE]
+)
+@pytest.mark.parametrize(
+    "method", ["unary_generate", "stream_generate", "unary_tokenize"]
+)
+def test_AsyncTGISGenerationClient_rpc_errors(fake_tgis_server, status_code, method):
+    servicer, address = fake_tgis_server
+    servicer.error_code = status_code
+
+    async def run():
+        gen_client = async_gen_client(address)
+        kwargs = GENERATE_KWARGS if method.endswith("_generate") else {}
+        try:
+            if method.startswith("stream_"):
+                async for _ in gen_client.stream_generate(text="foobar", **kwargs):
+                    pass
+            else:
+                await getattr(gen_client, method)(text="foobar", **kwargs)
+        finally:
+            await tgis_utils.close_async_tgis_clients()
+
+    with pytest.raises(CaikitCoreException) as context:
+        asyncio.run(run())
+    assert (
+        context.value.status_code == tgis_utils.GRPC_TO_CAIKIT_CORE_STATUS[status_code]
+    )
+    assert isinstance(context.value.__cause__, grpc.RpcError)
+
+
+## Batched tokenization ########################################################
+
+TOKENIZE_TEXTS = ["hello", "hello there", "a b c", "  spaced   out  ", "one more text"]
+
+
+def sync_gen_client(address):
+    channel = grpc.insecure_channel(address)
+    return channel, tgis_utils.TGISGenerationClient(
+        "foo",
+        "bar",
+        generation_pb2_grpc.GenerationServiceStub(channel),
+        ProducerId("foobar"),
+    )
+
+
+def test_TGISGenerationClient_batch_tokenize(fake_tgis_server):
+    servicer, address = fake_tgis_server
+    channel, gen_client = sync_gen_client(address)
+    with channel, temp_config(tgis_client={"tokenize_max_batch_size": 2}):
+        results = gen_client.batch_tokenize(TOKENIZE_TEXTS)
+        assert gen_client.batch_tokenize([]) == []
+    assert [result.token_count for result in results] == [1, 2, 3, 2, 3]
+    assert all(not result.results for result in results)
+    # The texts are split over requests of at most 2 texts, in order
+    assert [
+        [req.text for req in request.requests] for request in servicer.requests
+    ] == [TOKENIZE_TEXTS[:2], TOKENIZE_TEXTS[2:4], TOKENIZE_TEXTS[4:]]
+
+
+@pytest.mark.parametrize(
+    "return_tokens,return_offsets", [(True, False), (False, True), (True, True)]
+)
+def test_TGISGenerationClient_batch_tokenize_tokens(
+    fake_tgis_server, return_tokens, return_offsets
+):
+    servicer, address = fake_tgis_server
+    channel, gen_client = sync_gen_client(address)
+    with channel:
+        result = gen_client.batch_tokenize(
+            ["  spaced   out  "],
+            return_tokens=return_tokens,
+            return_offsets=return_offsets,
+        )[0]
+    request = servicer.requests[0]
+    assert (request.return_tokens, request.return_offsets) == (
+        return_tokens,
+        return_offsets,
+    )
+    assert result.token_count == 2
+    assert [token.text for token in result.results] == ["spaced", "out"]
+    if return_offsets:
+        assert [(token.start, token.end) for token in result.results] == [
+            (2, 8),
+            (11, 14),
+        ]
+    else:
+        assert all(token.start is None for token in result.results)
+
+
+def test_TGISGenerationClient_batch_tokenize_errors():
+    gen_client = tgis_utils.TGISGenerationClient(
+        "foo", "bar", MockTgisClient(grpc.StatusCode.UNAVAILABLE), ProducerId("foobar")
+    )
+    with pytest.raises(CaikitCoreException) as context:
+        gen_client.batch_tokenize(["foobar"])
+    assert (
+        context.value.status_code
+        == tgis_utils.GRPC_TO_CAIKIT_CORE_STATUS[grpc.StatusCode.UNAVAILABLE]
+    )
+
+    # A response without a result for each text is an error
+    gen_client.tgis_client = MockTgisClient(None)
+    with pytest.raises(ValueError):
+        gen_client.batch_tokenize(["foobar"])
+    with pytest.raises(TypeError):
+        gen_client.batch_tokenize(["foobar", 42])
+
+
+def test_AsyncTGISGenerationClient_batch_tokenize(fake_tgis_server):
+    servicer, address = fake_tgis_server
+
+    async def run():
+        gen_client = async_gen_client(address)
+        results = await gen_client.batch_tokenize(TOKENIZE_TEXTS, return_offsets=True)
+        await tgis_utils.close_async_tgis_clients()
+        return results
+
+    with temp_config(tgis_client={"tokenize_max_batch_size": "3"}):
+        results = asyncio.run(run())
+    assert [result.token_count for result in results] == [1, 2, 3, 2, 3]
+    assert [token.text for token in results[3].results] == ["spaced", "out"]
+    assert sorted(len(request.requests) for request in servicer.requests) == [2, 3]
+
+
+def test_get_async_tgis_client_per_event_loop():
+    connection = TGISConnection(hostname="localhost:1234", model_id="foo")
+
+    async def get_clients():
+        clients = (
+            tgis_utils.get_async_tgis_client(connection),
+            tgis_utils.get_async_tgis_client(connection),
+        )
+        await tgis_utils.close_async_tgis_clients()
+        return clients
+
+    first, same = asyncio.run(get_clients())
+    other, _ = asyncio.run(get_clients())
+    assert first is same
+    assert other is not first
+
+
 # NOTE: This test is preserved in caikit-nlp despite being duplicated in
 # caikit-tgis-backend so that we guarantee that the functionality is accessible
 # in a version-compatible way here.